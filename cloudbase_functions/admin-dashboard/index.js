@@ -9,406 +9,396 @@ const app = cloudbase.init({
 // 获取数据库引用
 const db = app.database();
 
-exports.main = async function(event, context) {
-    console.log('=== 管理员仪表板云函数 - 简化版本 ===');
-    console.log('Event:', JSON.stringify(event));
-    
-    try {
-        console.log('开始获取仪表板数据...');
-        
-        // 1. 获取订单统计（排除软删除的订单）
-        const ordersResult = await db.collection('orders')
-            .where({ is_deleted: db.command.neq(true) })
-            .get();
-        const orders = ordersResult.data || [];
-        
-        // 统计订单状态
-        var statusStats = {
-            '待处理': 0,
-            '制作中': 0,
-            '已完成': 0
-        };
-        
-        orders.forEach(order => {
-            var status = order.order_status || '待处理';
-            if (statusStats.hasOwnProperty(status)) {
-                statusStats[status]++;
-            }
-        });
-        
-        // 2. 获取进度统计
-        const progressResult = await db.collection('order_progress').get();
-        const allProgress = progressResult.data || [];
-        
-        // 统计各阶段进度
-        var stageStats = {};
-        allProgress.forEach(progress => {
-            var stageName = progress.stage_name || '未知阶段';
-            if (!stageStats[stageName]) {
-                stageStats[stageName] = {
-                    completed: 0,
-                    in_progress: 0,
-                    pending: 0,
-                    total: 0
-                };
-            }
-            
-            var status = progress.status || 'pending';
-            if (stageStats[stageName].hasOwnProperty(status)) {
-                stageStats[stageName][status]++;
-            }
-            stageStats[stageName].total++;
-        });
-        
-        // 3. 生成操作日志
-        var recentActivities = [];
-        
-        // 从订单收集活动
-        const sortedOrders = orders
-            .sort((a, b) => new Date(b.created_at || 0) - new Date(a.created_at || 0));
-        
-        sortedOrders.forEach(order => {
-            recentActivities.push({
-                type: '订单创建',
-                message: order.customer_name + ' - ' + order.order_number,
-                timestamp: order.created_at,
-                order_id: order._id
-            });
-        });
-        
-        // 从进度更新收集活动（最近完成的阶段）
-        const sortedProgress = allProgress
-            .filter(p => p.status === 'completed' && p.completed_at)
-            .sort((a, b) => new Date(b.completed_at) - new Date(a.completed_at));
-        
-        sortedProgress.forEach(progress => {
-            // 查找对应的订单信息
-            const order = orders.find(o => o._id === progress.order_id);
-            if (order) {
-                recentActivities.push({
-                    type: '阶段完成',
-                    message: `${order.customer_name} - ${progress.stage_name || progress.stage_id}`,
-                    timestamp: progress.completed_at,
-                    order_id: progress.order_id
-                });
-            }
-        });
-        
-        // 按时间排序
-        recentActivities.sort((a, b) => new Date(b.timestamp || 0) - new Date(a.timestamp || 0));
-        
-        // 4. 计算完成趋势数据（最近30天）
-        const trendData = calculateCompletionTrend(orders, allProgress);
-        
-        // 5. 计算真实的性能指标（使用进度数据）
-        const performanceMetrics = calculatePerformanceMetrics(orders, allProgress);
-        
-        // 6. 计算总体指标
-        var totalOrders = orders.length;
-        var completedOrders = statusStats['已完成'];
-        var inProgressOrders = statusStats['制作中'];
-        var pendingOrders = statusStats['待处理'];
-        var recentOrdersCount = getRecentOrdersCount(orders);
-        
-        // 计算今日完成数 - 统计今天完成最后一个阶段的订单数
-        var todayCompleted = getTodayCompletedOrders(orders, allProgress);
-        
-        // 计算本月完成数 - 统计本月完成最后一个阶段的订单数
-        var thisMonthCompleted = getThisMonthCompletedOrders(orders, allProgress);
-        
-        var completionRate = totalOrders > 0 ? Math.round((completedOrders / totalOrders) * 100) : 0;
-        var avgCompletionDays = performanceMetrics.avg_completion_days || 0;
-        var onTimeRate = performanceMetrics.on_time_rate || 0;
-        
-        var dashboardData = {
-            overview: {
-                total_orders: totalOrders,
-                completed_orders: completedOrders,
-                in_progress_orders: inProgressOrders,
-                pending_orders: pendingOrders,
-                today_completed: todayCompleted,
-                this_month_completed: thisMonthCompleted,
-                completion_rate: completionRate,
-                recent_orders: recentOrdersCount,
-                avg_completion_time: Math.round(avgCompletionDays),
-                on_time_rate: Math.round(onTimeRate * 100)
-            },
-            order_status_stats: statusStats,
-            stage_stats: stageStats,
-            recent_activities: recentActivities,
-            completion_trend: trendData,
-            performance_metrics: performanceMetrics
-        };
-        
-        // 添加详细调试信息
-        console.log('=== 调试信息 ===');
-        console.log('订单总数:', orders.length);
-        console.log('已完成订单数:', statusStats['已完成']);
-        console.log('进度总记录数:', allProgress.length);
-        if (allProgress.length > 0) {
-            console.log('第一个进度记录:', JSON.stringify(allProgress[0], null, 2));
+// 最近动态最多返回的条数
+const RECENT_ACTIVITY_LIMIT = 50;
+
+// 重建计数器时每次读取的记录数
+const SCAN_PAGE_SIZE = 1000;
+
+// 仪表板计数器：dashboard_stats 集合中的单个文档，由 admin-orders、admin-progress 的写操作按增量维护，
+// 这里只读这一个文档；rebuild 操作（以及每天的定时触发）全量重算并校正偏差
+// （与 admin-orders、admin-progress 中的同名函数保持一致）
+const DASHBOARD_STATS_COLLECTION = 'dashboard_stats';
+const DASHBOARD_STATS_ID = 'global';
+const ORDER_STATUSES = ['待处理', '制作中', '已完成'];
+const STAGE_STATUSES = ['completed', 'in_progress', 'pending'];
+
+function addDelta(delta, path, amount) {
+    delta[path] = (delta[path] || 0) + amount;
+}
+
+// 已完成订单的完成日期和耗时天数（以最后一个完成的阶段为准）
+function completionOf(order, progress) {
+    if (!order || order.order_status !== '已完成') {
+        return null;
+    }
+    const finished = progress
+        .filter(p => p.status === 'completed' && p.completed_at)
+        .map(p => p.completed_at)
+        .sort()
+        .pop();
+    if (!finished) {
+        return null;
+    }
+    const days = order.created_at
+        ? Math.ceil((new Date(finished) - new Date(order.created_at)) / (1000 * 60 * 60 * 24))
+        : 0;
+    return { day: finished.split('T')[0], days: days };
+}
+
+// 订单本身的计数（订单数、状态、完成日期和耗时），sign 为 1 计入、-1 扣除
+function addOrderStats(delta, order, progress, sign) {
+    const status = order.order_status || '待处理';
+    addDelta(delta, 'total_orders', sign);
+    if (ORDER_STATUSES.includes(status)) {
+        addDelta(delta, `status.${status}`, sign);
+    }
+    const completion = completionOf(order, progress);
+    if (completion) {
+        addDelta(delta, `completed_by_day.${completion.day}`, sign);
+        if (completion.days > 0) {
+            addDelta(delta, 'completion_days_total', sign * completion.days);
+            addDelta(delta, 'completion_days_count', sign);
         }
-        console.log('今日完成:', todayCompleted);
-        console.log('本月完成:', thisMonthCompleted);
-        console.log('平均耗时:', avgCompletionDays);
-        console.log('===============');
-        
-        console.log('仪表板数据生成成功:', JSON.stringify(dashboardData, null, 2));
-        
-        return {
-            statusCode: 200,
-            headers: {
-                'Content-Type': 'application/json; charset=utf-8',
-                'Access-Control-Allow-Origin': '*'
-            },
-            body: JSON.stringify({
-                success: true,
-                data: dashboardData,
-                message: '获取仪表板数据成功'
-            })
-        };
-        
-    } catch (error) {
-        console.error('云函数执行错误:', error);
-        
-        return {
-            statusCode: 200,
-            headers: {
-                'Content-Type': 'application/json; charset=utf-8',
-                'Access-Control-Allow-Origin': '*'
-            },
-            body: JSON.stringify({
-                success: false,
-                message: '服务器内部错误: ' + error.message,
-                data: null
-            })
-        };
     }
-};
+}
 
-// 计算完成趋势数据（最近30天）
-function calculateCompletionTrend(orders, allProgress) {
-    const dates = [];
-    const completions = [];
-    
-    // 生成最近30天的日期数组
-    for (let i = 29; i >= 0; i--) {
-        const date = new Date();
-        date.setDate(date.getDate() - i);
-        const dateStr = date.toISOString().split('T')[0]; // 格式：YYYY-MM-DD
-        dates.push(dateStr);
-        completions.push(0); // 初始化为0
+// 一条进度记录的阶段计数
+function addStageStats(delta, progress, sign) {
+    const stageName = progress.stage_name || '未知阶段';
+    const status = progress.status || 'pending';
+    addDelta(delta, `stages.${stageName}.total`, sign);
+    if (STAGE_STATUSES.includes(status)) {
+        addDelta(delta, `stages.${stageName}.${status}`, sign);
     }
-    
-    // 统计每天的完成订单数（通过进度表）
-    console.log('=== 趋势图调试 ===');
-    console.log('已完成订单数:', orders.filter(o => o.order_status === '已完成').length);
-    
-    let debugCount = 0;
-    orders.forEach(order => {
-        if (order.order_status === '已完成') {
-            // 找到这个订单的所有进度
-            const orderProgresses = allProgress.filter(p => p.order_id === order._id);
-            console.log(`订单 ${order.order_number} 的进度数:`, orderProgresses.length);
-            
-            // 调试：打印所有进度的状态
-            if (orderProgresses.length > 0) {
-                console.log(`订单 ${order.order_number} 的进度详情:`, 
-                    orderProgresses.map(p => ({
-                        stage_name: p.stage_name, 
-                        status: p.status, 
-                        completed_at: p.completed_at
-                    }))
-                );
-            }
-            
-            // 找到最后一个完成的阶段
-            const lastCompletedProgress = orderProgresses
-                .filter(p => p.status === 'completed' && p.completed_at)
-                .sort((a, b) => new Date(b.completed_at) - new Date(a.completed_at))[0];
-            
-            if (lastCompletedProgress && lastCompletedProgress.completed_at) {
-                const completedDate = lastCompletedProgress.completed_at.split('T')[0];
-                const index = dates.indexOf(completedDate);
-                console.log(`订单 ${order.order_number} 完成日期: ${completedDate}, 索引: ${index}`);
-                if (index !== -1) {
-                    completions[index]++;
-                    debugCount++;
-                }
-            }
+}
+
+// 计数器文档中不参与统计的字段
+const STATS_META_FIELDS = ['_id', 'updated_at', 'rebuilt_at'];
+
+// 把字段路径形式的计数展开为计数器文档
+function expandStats(delta) {
+    const stats = {
+        total_orders: 0,
+        status: { '待处理': 0, '制作中': 0, '已完成': 0 },
+        stages: {},
+        completed_by_day: {},
+        completion_days_total: 0,
+        completion_days_count: 0
+    };
+    Object.keys(delta).forEach(path => {
+        if (!delta[path]) {
+            return;
         }
+        const keys = path.split('.');
+        let node = stats;
+        keys.slice(0, -1).forEach(key => {
+            node = node[key] = node[key] || {};
+        });
+        node[keys[keys.length - 1]] = delta[path];
     });
-    console.log('统计到的完成订单数:', debugCount);
-    console.log('==================');
-    
-    return {
-        dates: dates.map(d => d.split('-').slice(1).join('-')), // 格式：MM-DD
-        completions: completions
-    };
+    return stats;
 }
 
-// 计算性能指标
-function calculatePerformanceMetrics(orders, allProgress) {
-    const completedOrders = orders.filter(o => o.order_status === '已完成');
-    
-    // 计算平均完成天数 - 从订单开始到最后一个阶段完成的时间
-    let totalDays = 0;
-    let validOrders = 0;
-    
-    completedOrders.forEach(order => {
-        if (order.created_at) {
-            // 找到这个订单的所有进度
-            const orderProgresses = allProgress.filter(p => p.order_id === order._id);
-            
-            // 找到最后一个完成的阶段
-            const lastCompletedProgress = orderProgresses
-                .filter(p => p.status === 'completed' && p.completed_at)
-                .sort((a, b) => new Date(b.completed_at) - new Date(a.completed_at))[0];
-            
-            if (lastCompletedProgress) {
-                const created = new Date(order.created_at);
-                const completed = new Date(lastCompletedProgress.completed_at);
-                const days = Math.ceil((completed - created) / (1000 * 60 * 60 * 24));
-                if (days > 0) {
-                    totalDays += days;
-                    validOrders++;
-                }
-            }
+// 计数器文档展开为 字段路径 -> 计数
+function flattenStats(node, prefix = '', result = {}) {
+    Object.keys(node || {}).forEach(key => {
+        if (!prefix && STATS_META_FIELDS.includes(key)) {
+            return;
+        }
+        const path = prefix ? `${prefix}.${key}` : key;
+        if (node[key] !== null && typeof node[key] === 'object') {
+            flattenStats(node[key], path, result);
+        } else {
+            result[path] = node[key];
         }
     });
-    
-    const avgCompletionDays = validOrders > 0 ? Math.round(totalDays / validOrders) : 0;
-    
-    // 由于系统中不再维护预计完成时间，这里暂不计算准时交付率
-    const onTimeRate = 0;
-    
-    return {
-        avg_completion_days: avgCompletionDays,
-        on_time_rate: onTimeRate
-    };
+    return result;
 }
 
-// 获取近30天新订单数
-function getRecentOrdersCount(orders) {
-    const thirtyDaysAgo = new Date();
-    thirtyDaysAgo.setDate(thirtyDaysAgo.getDate() - 30);
-    
-    return orders.filter(order => {
-        if (order.created_at) {
-            return new Date(order.created_at) >= thirtyDaysAgo;
-        }
-        return false;
-    }).length;
+function isCollectionMissing(error) {
+    const text = `${(error && error.code) || ''} ${(error && error.message) || error}`;
+    return /COLLECTION_NOT_EXIST|not exist|不存在/i.test(text);
 }
 
-// 获取今日完成数
-function getTodayCompletedCount(orders) {
-    const today = new Date();
-    today.setHours(0, 0, 0, 0);
-    
-    // 调试：打印一些订单数据
-    console.log('调试：第一个订单的状态和完成时间', orders[0] ? {
-        order_status: orders[0].order_status,
-        completed_at: orders[0].completed_at,
-        order_number: orders[0].order_number
-    } : '无订单');
-    
-    return orders.filter(order => {
-        // 检查是否有完成时间和状态
-        const hasCompletedAt = order.completed_at;
-        const statusIsCompleted = order.order_status === '已完成';
-        
-        // 调试信息
-        if (hasCompletedAt && !statusIsCompleted) {
-            console.log('有完成时间但状态不是已完成:', {
-                order_number: order.order_number,
-                order_status: order.order_status,
-                completed_at: order.completed_at
-            });
+async function ensureCollection(name) {
+    try {
+        await db.createCollection(name);
+        console.log(`已创建集合 ${name}`);
+    } catch (error) {
+        // 集合已存在（并发创建）时忽略
+        console.warn(`创建集合 ${name} 失败:`, error.message || error);
+    }
+}
+
+// 读取计数器文档；集合不存在（新环境）时创建集合并返回 null，由调用方全量重建
+async function loadDashboardStats() {
+    try {
+        const result = await db.collection(DASHBOARD_STATS_COLLECTION).doc(DASHBOARD_STATS_ID).get();
+        return (result.data && result.data[0]) || null;
+    } catch (error) {
+        if (!isCollectionMissing(error)) {
+            throw error;
         }
-        
-        if (statusIsCompleted && hasCompletedAt) {
-            const completed = new Date(order.completed_at);
-            completed.setHours(0, 0, 0, 0);
-            return completed.getTime() === today.getTime();
+        console.log(`集合 ${DASHBOARD_STATS_COLLECTION} 不存在，创建后全量重建计数器`);
+        await ensureCollection(DASHBOARD_STATS_COLLECTION);
+        return null;
+    }
+}
+
+// 按 _id 分页读取集合中符合条件的全部记录（只在重建计数器时使用）
+async function scanCollection(name, condition) {
+    const _ = db.command;
+    const docs = [];
+    let cursor = '';
+    for (;;) {
+        const where = cursor ? _.and([condition, { _id: _.gt(cursor) }]) : condition;
+        const result = await db.collection(name)
+            .where(where)
+            .orderBy('_id', 'asc')
+            .limit(SCAN_PAGE_SIZE)
+            .get();
+        const page = result.data || [];
+        docs.push(...page);
+        if (page.length < SCAN_PAGE_SIZE) {
+            return docs;
         }
-        return false;
-    }).length;
+        cursor = page[page.length - 1]._id;
+    }
 }
 
-// 获取本月完成数
-function getThisMonthCompletedCount(orders) {
-    const now = new Date();
-    const firstDayOfMonth = new Date(now.getFullYear(), now.getMonth(), 1);
+// 全量扫描订单和进度重算计数器，覆盖保存并返回与原计数器的偏差
+// 重算期间发生的写操作可能没有计入，下一次重建时校正
+async function rebuildDashboardStats() {
+    const previous = await loadDashboardStats();
+    const [orders, allProgress] = await Promise.all([
+        scanCollection('orders', { is_deleted: db.command.neq(true) }),
+        scanCollection('order_progress', {})
+    ]);
     
-    const completedInMonth = orders.filter(order => {
-        if (order.order_status === '已完成' && order.completed_at) {
-            const completed = new Date(order.completed_at);
-            return completed >= firstDayOfMonth;
-        }
-        return false;
+    const delta = {};
+    const progressByOrder = {};
+    allProgress.forEach(progress => {
+        addStageStats(delta, progress, 1);
+        (progressByOrder[progress.order_id] = progressByOrder[progress.order_id] || []).push(progress);
     });
+    orders.forEach(order => addOrderStats(delta, order, progressByOrder[order._id] || [], 1));
+    
+    const stats = expandStats(delta);
+    stats.rebuilt_at = stats.updated_at = new Date().toISOString();
+    
+    const stored = flattenStats(previous);
+    const actual = flattenStats(stats);
+    const drift = [...new Set([...Object.keys(stored), ...Object.keys(actual)])]
+        .filter(path => (stored[path] || 0) !== (actual[path] || 0))
+        .sort()
+        .map(path => ({ field: path, stored: stored[path] || 0, actual: actual[path] || 0 }));
     
-    console.log('本月完成的订单数:', completedInMonth.length);
+    await db.collection(DASHBOARD_STATS_COLLECTION).doc(DASHBOARD_STATS_ID).set(stats);
+    console.log(`仪表板计数器已重建：订单 ${orders.length}，进度 ${allProgress.length}，偏差 ${drift.length} 项`);
     
-    return completedInMonth.length;
+    return {
+        stats: stats,
+        drift: drift,
+        bootstrapped: !previous,
+        scanned: { orders: orders.length, progress: allProgress.length }
+    };
 }
 
-// 统计今天完成最后一个阶段的订单数
-function getTodayCompletedOrders(orders, allProgress) {
-    const today = new Date();
-    today.setHours(0, 0, 0, 0);
+// 最近动态：最新创建的订单和最近完成的阶段，各自只读取前 RECENT_ACTIVITY_LIMIT 条
+async function loadRecentActivities() {
+    const _ = db.command;
+    const [ordersResult, progressResult] = await Promise.all([
+        db.collection('orders')
+            .where({ is_deleted: _.neq(true) })
+            .orderBy('created_at', 'desc')
+            .limit(RECENT_ACTIVITY_LIMIT)
+            .get(),
+        // 多读取一些：已删除订单的阶段会被过滤掉
+        db.collection('order_progress')
+            .where({ status: 'completed', completed_at: _.exists(true) })
+            .orderBy('completed_at', 'desc')
+            .limit(RECENT_ACTIVITY_LIMIT * 2)
+            .get()
+    ]);
+    const recentOrders = ordersResult.data || [];
+    const completedProgress = (progressResult.data || []).filter(p => p.completed_at);
     
-    let count = 0;
+    const ordersById = {};
+    recentOrders.forEach(order => {
+        ordersById[order._id] = order;
+    });
+    const missingIds = [...new Set(completedProgress.map(p => p.order_id))].filter(id => id && !ordersById[id]);
+    if (missingIds.length > 0) {
+        const missingResult = await db.collection('orders')
+            .where({ _id: _.in(missingIds), is_deleted: _.neq(true) })
+            .limit(missingIds.length)
+            .get();
+        (missingResult.data || []).forEach(order => {
+            ordersById[order._id] = order;
+        });
+    }
     
-    orders.forEach(order => {
-        if (order.order_status === '已完成') {
-            // 找到这个订单的所有进度
-            const orderProgresses = allProgress.filter(p => p.order_id === order._id);
-            
-            // 找到最后一个完成的阶段
-            const lastCompletedProgress = orderProgresses
-                .filter(p => p.status === 'completed' && p.completed_at)
-                .sort((a, b) => new Date(b.completed_at) - new Date(a.completed_at))[0];
-            
-            if (lastCompletedProgress) {
-                const completed = new Date(lastCompletedProgress.completed_at);
-                completed.setHours(0, 0, 0, 0);
-                if (completed.getTime() === today.getTime()) {
-                    count++;
-                }
-            }
+    const activities = recentOrders.map(order => ({
+        type: '订单创建',
+        message: order.customer_name + ' - ' + order.order_number,
+        timestamp: order.created_at,
+        order_id: order._id
+    }));
+    completedProgress.forEach(progress => {
+        const order = ordersById[progress.order_id];
+        if (order) {
+            activities.push({
+                type: '阶段完成',
+                message: `${order.customer_name} - ${progress.stage_name || progress.stage_id}`,
+                timestamp: progress.completed_at,
+                order_id: progress.order_id
+            });
         }
     });
     
-    return count;
+    // 按时间排序
+    activities.sort((a, b) => new Date(b.timestamp || 0) - new Date(a.timestamp || 0));
+    return activities.slice(0, RECENT_ACTIVITY_LIMIT);
 }
 
-// 统计本月完成最后一个阶段的订单数
-function getThisMonthCompletedOrders(orders, allProgress) {
-    const now = new Date();
-    const firstDayOfMonth = new Date(now.getFullYear(), now.getMonth(), 1);
+// 近30天新订单数（计数查询，不读取订单）
+async function countRecentOrders() {
+    const thirtyDaysAgo = new Date();
+    thirtyDaysAgo.setDate(thirtyDaysAgo.getDate() - 30);
     
-    let count = 0;
+    const result = await db.collection('orders')
+        .where({ is_deleted: db.command.neq(true), created_at: db.command.gte(thirtyDaysAgo.toISOString()) })
+        .count();
+    return result.total || 0;
+}
+
+// 由计数器文档生成仪表板数据
+function buildDashboardData(stats, recentActivities, recentOrdersCount) {
+    const statusStats = {};
+    ORDER_STATUSES.forEach(status => {
+        statusStats[status] = (stats.status || {})[status] || 0;
+    });
     
-    orders.forEach(order => {
-        if (order.order_status === '已完成') {
-            // 找到这个订单的所有进度
-            const orderProgresses = allProgress.filter(p => p.order_id === order._id);
-            
-            // 找到最后一个完成的阶段
-            const lastCompletedProgress = orderProgresses
-                .filter(p => p.status === 'completed' && p.completed_at)
-                .sort((a, b) => new Date(b.completed_at) - new Date(a.completed_at))[0];
-            
-            if (lastCompletedProgress) {
-                const completed = new Date(lastCompletedProgress.completed_at);
-                if (completed >= firstDayOfMonth) {
-                    count++;
-                }
-            }
+    const stageStats = {};
+    Object.keys(stats.stages || {}).forEach(stageName => {
+        const counts = stats.stages[stageName] || {};
+        if (counts.total) {
+            stageStats[stageName] = {
+                completed: counts.completed || 0,
+                in_progress: counts.in_progress || 0,
+                pending: counts.pending || 0,
+                total: counts.total
+            };
         }
     });
     
-    return count;
+    // 完成趋势（最近30天）、今日和本月完成数：按最后一个阶段的完成日期计数
+    const completedByDay = stats.completed_by_day || {};
+    const dates = [];
+    for (let i = 29; i >= 0; i--) {
+        const date = new Date();
+        date.setDate(date.getDate() - i);
+        dates.push(date.toISOString().split('T')[0]); // 格式：YYYY-MM-DD
+    }
+    const today = dates[dates.length - 1];
+    const thisMonth = today.slice(0, 7);
+    const todayCompleted = completedByDay[today] || 0;
+    const thisMonthCompleted = Object.keys(completedByDay)
+        .filter(day => day.slice(0, 7) === thisMonth)
+        .reduce((sum, day) => sum + (completedByDay[day] || 0), 0);
+    
+    const avgCompletionDays = stats.completion_days_count > 0
+        ? Math.round(stats.completion_days_total / stats.completion_days_count)
+        : 0;
+    
+    const totalOrders = stats.total_orders || 0;
+    const completedOrders = statusStats['已完成'];
+    
+    return {
+        overview: {
+            total_orders: totalOrders,
+            completed_orders: completedOrders,
+            in_progress_orders: statusStats['制作中'],
+            pending_orders: statusStats['待处理'],
+            today_completed: todayCompleted,
+            this_month_completed: thisMonthCompleted,
+            completion_rate: totalOrders > 0 ? Math.round((completedOrders / totalOrders) * 100) : 0,
+            recent_orders: recentOrdersCount,
+            avg_completion_time: avgCompletionDays,
+            // 由于系统中不再维护预计完成时间，这里暂不计算准时交付率
+            on_time_rate: 0
+        },
+        order_status_stats: statusStats,
+        stage_stats: stageStats,
+        recent_activities: recentActivities,
+        completion_trend: {
+            dates: dates.map(d => d.split('-').slice(1).join('-')), // 格式：MM-DD
+            completions: dates.map(d => completedByDay[d] || 0)
+        },
+        performance_metrics: {
+            avg_completion_days: avgCompletionDays,
+            on_time_rate: 0
+        },
+        stats_updated_at: stats.updated_at || null,
+        stats_rebuilt_at: stats.rebuilt_at || null
+    };
 }
+
+function jsonResponse(payload) {
+    return {
+        statusCode: 200,
+        headers: {
+            'Content-Type': 'application/json; charset=utf-8',
+            'Access-Control-Allow-Origin': '*'
+        },
+        body: JSON.stringify(payload)
+    };
+}
+
+exports.main = async function(event, context) {
+    console.log('=== 管理员仪表板云函数 - 简化版本 ===');
+    
+    try {
+        const requestData = JSON.parse(event.body || '{}');
+        const action = requestData.action || '';
+        
+        // 重建计数器：手动调用或每天的定时触发
+        if (action === 'rebuild' || event.Type === 'Timer') {
+            const rebuilt = await rebuildDashboardStats();
+            return jsonResponse({
+                success: true,
+                data: rebuilt,
+                message: `仪表板计数器已重建，校正 ${rebuilt.drift.length} 项偏差`
+            });
+        }
+        
+        console.log('开始获取仪表板数据...');
+        
+        // 读取计数器文档；还没有计数器时（首次部署）全量重建一次
+        let stats = await loadDashboardStats();
+        if (!stats) {
+            stats = (await rebuildDashboardStats()).stats;
+        }
+        
+        const [recentActivities, recentOrdersCount] = await Promise.all([
+            loadRecentActivities(),
+            countRecentOrders()
+        ]);
+        
+        return jsonResponse({
+            success: true,
+            data: buildDashboardData(stats, recentActivities, recentOrdersCount),
+            message: '获取仪表板数据成功'
+        });
+        
+    } catch (error) {
+        console.error('云函数执行错误:', error);
+        
+        return jsonResponse({
+            success: false,
+            message: '服务器内部错误: ' + error.message,
+            data: null
+        });
+    }
+};
@@ -9,6 +9,119 @@ const app = cloudbase.init({
 // 获取数据库引用
 const db = app.database();
 
+// 每页默认和最多返回的日志条数
+const LOG_PAGE_SIZE = 100;
+const LOG_MAX_PAGE_SIZE = 500;
+
+// 游标分页：游标是最后一条日志的 (timestamp, _id)，Base64 编码后返回给客户端
+function encodeCursor(log) {
+    return Buffer.from(JSON.stringify([log.timestamp || '', log._id])).toString('base64');
+}
+
+function decodeCursor(cursor) {
+    try {
+        const [timestamp, id] = JSON.parse(Buffer.from(String(cursor), 'base64').toString('utf8'));
+        if (typeof timestamp !== 'string' || typeof id !== 'string') {
+            return null;
+        }
+        return { timestamp, id };
+    } catch (e) {
+        return null;
+    }
+}
+
+// 包含匹配（不区分大小写）
+function containsPattern(text) {
+    return db.RegExp({
+        regexp: String(text).replace(/[.*+?^${}()|[\]\\]/g, '\\$&'),
+        options: 'i'
+    });
+}
+
+// 筛选条件：type 精确匹配；since（含）/ until（不含）为 ISO 时间；order_number、operator 包含匹配；
+// customer 在描述和客户姓名中包含匹配
+function logConditions(body) {
+    const _ = db.command;
+    const conditions = [];
+    if (body.type) {
+        conditions.push({ type: body.type });
+    }
+    if (body.since && body.until) {
+        conditions.push({ timestamp: _.gte(body.since).and(_.lt(body.until)) });
+    } else if (body.since) {
+        conditions.push({ timestamp: _.gte(body.since) });
+    } else if (body.until) {
+        conditions.push({ timestamp: _.lt(body.until) });
+    }
+    if (body.order_number) {
+        conditions.push({ order_number: containsPattern(body.order_number) });
+    }
+    if (body.operator) {
+        conditions.push({ operator: containsPattern(body.operator) });
+    }
+    if (body.customer) {
+        conditions.push(_.or([
+            { description: containsPattern(body.customer) },
+            { 'metadata.customer_name': containsPattern(body.customer) }
+        ]));
+    }
+    return conditions;
+}
+
+// 按时间倒序返回一页日志
+async function listLogs(body) {
+    const _ = db.command;
+    const limit = Math.min(parseInt(body.limit || LOG_PAGE_SIZE), LOG_MAX_PAGE_SIZE);
+    const cursor = body.cursor ? decodeCursor(body.cursor) : null;
+    if (body.cursor && !cursor) {
+        return { success: false, message: '无效的分页游标', data: null };
+    }
+    
+    const conditions = logConditions(body);
+    const pageConditions = cursor ? conditions.concat([_.or([
+        { timestamp: _.lt(cursor.timestamp) },
+        { timestamp: cursor.timestamp, _id: _.lt(cursor.id) }
+    ])]) : conditions;
+    
+    // 多取一条判断是否还有下一页
+    let query = db.collection('operation_logs');
+    if (pageConditions.length > 0) {
+        query = query.where(_.and(pageConditions));
+    }
+    const logsResult = await query
+        .orderBy('timestamp', 'desc')
+        .orderBy('_id', 'desc')
+        .limit(limit + 1)
+        .get();
+    const rows = logsResult.data || [];
+    const hasMore = rows.length > limit;
+    const logs = rows.slice(0, limit);
+    
+    const pagination = {
+        page_size: limit,
+        has_more: hasMore,
+        next_cursor: hasMore ? encodeCursor(logs[logs.length - 1]) : null
+    };
+    // 符合条件的总数需要额外一次 count，只在请求时返回
+    if (body.with_total) {
+        let countQuery = db.collection('operation_logs');
+        if (conditions.length > 0) {
+            countQuery = countQuery.where(_.and(conditions));
+        }
+        pagination.total_count = (await countQuery.count()).total;
+    }
+    
+    console.log(`返回 ${logs.length} 条操作日志，还有更多: ${hasMore}`);
+    return {
+        success: true,
+        data: {
+            logs: logs,
+            pagination: pagination
+        },
+        message: '获取操作日志成功'
+    };
+}
+
 exports.main = async function(event, context) {
     console.log('=== 操作日志查询云函数 ===');
     console.log('Event:', JSON.stringify(event));
@@ -43,29 +156,14 @@ exports.main = async function(event, context) {
             console.log('开始获取操作日志列表...');
             
             try {
-                // 获取所有操作日志（按时间倒序）
-                const logsResult = await db.collection('operation_logs')
-                    .orderBy('timestamp', 'desc')
-                    .limit(1000)
-                    .get();
-                
-                const logs = logsResult.data || [];
-                
-                console.log(`找到 ${logs.length} 条操作日志`);
-                
+                // 按筛选条件分页获取操作日志（按时间倒序）
                 return {
                     statusCode: 200,
                     headers: {
                         'Content-Type': 'application/json; charset=utf-8',
                         'Access-Control-Allow-Origin': '*'
                     },
-                    body: JSON.stringify({
-                        success: true,
-                        data: {
-                            logs: logs
-                        },
-                        message: '获取操作日志成功'
-                    })
+                    body: JSON.stringify(await listLogs(body))
                 };
             } catch (dbError) {
                 console.error('数据库查询失败:', dbError);
@@ -79,7 +177,8 @@ exports.main = async function(event, context) {
                     body: JSON.stringify({
                         success: true,
                         data: {
-                            logs: []
+                            logs: [],
+                            pagination: { page_size: 0, has_more: false, next_cursor: null }
                         },
                         message: '集合不存在，返回空列表'
                     })
@@ -44,6 +44,100 @@ async function logOperation(params) {
     }
 }
 
+// 仪表板计数器：dashboard_stats 集合中的单个文档，订单和进度的写操作按增量维护，
+// admin-dashboard 只读这一个文档；增量写入失败等原因造成的偏差由 admin-dashboard 的 rebuild 操作校正
+// （与 admin-progress、admin-dashboard 中的同名函数保持一致）
+const DASHBOARD_STATS_COLLECTION = 'dashboard_stats';
+const DASHBOARD_STATS_ID = 'global';
+const ORDER_STATUSES = ['待处理', '制作中', '已完成'];
+const STAGE_STATUSES = ['completed', 'in_progress', 'pending'];
+
+function addDelta(delta, path, amount) {
+    delta[path] = (delta[path] || 0) + amount;
+}
+
+// 已完成订单的完成日期和耗时天数（以最后一个完成的阶段为准）
+function completionOf(order, progress) {
+    if (!order || order.order_status !== '已完成') {
+        return null;
+    }
+    const finished = progress
+        .filter(p => p.status === 'completed' && p.completed_at)
+        .map(p => p.completed_at)
+        .sort()
+        .pop();
+    if (!finished) {
+        return null;
+    }
+    const days = order.created_at
+        ? Math.ceil((new Date(finished) - new Date(order.created_at)) / (1000 * 60 * 60 * 24))
+        : 0;
+    return { day: finished.split('T')[0], days: days };
+}
+
+// 订单本身的计数（订单数、状态、完成日期和耗时），sign 为 1 计入、-1 扣除
+function addOrderStats(delta, order, progress, sign) {
+    const status = order.order_status || '待处理';
+    addDelta(delta, 'total_orders', sign);
+    if (ORDER_STATUSES.includes(status)) {
+        addDelta(delta, `status.${status}`, sign);
+    }
+    const completion = completionOf(order, progress);
+    if (completion) {
+        addDelta(delta, `completed_by_day.${completion.day}`, sign);
+        if (completion.days > 0) {
+            addDelta(delta, 'completion_days_total', sign * completion.days);
+            addDelta(delta, 'completion_days_count', sign);
+        }
+    }
+}
+
+// 一条进度记录的阶段计数
+function addStageStats(delta, progress, sign) {
+    const stageName = progress.stage_name || '未知阶段';
+    const status = progress.status || 'pending';
+    addDelta(delta, `stages.${stageName}.total`, sign);
+    if (STAGE_STATUSES.includes(status)) {
+        addDelta(delta, `stages.${stageName}.${status}`, sign);
+    }
+}
+
+// 一个订单从 (orderBefore, progressBefore) 变为 (orderAfter, progressAfter) 的计数增量
+function orderStatsDelta(orderBefore, progressBefore, orderAfter, progressAfter) {
+    const delta = {};
+    addOrderStats(delta, orderBefore, progressBefore, -1);
+    addOrderStats(delta, orderAfter, progressAfter, 1);
+    progressBefore.forEach(p => addStageStats(delta, p, -1));
+    progressAfter.forEach(p => addStageStats(delta, p, 1));
+    return delta;
+}
+
+// 按增量原子更新计数器（只更新涉及的字段），失败不影响主流程
+async function updateDashboardStats(delta) {
+    const _ = db.command;
+    const update = {};
+    Object.keys(delta).forEach(path => {
+        if (!delta[path]) {
+            return;
+        }
+        const keys = path.split('.');
+        let node = update;
+        keys.slice(0, -1).forEach(key => {
+            node = node[key] = node[key] || {};
+        });
+        node[keys[keys.length - 1]] = _.inc(delta[path]);
+    });
+    if (Object.keys(update).length === 0) {
+        return;
+    }
+    update.updated_at = new Date().toISOString();
+    try {
+        await db.collection(DASHBOARD_STATS_COLLECTION).doc(DASHBOARD_STATS_ID).update(update);
+    } catch (error) {
+        console.error('❌ 更新仪表板计数器失败:', error);
+    }
+}
+
 // 生成订单编号：LD + 手机后4位 + 6位随机十六进制（不含连接符）
 async function generateOrderNumber(customerPhone = '') {
     const now = new Date();
@@ -79,6 +173,107 @@ async function generateOrderNumber(customerPhone = '') {
     throw new Error('生成唯一订单号失败，请稍后重试');
 }
 
+// 游标分页：游标是最后一条订单的 (created_at, _id)，Base64 编码后返回给客户端
+function encodeCursor(order) {
+    return Buffer.from(JSON.stringify([order.created_at || '', order._id])).toString('base64');
+}
+
+function decodeCursor(cursor) {
+    try {
+        const [createdAt, id] = JSON.parse(Buffer.from(String(cursor), 'base64').toString('utf8'));
+        if (typeof createdAt !== 'string' || typeof id !== 'string') {
+            return null;
+        }
+        return { createdAt, id };
+    } catch (e) {
+        return null;
+    }
+}
+
+// 增量变更：查询时从水位线向前回退的时间，容忍各云函数实例的时钟偏差以及写入时间早于提交时间
+const CHANGE_FEED_OVERLAP_MS = 5000;
+// 云数据库 get() 单次最多返回的记录数
+const DB_MAX_GET = 1000;
+// 增量变更：每个集合最多返回的记录数，超过时要求客户端全量重新加载。
+// 查询多取一条判断是否超出，limit + 1 不能超过 DB_MAX_GET，否则超出的记录被静默截断
+const CHANGE_FEED_MAX_RECORDS = DB_MAX_GET - 1;
+
+// 查询订单、进度和照片在水位线之后的变更（含软删除的记录）
+async function listChanges(requestData) {
+    const _ = db.command;
+    // 水位线在查询之前取，查询期间的写入会出现在下一次增量中
+    const watermark = new Date().toISOString();
+    const since = requestData.since || '';
+    const limit = Math.max(1, Math.min(parseInt(requestData.limit || String(CHANGE_FEED_MAX_RECORDS)) || CHANGE_FEED_MAX_RECORDS,
+                                       CHANGE_FEED_MAX_RECORDS));
+    const sinceTime = Date.parse(since);
+    
+    const fullResync = { watermark: watermark, full_resync: true, orders: [], progress: [], photos: [] };
+    if (!since || isNaN(sinceTime)) {
+        return fullResync;
+    }
+    
+    const from = new Date(sinceTime - CHANGE_FEED_OVERLAP_MS).toISOString();
+    const query = name => db.collection(name)
+        .where({ updated_at: _.gte(from) })
+        .orderBy('updated_at', 'asc')
+        .limit(limit + 1)
+        .get();
+    const [ordersResult, progressResult, photosResult] = await Promise.all([
+        query('orders'),
+        query('order_progress'),
+        query('photos')
+    ]);
+    
+    const orders = ordersResult.data || [];
+    const progress = progressResult.data || [];
+    const photos = photosResult.data || [];
+    if (orders.length > limit || progress.length > limit || photos.length > limit) {
+        return fullResync;
+    }
+    
+    return {
+        watermark: watermark,
+        since: since,
+        full_resync: false,
+        orders: orders,
+        progress: progress,
+        photos: photos
+    };
+}
+
+// 全量快照每页最多返回的记录数
+const SNAPSHOT_PAGE_SIZE = 500;
+const SNAPSHOT_COLLECTIONS = ['orders', 'order_progress', 'photos'];
+
+// 全量快照：按 _id 分页返回一个集合中未删除的记录，供客户端建立本地副本
+async function snapshotPage(requestData) {
+    const _ = db.command;
+    const collection = requestData.collection;
+    if (SNAPSHOT_COLLECTIONS.indexOf(collection) === -1) {
+        return null;
+    }
+    const limit = Math.min(parseInt(requestData.limit || String(SNAPSHOT_PAGE_SIZE)), SNAPSHOT_PAGE_SIZE);
+    const conditions = [{ is_deleted: _.neq(true) }];
+    if (requestData.cursor) {
+        conditions.push({ _id: _.gt(requestData.cursor) });
+    }
+    const pageResult = await db.collection(collection)
+        .where(_.and(conditions))
+        .orderBy('_id', 'asc')
+        .limit(limit + 1)
+        .get();
+    
+    const docs = pageResult.data || [];
+    const hasMore = docs.length > limit;
+    const pageDocs = docs.slice(0, limit);
+    return {
+        collection: collection,
+        docs: pageDocs,
+        next_cursor: hasMore ? pageDocs[pageDocs.length - 1]._id : null
+    };
+}
+
 exports.main = async function(event, context) {
     console.log('=== 管理员订单管理云函数 - 简化版本 ===');
     console.log('Event:', JSON.stringify(event));
@@ -118,47 +313,101 @@ exports.main = async function(event, context) {
             var limit = parseInt(requestData.limit || requestData.page_size || '20');
             var status = requestData.status || 'all';
             var search = requestData.search || '';
-            
-            var query = db.collection('orders');
+            // 传入 cursor（首页为空字符串）时使用游标分页，否则按页码分页
+            var useCursor = requestData.cursor !== undefined && requestData.cursor !== null;
+            const _ = db.command;
             
             // 过滤已删除的订单（软删除）
-            query = query.where({ is_deleted: { $ne: true } });
+            const conditions = [{ is_deleted: _.neq(true) }];
             
             // 添加状态过滤
             if (status !== 'all') {
-                query = query.where({ order_status: status });
+                conditions.push({ order_status: status });
             }
             
             // 添加搜索过滤
             if (search) {
-                query = query.where({ customer_name: search });
+                conditions.push({ customer_name: search });
             }
             
-            // 获取总数
-            const countResult = await query.count();
-            const totalCount = countResult.total;
-            
-            // 分页查询
-            const offset = (page - 1) * limit;
-            const ordersResult = await query
-                .orderBy('created_at', 'desc')
-                .skip(offset)
-                .limit(limit)
-                .get();
+            const cursor = useCursor && requestData.cursor ? decodeCursor(requestData.cursor) : null;
             
-            result = {
-                success: true,
-                data: {
-                    orders: ordersResult.data || [],
-                    pagination: {
-                        current_page: page,
-                        page_size: limit,
-                        total_count: totalCount,
-                        total_pages: Math.ceil(totalCount / limit)
-                    }
-                },
-                message: '获取订单列表成功'
-            };
+            if (useCursor && requestData.cursor && !cursor) {
+                result = { success: false, message: '无效的分页游标', data: null };
+            } else if (useCursor) {
+                // 游标分页：按 (created_at, _id) 倒序取游标之后的订单，不随页数变慢
+                const pageConditions = cursor ? conditions.concat([_.or([
+                    { created_at: _.lt(cursor.createdAt) },
+                    { created_at: cursor.createdAt, _id: _.lt(cursor.id) }
+                ])]) : conditions;
+                
+                // 多取一条判断是否还有下一页
+                const pageResult = await db.collection('orders')
+                    .where(_.and(pageConditions))
+                    .orderBy('created_at', 'desc')
+                    .orderBy('_id', 'desc')
+                    .limit(limit + 1)
+                    .get();
+                const rows = pageResult.data || [];
+                const hasMore = rows.length > limit;
+                const orders = rows.slice(0, limit);
+                
+                const pagination = {
+                    page_size: limit,
+                    has_more: hasMore,
+                    next_cursor: hasMore ? encodeCursor(orders[orders.length - 1]) : null
+                };
+                // 总数需要额外一次 count，只在请求时返回
+                if (requestData.with_total) {
+                    const countResult = await db.collection('orders').where(_.and(conditions)).count();
+                    pagination.total_count = countResult.total;
+                    pagination.total_pages = Math.ceil(countResult.total / limit);
+                }
+                
+                result = {
+                    success: true,
+                    data: {
+                        orders: orders,
+                        pagination: pagination
+                    },
+                    message: '获取订单列表成功'
+                };
+            } else {
+                var query = db.collection('orders').where(_.and(conditions));
+                
+                // 获取总数
+                const countResult = await query.count();
+                const totalCount = countResult.total;
+                
+                // 分页查询
+                const offset = (page - 1) * limit;
+                const ordersResult = await query
+                    .orderBy('created_at', 'desc')
+                    .orderBy('_id', 'desc')
+                    .skip(offset)
+                    .limit(limit)
+                    .get();
+                
+                const orders = ordersResult.data || [];
+                // 同时返回下一页游标，客户端之后可以改用游标翻页
+                const hasMore = offset + orders.length < totalCount;
+                
+                result = {
+                    success: true,
+                    data: {
+                        orders: orders,
+                        pagination: {
+                            current_page: page,
+                            page_size: limit,
+                            total_count: totalCount,
+                            total_pages: Math.ceil(totalCount / limit),
+                            has_more: hasMore,
+                            next_cursor: hasMore && orders.length > 0 ? encodeCursor(orders[orders.length - 1]) : null
+                        }
+                    },
+                    message: '获取订单列表成功'
+                };
+            }
             
         } else if (action === 'create') {
             // 创建订单
@@ -212,6 +461,7 @@ exports.main = async function(event, context) {
                 stages.push(...fallbackStages);
             }
             
+            const createdProgress = [];
             for (let stage of stages) {
                 try {
                     const progressRecord = {
@@ -221,12 +471,14 @@ exports.main = async function(event, context) {
                         status: 'pending',
                         stage_order: stage.stage_order,
                         notes: '',
+                        version: 0,
                         created_at: new Date().toISOString(),
                         updated_at: new Date().toISOString()
                     };
                     
                     console.log(`创建进度记录: ${JSON.stringify(progressRecord)}`);
                     const progressResult = await db.collection('order_progress').add(progressRecord);
+                    createdProgress.push(progressRecord);
                     console.log(`✅ 进度记录创建成功: ${stage.stage_name}, ID: ${progressResult.id}`);
                 } catch (error) {
                     console.error(`❌ 创建进度记录失败: ${stage.stage_name}`, error);
@@ -235,6 +487,11 @@ exports.main = async function(event, context) {
             
             console.log('所有进度记录创建完成');
             
+            const statsDelta = {};
+            addOrderStats(statsDelta, newOrder, [], 1);
+            createdProgress.forEach(p => addStageStats(statsDelta, p, 1));
+            await updateDashboardStats(statsDelta);
+            
             // 记录操作日志
             await logOperation({
                 type: '订单创建',
@@ -295,6 +552,15 @@ exports.main = async function(event, context) {
                 const newOrderInfo = await db.collection('orders').where({ _id: orderId }).get();
                 const newOrder = newOrderInfo.data && newOrderInfo.data[0];
                 
+                // 订单状态变化时更新仪表板计数器（已删除的订单不计入）
+                if (oldOrder && newOrder && !oldOrder.is_deleted && oldOrder.order_status !== newOrder.order_status) {
+                    const progressResult = await db.collection('order_progress')
+                        .where({ order_id: orderId })
+                        .get();
+                    const progress = progressResult.data || [];
+                    await updateDashboardStats(orderStatsDelta(oldOrder, progress, newOrder, progress));
+                }
+                
                 if (oldOrder && newOrder) {
                     // 构建字段中文名映射
                     const fieldNameMap = {
@@ -376,6 +642,16 @@ exports.main = async function(event, context) {
                     updated_at: new Date().toISOString()
                 });
                 
+                // 从仪表板计数器中扣除（阶段计数与原来一样包含已删除订单的进度，不扣除）
+                if (order && !order.is_deleted) {
+                    const progressResult = await db.collection('order_progress')
+                        .where({ order_id: orderId })
+                        .get();
+                    const statsDelta = {};
+                    addOrderStats(statsDelta, order, progressResult.data || [], -1);
+                    await updateDashboardStats(statsDelta);
+                }
+                
                 // 记录操作日志
                 if (order) {
                     await logOperation({
@@ -397,6 +673,27 @@ exports.main = async function(event, context) {
                 };
             }
             
+        } else if (action === 'changes') {
+            // 增量变更（软删除的订单/照片以 is_deleted 记录返回）
+            result = {
+                success: true,
+                data: await listChanges(requestData),
+                message: '获取变更成功'
+            };
+            
+        } else if (action === 'snapshot') {
+            // 全量快照（按集合分页）
+            const page = await snapshotPage(requestData);
+            result = page ? {
+                success: true,
+                data: page,
+                message: '获取快照成功'
+            } : {
+                success: false,
+                message: '不支持的集合: ' + requestData.collection,
+                data: null
+            };
+            
         } else {
             result = {
                 success: false,
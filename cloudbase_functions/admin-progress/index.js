@@ -43,6 +43,503 @@ async function logOperation(params) {
     }
 }
 
+// 单次批量更新最多处理的条目数（客户端按此大小分块发送）
+const BULK_MAX_ITEMS = 50;
+
+// 批量更新的幂等记录集合：idempotency_key -> 首次处理的结果（首次使用时自动创建）
+const IDEMPOTENCY_COLLECTION = 'progress_idempotency';
+// 幂等记录保留时间，每天的定时触发删除更早的记录
+const IDEMPOTENCY_TTL_MS = 7 * 24 * 3600 * 1000;
+
+// 内联函数，避免文件依赖问题
+function isCollectionMissing(error) {
+    const text = `${(error && error.code) || ''} ${(error && error.message) || error}`;
+    return /COLLECTION_NOT_EXIST|not exist|不存在/i.test(text);
+}
+
+async function ensureCollection(name) {
+    try {
+        await db.createCollection(name);
+        console.log(`已创建集合 ${name}`);
+    } catch (error) {
+        // 集合已存在（并发创建）时忽略
+        console.warn(`创建集合 ${name} 失败:`, error.message || error);
+    }
+}
+
+// 查询已处理过的幂等键；集合不存在（新环境）时创建集合并按未处理继续
+async function loadProcessedResults(keys) {
+    const _ = db.command;
+    const processed = {};
+    if (keys.length === 0) {
+        return processed;
+    }
+    try {
+        const processedResult = await db.collection(IDEMPOTENCY_COLLECTION)
+            .where({ _id: _.in(keys) })
+            .limit(BULK_MAX_ITEMS)
+            .get();
+        for (const record of processedResult.data || []) {
+            processed[record._id] = record.result;
+        }
+    } catch (error) {
+        if (!isCollectionMissing(error)) {
+            throw error;
+        }
+        console.warn('幂等记录集合不存在，自动创建');
+        await ensureCollection(IDEMPOTENCY_COLLECTION);
+    }
+    return processed;
+}
+
+// 删除超过保留时间的幂等记录（定时触发）
+async function cleanupIdempotencyRecords() {
+    const _ = db.command;
+    const cutoff = new Date(Date.now() - IDEMPOTENCY_TTL_MS).toISOString();
+    try {
+        const result = await db.collection(IDEMPOTENCY_COLLECTION)
+            .where({ created_at: _.lt(cutoff) })
+            .remove();
+        const removed = (result && result.deleted) || 0;
+        console.log(`已删除 ${removed} 条过期幂等记录`);
+        return { success: true, message: `已删除 ${removed} 条过期幂等记录`, data: { removed: removed, cutoff: cutoff } };
+    } catch (error) {
+        if (isCollectionMissing(error)) {
+            return { success: true, message: '幂等记录集合不存在，无需清理', data: { removed: 0, cutoff: cutoff } };
+        }
+        throw error;
+    }
+}
+
+function jsonResponse(payload) {
+    return {
+        statusCode: 200,
+        headers: {
+            'Content-Type': 'application/json; charset=utf-8',
+            'Access-Control-Allow-Origin': '*'
+        },
+        body: JSON.stringify(payload)
+    };
+}
+
+// 阶段并发冲突的返回内容
+function conflictPayload(stage, expectedStatus, expectedVersion) {
+    return {
+        success: false,
+        message: `阶段「${stage.stage_name}」已被其他操作修改，请刷新后重试`,
+        error_code: 'STAGE_CONFLICT',
+        data: {
+            stage_id: stage.stage_id,
+            expected_status: expectedStatus === undefined ? null : expectedStatus,
+            expected_version: expectedVersion === undefined ? null : expectedVersion,
+            current_status: stage.status,
+            current_version: stage.version || 0
+        }
+    };
+}
+
+// 阶段并发冲突响应
+function conflictResponse(stage, expectedStatus, expectedVersion) {
+    return jsonResponse(conflictPayload(stage, expectedStatus, expectedVersion));
+}
+
+// 期望的状态或版本与数据库不一致：阶段已被其他操作修改
+function isStale(stage, expectedStatus, expectedVersion) {
+    return (expectedStatus !== undefined && expectedStatus !== null && expectedStatus !== stage.status) ||
+        (expectedVersion !== undefined && expectedVersion !== null && Number(expectedVersion) !== (stage.version || 0));
+}
+
+// 阶段流转规则校验，返回错误信息（可以流转时返回 null）
+function validateTransition(allProgress, currentStage, status) {
+    let validationError = null;
+    
+    if (status === 'in_progress') {
+        // 1. 检查是否有其他阶段正在进行中
+        const inProgressStage = allProgress.find(p => p.status === 'in_progress' && p.stage_id !== currentStage.stage_id);
+        if (inProgressStage) {
+            validationError = `无法开始新阶段，请先完成当前进行中的阶段：${inProgressStage.stage_name}`;
+        }
+        
+        // 2. 检查是否可以开始这个阶段（前一个阶段必须已完成）
+        if (!validationError) {
+            const currentOrder = currentStage.stage_order;
+            const previousStage = allProgress.find(p => p.stage_order === currentOrder - 1);
+            
+            if (previousStage && previousStage.status !== 'completed') {
+                validationError = `无法开始此阶段，请先完成前一个阶段：${previousStage.stage_name}`;
+            }
+        }
+        
+        // 3. 检查当前阶段状态
+        if (!validationError && currentStage.status === 'completed') {
+            validationError = '此阶段已完成，无法重新开始';
+        }
+    }
+    
+    if (status === 'completed') {
+        // 1. 检查当前阶段是否真的是 in_progress
+        if (currentStage.status !== 'in_progress') {
+            validationError = '只能完成正在进行中的阶段';
+        }
+    }
+    
+    return validationError;
+}
+
+// 根据全部进度计算整体进度、当前阶段和订单状态
+function summarizeProgress(progress) {
+    const totalStages = progress.length;
+    const completedStages = progress.filter(p => p.status === 'completed').length;
+    const inProgressStages = progress.filter(p => p.status === 'in_progress');
+    
+    // 计算进度百分比
+    const progressPercentage = totalStages ? Math.round((completedStages / totalStages) * 100) : 0;
+    
+    // 确定当前阶段
+    let currentStageName = '未开始';
+    if (inProgressStages.length > 0) {
+        currentStageName = inProgressStages[0].stage_name;
+    } else if (totalStages && completedStages === totalStages) {
+        currentStageName = '已完成';
+    } else if (completedStages > 0) {
+        // 找到下一个未开始的阶段
+        const nextStage = progress.find(p => p.status === 'pending');
+        if (nextStage) {
+            currentStageName = nextStage.stage_name;
+        }
+    }
+    
+    // 确定订单状态
+    let orderStatus = '待处理';
+    if (totalStages && completedStages === totalStages) {
+        orderStatus = '已完成';
+    } else if (completedStages > 0 || inProgressStages.length > 0) {
+        orderStatus = '制作中';
+    }
+    
+    return { progressPercentage, currentStageName, orderStatus };
+}
+
+// 仪表板计数器：dashboard_stats 集合中的单个文档，订单和进度的写操作按增量维护，
+// admin-dashboard 只读这一个文档；增量写入失败等原因造成的偏差由 admin-dashboard 的 rebuild 操作校正
+// （与 admin-orders、admin-dashboard 中的同名函数保持一致）
+const DASHBOARD_STATS_COLLECTION = 'dashboard_stats';
+const DASHBOARD_STATS_ID = 'global';
+const ORDER_STATUSES = ['待处理', '制作中', '已完成'];
+const STAGE_STATUSES = ['completed', 'in_progress', 'pending'];
+
+function addDelta(delta, path, amount) {
+    delta[path] = (delta[path] || 0) + amount;
+}
+
+// 已完成订单的完成日期和耗时天数（以最后一个完成的阶段为准）
+function completionOf(order, progress) {
+    if (!order || order.order_status !== '已完成') {
+        return null;
+    }
+    const finished = progress
+        .filter(p => p.status === 'completed' && p.completed_at)
+        .map(p => p.completed_at)
+        .sort()
+        .pop();
+    if (!finished) {
+        return null;
+    }
+    const days = order.created_at
+        ? Math.ceil((new Date(finished) - new Date(order.created_at)) / (1000 * 60 * 60 * 24))
+        : 0;
+    return { day: finished.split('T')[0], days: days };
+}
+
+// 订单本身的计数（订单数、状态、完成日期和耗时），sign 为 1 计入、-1 扣除
+function addOrderStats(delta, order, progress, sign) {
+    const status = order.order_status || '待处理';
+    addDelta(delta, 'total_orders', sign);
+    if (ORDER_STATUSES.includes(status)) {
+        addDelta(delta, `status.${status}`, sign);
+    }
+    const completion = completionOf(order, progress);
+    if (completion) {
+        addDelta(delta, `completed_by_day.${completion.day}`, sign);
+        if (completion.days > 0) {
+            addDelta(delta, 'completion_days_total', sign * completion.days);
+            addDelta(delta, 'completion_days_count', sign);
+        }
+    }
+}
+
+// 一条进度记录的阶段计数
+function addStageStats(delta, progress, sign) {
+    const stageName = progress.stage_name || '未知阶段';
+    const status = progress.status || 'pending';
+    addDelta(delta, `stages.${stageName}.total`, sign);
+    if (STAGE_STATUSES.includes(status)) {
+        addDelta(delta, `stages.${stageName}.${status}`, sign);
+    }
+}
+
+// 一个订单从 (orderBefore, progressBefore) 变为 (orderAfter, progressAfter) 的计数增量
+function orderStatsDelta(orderBefore, progressBefore, orderAfter, progressAfter) {
+    const delta = {};
+    addOrderStats(delta, orderBefore, progressBefore, -1);
+    addOrderStats(delta, orderAfter, progressAfter, 1);
+    progressBefore.forEach(p => addStageStats(delta, p, -1));
+    progressAfter.forEach(p => addStageStats(delta, p, 1));
+    return delta;
+}
+
+// 按增量原子更新计数器（只更新涉及的字段），失败不影响主流程
+async function updateDashboardStats(delta) {
+    const _ = db.command;
+    const update = {};
+    Object.keys(delta).forEach(path => {
+        if (!delta[path]) {
+            return;
+        }
+        const keys = path.split('.');
+        let node = update;
+        keys.slice(0, -1).forEach(key => {
+            node = node[key] = node[key] || {};
+        });
+        node[keys[keys.length - 1]] = _.inc(delta[path]);
+    });
+    if (Object.keys(update).length === 0) {
+        return;
+    }
+    update.updated_at = new Date().toISOString();
+    try {
+        await db.collection(DASHBOARD_STATS_COLLECTION).doc(DASHBOARD_STATS_ID).update(update);
+    } catch (error) {
+        console.error('❌ 更新仪表板计数器失败:', error);
+    }
+}
+
+// 条件更新阶段：只有状态和版本仍与校验时一致才写入，避免两个操作员同时推进同一阶段
+async function writeStage(orderId, stage, status, notes) {
+    const currentVersion = stage.version || 0;
+    const updateData = {
+        status: status,
+        notes: notes,
+        version: currentVersion + 1,
+        updated_at: new Date().toISOString()
+    };
+    
+    if (status === 'in_progress') {
+        updateData.started_at = new Date().toISOString();
+    }
+    
+    if (status === 'completed') {
+        updateData.completed_at = new Date().toISOString();
+    }
+    
+    const updateResult = await db.collection('order_progress')
+        .where({
+            order_id: orderId,
+            stage_id: stage.stage_id,
+            status: stage.status,
+            version: stage.version === undefined ? db.command.exists(false) : currentVersion
+        })
+        .update(updateData);
+    
+    return updateResult.updated ? updateData : null;
+}
+
+// 批量更新中的一项（同一订单的多项按顺序处理，allProgress 随之就地更新）
+async function applyBulkItem(item, order, allProgress, operator) {
+    const base = {
+        order_id: item.order_id || '',
+        stage_id: item.stage_id || '',
+        idempotency_key: item.idempotency_key || null
+    };
+    const status = item.status || '';
+    const notes = item.notes || '';
+    
+    if (!item.order_id || !item.stage_id) {
+        return { ...base, success: false, message: '缺少订单ID或阶段ID', data: null };
+    }
+    if (!order) {
+        return { ...base, success: false, message: '订单不存在或已删除', data: null };
+    }
+    
+    const currentStage = allProgress.find(p => p.stage_id === item.stage_id);
+    if (!currentStage) {
+        return { ...base, success: false, message: '未找到指定的阶段记录', data: null };
+    }
+    
+    if (isStale(currentStage, item.expected_status, item.expected_version)) {
+        return { ...base, ...conflictPayload(currentStage, item.expected_status, item.expected_version) };
+    }
+    
+    const validationError = validateTransition(allProgress, currentStage, status);
+    if (validationError) {
+        return {
+            ...base,
+            success: false,
+            message: validationError,
+            error_code: 'INVALID_TRANSITION',
+            data: {
+                stage_id: item.stage_id,
+                current_status: currentStage.status,
+                current_version: currentStage.version || 0
+            }
+        };
+    }
+    
+    const updateData = await writeStage(item.order_id, currentStage, status, notes);
+    if (!updateData) {
+        const latestResult = await db.collection('order_progress')
+            .where({ order_id: item.order_id, stage_id: item.stage_id })
+            .get();
+        const latestStage = (latestResult.data && latestResult.data[0]) || currentStage;
+        Object.assign(currentStage, latestStage);
+        return { ...base, ...conflictPayload(latestStage, item.expected_status, item.expected_version) };
+    }
+    Object.assign(currentStage, updateData);
+    
+    const summary = summarizeProgress(allProgress);
+    const logType = status === 'in_progress' ? '阶段开始' : '阶段完成';
+    const stageName = currentStage.stage_name || item.stage_id;
+    await logOperation({
+        type: logType,
+        operator: operator,
+        description: `${logType}：客户 ${order.customer_name} - ${stageName}`,
+        order_id: item.order_id,
+        order_number: order.order_number,
+        metadata: {
+            customer_name: order.customer_name,
+            stage_name: stageName,
+            progress_percentage: summary.progressPercentage,
+            batch: true
+        }
+    });
+    
+    return {
+        ...base,
+        success: true,
+        message: '进度更新成功',
+        data: {
+            order_id: item.order_id,
+            stage_id: item.stage_id,
+            status: status,
+            notes: notes,
+            version: updateData.version,
+            started_at: updateData.started_at,
+            completed_at: updateData.completed_at,
+            progress_percentage: summary.progressPercentage,
+            current_stage: summary.currentStageName,
+            order_status: summary.orderStatus
+        }
+    };
+}
+
+// 批量更新阶段：一次查询所有订单和进度，同一订单内按顺序处理，不同订单并行写入
+async function bulkUpdate(progressData) {
+    const items = Array.isArray(progressData.items) ? progressData.items : [];
+    const operator = progressData.operator || 'admin';
+    const _ = db.command;
+    
+    // 请求本身无效时标记为不可重试；其他失败（包括数据库异常等）客户端按相同的幂等键重试
+    if (items.length === 0) {
+        return { success: false, message: '缺少批量更新项', error_code: 'INVALID_BULK_REQUEST', retryable: false, data: null };
+    }
+    if (items.length > BULK_MAX_ITEMS) {
+        return {
+            success: false,
+            message: `单次批量更新最多 ${BULK_MAX_ITEMS} 项`,
+            error_code: 'INVALID_BULK_REQUEST',
+            retryable: false,
+            data: null
+        };
+    }
+    
+    // 幂等：已处理过的 idempotency_key 直接返回首次处理的结果
+    const keys = [...new Set(items.map(item => item.idempotency_key).filter(Boolean))];
+    const processed = await loadProcessedResults(keys);
+    
+    const results = new Array(items.length);
+    const groups = {};
+    items.forEach((item, index) => {
+        const replay = item.idempotency_key && processed[item.idempotency_key];
+        if (replay) {
+            results[index] = { ...replay, replayed: true };
+            return;
+        }
+        const orderId = item.order_id || '';
+        (groups[orderId] = groups[orderId] || []).push(index);
+    });
+    
+    const orderIds = Object.keys(groups).filter(Boolean);
+    const ordersById = {};
+    const progressByOrder = {};
+    if (orderIds.length > 0) {
+        const [ordersResult, progressResult] = await Promise.all([
+            db.collection('orders')
+                .where({ _id: _.in(orderIds), is_deleted: _.neq(true) })
+                .limit(1000)
+                .get(),
+            db.collection('order_progress')
+                .where({ order_id: _.in(orderIds) })
+                .orderBy('stage_order', 'asc')
+                .limit(1000)
+                .get()
+        ]);
+        for (const order of ordersResult.data || []) {
+            ordersById[order._id] = order;
+        }
+        for (const progress of progressResult.data || []) {
+            (progressByOrder[progress.order_id] = progressByOrder[progress.order_id] || []).push(progress);
+        }
+    }
+    
+    await Promise.all(Object.keys(groups).map(async orderId => {
+        const order = ordersById[orderId];
+        const allProgress = progressByOrder[orderId] || [];
+        const progressBefore = allProgress.map(p => ({ ...p }));
+        let changed = false;
+        for (const index of groups[orderId]) {
+            results[index] = await applyBulkItem(items[index], order, allProgress, operator);
+            changed = changed || results[index].success;
+        }
+        if (changed) {
+            const summary = summarizeProgress(allProgress);
+            await db.collection('orders')
+                .where({ _id: orderId })
+                .update({
+                    progress_percentage: summary.progressPercentage,
+                    current_stage: summary.currentStageName,
+                    order_status: summary.orderStatus,
+                    updated_at: new Date().toISOString()
+                });
+            await updateDashboardStats(orderStatsDelta(
+                order, progressBefore, { ...order, order_status: summary.orderStatus }, allProgress));
+        }
+    }));
+    
+    // 保存本次生效的结果，重试时原样返回；失败项不记录，重新提交时按当前状态再处理一次
+    const timestamp = new Date().toISOString();
+    await Promise.all(items.map((item, index) => {
+        if (!item.idempotency_key || results[index].replayed || !results[index].success) {
+            return null;
+        }
+        return db.collection(IDEMPOTENCY_COLLECTION)
+            .add({ _id: item.idempotency_key, result: results[index], created_at: timestamp })
+            .catch(error => console.error('保存幂等记录失败:', error));
+    }));
+    
+    const succeeded = results.filter(r => r.success).length;
+    console.log(`批量更新 ${items.length} 项：成功 ${succeeded}，失败 ${items.length - succeeded}`);
+    
+    return {
+        success: true,
+        message: `批量更新完成：成功 ${succeeded} 项，失败 ${items.length - succeeded} 项`,
+        data: {
+            results: results,
+            succeeded: succeeded,
+            failed: items.length - succeeded
+        }
+    };
+}
+
 exports.main = async function(event, context) {
     console.log('=== 管理员进度管理云函数 - 完整版本 ===');
     
@@ -55,6 +552,15 @@ exports.main = async function(event, context) {
         console.log('操作类型:', action);
         console.log('进度数据:', JSON.stringify(progressData));
         
+        // 每天的定时触发：清理过期的幂等记录
+        if (event.Type === 'Timer') {
+            return jsonResponse(await cleanupIdempotencyRecords());
+        }
+        
+        if (action === 'bulk_update') {
+            return jsonResponse(await bulkUpdate(progressData));
+        }
+        
         if (action === 'list') {
             // 获取进度列表
             const orderId = progressData.order_id || '';
@@ -119,6 +625,9 @@ exports.main = async function(event, context) {
             const stageId = progressData.stage_id || '';
             const status = progressData.status || '';
             const notes = progressData.notes || '';
+            // 乐观并发：客户端期望的阶段状态/版本号（可选，不传则不校验）
+            const expectedStatus = progressData.expected_status;
+            const expectedVersion = progressData.expected_version;
             
             if (!orderId || !stageId) {
                 return {
@@ -179,38 +688,15 @@ exports.main = async function(event, context) {
                 };
             }
             
-            // 状态验证逻辑
-            let validationError = null;
+            const currentVersion = currentStage.version || 0;
             
-            if (status === 'in_progress') {
-                // 1. 检查是否有其他阶段正在进行中
-                const inProgressStage = allProgress.find(p => p.status === 'in_progress' && p.stage_id !== stageId);
-                if (inProgressStage) {
-                    validationError = `无法开始新阶段，请先完成当前进行中的阶段：${inProgressStage.stage_name}`;
-                }
-                
-                // 2. 检查是否可以开始这个阶段（前一个阶段必须已完成）
-                if (!validationError) {
-                    const currentOrder = currentStage.stage_order;
-                    const previousStage = allProgress.find(p => p.stage_order === currentOrder - 1);
-                    
-                    if (previousStage && previousStage.status !== 'completed') {
-                        validationError = `无法开始此阶段，请先完成前一个阶段：${previousStage.stage_name}`;
-                    }
-                }
-                
-                // 3. 检查当前阶段状态
-                if (!validationError && currentStage.status === 'completed') {
-                    validationError = '此阶段已完成，无法重新开始';
-                }
+            // 期望的状态或版本与数据库不一致：阶段已被其他操作修改
+            if (isStale(currentStage, expectedStatus, expectedVersion)) {
+                return conflictResponse(currentStage, expectedStatus, expectedVersion);
             }
             
-            if (status === 'completed') {
-                // 1. 检查当前阶段是否真的是 in_progress
-                if (currentStage.status !== 'in_progress') {
-                    validationError = '只能完成正在进行中的阶段';
-                }
-            }
+            // 状态验证逻辑
+            const validationError = validateTransition(allProgress, currentStage, status);
             
             if (validationError) {
                 return {
@@ -222,30 +708,27 @@ exports.main = async function(event, context) {
                     body: JSON.stringify({
                         success: false,
                         message: validationError,
-                        data: null
+                        error_code: 'INVALID_TRANSITION',
+                        data: {
+                            stage_id: stageId,
+                            current_status: currentStage.status,
+                            current_version: currentVersion
+                        }
                     })
                 };
             }
             
-            // 更新进度记录
-            const updateData = {
-                status: status,
-                notes: notes,
-                updated_at: new Date().toISOString()
-            };
+            // 条件更新进度记录
+            const updateData = await writeStage(orderId, currentStage, status, notes);
             
-            if (status === 'in_progress') {
-                updateData.started_at = new Date().toISOString();
+            if (!updateData) {
+                const latestResult = await db.collection('order_progress')
+                    .where({ order_id: orderId, stage_id: stageId })
+                    .get();
+                const latestStage = (latestResult.data && latestResult.data[0]) || currentStage;
+                return conflictResponse(latestStage, expectedStatus, expectedVersion);
             }
             
-            if (status === 'completed') {
-                updateData.completed_at = new Date().toISOString();
-            }
-            
-            await db.collection('order_progress')
-                .where({ order_id: orderId, stage_id: stageId })
-                .update(updateData);
-            
             // 自动计算整体进度和更新订单状态
             const updatedProgressResult = await db.collection('order_progress')
                 .where({ order_id: orderId })
@@ -253,34 +736,7 @@ exports.main = async function(event, context) {
                 .get();
             
             const updatedProgress = updatedProgressResult.data || [];
-            const totalStages = updatedProgress.length;
-            const completedStages = updatedProgress.filter(p => p.status === 'completed').length;
-            const inProgressStages = updatedProgress.filter(p => p.status === 'in_progress');
-            
-            // 计算进度百分比
-            const progressPercentage = Math.round((completedStages / totalStages) * 100);
-            
-            // 确定当前阶段
-            let currentStageName = '未开始';
-            if (inProgressStages.length > 0) {
-                currentStageName = inProgressStages[0].stage_name;
-            } else if (completedStages === totalStages) {
-                currentStageName = '已完成';
-            } else if (completedStages > 0) {
-                // 找到下一个未开始的阶段
-                const nextStage = updatedProgress.find(p => p.status === 'pending');
-                if (nextStage) {
-                    currentStageName = nextStage.stage_name;
-                }
-            }
-            
-            // 确定订单状态
-            let orderStatus = '待处理';
-            if (completedStages === totalStages) {
-                orderStatus = '已完成';
-            } else if (completedStages > 0 || inProgressStages.length > 0) {
-                orderStatus = '制作中';
-            }
+            const { progressPercentage, currentStageName, orderStatus } = summarizeProgress(updatedProgress);
             
             // 更新订单信息
             await db.collection('orders')
@@ -292,6 +748,10 @@ exports.main = async function(event, context) {
                     updated_at: new Date().toISOString()
                 });
             
+            const orderBefore = orderCheck.data[0];
+            await updateDashboardStats(orderStatsDelta(
+                orderBefore, allProgress, { ...orderBefore, order_status: orderStatus }, updatedProgress));
+            
             console.log(`订单 ${orderId} 进度更新: ${progressPercentage}%, 当前阶段: ${currentStageName}, 订单状态: ${orderStatus}`);
             
             // 记录操作日志
@@ -332,6 +792,9 @@ exports.main = async function(event, context) {
                         stage_id: stageId,
                         status: status,
                         notes: notes,
+                        version: updateData.version,
+                        started_at: updateData.started_at,
+                        completed_at: updateData.completed_at,
                         progress_percentage: progressPercentage,
                         current_stage: currentStageName,
                         order_status: orderStatus
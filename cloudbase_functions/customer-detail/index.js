@@ -267,7 +267,8 @@ exports.main = async function(event, context) {
                         started_at: progress.started_at,
                         completed_at: progress.completed_at,
                         notes: progress.notes,
-                        stage_order: progress.stage_order
+                        stage_order: progress.stage_order,
+                        version: progress.version || 0
                     })),
                     photos: Object.keys(photosByStage).map(stageName => ({
                         stage_name: stageName,
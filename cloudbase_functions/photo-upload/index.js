@@ -31,6 +31,10 @@ if (TENCENT_SECRET_ID && TENCENT_SECRET_KEY) {
 
 const SIGNED_GET_URL_EXPIRES = parseInt(COS_GET_SIGNED_URL_EXPIRES || '3600', 10);
 const COS_DEFAULT_DOMAIN = `${STORAGE_BUCKET}.cos.${STORAGE_REGION}.myqcloud.com`;
+// 分片上传 URL 有效期（秒）：大文件上传耗时较长，且断点续传需要重新签名
+const MULTIPART_URL_EXPIRES = 3600;
+// COS 分片数量上限
+const MAX_PART_COUNT = 10000;
 
 function buildCosUrl(key) {
   if (!key) {
@@ -76,6 +80,35 @@ function generateSignedGetUrl(key, fallbackUrl = '') {
   return baseUrl;
 }
 
+// 将 COS SDK 的回调接口包装为 Promise
+function cosRequest(method, params) {
+  return new Promise((resolve, reject) => {
+    cos[method]({ Bucket: STORAGE_BUCKET, Region: STORAGE_REGION, ...params }, (err, data) => {
+      if (err) {
+        return reject(err);
+      }
+      resolve(data);
+    });
+  });
+}
+
+// 生成分片上传的预签名 PUT URL（不对 host 签名）
+function generatePartUploadUrl(key, uploadId, partNumber) {
+  const auth = cos.getAuth({
+    Method: 'PUT',
+    Key: key,
+    Expires: MULTIPART_URL_EXPIRES,
+    SignHost: false,
+    Query: { partNumber: String(partNumber), uploadId: uploadId }
+  });
+  return `${buildCosUrl(key)}?partNumber=${partNumber}&uploadId=${encodeURIComponent(uploadId)}&${auth}`;
+}
+
+// 分片上传只允许写入照片/视频目录
+function isValidUploadKey(key) {
+  return typeof key === 'string' && (key.startsWith('photos/') || key.startsWith('videos/')) && !key.includes('..');
+}
+
 // 记录操作日志（内联函数，避免文件依赖问题）
 async function logOperation(params) {
     try {
@@ -331,6 +364,166 @@ exports.main = async (event, context) => {
       };
     }
     
+    if (action === 'init_multipart') {
+      // 初始化（或续传）分片上传：返回 upload_id、每个分片的预签名 URL 以及已上传的分片
+      const { cloud_path, part_count, content_type = 'application/octet-stream', upload_id = '' } = data || {};
+      
+      if (!isValidUploadKey(cloud_path) || !part_count || part_count < 1 || part_count > MAX_PART_COUNT) {
+        return {
+          statusCode: 400,
+          headers: { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+          body: JSON.stringify({ 
+            success: false, 
+            message: '缺少必要参数或参数无效: cloud_path 或 part_count' 
+          })
+        };
+      }
+      
+      if (!cos) {
+        return {
+          statusCode: 500,
+          headers: { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+          body: JSON.stringify({ 
+            success: false, 
+            message: 'COS未配置：请配置TENCENT_SECRET_ID和TENCENT_SECRET_KEY环境变量',
+            error: 'COS_NOT_CONFIGURED'
+          })
+        };
+      }
+      
+      try {
+        let uploadId = upload_id;
+        let uploaded_parts = [];
+        
+        if (uploadId) {
+          // 续传：查询已上传的分片，客户端跳过这些分片
+          console.log(`续传分片上传: ${cloud_path}, uploadId=${uploadId}`);
+          const listed = await cosRequest('multipartListPart', { Key: cloud_path, UploadId: uploadId });
+          uploaded_parts = (listed.Part || []).map(part => ({
+            part_number: parseInt(part.PartNumber, 10),
+            etag: part.ETag,
+            size: parseInt(part.Size, 10)
+          }));
+        } else {
+          const init = await cosRequest('multipartInit', { Key: cloud_path, ContentType: content_type });
+          uploadId = init.UploadId;
+          console.log(`初始化分片上传: ${cloud_path}, uploadId=${uploadId}, 分片数${part_count}`);
+        }
+        
+        const part_urls = [];
+        for (let partNumber = 1; partNumber <= part_count; partNumber++) {
+          part_urls.push({
+            part_number: partNumber,
+            upload_url: generatePartUploadUrl(cloud_path, uploadId, partNumber)
+          });
+        }
+        
+        return {
+          statusCode: 200,
+          headers: { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+          body: JSON.stringify({ 
+            success: true,
+            data: { upload_id: uploadId, cloud_path, part_urls, uploaded_parts },
+            message: `分片上传已就绪，共${part_count}个分片`
+          })
+        };
+      } catch (error) {
+        console.error('❌ 初始化分片上传失败:', error);
+        return {
+          statusCode: 200,
+          headers: { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+          body: JSON.stringify({ 
+            success: false, 
+            message: `初始化分片上传失败: ${error.message || error}`,
+            // 续传的 upload_id 已失效时，客户端需要重新初始化
+            error_code: error && error.code === 'NoSuchUpload' ? 'UPLOAD_NOT_FOUND' : 'MULTIPART_INIT_FAILED'
+          })
+        };
+      }
+    }
+    
+    if (action === 'complete_multipart') {
+      const { cloud_path, upload_id, parts } = data || {};
+      
+      if (!isValidUploadKey(cloud_path) || !upload_id || !Array.isArray(parts) || parts.length === 0) {
+        return {
+          statusCode: 400,
+          headers: { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+          body: JSON.stringify({ 
+            success: false, 
+            message: '缺少必要参数: cloud_path, upload_id 或 parts' 
+          })
+        };
+      }
+      
+      try {
+        const sortedParts = parts
+          .map(part => ({ PartNumber: parseInt(part.part_number, 10), ETag: part.etag }))
+          .sort((a, b) => a.PartNumber - b.PartNumber);
+        const completed = await cosRequest('multipartComplete', {
+          Key: cloud_path,
+          UploadId: upload_id,
+          Parts: sortedParts
+        });
+        console.log(`✅ 分片上传完成: ${cloud_path}, 分片数${sortedParts.length}`);
+        
+        return {
+          statusCode: 200,
+          headers: { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+          body: JSON.stringify({ 
+            success: true,
+            data: { cloud_path, etag: completed.ETag || '', photo_url: buildCosUrl(cloud_path) },
+            message: '分片上传完成'
+          })
+        };
+      } catch (error) {
+        console.error('❌ 完成分片上传失败:', error);
+        return {
+          statusCode: 200,
+          headers: { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+          body: JSON.stringify({ 
+            success: false, 
+            message: `完成分片上传失败: ${error.message || error}`
+          })
+        };
+      }
+    }
+    
+    if (action === 'abort_multipart') {
+      const { cloud_path, upload_id } = data || {};
+      
+      if (!isValidUploadKey(cloud_path) || !upload_id) {
+        return {
+          statusCode: 400,
+          headers: { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+          body: JSON.stringify({ 
+            success: false, 
+            message: '缺少必要参数: cloud_path 或 upload_id' 
+          })
+        };
+      }
+      
+      try {
+        await cosRequest('multipartAbort', { Key: cloud_path, UploadId: upload_id });
+        console.log(`🧹 已取消分片上传: ${cloud_path}, uploadId=${upload_id}`);
+        return {
+          statusCode: 200,
+          headers: { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+          body: JSON.stringify({ success: true, message: '分片上传已取消' })
+        };
+      } catch (error) {
+        console.error('❌ 取消分片上传失败:', error);
+        return {
+          statusCode: 200,
+          headers: { 'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*' },
+          body: JSON.stringify({ 
+            success: false, 
+            message: `取消分片上传失败: ${error.message || error}`
+          })
+        };
+      }
+    }
+    
     if (action === 'upload') {
       // 已废弃：只支持预签名直传
       return {
@@ -424,6 +617,7 @@ exports.main = async (event, context) => {
             media_type: mediaType, // 'photo' 或 'video'
             upload_time: new Date().toISOString(),
             created_at: new Date().toISOString(),
+            updated_at: new Date().toISOString(),
             description: description || '',
             sort_order: existingPhotoCount + i,
             is_deleted: false,
@@ -97,6 +97,10 @@ def show_start_stage_button(progress_service, order_id, stage_id, stage_name, al
             st.success(f"✅ 阶段 '{stage_name}' 已开始！")
             if on_update:
                 on_update()
+        elif progress_service.is_conflict(result):
+            st.warning(f"⚠️ {result.get('message')}")
+            if st.button("🔄 刷新进度", key=f"refresh_conflict_{stage_id}") and on_update:
+                on_update()
         else:
             st.error(f"❌ 开始阶段失败：{result.get('message')}")
 
@@ -188,5 +192,7 @@ def show_complete_stage_form(progress_service, order_id, stage_id, stage_name, a
                         st.success(f"📷 已上传 {image_count} 张照片")
                 if on_update:
                     on_update()
+            elif progress_service.is_conflict(result):
+                st.warning(f"⚠️ {result.get('message')}（页面刷新后可重新操作）")
             else:
                 st.error(f"❌ 完成阶段失败：{result.get('message')}")
@@ -23,6 +23,91 @@ API_ENDPOINTS = {
     "admin_dashboard": "admin-dashboard"
 }
 
+# HTTP 连接池配置 - 复用 keep-alive 连接，避免每次调用重新握手
+HTTP_POOL_CONFIG = {
+    "default_pool_size": int(os.getenv("HTTP_POOL_SIZE", "10")),
+    "pool_connections": 4,
+    "keep_alive": os.getenv("HTTP_KEEP_ALIVE", "true").lower() != "false",
+    # 按云函数单独设置连接池大小（高频调用的函数给更大的池）
+    "pool_sizes": {
+        "admin-orders": 20,
+        "customer-detail": 20,
+        "role-permissions": 16,
+        "photo-upload": 8
+    }
+}
+
+# 只读调用缓存配置 - 进程内共享，写操作后按标签自动失效
+CACHE_CONFIG = {
+    "enabled": os.getenv("CLOUDBASE_CACHE", "true").lower() != "false",
+    "max_entries": int(os.getenv("CLOUDBASE_CACHE_SIZE", "512")),
+    # 各云函数的缓存时间（秒），未配置的云函数不缓存
+    "ttl": {
+        "customer-detail": 30,
+        "admin-orders": 15,
+        "admin-dashboard": 30,
+        "role-permissions": 300
+    }
+}
+
+# 客户查询页面配置 - 查询结果缓存（写操作后失效）和按会话 / IP 的令牌桶限流
+CUSTOMER_LOOKUP_CONFIG = {
+    "ttl": int(os.getenv("CUSTOMER_LOOKUP_TTL", "60")),
+    # 无结果的查询缓存时间（秒）
+    "negative_ttl": int(os.getenv("CUSTOMER_LOOKUP_NEGATIVE_TTL", "20")),
+    # 每个会话最多连续查询 10 次，之后每 10 秒恢复 1 次（命中缓存的查询不计）
+    "session_rate": {"capacity": 10, "refill_per_second": 0.1},
+    # 同一 IP（可能是多人共用的出口）的额度更高
+    "ip_rate": {"capacity": 30, "refill_per_second": 0.5},
+    # 应用前面受信任的反向代理层数：客户端 IP 取 X-Forwarded-For 从右数第 N 个地址
+    # （更靠左的地址由客户端自己填写，不可信）；0 表示不使用 X-Forwarded-For
+    "trusted_proxy_hops": int(os.getenv("TRUSTED_PROXY_HOPS", "1"))
+}
+
+# 本地只读副本配置 - 进程内 SQLite 保存订单、进度和照片，按增量同步保持最新，写操作仍然调用云函数
+REPLICA_CONFIG = {
+    "enabled": os.getenv("CLOUDBASE_REPLICA", "true").lower() != "false",
+    "path": os.getenv("CLOUDBASE_REPLICA_PATH", ":memory:"),
+    # 查询允许的最大数据年龄（秒），超过时查询前先同步
+    "max_staleness": float(os.getenv("CLOUDBASE_REPLICA_MAX_STALENESS", "15"))
+}
+
+# COS 预签名上传配置
+COS_UPLOAD_CONFIG = {
+    "max_workers": int(os.getenv("COS_UPLOAD_WORKERS", "4")),
+    "max_retries": 3,
+    "backoff_base": 0.5,  # 首次重试等待（秒），之后指数增长
+    "timeout": 60,
+    # 大文件（视频）分片上传：内存占用约为 part_size × part_concurrency
+    "multipart_threshold": 16 * 1024 * 1024,
+    "part_size": 8 * 1024 * 1024,
+    "part_concurrency": 4,
+    # 同一分片上传连续失败（含续传）的次数上限，超过后取消上传，释放已上传的分片
+    "max_multipart_rounds": 3
+}
+
+# 云函数调用指标配置 - 滚动窗口内的延迟直方图，在“性能监控”页面查看
+METRICS_CONFIG = {
+    "enabled": os.getenv("CLOUDBASE_METRICS", "true").lower() != "false",
+    "window_seconds": int(os.getenv("CLOUDBASE_METRICS_WINDOW", "900")),
+    "slot_seconds": 60
+}
+
+# 后台导出配置
+EXPORT_CONFIG = {
+    "max_workers": int(os.getenv("EXPORT_WORKERS", "2")),
+    # 每次写入的行数
+    "chunk_size": 500,
+    # 完成的导出文件保留时间（秒）
+    "job_ttl": int(os.getenv("EXPORT_JOB_TTL", "1800"))
+}
+
+# 日志配置 - 调用链路的逐次日志为 DEBUG 级别，默认不输出
+LOGGING_CONFIG = {
+    "level": os.getenv("LOG_LEVEL", "WARNING").upper(),
+    "format": "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+}
+
 # 应用配置
 APP_CONFIG = {
     "title": "生命钻石服务系统",
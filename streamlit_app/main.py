@@ -1,19 +1,23 @@
 import streamlit as st
 import sys
 import os
+import logging
 from datetime import datetime
 
 # 添加当前目录到路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from config import APP_CONFIG
+from config import APP_CONFIG, LOGGING_CONFIG
 from utils.helpers import apply_custom_css
 from utils.auth import auth_manager
 from streamlit_option_menu import option_menu
 from components.maintenance_page import check_maintenance_mode, show_maintenance_page, should_bypass_maintenance
 
 # 导入页面组件
-from pages_backup import customer_query, admin_dashboard, admin_orders, admin_users, admin_role_permissions, admin_operation_logs
+from pages_backup import customer_query, admin_dashboard, admin_orders, admin_users, admin_role_permissions, admin_operation_logs, admin_performance
+
+# 日志级别由 LOG_LEVEL 控制（调用链路的逐次日志为 DEBUG）
+logging.basicConfig(level=LOGGING_CONFIG["level"], format=LOGGING_CONFIG["format"])
 
 def main():
     """主应用函数"""
@@ -105,8 +109,8 @@ def show_admin_pages():
         st.markdown("---")
         st.markdown("### 📊 管理功能")
         
-        admin_options = ["数据仪表板", "订单管理", "订单详情", "操作日志", "用户管理", "角色权限"]
-        admin_icons = ["bar-chart-fill", "list-ul", "search", "file-text", "people-fill", "shield-check"]
+        admin_options = ["数据仪表板", "订单管理", "订单详情", "操作日志", "性能监控", "用户管理", "角色权限"]
+        admin_icons = ["bar-chart-fill", "list-ul", "search", "file-text", "speedometer2", "people-fill", "shield-check"]
         
         if 'admin_page' not in st.session_state:
             st.session_state.admin_page = "数据仪表板"
@@ -144,6 +148,8 @@ def show_admin_pages():
         admin_orders_center.show_page()
     elif st.session_state.admin_page == "操作日志":
         admin_operation_logs.show_page()
+    elif st.session_state.admin_page == "性能监控":
+        admin_performance.show_page()
     elif st.session_state.admin_page == "用户管理":
         admin_users.show_page()
     elif st.session_state.admin_page == "角色权限":
@@ -11,12 +11,14 @@ import streamlit as st
 from services.order_service import OrderService
 from services.progress_service import ProgressService
 from services.photo_service import PhotoService
+from services.order_aggregate import order_scope
 from components import order_info_card, progress_timeline, photo_gallery
 from utils.cloudbase_client import api_client
+from utils.read_replica import order_replica, order_search_index
 from utils.auth import auth_manager
 
 # 初始化服务
-order_service = OrderService(api_client)
+order_service = OrderService(api_client, replica=order_replica, search_index=order_search_index)
 progress_service = ProgressService(api_client)
 photo_service = PhotoService(api_client)
 
@@ -41,18 +43,19 @@ def show_page():
             submitted = st.form_submit_button("🔍 查询")
             
             if submitted and input_order_number:
-                # 通过订单编号查找订单
-                result = order_service.list_orders(search=input_order_number, limit=1)
-                if result.get('success') and result.get('data', {}).get('orders'):
-                    found_order = result['data']['orders'][0]
+                # 通过订单编号查找订单（完全匹配的订单号排在最前）
+                result = order_service.search(input_order_number, limit=1)
+                if result.get('success') and result.get('data'):
+                    found_order = result['data'][0]
                     st.session_state.selected_order_id = found_order.get('_id')
                     st.rerun()
                 else:
                     st.error(f"❌ 未找到订单：{input_order_number}")
         return
     
-    # 显示订单详情
-    show_order_detail_panel()
+    # 显示订单详情（本次渲染内订单、进度、照片和阶段操作共享一次详情请求）
+    with order_scope(api_client):
+        show_order_detail_panel()
 
 
 def show_order_detail_panel():
@@ -105,9 +108,11 @@ def show_progress_tab(order, progress, allowed_actions):
     
     # 进度概览
     if progress:
-        current_stage = progress_service.get_current_stage(progress)
-        next_stage = progress_service.get_next_stage(progress)
-        completed_stages = progress_service.get_completed_stages(progress)
+        # 同一份进度只构建一次快照
+        snapshot = progress_service.state_machine.snapshot(progress)
+        current_stage = progress_service.get_current_stage(snapshot)
+        next_stage = progress_service.get_next_stage(snapshot)
+        completed_stages = progress_service.get_completed_stages(snapshot)
         
         col1, col2, col3 = st.columns(3)
         with col1:
@@ -1,5 +1,7 @@
 import streamlit as st
 from utils.cloudbase_client import api_client
+from utils.read_replica import order_replica
+from services.order_service import OrderService
 from utils.auth import auth_manager
 from utils.helpers import (
     show_error_message,
@@ -10,6 +12,8 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime, timedelta
 
+order_service = OrderService(api_client, replica=order_replica)
+
 def show_page():
     """管理仪表板页面"""
     # 权限检查
@@ -33,7 +37,8 @@ def load_dashboard_data():
     if 'dashboard_data' not in st.session_state or st.button("🔄 刷新数据", type="secondary", key="dashboard_refresh_top"):
         from components.loading_page import loading_context
         with loading_context("正在加载仪表板数据...", loading_type="inline"):
-            result = api_client.get_dashboard_data()
+            # 有本地副本时在本地统计，不请求云函数
+            result = order_service.get_order_statistics()
             
             if result.get("success"):
                 # 处理嵌套的数据结构
@@ -44,6 +49,7 @@ def load_dashboard_data():
                     st.session_state.dashboard_data = data
                 # 使用北京时间（UTC+8）
                 st.session_state.dashboard_last_update = datetime.utcnow() + timedelta(hours=8)
+                st.session_state.dashboard_replica = result.get("replica")
             else:
                 show_error_message(
                     result.get("message", "数据加载失败"),
@@ -62,6 +68,9 @@ def render_dashboard():
         last_update = st.session_state.dashboard_last_update
         # 直接格式化本地时间，不进行时区转换
         formatted_time = last_update.strftime("%Y年%m月%d日 %H:%M:%S")
+        replica = st.session_state.get("dashboard_replica")
+        if replica and replica.get("staleness_seconds") is not None:
+            formatted_time += f"（本地副本，{replica['staleness_seconds']:.0f} 秒前同步）"
         st.caption(f"最后更新：{formatted_time}")
     
     # 核心指标卡片
@@ -4,12 +4,22 @@ from utils.auth import auth_manager
 from utils.helpers import (
     show_error_message,
     format_datetime,
+    format_datetime_series,
     convert_to_dataframe,
-    translate_role
+    translate_role,
+    render_export_panel
 )
-from datetime import datetime, timedelta
+from utils.export_engine import export_manager
+from services.log_store import OperationLogStore
+from datetime import datetime, timedelta, timezone
 import pandas as pd
 
+# 每页加载的日志条数
+LOG_PAGE_SIZE = 100
+
+# 日期按北京时间划分，与页面显示的时间一致
+BEIJING_TZ = timezone(timedelta(hours=8))
+
 def show_page():
     """操作日志页面"""
     # 权限检查（使用仪表板权限，因为数据来源是仪表板）
@@ -27,45 +37,81 @@ def show_page():
     
     st.markdown("查看系统所有操作记录")
     
-    # 加载日志数据
-    logs_data = load_operation_logs()
+    # 渲染筛选器（点击搜索后生效）
+    render_filters()
     
-    if logs_data:
-        # 渲染筛选器
-        render_filters(logs_data)
-        
+    # 加载符合条件的第一页日志
+    view = load_operation_logs(st.session_state.get("applied_log_filters", {}))
+    
+    if view["logs"]:
         # 渲染日志列表
-        render_logs_list()
+        render_logs_list(view)
+    elif st.session_state.get("applied_log_filters"):
+        st.info("没有符合条件的操作记录")
     else:
         st.info("暂无操作日志记录")
 
-def load_operation_logs():
-    """加载操作日志数据"""
-    if 'operation_logs' not in st.session_state or st.session_state.get('refresh_logs', False):
+def fetch_log_page(filters, cursor=""):
+    """请求一页日志，失败时显示错误并返回 None"""
+    result = api_client.get_operation_logs(filters, cursor=cursor, limit=LOG_PAGE_SIZE, with_total=not cursor)
+    if result.get("success"):
+        return result.get("data") or {}
+    # 静默处理 404 错误（HTTP 触发器未配置）
+    status_code = result.get("status_code", 0)
+    if status_code != 404:
+        show_error_message(
+            result.get("message", "日志加载失败"),
+            error_code=str(status_code),
+            support_info="请检查云函数配置"
+        )
+    return None
+
+def set_log_view(view, page):
+    """把一页日志合并到当前视图"""
+    pagination = page.get("pagination", {})
+    view["logs"].extend(page.get("logs", []))
+    view["cursor"] = pagination.get("next_cursor")
+    if "total_count" in pagination:
+        view["total"] = pagination["total_count"]
+
+def loaded_log_store(view):
+    """已加载日志的列式存储（加载更多或重新加载后重建）"""
+    store = view.get("store")
+    if store is None or len(store) != len(view["logs"]):
+        store = view["store"] = OperationLogStore(view["logs"])
+    return store
+
+def count_today_logs():
+    """今日操作数：不受筛选条件影响，由云函数计数（只取一条日志）"""
+    today = datetime.now(BEIJING_TZ).date()
+    result = api_client.get_operation_logs({"since": day_start_iso(today)}, limit=1, with_total=True)
+    if not result.get("success"):
+        return None
+    return (result.get("data") or {}).get("pagination", {}).get("total_count")
+
+def load_operation_logs(filters):
+    """加载操作日志：筛选条件变化或刷新时重新请求第一页，每次只传输一页"""
+    view = st.session_state.get("operation_log_view")
+    if view is None or view["filters"] != filters or st.session_state.get('refresh_logs', False):
         with st.spinner("正在加载操作日志..."):
-            # 只从云函数获取日志数据
-            result = api_client.get_operation_logs()
-            
-            if result.get("success"):
-                data = result.get("data", {})
-                logs = data.get("logs", [])
-                st.session_state.operation_logs = logs
-            else:
-                # 如果云函数失败，不显示任何数据
-                st.session_state.operation_logs = []
-                # 静默处理 404 错误（HTTP 触发器未配置）
-                status_code = result.get("status_code", 0)
-                if status_code != 404:
-                    show_error_message(
-                        result.get("message", "日志加载失败"),
-                        error_code=str(status_code),
-                        support_info="请检查云函数配置"
-                    )
+            view = {"filters": filters, "logs": [], "cursor": None, "total": 0}
+            page = fetch_log_page(filters)
+            set_log_view(view, page or {})
+            view["today_count"] = count_today_logs() if page is not None else None
+            st.session_state.operation_log_view = view
             st.session_state.refresh_logs = False
-    
-    return st.session_state.get("operation_logs", [])
+    return view
 
-def render_filters(logs_data):
+def load_more_logs(view):
+    """按游标加载下一页，追加到当前视图"""
+    if not view.get("cursor"):
+        return
+    with st.spinner("正在加载更多日志..."):
+        page = fetch_log_page(view["filters"], cursor=view["cursor"])
+        if page is not None:
+            set_log_view(view, page)
+
+def render_filters():
     """渲染筛选器"""
     st.markdown("### 🔍 筛选条件")
     
@@ -122,147 +168,130 @@ def render_filters(logs_data):
     col_button, col_info = st.columns([1, 5])
     with col_button:
         if st.button("🔍 搜索", type="primary"):
-            st.session_state['search_applied'] = True
-    
-    # 应用筛选
-    if st.session_state.get('search_applied', False):
-        filtered_logs = apply_filters(
-            logs_data,
-            selected_type,
-            date_range,
-            order_number,
-            customer_name,
-            operator,
-            date_from,
-            date_to
-        )
-        
-        st.session_state.filtered_logs = filtered_logs
-        
-        # 显示筛选结果统计
-        st.caption(f"📊 找到 {len(filtered_logs)} 条记录")
-    else:
-        # 首次加载显示所有记录
-        st.session_state.filtered_logs = logs_data
-        st.caption(f"📊 共 {len(logs_data)} 条记录")
+            st.session_state.applied_log_filters = build_log_filters(
+                selected_type,
+                date_range,
+                order_number,
+                customer_name,
+                operator,
+                date_from,
+                date_to
+            )
 
-def apply_filters(logs, type_filter, date_range, order_number, customer_name, operator, date_from, date_to):
-    """应用筛选条件"""
-    filtered = logs
+def day_start_iso(day):
+    """北京时间某天零点对应的 UTC 时间（与日志 timestamp 格式相同）"""
+    moment = datetime(day.year, day.month, day.day, tzinfo=BEIJING_TZ).astimezone(timezone.utc)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+def build_log_filters(type_filter, date_range, order_number, customer_name, operator, date_from, date_to):
+    """把筛选条件转换为 admin-logs 的查询参数"""
+    filters = {}
     
     # 操作类型筛选
     if type_filter != "全部":
-        filtered = [log for log in filtered if log.get('type') == type_filter]
+        filters["type"] = type_filter
     
-    # 时间范围筛选
-    now = datetime.now()
+    # 时间范围筛选：换算为 [since, until) 的 UTC 时间
+    today = datetime.now(BEIJING_TZ).date()
+    start_date = end_date = None
     if date_range == "今天":
-        filtered = [log for log in filtered if is_same_day(log.get('timestamp'), now)]
+        start_date = end_date = today
     elif date_range == "昨天":
-        yesterday = now - timedelta(days=1)
-        filtered = [log for log in filtered if is_same_day(log.get('timestamp'), yesterday)]
+        start_date = end_date = today - timedelta(days=1)
     elif date_range == "最近7天":
-        week_ago = now - timedelta(days=7)
-        filtered = [log for log in filtered if is_after_date(log.get('timestamp'), week_ago)]
+        start_date = today - timedelta(days=7)
     elif date_range == "最近30天":
-        month_ago = now - timedelta(days=30)
-        filtered = [log for log in filtered if is_after_date(log.get('timestamp'), month_ago)]
+        start_date = today - timedelta(days=30)
     elif date_range == "自定义" and date_from and date_to:
-        filtered = [log for log in filtered if is_in_date_range(log.get('timestamp'), date_from, date_to)]
+        start_date, end_date = date_from, date_to
+    if start_date:
+        filters["since"] = day_start_iso(start_date)
+    if end_date:
+        filters["until"] = day_start_iso(end_date + timedelta(days=1))
     
-    # 订单编号筛选
+    # 订单编号、客户姓名和操作人（包含匹配）
     if order_number and order_number.strip():
-        filtered = [log for log in filtered if order_number.lower() in log.get('order_number', '').lower()]
-    
-    # 客户姓名筛选（从详细信息的metadata中查找）
+        filters["order_number"] = order_number.strip()
     if customer_name and customer_name.strip():
-        filtered = [log for log in filtered 
-                   if customer_name.lower() in log.get('description', '').lower() or 
-                      customer_name.lower() in str(log.get('metadata', {})).lower()]
-    
-    # 操作人筛选
+        filters["customer"] = customer_name.strip()
     if operator and operator.strip():
-        filtered = [log for log in filtered if operator.lower() in log.get('operator', '').lower()]
+        filters["operator"] = operator.strip()
     
-    return filtered
-
-def is_same_day(timestamp_str, date):
-    """判断是否同一天"""
-    if not timestamp_str:
-        return False
-    try:
-        log_date = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-        return log_date.date() == date.date()
-    except:
-        return False
-
-def is_after_date(timestamp_str, date):
-    """判断是否在日期之后"""
-    if not timestamp_str:
-        return False
-    try:
-        log_date = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00'))
-        return log_date.date() >= date.date()
-    except:
-        return False
-
-def is_in_date_range(timestamp_str, date_from, date_to):
-    """判断是否在日期范围内"""
-    if not timestamp_str:
-        return False
-    try:
-        log_date = datetime.fromisoformat(timestamp_str.replace('Z', '+00:00')).date()
-        return date_from <= log_date <= date_to
-    except:
-        return False
+    return filters
 
-def render_logs_list():
+def render_logs_list(view):
     """渲染日志列表"""
     st.markdown("### 📝 操作记录")
     
-    filtered_logs = st.session_state.get("filtered_logs", [])
+    logs = view["logs"]
     
-    if filtered_logs:
-        # 统计信息
-        col1, col2, col3 = st.columns(3)
+    # 统计信息
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("总记录数", view.get("total") or len(logs))
+    with col2:
+        today_count = view.get("today_count")
+        st.metric("今日操作", "-" if today_count is None else today_count)
+    with col3:
+        # 导出按钮（点击后才在后台生成文件）
+        render_export_panel("operation_logs", lambda file_format: start_log_export(view, file_format))
+    
+    # 在已加载的记录中细筛（不请求云函数）
+    store = loaded_log_store(view)
+    with st.expander("在已加载的记录中筛选", expanded=False):
+        col1, col2, col3, col4 = st.columns(4)
         with col1:
-            st.metric("总记录数", len(filtered_logs))
+            loaded_type = st.selectbox("操作类型", ["全部"] + store.log_types, key="loaded_log_type")
         with col2:
-            st.metric("今日操作", count_today_operations(filtered_logs))
+            loaded_order_number = st.text_input("订单编号", key="loaded_log_order_number")
         with col3:
-            # 导出Excel按钮
-            export_excel_button(filtered_logs)
-        
-        # 准备表格数据
-        table_data = []
-        for log in filtered_logs:
-            row = {
-                '操作时间': format_datetime(log.get('timestamp'), 'datetime') if log.get('timestamp') else '',
-                '操作类型': log.get('type', ''),
-                '操作人': log.get('operator', ''),
-                '操作描述': log.get('description', ''),
-                '订单编号': log.get('order_number', ''),
-                '详细信息': format_metadata_readable(log.get('metadata', {}))
-            }
-            table_data.append(row)
-        
-        # 转换为DataFrame并显示
-        df = pd.DataFrame(table_data)
-        
-        st.dataframe(
-            df,
-            hide_index=True,
-            height=600,
-            column_config={
-                '详细信息': st.column_config.TextColumn(
-                    '详细信息',
-                    width='large',
-                    help='点击单元格可查看完整内容'
-                )
-            }
-        )
+            loaded_customer = st.text_input("客户姓名", key="loaded_log_customer")
+        with col4:
+            loaded_operator = st.text_input("操作人", key="loaded_log_operator")
+    shown = store.rows(store.filter(log_type=loaded_type, order_number=loaded_order_number,
+                                    customer=loaded_customer, operator=loaded_operator))
+    
+    if len(shown) == len(logs):
+        st.caption(f"📊 已加载 {len(logs)} 条记录")
     else:
-        st.info("没有符合条件的操作记录")
+        st.caption(f"📊 已加载 {len(logs)} 条记录，筛选后显示 {len(shown)} 条")
+    
+    # 准备表格数据
+    table_data = []
+    for log in shown:
+        row = {
+            '操作时间': log.get('timestamp'),
+            '操作类型': log.get('type', ''),
+            '操作人': log.get('operator', ''),
+            '操作描述': log.get('description', ''),
+            '订单编号': log.get('order_number', ''),
+            '详细信息': format_metadata_readable(log.get('metadata', {}))
+        }
+        table_data.append(row)
+    
+    # 转换为DataFrame并显示（时间列整列批量转换）
+    df = pd.DataFrame(table_data, columns=['操作时间', '操作类型', '操作人', '操作描述', '订单编号', '详细信息'])
+    df['操作时间'] = format_datetime_series(df['操作时间'], 'datetime')
+    
+    st.dataframe(
+        df,
+        hide_index=True,
+        height=600,
+        column_config={
+            '详细信息': st.column_config.TextColumn(
+                '详细信息',
+                width='large',
+                help='点击单元格可查看完整内容'
+            )
+        }
+    )
+    
+    # 滚动到底部后加载下一页
+    if view.get("cursor"):
+        if st.button(f"⬇️ 加载更多（已加载 {len(logs)} / 共 {view.get('total') or '?'} 条）",
+                     key="logs_load_more", use_container_width=True):
+            load_more_logs(view)
+            st.rerun()
 
 def format_metadata_readable(metadata):
     """格式化元数据为表格中易读的格式（使用换行）"""
@@ -325,56 +354,20 @@ def format_metadata_readable(metadata):
     # 使用换行符分隔，让表格中显示更清晰
     return "\n".join(parts) if parts else ''
 
-def count_today_operations(logs):
-    """统计今日操作数"""
-    today = datetime.now().date()
-    count = 0
-    for log in logs:
-        if log.get('timestamp'):
-            try:
-                log_date = datetime.fromisoformat(log.get('timestamp').replace('Z', '+00:00')).date()
-                if log_date == today:
-                    count += 1
-            except:
-                pass
-    return count
-
-def export_excel_button(logs):
-    """导出Excel按钮"""
-    try:
-        # 准备显示数据
-        export_data = []
-        for log in logs:
-            export_data.append({
-                '操作时间': format_datetime(log.get('timestamp'), 'datetime') if log.get('timestamp') else '',
-                '操作类型': log.get('type', ''),
-                '操作人': log.get('operator', ''),
-                '操作描述': log.get('description', ''),
-                '订单编号': log.get('order_number', ''),
-                '详细信息': format_metadata_readable(log.get('metadata', {}))
-            })
-        
-        df = pd.DataFrame(export_data)
-        
-        # 导出到内存
-        from io import BytesIO
-        output = BytesIO()
-        df.to_excel(output, index=False, engine='openpyxl')
-        output.seek(0)
-        
-        # 生成文件名
-        filename = f"操作日志_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        
-        # 提供下载按钮
-        st.download_button(
-            label="📥 导出Excel",
-            data=output,
-            file_name=filename,
-            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            width='stretch'
-        )
-    except ImportError:
-        st.error("❌ 缺少 openpyxl 包，请安装：pip install openpyxl")
-    except Exception as e:
-        st.error(f"❌ 导出失败: {str(e)}")
-
+def start_log_export(view, file_format):
+    """在后台导出当前筛选条件下的全部日志（逐页请求，不依赖页面已加载的日志）"""
+    columns = [
+        ('操作时间', lambda log: format_datetime(log.get('timestamp'), 'datetime') if log.get('timestamp') else ''),
+        ('操作类型', lambda log: log.get('type', '')),
+        ('操作人', lambda log: log.get('operator', '')),
+        ('操作描述', lambda log: log.get('description', '')),
+        ('订单编号', lambda log: log.get('order_number', '')),
+        ('详细信息', lambda log: format_metadata_readable(log.get('metadata', {}))),
+    ]
+    return export_manager.start(
+        api_client.iter_operation_logs(view["filters"]),
+        columns,
+        file_name=f"操作日志_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        file_format=file_format,
+        total=view.get("total") or None
+    )
@@ -1,20 +1,24 @@
 import streamlit as st
 from utils.cloudbase_client import api_client
+from utils.read_replica import order_replica
 from utils.auth import auth_manager
 from utils.helpers import (
     render_order_card,
     show_error_message,
     show_success_message,
     format_datetime,
-    convert_to_dataframe
+    format_datetime_series,
+    convert_to_dataframe,
+    render_export_panel
 )
+from utils.export_engine import export_manager
 from datetime import datetime, date
 import pandas as pd
 from services.order_service import OrderService
 
 
 # 服务实例
-order_service = OrderService(api_client)
+order_service = OrderService(api_client, replica=order_replica)
 
 class OrderPageState:
     KEY = "order_page_state"
@@ -126,6 +130,8 @@ def load_orders(page: int, limit: int, status: str, search: str):
                 st.session_state.orders_data = data.get("data", {})
             else:
                 st.session_state.orders_data = data
+            # 从本地副本读取时记录同步时间
+            st.session_state.orders_replica = result.get("replica")
         else:
             show_error_message(
                 result.get("message", "订单数据加载失败"),
@@ -149,6 +155,9 @@ def render_orders_list():
     total_pages = pagination.get("total_pages", 1)
     
     st.markdown(f"**找到 {total_count} 个订单，当前第 {current_page}/{total_pages} 页**")
+    replica = st.session_state.get("orders_replica")
+    if replica and replica.get("staleness_seconds") is not None:
+        st.caption(f"数据来自本地副本，{replica['staleness_seconds']:.0f} 秒前同步")
     
     # 订单列表显示模式
     state = OrderPageState.get()
@@ -160,6 +169,10 @@ def render_orders_list():
     )
     state["view_mode"] = view_mode
     
+    # 导出当前筛选条件下的全部订单（不限于当前页）
+    with st.expander("📥 导出订单"):
+        render_export_panel("orders", lambda file_format: start_orders_export(state, total_count, file_format))
+    
     # 软删除本地过滤：未选择“已删除”时隐藏已删除；选择“已删除”仅显示已删除
     filter_status = state.get("status_filter", "all")
     if filter_status == "已删除":
@@ -264,16 +277,12 @@ def render_orders_table(orders: list):
         if col in df.columns:
             df = df.drop(columns=[col])
 
-    # 格式化时间列
+    # 格式化时间列（整列批量转换）
     if '创建时间' in df.columns:
-        df['创建时间'] = df['创建时间'].apply(
-            lambda x: format_datetime(x, 'date')
-        )
+        df['创建时间'] = format_datetime_series(df['创建时间'], 'date')
     
     if '更新时间' in df.columns:
-        df['更新时间'] = df['更新时间'].apply(
-            lambda x: format_datetime(x, 'datetime')
-        )
+        df['更新时间'] = format_datetime_series(df['更新时间'], 'datetime')
 
     # 调整列顺序，让订单编号显示在最前面
     if '订单编号' in df.columns:
@@ -286,6 +295,36 @@ def render_orders_table(orders: list):
         hide_index=True
     )
 
+def start_orders_export(state: dict, total_count: int, file_format: str):
+    """在后台按游标分页导出当前筛选条件下的全部订单"""
+    status_filter = state.get("status_filter", "all")
+    filters = {
+        "status": "deleted" if status_filter == "已删除" else status_filter,
+        "search": state.get("search", "")
+    }
+    columns = [
+        ('订单编号', lambda o: o.get('order_number', '')),
+        ('客户姓名', lambda o: o.get('customer_name', '')),
+        ('联系电话', lambda o: o.get('customer_phone', '')),
+        ('邮箱', lambda o: o.get('customer_email', '')),
+        ('钻石类型', lambda o: o.get('diamond_type', '')),
+        ('钻石大小', lambda o: o.get('diamond_size', '')),
+        ('特殊要求', lambda o: o.get('special_requirements', '')),
+        ('订单状态', lambda o: o.get('order_status', '')),
+        ('当前阶段', lambda o: o.get('current_stage', '')),
+        ('进度(%)', lambda o: o.get('progress_percentage', 0)),
+        ('备注', lambda o: o.get('notes', '')),
+        ('创建时间', lambda o: format_datetime(o.get('created_at'), 'datetime')),
+        ('更新时间', lambda o: format_datetime(o.get('updated_at'), 'datetime')),
+    ]
+    return export_manager.start(
+        order_service.iter_orders(filters),
+        columns,
+        file_name=f"订单_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        file_format=file_format,
+        total=total_count or None
+    )
+
 def render_pagination(pagination: dict):
     """渲染分页导航"""
     current_page = pagination.get("current_page", 1)
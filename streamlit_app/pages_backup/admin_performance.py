@@ -0,0 +1,128 @@
+import streamlit as st
+from utils.cloudbase_client import api_client
+from utils.customer_lookup import customer_lookup
+from utils.auth import auth_manager
+from utils.call_metrics import BUCKET_BOUNDS_MS
+from datetime import datetime
+import pandas as pd
+import plotly.express as px
+
+def show_page():
+    """性能监控页面"""
+    # 权限检查（运行指标只对系统管理员开放）
+    if not auth_manager.require_permission("system.settings"):
+        return
+
+    col_title, col_refresh = st.columns([4, 1])
+    with col_title:
+        st.title("📈 性能监控")
+    with col_refresh:
+        if st.button("🔄 刷新数据", type="primary", key="performance_refresh"):
+            st.rerun()
+
+    metrics = api_client.get_call_metrics()
+    window_minutes = metrics["window_seconds"] // 60
+    st.markdown(f"本进程最近 {window_minutes} 分钟内的云函数调用耗时、缓存命中和错误统计")
+
+    render_overview(metrics)
+
+    if not metrics["calls"]:
+        st.info("暂无调用记录")
+    else:
+        render_calls_table(metrics)
+        render_histogram(metrics)
+
+    render_infrastructure_stats()
+    render_export()
+
+def render_overview(metrics):
+    """渲染总体指标"""
+    totals = metrics["totals"]
+    cache_stats = api_client.get_cache_stats()
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+    with col1:
+        st.metric("调用次数", f"{totals['count']:,}", help=f"吞吐量 {totals['throughput']} 次/秒")
+    with col2:
+        st.metric("错误率", f"{totals['error_rate']:.2%}")
+    with col3:
+        st.metric("P50 耗时", f"{totals['p50_ms']} ms")
+    with col4:
+        st.metric("P95 耗时", f"{totals['p95_ms']} ms", help=f"P99 {totals['p99_ms']} ms，最大 {totals['max_ms']} ms")
+    with col5:
+        st.metric("缓存命中率", f"{cache_stats['hit_ratio']:.1%}", help=f"缓存条目 {cache_stats['size']}/{cache_stats['max_entries']}")
+
+def render_calls_table(metrics):
+    """渲染按云函数和操作分组的统计表"""
+    st.markdown("### ⏱️ 调用耗时")
+
+    rows = []
+    for call in metrics["calls"]:
+        rows.append({
+            "云函数": call["function"],
+            "操作": call["action"] or "-",
+            "次数": call["count"],
+            "错误率": f"{call['error_rate']:.1%}",
+            "缓存命中": call["cache_hits"],
+            "重试": call["retries"],
+            "平均(ms)": call["avg_ms"],
+            "P50(ms)": call["p50_ms"],
+            "P95(ms)": call["p95_ms"],
+            "P99(ms)": call["p99_ms"],
+            "最大(ms)": call["max_ms"],
+            "请求(KB)": round(call["request_bytes"] / 1024, 1),
+            "响应(KB)": round(call["response_bytes"] / 1024, 1),
+            "状态": ", ".join(f"{status}×{n}" for status, n in call["statuses"].items())
+        })
+
+    df = pd.DataFrame(rows).sort_values("P95(ms)", ascending=False)
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+def render_histogram(metrics):
+    """渲染单个调用的耗时分布"""
+    st.markdown("### 📊 耗时分布")
+
+    labels = [f"{call['function']} {call['action']}".strip() for call in metrics["calls"]]
+    selected = st.selectbox("选择调用", labels, key="performance_histogram_call")
+    call = metrics["calls"][labels.index(selected)]
+
+    bounds = [f"≤{bound:g}" for bound in BUCKET_BOUNDS_MS] + [f">{BUCKET_BOUNDS_MS[-1]:g}"]
+    df = pd.DataFrame({"耗时(ms)": bounds, "次数": call["buckets"]})
+    # 只显示有数据的区间及其相邻区间
+    used = [i for i, n in enumerate(call["buckets"]) if n]
+    df = df.iloc[max(used[0] - 1, 0):used[-1] + 2]
+
+    fig = px.bar(df, x="耗时(ms)", y="次数", color_discrete_sequence=["#A569BD"])
+    fig.update_layout(height=320, margin=dict(l=20, r=20, t=20, b=20))
+    st.plotly_chart(fig, use_container_width=True)
+
+def render_infrastructure_stats():
+    """渲染缓存、请求合并、客户查询和连接池统计"""
+    with st.expander("🔧 缓存 / 请求合并 / 客户查询 / 连接池"):
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**响应缓存**")
+            st.json(api_client.get_cache_stats(), expanded=False)
+            st.markdown("**请求合并**")
+            st.json(api_client.get_singleflight_stats(), expanded=False)
+            st.markdown("**客户查询缓存 / 限流**")
+            st.json(customer_lookup.get_stats(), expanded=False)
+        with col2:
+            st.markdown("**连接池**")
+            st.json(api_client.get_transport_stats(), expanded=False)
+
+def render_export():
+    """导出和重置"""
+    col1, col2 = st.columns([1, 1])
+    with col1:
+        st.download_button(
+            "📥 导出指标 JSON",
+            data=api_client.metrics.to_json(),
+            file_name=f"call_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+            mime="application/json",
+            key="performance_export"
+        )
+    with col2:
+        if st.button("🗑️ 重置指标", key="performance_reset"):
+            api_client.metrics.reset()
+            st.rerun()
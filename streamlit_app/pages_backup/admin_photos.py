@@ -1,5 +1,6 @@
 import streamlit as st
 from utils.cloudbase_client import api_client
+from utils.read_replica import order_replica, order_search_index
 from utils.auth import auth_manager
 from utils.helpers import (
     show_error_message,
@@ -11,9 +12,11 @@ from typing import List
 from PIL import Image
 import io
 from datetime import datetime
+from services.order_service import OrderService
 from services.photo_service import PhotoService
 
 # 服务实例
+order_service = OrderService(api_client, replica=order_replica, search_index=order_search_index)
 photo_service = PhotoService(api_client)
 
 def compress_image(file, max_size_kb=100, quality=85):
@@ -112,41 +115,22 @@ def show_photo_upload():
 def search_orders_for_photos(query: str):
     """搜索订单用于照片上传"""
     with st.spinner("正在搜索订单..."):
-        # 首先尝试按客户姓名搜索
-        result = api_client.search_orders_by_name(query)
+        # 订单号前缀、电话后缀、客户姓名（含拼音首字母）搜索，有本地索引时不请求云函数
+        result = order_service.search(query, limit=50)
         
         if result.get("success"):
-            orders = result.get("data", [])
-            if orders:
-                # 过滤出非待处理状态的订单
-                active_orders = [
-                    order for order in orders 
-                    if order.get('order_status') != '已完成'
-                ]
+            # 过滤出未完成的订单
+            active_orders = [
+                order for order in result.get("data", [])
+                if order.get('order_status') != '已完成'
+            ]
+            if active_orders:
                 st.session_state.photo_search_results = active_orders
-                if active_orders:
-                    st.success(f"找到 {len(active_orders)} 个可上传照片的订单")
-                else:
-                    st.info(f"客户“{query}”的所有订单已完成，无法上传新照片")
+                st.success(f"找到 {len(active_orders)} 个可上传照片的订单")
             else:
-                # 如果按姓名未找到，尝试从所有订单中搜索
-                all_orders_result = api_client.get_orders(page=1, limit=100, status="all", search="")
-                if all_orders_result.get("success"):
-                    all_orders = all_orders_result.get("data", {}).get("orders", [])
-                    # 按订单编号过滤
-                    filtered_orders = [
-                        order for order in all_orders 
-                        if (query.lower() in order.get('order_number', '').lower() and 
-                            order.get('order_status') != '已完成')
-                    ]
-                    
-                    if filtered_orders:
-                        st.session_state.photo_search_results = filtered_orders
-                        st.success(f"找到 {len(filtered_orders)} 个可上传照片的订单")
-                    else:
-                        st.info(f"未找到包含“{query}”的未完成订单")
-                        if 'photo_search_results' in st.session_state:
-                            del st.session_state.photo_search_results
+                st.info(f"未找到包含“{query}”的未完成订单")
+                if 'photo_search_results' in st.session_state:
+                    del st.session_state.photo_search_results
         else:
             show_error_message(
                 result.get("message", "搜索失败"),
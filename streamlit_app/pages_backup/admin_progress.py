@@ -1,5 +1,6 @@
 import streamlit as st
 from utils.cloudbase_client import api_client
+from utils.read_replica import order_replica, order_search_index
 from utils.auth import auth_manager
 from utils.helpers import (
     render_progress_timeline,
@@ -9,7 +10,14 @@ from utils.helpers import (
     get_stage_info
 )
 from config import PRODUCTION_STAGES
+from services.order_service import OrderService
+from services.progress_service import ProgressService
+from services.order_sync import OrderSync
 from datetime import datetime, date
+import uuid
+
+order_service = OrderService(api_client, replica=order_replica, search_index=order_search_index)
+progress_service = ProgressService(api_client)
 
 def show_page():
     """进度管理页面"""
@@ -65,50 +73,18 @@ def show_single_progress_update():
 def search_orders_for_progress(query: str):
     """搜索订单用于进度更新"""
     with st.spinner("正在搜索订单..."):
-        # 首先尝试按客户姓名搜索
-        result = api_client.search_orders_by_name(query)
+        # 订单号前缀、电话后缀、客户姓名（含拼音首字母）搜索，有本地索引时不请求云函数
+        result = order_service.search(query, limit=50)
         
         if result.get("success"):
-            # 处理嵌套的数据结构
-            data = result.get("data", {})
-            if isinstance(data, dict) and data.get("success"):
-                orders = data.get("data", [])
-            else:
-                orders = data if isinstance(data, list) else []
-                
+            orders = result.get("data", [])
             if orders:
                 st.session_state.progress_search_results = orders
                 st.success(f"找到 {len(orders)} 个订单")
             else:
-                # 如果按姓名未找到，尝试从所有订单中搜索
-                all_orders_result = api_client.get_orders(page=1, limit=100, status="all", search="")
-                if all_orders_result.get("success"):
-                    # 处理嵌套的数据结构
-                    all_data = all_orders_result.get("data", {})
-                    if isinstance(all_data, dict) and all_data.get("success"):
-                        all_orders_info = all_data.get("data", {})
-                        all_orders = all_orders_info.get("orders", [])
-                    else:
-                        all_orders = []
-                    # 按订单编号过滤
-                    filtered_orders = [
-                        order for order in all_orders 
-                        if query.lower() in order.get('order_number', '').lower()
-                    ]
-                    
-                    if filtered_orders:
-                        st.session_state.progress_search_results = filtered_orders
-                        st.success(f"找到 {len(filtered_orders)} 个订单")
-                    else:
-                        st.info(f"未找到包含“{query}”的订单")
-                        if 'progress_search_results' in st.session_state:
-                            del st.session_state.progress_search_results
-                else:
-                    show_error_message(
-                        "搜索失败",
-                        error_code=str(all_orders_result.get("status_code", "")),
-                        support_info="请稍后重试"
-                    )
+                st.info(f"未找到包含“{query}”的订单")
+                if 'progress_search_results' in st.session_state:
+                    del st.session_state.progress_search_results
         else:
             show_error_message(
                 result.get("message", "搜索失败"),
@@ -522,21 +498,23 @@ def show_all_orders_dashboard():
         # 自动加载订单
         load_all_orders()
 
+def get_order_sync() -> OrderSync:
+    """会话内的订单副本，刷新时只拉取上次同步之后的变更"""
+    if 'order_sync' not in st.session_state:
+        st.session_state.order_sync = OrderSync(api_client, order_service)
+    return st.session_state.order_sync
+
 def load_all_orders():
     """加载所有订单"""
     from components.loading_page import loading_context
     with loading_context("正在加载所有订单...", loading_type="inline"):
-        # 获取所有状态的订单
-        all_orders = []
-        
-        # 获取不同状态的订单
-        statuses = ["待处理", "制作中", "已完成"]
-        for status in statuses:
-            result = api_client.get_orders(page=1, limit=100, status=status, search="")
-            if result.get("success"):
-                orders = result.get("data", {}).get("orders", [])
-                all_orders.extend(orders)
+        # 首次全量加载（游标分页遍历所有订单），之后只合并增量变更
+        sync = get_order_sync()
+        result = sync.refresh()
+        if not result.get("success"):
+            st.error(f"订单加载失败：{result.get('message', '')}")
         
+        all_orders = sync.list_orders(["待处理", "制作中", "已完成"])
         st.session_state.all_orders = all_orders
         
         if all_orders:
@@ -645,10 +623,11 @@ def display_order_card(order):
 def load_orders_for_batch_update():
     """加载可批量更新的订单"""
     with st.spinner("正在加载订单数据..."):
-        result = api_client.get_orders(page=1, limit=50, status="制作中", search="")
+        sync = get_order_sync()
+        result = sync.refresh()
         
         if result.get("success"):
-            orders = result.get("data", {}).get("orders", [])
+            orders = sync.list_orders("制作中")
             st.session_state.batch_update_orders = orders
             if orders:
                 st.success(f"加载了 {len(orders)} 个在制作中的订单")
@@ -714,9 +693,8 @@ def show_batch_update_form():
         with col2:
             batch_status = st.selectbox(
                 "新状态",
-                options=["pending", "in_progress", "completed"],
+                options=["in_progress", "completed"],
                 format_func=lambda x: {
-                    "pending": "待处理",
                     "in_progress": "进行中",
                     "completed": "已完成"
                 }[x],
@@ -726,6 +704,20 @@ def show_batch_update_form():
         if st.button("🚀 执行批量更新", type="primary"):
             execute_batch_update(selected_orders, batch_stage, batch_status)
 
+def batch_id_for(orders: list, stage_name: str, status: str) -> str:
+    """
+    本次批量操作的批次ID
+
+    同一组订单、阶段和状态重复提交（如请求超时后再点一次）时复用同一个ID，云函数按幂等键返回
+    已生效项的首次结果；选择变化或上一次全部成功后生成新的ID。
+    """
+    signature = (tuple(sorted(o.get('_id', '') for o in orders)), stage_name, status)
+    pending = st.session_state.get("batch_update_pending")
+    if not pending or pending["signature"] != signature:
+        pending = {"signature": signature, "batch_id": uuid.uuid4().hex}
+        st.session_state.batch_update_pending = pending
+    return pending["batch_id"]
+
 def execute_batch_update(orders: list, stage_name: str, status: str):
     """执行批量更新"""
     # 找到对应的stage_id
@@ -739,34 +731,32 @@ def execute_batch_update(orders: list, stage_name: str, status: str):
         st.error("未找到指定的制作阶段")
         return
     
-    # 执行批量更新
-    success_count = 0
-    error_count = 0
-    error_messages = []
-    
+    # 执行批量更新：本地一次校验，分块发送（每块一次云函数调用）
+    user_info = st.session_state.get("user_info") or {}
     with st.spinner(f"正在批量更新 {len(orders)} 个订单..."):
-        for order in orders:
-            order_id = order.get("_id") or order.get("order_id")
-            order_number = order.get("order_number", '')
-            
-            try:
-                # 调用单个进度更新API
-                result = api_client.update_order_progress(
-                    order_id=order_id,
-                    stage_id=stage_id,
-                    status=status,
-                    notes=f"批量更新 - {stage_name} -> {status}"
-                )
-                
-                if result.get("success"):
-                    success_count += 1
-                else:
-                    error_count += 1
-                    error_messages.append(f"{order_number}: {result.get('message', '更新失败')}")
-                    
-            except Exception as e:
-                error_count += 1
-                error_messages.append(f"{order_number}: 系统错误 - {str(e)}")
+        result = progress_service.batch_transition(
+            orders,
+            stage_id=stage_id,
+            status=status,
+            notes=f"批量更新 - {stage_name} -> {status}",
+            operator=user_info.get("username") or "admin",
+            batch_id=batch_id_for(orders, stage_name, status)
+        )
+    
+    if not result.get("success"):
+        st.error(result.get("message", "批量更新失败"))
+        return
+    
+    batch = result["data"]
+    success_count = batch["succeeded"]
+    error_count = batch["failed"]
+    if error_count == 0:
+        # 全部成功，下一次提交是新的批次
+        st.session_state.pop("batch_update_pending", None)
+    error_messages = [
+        f"{item['order_number'] or item['order_id']}: {item['message'] or '更新失败'}"
+        for item in batch["results"] if not item["success"]
+    ]
     
     # 显示批量更新结果
     if success_count > 0:
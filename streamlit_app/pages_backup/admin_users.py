@@ -13,10 +13,7 @@ import hashlib
 
 def _get_available_roles():
     """从角色管理模块获取可用角色列表，用于用户角色选择"""
-    # 优先使用缓存，避免每次打开表单都请求一次
-    if "available_roles_cache" in st.session_state:
-        return st.session_state["available_roles_cache"]
-
+    # 角色列表由 api_client 的进程级缓存提供，角色变更后自动失效
     try:
         result = api_client.get_roles()
         if result.get("success"):
@@ -28,15 +25,12 @@ def _get_available_roles():
                 if r.get("is_active", True) and r.get("role_name")
             ]
             if role_names:
-                st.session_state["available_roles_cache"] = role_names
                 return role_names
     except Exception as e:
         # 如果加载失败，给一个兜底选项，并给出轻量提示
         st.warning(f"加载角色列表失败，将使用默认角色集：{e}")
 
-    fallback = ["admin", "operator", "viewer"]
-    st.session_state["available_roles_cache"] = fallback
-    return fallback
+    return ["admin", "operator", "viewer"]
 
 
 def show_page():
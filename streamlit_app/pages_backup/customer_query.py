@@ -2,6 +2,8 @@ import streamlit as st
 import re
 import streamlit.components.v1 as components
 from utils.cloudbase_client import api_client
+from utils.customer_lookup import customer_lookup, client_ip
+from config import CUSTOMER_LOOKUP_CONFIG
 from utils.helpers import (
     render_progress_timeline, 
     render_photo_gallery, 
@@ -89,6 +91,23 @@ def detect_search_type(value: str) -> str:
     # 默认按订单号处理（适配可能包含字母的自定义订单号）
     return "order_number"
 
+def get_client_identity():
+    """当前会话ID和客户端 IP（用于查询限流）"""
+    session_id = ip = None
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+        ctx = get_script_run_ctx()
+        session_id = ctx.session_id if ctx else None
+    except ImportError:
+        pass
+    try:
+        # 部署在反向代理之后时取代理追加的地址（客户端填写的部分不可信）
+        ip = client_ip(st.context.headers.get("X-Forwarded-For", ""),
+                       CUSTOMER_LOOKUP_CONFIG["trusted_proxy_hops"], st.context.ip_address)
+    except (AttributeError, RuntimeError):
+        pass
+    return session_id, ip
+
 def search_orders(search_type: str, search_value: str):
     """查询订单"""
     search_type_names = {
@@ -100,7 +119,13 @@ def search_orders(search_type: str, search_value: str):
     # 使用新的加载组件
     from components.loading_page import loading_context
     with loading_context(f"正在根据{search_type_name}查询订单...", loading_type="inline"):
-        result = api_client.search_orders(search_type=search_type, search_value=search_value)
+        # 相同号码的查询命中缓存，未命中的查询按会话和 IP 限流
+        session_id, ip = get_client_identity()
+        result = customer_lookup.search(search_type, search_value, session_id=session_id, ip=ip)
+        
+        if result.get("rate_limited"):
+            st.warning(result.get("message", "查询过于频繁，请稍后再试"))
+            return
         
         if result.get("success"):
             data = result.get("data", {})
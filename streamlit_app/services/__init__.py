@@ -7,13 +7,26 @@
 from .order_service import OrderService
 from .progress_service import ProgressService
 from .photo_service import PhotoService
-from .state_machine import OrderStateMachine
+from .state_machine import OrderStateMachine, ProgressSnapshot
+from .order_aggregate import OrderAggregate, OrderRepository, order_scope
+from .order_sync import OrderSync
+from .order_replica import OrderReplica
+from .search_index import OrderSearchIndex
+from .log_store import OperationLogStore
 
 __all__ = [
     'OrderService',
     'ProgressService',
     'PhotoService',
-    'OrderStateMachine'
+    'OrderStateMachine',
+    'ProgressSnapshot',
+    'OrderAggregate',
+    'OrderRepository',
+    'order_scope',
+    'OrderSync',
+    'OrderReplica',
+    'OrderSearchIndex',
+    'OperationLogStore'
 ]
 
 
@@ -0,0 +1,146 @@
+"""
+操作日志列式存储
+
+操作日志按条件分页由 admin-logs 在服务端筛选；已经加载到页面的日志（可能是"加载更多"累积的
+上千条）再按类型、订单号、客户和操作人细筛时不再请求云函数，而是在加载后把日志转换为按时间
+排序的列，之后每次重新运行只做编码比较和区间查找：
+- 时间戳只解析一次，保存为 int64 纳秒时间戳，时间范围用二分查找定位区间
+- 操作类型、操作人、订单编号保存为分类编码，精确匹配比较编码，包含匹配只在去重后的取值上做一次
+- 客户姓名在描述和详细信息中查找，预先拼接为小写文本，只在前面条件筛出的行上匹配
+
+日期按北京时间（UTC+8）划分，与页面显示的时间一致。
+"""
+
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+NS_PER_DAY = 24 * 3600 * 10**9
+
+
+class _Codes:
+    """一列字符串的分类编码"""
+
+    __slots__ = ("codes", "values", "_lower", "_index")
+
+    def __init__(self, values: List[str]):
+        codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        self.codes = codes
+        self.values = list(uniques)
+        self._lower = [value.lower() for value in self.values]
+        self._index = {value: i for i, value in enumerate(self.values)}
+
+    def equals(self, value: str) -> np.ndarray:
+        """取值等于 value 的编码"""
+        code = self._index.get(value)
+        return np.array([] if code is None else [code], dtype=self.codes.dtype)
+
+    def contains(self, needle: str) -> np.ndarray:
+        """取值包含 needle（不区分大小写）的编码"""
+        needle = needle.lower()
+        return np.array([i for i, value in enumerate(self._lower) if needle in value], dtype=self.codes.dtype)
+
+
+class OperationLogStore:
+    """按时间排序的操作日志列式存储（只读，日志变化时重新创建）"""
+
+    def __init__(self, logs: Iterable[Dict[str, Any]], tz_offset_hours: int = 8):
+        """
+        Args:
+            logs: 操作日志列表（admin-logs 返回的格式）
+            tz_offset_hours: 划分日期使用的时区（默认北京时间）
+        """
+        logs = list(logs)
+        self.tz = timezone(timedelta(hours=tz_offset_hours))
+
+        # 无法解析的时间戳为 NaT（int64 最小值），排在最前，任何时间范围都不会包含
+        parsed = pd.to_datetime(pd.Series([log.get('timestamp') or None for log in logs], dtype=object),
+                                utc=True, errors='coerce', format='ISO8601')
+        epochs = parsed.dt.tz_localize(None).to_numpy(dtype='datetime64[ns]').view('int64')
+        order = np.argsort(epochs, kind='stable')
+
+        self._logs = [logs[i] for i in order]
+        self._epochs = epochs[order]
+        self._types = _Codes([log.get('type') or '' for log in self._logs])
+        self._operators = _Codes([log.get('operator') or '' for log in self._logs])
+        self._order_numbers = _Codes([log.get('order_number') or '' for log in self._logs])
+        self._search_text = np.array(
+            [f"{log.get('description', '')}\n{log.get('metadata', {})}".lower() for log in self._logs], dtype=object)
+
+    def __len__(self):
+        return len(self._logs)
+
+    @property
+    def log_types(self) -> List[str]:
+        """出现过的操作类型（排序后）"""
+        return sorted(value for value in self._types.values if value)
+
+    def today(self) -> date:
+        """当前日期（按存储使用的时区）"""
+        return datetime.now(self.tz).date()
+
+    def _day_start(self, day: date) -> int:
+        """某天零点的纳秒时间戳"""
+        return int(pd.Timestamp(datetime(day.year, day.month, day.day, tzinfo=self.tz)).value)
+
+    def _time_slice(self, start_date: Optional[date], end_date: Optional[date]) -> slice:
+        """时间范围 [start_date, end_date]（含两端，None 表示不限）在排序后的行中的区间"""
+        if start_date is None and end_date is None:
+            return slice(0, len(self._logs))
+        # 下界至少为最小的有效时间戳，排除无法解析的时间
+        lower = self._day_start(start_date) if start_date else np.iinfo(np.int64).min + 1
+        lo = int(np.searchsorted(self._epochs, lower, side='left'))
+        hi = len(self._logs)
+        if end_date is not None:
+            hi = int(np.searchsorted(self._epochs, self._day_start(end_date) + NS_PER_DAY, side='left'))
+        return slice(lo, max(lo, hi))
+
+    def filter(self, log_type: Optional[str] = None, start_date: Optional[date] = None,
+               end_date: Optional[date] = None, order_number: str = '', customer: str = '',
+               operator: str = '') -> np.ndarray:
+        """
+        筛选日志
+
+        Args:
+            log_type: 操作类型（精确匹配，None 或"全部"表示不限）
+            start_date: 开始日期（含）
+            end_date: 结束日期（含）
+            order_number: 订单编号（包含匹配，不区分大小写）
+            customer: 客户姓名（在描述和详细信息中包含匹配）
+            operator: 操作人（包含匹配）
+
+        Returns:
+            符合条件的行号，按时间倒序（传给 rows() / count_on()）
+        """
+        window = self._time_slice(start_date, end_date)
+        mask = np.ones(window.stop - window.start, dtype=bool)
+
+        if log_type and log_type != '全部':
+            mask &= np.isin(self._types.codes[window], self._types.equals(log_type))
+        if operator and operator.strip():
+            mask &= np.isin(self._operators.codes[window], self._operators.contains(operator.strip()))
+        if order_number and order_number.strip():
+            mask &= np.isin(self._order_numbers.codes[window], self._order_numbers.contains(order_number.strip()))
+
+        positions = np.flatnonzero(mask) + window.start
+        if customer and customer.strip():
+            needle = customer.strip().lower()
+            text = self._search_text[positions]
+            positions = positions[np.fromiter((needle in t for t in text), dtype=bool, count=len(text))]
+        return positions[::-1]
+
+    def rows(self, positions: np.ndarray) -> List[Dict[str, Any]]:
+        """行号对应的日志"""
+        logs = self._logs
+        return [logs[i] for i in positions]
+
+    def count_on(self, day: date, positions: Optional[np.ndarray] = None) -> int:
+        """某天的日志条数（positions 为 None 时统计全部日志）"""
+        start = self._day_start(day)
+        if positions is None:
+            window = self._time_slice(day, day)
+            return window.stop - window.start
+        epochs = self._epochs[positions]
+        return int(np.count_nonzero((epochs >= start) & (epochs < start + NS_PER_DAY)))
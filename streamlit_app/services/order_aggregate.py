@@ -0,0 +1,189 @@
+"""
+订单聚合
+
+订单详情（订单信息 + 进度 + 照片）在一次页面渲染中只加载一次：
+- OrderAggregate 封装一次 get_order_detail 的结果，订单、进度、照片和允许的操作都从同一份数据读取
+- OrderRepository 是按订单ID索引的身份映射，同一作用域内的 OrderService、ProgressService、
+  PhotoService 共享同一个聚合
+- 写操作成功后，根据写接口的返回值就地更新聚合，不再重新请求订单详情
+
+使用方法：
+    with order_scope(api_client):
+        order_service.get_order(order_id)          # 请求一次
+        progress_service.start_stage(order_id, s)  # 复用已加载的进度，写后就地更新
+
+不在作用域内调用时，每次调用使用临时仓库，行为与直接请求一致。
+"""
+
+import contextlib
+import contextvars
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+
+from .state_machine import ProgressSnapshot, StageStatus
+
+
+_current_repository: contextvars.ContextVar = contextvars.ContextVar("order_repository", default=None)
+
+
+def _now_iso() -> str:
+    """与云函数相同格式的 UTC 时间"""
+    now = datetime.now(timezone.utc)
+    return now.strftime("%Y-%m-%dT%H:%M:%S.") + f"{now.microsecond // 1000:03d}Z"
+
+
+class OrderAggregate:
+    """一个订单的详情数据（订单 + 进度 + 照片）"""
+
+    def __init__(self, order_id: str, detail: Dict[str, Any]):
+        """
+        Args:
+            order_id: 订单ID
+            detail: customer-detail 返回的 data（order_info、progress_timeline、photos）
+        """
+        self.order_id = order_id
+        self.order: Dict[str, Any] = detail.get('order_info', {}) or {}
+        self.progress: List[Dict[str, Any]] = detail.get('progress_timeline', []) or []
+        self.photos: List[Dict[str, Any]] = detail.get('photos', []) or []
+        self._snapshot: Optional[ProgressSnapshot] = None
+
+    @property
+    def snapshot(self) -> ProgressSnapshot:
+        """进度快照（首次访问时构建，阶段更新后重建）"""
+        if self._snapshot is None:
+            self._snapshot = ProgressSnapshot(self.progress)
+        return self._snapshot
+
+    @property
+    def allowed_actions(self) -> List[str]:
+        """根据当前订单和进度计算允许的操作"""
+        return self.snapshot.allowed_actions(self.order)
+
+    def find_stage(self, stage_id: str) -> Optional[Dict[str, Any]]:
+        record = self.snapshot.find(stage_id)
+        return record.source if record is not None else None
+
+    def apply_order_update(self, update_data: Dict[str, Any]):
+        """订单更新成功后合并更新的字段"""
+        self.order.update({k: v for k, v in update_data.items() if k != 'order_id'})
+
+    def apply_progress_update(self, result_data: Dict[str, Any]):
+        """
+        阶段更新成功后就地更新进度和订单状态
+
+        Args:
+            result_data: admin-progress update 返回的 data
+                （stage_id、status、notes、version、started_at/completed_at、
+                 progress_percentage、current_stage、order_status）
+        """
+        stage = self.find_stage(result_data.get('stage_id', ''))
+        if stage is not None:
+            self._snapshot = None
+            status = result_data.get('status')
+            stage['status'] = status
+            stage['notes'] = result_data.get('notes', stage.get('notes', ''))
+            if 'version' in result_data:
+                stage['version'] = result_data['version']
+            if status == StageStatus.IN_PROGRESS.value:
+                stage['started_at'] = result_data.get('started_at') or _now_iso()
+            elif status == StageStatus.COMPLETED.value:
+                stage['completed_at'] = result_data.get('completed_at') or _now_iso()
+
+        for key in ('progress_percentage', 'current_stage', 'order_status'):
+            if key in result_data:
+                self.order[key] = result_data[key]
+
+    def add_photos(self, saved_photos: List[Dict[str, Any]]):
+        """照片确认上传后加入对应阶段分组"""
+        for photo in saved_photos:
+            stage_name = photo.get('stage_name') or '未知阶段'
+            group = next((g for g in self.photos if g.get('stage_name') == stage_name), None)
+            if group is None:
+                group = {'stage_name': stage_name, 'photos': []}
+                self.photos.append(group)
+            group['photos'].append({
+                'photo_url': photo.get('photo_url', ''),
+                'thumbnail_url': photo.get('thumbnail_url', photo.get('photo_url', '')),
+                'description': photo.get('description'),
+                'upload_time': photo.get('upload_time'),
+                'media_type': photo.get('media_type', 'photo'),
+                'file_type': photo.get('file_type', 'image/jpeg'),
+                'file_name': photo.get('file_name', ''),
+                '_id': photo.get('_id', '')
+            })
+
+    def remove_photo(self, photo_id: str) -> bool:
+        """照片删除后从分组中移除，空分组一并移除"""
+        removed = False
+        for group in self.photos:
+            before = len(group.get('photos', []))
+            group['photos'] = [p for p in group.get('photos', []) if p.get('_id') != photo_id]
+            removed = removed or len(group['photos']) != before
+        self.photos = [g for g in self.photos if g.get('photos')]
+        return removed
+
+
+class OrderRepository:
+    """订单聚合的身份映射：同一订单在作用域内只请求一次详情"""
+
+    def __init__(self, api_client):
+        self.api_client = api_client
+        self._aggregates: Dict[str, OrderAggregate] = {}
+        self.loads = 0
+
+    def load(self, order_id: str) -> Dict[str, Any]:
+        """
+        获取订单聚合
+
+        Returns:
+            {'success': True, 'data': OrderAggregate}，失败时返回接口原始结果
+        """
+        aggregate = self._aggregates.get(order_id)
+        if aggregate is not None:
+            return {'success': True, 'data': aggregate}
+
+        result = self.api_client.get_order_detail(order_id, is_admin=True)
+        self.loads += 1
+        if not result.get('success'):
+            return result
+
+        data = result.get('data', {})
+        if not isinstance(data, dict):
+            return {'success': False, 'message': '订单详情格式错误'}
+        aggregate = OrderAggregate(order_id, data)
+        self._aggregates[order_id] = aggregate
+        return {'success': True, 'data': aggregate}
+
+    def peek(self, order_id: str) -> Optional[OrderAggregate]:
+        """获取已加载的聚合（不发起请求）"""
+        return self._aggregates.get(order_id)
+
+    def evict(self, order_id: str):
+        """移除订单聚合（下次访问重新加载）"""
+        self._aggregates.pop(order_id, None)
+
+
+def order_repository(api_client) -> OrderRepository:
+    """获取当前作用域的仓库；不在作用域内（或客户端不同）时返回临时仓库"""
+    repository = _current_repository.get()
+    if repository is not None and repository.api_client is api_client:
+        return repository
+    return OrderRepository(api_client)
+
+
+@contextlib.contextmanager
+def order_scope(api_client):
+    """
+    订单聚合作用域（一次页面渲染或一次请求）
+
+    作用域内对同一订单的多次读取共享一个聚合；嵌套使用时复用外层作用域。
+    """
+    repository = _current_repository.get()
+    if repository is not None and repository.api_client is api_client:
+        yield repository
+        return
+    token = _current_repository.set(OrderRepository(api_client))
+    try:
+        yield _current_repository.get()
+    finally:
+        _current_repository.reset(token)
@@ -0,0 +1,392 @@
+"""
+订单只读副本
+
+进程内的 SQLite 副本，保存订单、进度和照片三个集合，订单列表、客户搜索和仪表板统计直接在本地查询：
+- 首次使用时按 _id 分页拉取全量快照（admin-orders snapshot），之后按增量同步（admin-orders changes）
+- 距上次同步超过 max_staleness 秒，或本进程写过订单/照片后，查询前先同步一次；
+  查询结果带 replica 字段（同步时间和数据年龄），页面据此显示数据的新旧
+- 写操作仍然调用云函数，副本只用于读取
+
+所有访问共享一个连接并由锁串行化；查询走索引，单次耗时在毫秒以内。
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from .order_sync import ChangeFeedSync
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS orders (
+    _id TEXT PRIMARY KEY,
+    order_number TEXT,
+    customer_name TEXT,
+    customer_phone TEXT,
+    customer_email TEXT,
+    order_status TEXT,
+    created_at TEXT,
+    updated_at TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_orders_created ON orders (created_at DESC, _id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_status_created ON orders (order_status, created_at DESC, _id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_customer_name ON orders (customer_name);
+CREATE INDEX IF NOT EXISTS idx_orders_customer_phone ON orders (customer_phone);
+CREATE INDEX IF NOT EXISTS idx_orders_order_number ON orders (order_number);
+
+CREATE TABLE IF NOT EXISTS order_progress (
+    _id TEXT PRIMARY KEY,
+    order_id TEXT,
+    stage_id TEXT,
+    stage_name TEXT,
+    stage_order INTEGER,
+    status TEXT,
+    completed_at TEXT,
+    updated_at TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_progress_order ON order_progress (order_id, stage_order);
+CREATE INDEX IF NOT EXISTS idx_progress_status ON order_progress (status, order_id);
+
+CREATE TABLE IF NOT EXISTS photos (
+    _id TEXT PRIMARY KEY,
+    order_id TEXT,
+    stage_id TEXT,
+    updated_at TEXT,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_photos_order ON photos (order_id, stage_id);
+"""
+
+# 表名 -> 除 _id 和 doc 外按字段建列的属性
+_COLUMNS = {
+    'orders': ('order_number', 'customer_name', 'customer_phone', 'customer_email',
+               'order_status', 'created_at', 'updated_at'),
+    'order_progress': ('order_id', 'stage_id', 'stage_name', 'stage_order', 'status',
+                       'completed_at', 'updated_at'),
+    'photos': ('order_id', 'stage_id', 'updated_at')
+}
+
+# 与 customer-search 相同的查询字段
+_SEARCH_FIELDS = {'order_number': 'order_number', 'phone': 'customer_phone',
+                  'email': 'customer_email', 'name': 'customer_name'}
+
+
+def _upsert_sql(table: str) -> str:
+    """
+    插入或覆盖一条记录；已有记录只被 updated_at 更新（或相同时间但内容不同）的记录覆盖
+
+    没有 updated_at 的旧记录（增加该字段之前写入的照片等）视为最旧，任何新版本都可以覆盖。
+    """
+    columns = ('_id',) + _COLUMNS[table] + ('doc',)
+    updates = ', '.join(f"{c} = excluded.{c}" for c in columns[1:])
+    return (
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))}) "
+        f"ON CONFLICT(_id) DO UPDATE SET {updates} "
+        f"WHERE {table}.updated_at IS NULL "
+        f"OR excluded.updated_at > {table}.updated_at "
+        f"OR (excluded.updated_at = {table}.updated_at AND excluded.doc != {table}.doc)"
+    )
+
+
+def _row(table: str, doc: Dict[str, Any]) -> tuple:
+    return ((doc['_id'],) + tuple(doc.get(c) for c in _COLUMNS[table])
+            + (json.dumps(doc, ensure_ascii=False, sort_keys=True),))
+
+
+class OrderReplica(ChangeFeedSync):
+    """订单、进度和照片的本地 SQLite 只读副本"""
+
+    # 全量快照每页拉取的记录数
+    SNAPSHOT_PAGE_SIZE = 500
+    # 仪表板返回的最近动态条数
+    RECENT_ACTIVITY_LIMIT = 50
+
+    def __init__(self, api_client, path: str = ":memory:", max_staleness: float = 15.0, clock=time.time):
+        """
+        Args:
+            api_client: CloudBase API客户端实例
+            path: SQLite 数据库文件（默认内存数据库）
+            max_staleness: 查询允许的最大数据年龄（秒）
+            clock: 时钟函数（便于测试）
+        """
+        super().__init__(api_client, clock)
+        self.max_staleness = max_staleness
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        # _lock 保护数据库连接，_sync_lock 保证同一时刻只有一个线程在同步（同步期间查询照常读取旧数据）
+        self._lock = threading.RLock()
+        self._sync_lock = threading.Lock()
+        # 上次同步时本进程的订单/照片写入版本，变化说明本进程写过数据
+        self._synced_versions: Optional[tuple] = None
+        self._listeners: List[Callable[[List[Dict[str, Any]], List[str], bool], None]] = []
+
+    # ---------- 同步 ----------
+
+    def _write_versions(self) -> tuple:
+        if hasattr(self.api_client, 'get_tag_versions'):
+            return self.api_client.get_tag_versions(['orders', 'photos'])
+        return ()
+
+    def _is_fresh(self, versions: tuple) -> bool:
+        staleness = self.staleness
+        return (staleness is not None and staleness <= self.max_staleness
+                and versions == self._synced_versions)
+
+    def ensure_fresh(self) -> Dict[str, Any]:
+        """
+        数据过旧或本进程写过数据时同步一次
+
+        Returns:
+            同步结果；不需要同步时返回 {'success': True, 'data': None}
+        """
+        versions = self._write_versions()
+        if self._is_fresh(versions):
+            return {'success': True, 'message': '副本已是最新', 'data': None}
+        with self._sync_lock:
+            # 等锁期间其他线程可能已经同步
+            if self._is_fresh(versions):
+                return {'success': True, 'message': '副本已是最新', 'data': None}
+            result = self.refresh()
+            if result.get('success'):
+                self._synced_versions = versions
+            return result
+
+    def subscribe(self, callback: Callable[[List[Dict[str, Any]], List[str], bool], None]):
+        """
+        订阅订单变化（例如搜索索引）
+
+        Args:
+            callback: callback(新增或更新的订单, 删除的订单ID, 是否全量)，全量加载时传入全部订单；
+                订阅时副本已有数据的，立即以全量方式回调一次
+        """
+        with self._lock:
+            self._listeners.append(callback)
+            if self.synced_at is not None:
+                callback([json.loads(doc) for (doc,) in self._db.execute("SELECT doc FROM orders")], [], True)
+
+    def _notify(self, orders: List[Dict[str, Any]], deleted: List[str], full: bool):
+        for callback in self._listeners:
+            callback(orders, deleted, full)
+
+    def freshness(self) -> Dict[str, Any]:
+        """副本的同步时间和数据年龄"""
+        synced_at = None
+        if self.synced_at is not None:
+            synced_at = datetime.fromtimestamp(self.synced_at, timezone.utc).isoformat()
+        staleness = self.staleness
+        return {
+            'synced_at': synced_at,
+            'staleness_seconds': None if staleness is None else round(staleness, 1),
+            'max_staleness_seconds': self.max_staleness,
+            'watermark': self.watermark
+        }
+
+    def _fetch_collection(self, collection: str) -> List[Dict[str, Any]]:
+        docs: List[Dict[str, Any]] = []
+        cursor: Optional[str] = ""
+        while cursor is not None:
+            result = self.api_client.get_snapshot_page(collection, cursor, self.SNAPSHOT_PAGE_SIZE)
+            if not result.get('success'):
+                raise RuntimeError(result.get('message') or f'获取{collection}快照失败')
+            data = result.get('data') or {}
+            docs.extend(data.get('docs', []))
+            cursor = data.get('next_cursor')
+        return docs
+
+    def _load_snapshot(self) -> int:
+        # 先在内存中取完全部快照，再在一个事务中替换，加载期间查询仍然读取旧数据
+        snapshot = {table: self._fetch_collection(table) for table in _COLUMNS}
+        with self._lock, self._db:
+            for table, docs in snapshot.items():
+                self._db.execute(f"DELETE FROM {table}")
+                self._db.executemany(_upsert_sql(table), [_row(table, d) for d in docs if d.get('_id')])
+        self._notify(snapshot['orders'], [], True)
+        return sum(len(docs) for docs in snapshot.values())
+
+    def _merge(self, data: Dict[str, Any]) -> Tuple[Set[str], Set[str]]:
+        """合并一次增量；重叠窗口内的重复记录不会覆盖更新的数据，也不计为变化"""
+        changed: Set[str] = set()
+        deleted: Set[str] = set()
+        upserted: List[Dict[str, Any]] = []
+        with self._lock, self._db:
+            for table, key in (('orders', 'orders'), ('order_progress', 'progress'), ('photos', 'photos')):
+                upsert = _upsert_sql(table)
+                for doc in data.get(key, []):
+                    if not doc.get('_id'):
+                        continue
+                    self.stats['records'] += 1
+                    order_id = doc['_id'] if table == 'orders' else doc.get('order_id')
+                    if doc.get('is_deleted'):
+                        cursor = self._db.execute(f"DELETE FROM {table} WHERE _id = ?", (doc['_id'],))
+                        if cursor.rowcount:
+                            (deleted if table == 'orders' else changed).add(order_id)
+                        continue
+                    if self._db.execute(upsert, _row(table, doc)).rowcount:
+                        changed.add(order_id)
+                        if table == 'orders':
+                            upserted.append(doc)
+        if upserted or deleted:
+            self._notify(upserted, sorted(deleted), False)
+        return changed - deleted, deleted
+
+    # ---------- 查询 ----------
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    def _result(self, data: Any, message: str) -> Dict[str, Any]:
+        return {'success': True, 'data': data, 'message': message, 'replica': self.freshness()}
+
+    def list_orders(self, page: int = 1, limit: int = 20, status: str = "all", search: str = "") -> Dict[str, Any]:
+        """
+        与 admin-orders list 相同的订单列表（按创建时间倒序，search 按客户姓名精确匹配）
+
+        Returns:
+            {'success', 'data': {'orders', 'pagination'}, 'replica'}；同步失败时返回同步结果
+        """
+        sync = self.ensure_fresh()
+        if not sync.get('success'):
+            return sync
+        page = max(1, int(page))
+        conditions, params = [], []
+        if status != 'all':
+            conditions.append("order_status = ?")
+            params.append(status)
+        if search:
+            conditions.append("customer_name = ?")
+            params.append(search)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        total = self._query(f"SELECT COUNT(*) FROM orders {where}", tuple(params))[0][0]
+        rows = self._query(
+            f"SELECT doc FROM orders {where} ORDER BY created_at DESC, _id DESC LIMIT ? OFFSET ?",
+            tuple(params) + (limit, (page - 1) * limit)
+        )
+        return self._result({
+            'orders': [json.loads(doc) for (doc,) in rows],
+            'pagination': {
+                'current_page': page,
+                'page_size': limit,
+                'total_count': total,
+                'total_pages': -(-total // limit) if limit else 0,
+                'has_more': page * limit < total
+            }
+        }, '获取订单列表成功')
+
+    def search_orders(self, search_type: str = "name", search_value: str = "") -> Dict[str, Any]:
+        """与 customer-search 相同：按姓名、电话、邮箱或订单号精确查询"""
+        sync = self.ensure_fresh()
+        if not sync.get('success'):
+            return sync
+        field = _SEARCH_FIELDS.get(search_type, 'customer_name')
+        rows = self._query(f"SELECT doc FROM orders WHERE {field} = ? ORDER BY created_at DESC, _id DESC",
+                           (search_value.strip(),))
+        return self._result([json.loads(doc) for (doc,) in rows], f'找到 {len(rows)} 个订单')
+
+    def match_order_number(self, fragment: str) -> Dict[str, Any]:
+        """订单号包含 fragment 的订单（不区分大小写）"""
+        sync = self.ensure_fresh()
+        if not sync.get('success'):
+            return sync
+        escaped = fragment.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        rows = self._query(
+            "SELECT doc FROM orders WHERE order_number LIKE ? ESCAPE '\\' ORDER BY created_at DESC, _id DESC",
+            (f"%{escaped}%",)
+        )
+        return self._result([json.loads(doc) for (doc,) in rows], f'找到 {len(rows)} 个订单')
+
+    def dashboard_data(self) -> Dict[str, Any]:
+        """与 admin-dashboard 相同的统计数据（最近动态只返回前 RECENT_ACTIVITY_LIMIT 条）"""
+        sync = self.ensure_fresh()
+        if not sync.get('success'):
+            return sync
+
+        status_stats = {"待处理": 0, "制作中": 0, "已完成": 0}
+        for status, count in self._query(
+                "SELECT COALESCE(NULLIF(order_status, ''), '待处理'), COUNT(*) FROM orders GROUP BY 1"):
+            if status in status_stats:
+                status_stats[status] += count
+        total = self._query("SELECT COUNT(*) FROM orders")[0][0]
+
+        stage_stats: Dict[str, Dict[str, int]] = {}
+        for stage_name, status, count in self._query(
+                "SELECT COALESCE(NULLIF(stage_name, ''), '未知阶段'), COALESCE(NULLIF(status, ''), 'pending'), "
+                "COUNT(*) FROM order_progress GROUP BY 1, 2"):
+            stats = stage_stats.setdefault(stage_name, {"completed": 0, "in_progress": 0, "pending": 0, "total": 0})
+            if status in stats:
+                stats[status] += count
+            stats["total"] += count
+
+        # 已完成订单的最后一个阶段完成时间
+        finished_orders = self._query(
+            "SELECT o.created_at, MAX(p.completed_at) FROM orders o "
+            "JOIN order_progress p ON p.order_id = o._id "
+            "WHERE o.order_status = '已完成' AND p.status = 'completed' AND p.completed_at IS NOT NULL "
+            "AND p.completed_at != '' GROUP BY o._id"
+        )
+        now = datetime.now(timezone.utc)
+        dates = [(now - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(29, -1, -1)]
+        day_index = {day: i for i, day in enumerate(dates)}
+        completions = [0] * 30
+        today, month = now.strftime("%Y-%m-%d"), now.strftime("%Y-%m")
+        today_completed = month_completed = 0
+        total_days = valid = 0
+        for created_at, finished in finished_orders:
+            day = finished[:10]
+            if day in day_index:
+                completions[day_index[day]] += 1
+            today_completed += day == today
+            month_completed += day[:7] == month
+            if created_at:
+                created = datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+                elapsed = datetime.fromisoformat(finished.replace("Z", "+00:00")) - created
+                days = -(-elapsed.total_seconds() // 86400)
+                if days > 0:
+                    total_days += days
+                    valid += 1
+        avg_days = int(round(total_days / valid)) if valid else 0
+
+        thirty_days_ago = (now - timedelta(days=30)).strftime("%Y-%m-%dT%H:%M:%S.") + f"{now.microsecond // 1000:03d}Z"
+        recent_orders = self._query("SELECT COUNT(*) FROM orders WHERE created_at >= ?", (thirty_days_ago,))[0][0]
+
+        activities = [
+            {"type": kind, "message": message, "timestamp": timestamp, "order_id": order_id}
+            for kind, message, timestamp, order_id in self._query(
+                "SELECT '订单创建', customer_name || ' - ' || order_number, created_at, _id FROM orders "
+                "UNION ALL "
+                "SELECT '阶段完成', o.customer_name || ' - ' || COALESCE(NULLIF(p.stage_name, ''), p.stage_id), "
+                "p.completed_at, p.order_id FROM order_progress p JOIN orders o ON o._id = p.order_id "
+                "WHERE p.status = 'completed' AND p.completed_at IS NOT NULL AND p.completed_at != '' "
+                "ORDER BY 3 DESC LIMIT ?", (self.RECENT_ACTIVITY_LIMIT,))
+        ]
+
+        return self._result({
+            "overview": {
+                "total_orders": total,
+                "completed_orders": status_stats["已完成"],
+                "in_progress_orders": status_stats["制作中"],
+                "pending_orders": status_stats["待处理"],
+                "today_completed": today_completed,
+                "this_month_completed": month_completed,
+                "completion_rate": round(status_stats["已完成"] / total * 100) if total else 0,
+                "recent_orders": recent_orders,
+                "avg_completion_time": avg_days,
+                "on_time_rate": 0
+            },
+            "order_status_stats": status_stats,
+            "stage_stats": stage_stats,
+            "recent_activities": activities,
+            "completion_trend": {"dates": [d[5:] for d in dates], "completions": completions},
+            "performance_metrics": {"avg_completion_days": avg_days, "on_time_rate": 0}
+        }, '获取仪表板数据成功')
+
+    def close(self):
+        """关闭数据库连接"""
+        with self._lock:
+            self._db.close()
@@ -4,23 +4,39 @@
 处理订单相关的业务逻辑
 """
 
-from typing import Dict, List, Optional, Any
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Optional, Any
 from datetime import datetime
 from .state_machine import OrderStateMachine, OrderStatus
+from .order_aggregate import order_repository
 
 
 class OrderService:
     """订单业务逻辑服务"""
     
-    def __init__(self, api_client):
+    # iter_orders 每次请求的订单数
+    ITER_PAGE_SIZE = 100
+    # 页码分页记住游标的筛选条件数
+    MAX_CURSOR_FILTERS = 32
+    
+    def __init__(self, api_client, replica=None, search_index=None):
         """
         初始化订单服务
         
         Args:
             api_client: CloudBase API客户端实例
+            replica: 订单只读副本（OrderReplica）；设置后订单列表、搜索和统计优先从副本读取
+            search_index: 订阅了 replica 的订单搜索索引（OrderSearchIndex），用于 search()
         """
         self.api_client = api_client
+        self.replica = replica
+        self.search_index = search_index
         self.state_machine = OrderStateMachine
+        # 页码分页：(状态, 搜索, 每页数量) -> {页码: 起始游标}（第1页为空字符串）
+        self._page_cursors: "OrderedDict[tuple, Dict[str, Any]]" = OrderedDict()
+        self._cursor_lock = threading.Lock()
     
     def create_order(self, order_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -54,37 +70,22 @@ class OrderService:
         Returns:
             订单详情 + 进度 + 照片 + 允许的操作
         """
-        # 获取订单基本信息
-        result = self.api_client.get_order_detail(order_id, is_admin=True)
+        # 获取订单聚合（同一作用域内只请求一次详情）
+        result = order_repository(self.api_client).load(order_id)
         
         if not result.get('success'):
             return result
         
-        data = result.get('data', {})
-        
-        # 如果数据中已经包含了所需信息，直接返回
-        if isinstance(data, dict):
-            order_info = data.get('order_info', {})
-            progress_timeline = data.get('progress_timeline', [])
-            photos = data.get('photos', [])
-            
-            # 计算允许的操作
-            allowed_actions = self.state_machine.get_allowed_actions(
-                order_info, 
-                progress_timeline
-            )
-            
-            return {
-                'success': True,
-                'data': {
-                    'order': order_info,
-                    'progress': progress_timeline,
-                    'photos': photos,
-                    'allowed_actions': allowed_actions
-                }
+        aggregate = result['data']
+        return {
+            'success': True,
+            'data': {
+                'order': aggregate.order,
+                'progress': aggregate.progress if include_progress else [],
+                'photos': aggregate.photos if include_photos else [],
+                'allowed_actions': aggregate.allowed_actions
             }
-        
-        return result
+        }
     
     def update_order(self, order_id: str, update_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -98,6 +99,12 @@ class OrderService:
             更新结果
         """
         result = self.api_client.update_admin_order(order_id, update_data)
+        
+        # 就地更新已加载的订单聚合
+        aggregate = order_repository(self.api_client).peek(order_id)
+        if aggregate is not None and result.get('success'):
+            aggregate.apply_order_update(update_data)
+        
         return result
     
     def delete_order(self, order_id: str, soft_delete: bool = True) -> Dict[str, Any]:
@@ -112,6 +119,8 @@ class OrderService:
             删除结果
         """
         result = self.api_client.delete_admin_order(order_id)
+        if result.get('success'):
+            order_repository(self.api_client).evict(order_id)
         return result
     
     def list_orders(self, page: int = 1, limit: int = 20, 
@@ -121,6 +130,10 @@ class OrderService:
         """
         获取订单列表
         
+        有只读副本时从副本查询（副本同步失败时再请求云函数）。
+        页码分页建立在游标分页之上：记住每页返回的下一页游标，顺序翻页时按游标请求，
+        跳到没有游标的页时按页码请求；两种方式都只请求一次。
+        
         Args:
             page: 页码
             limit: 每页数量
@@ -132,15 +145,85 @@ class OrderService:
         Returns:
             订单列表 + 分页信息
         """
-        result = self.api_client.get_orders(
-            page=page,
-            limit=limit,
-            status=status,
-            search=search
-        )
+        page = max(1, int(page))
+        if self.replica is not None:
+            result = self.replica.list_orders(page=page, limit=limit, status=status, search=search)
+            if result.get('success'):
+                return result
         
+        key = (status, search, limit)
+        cursors = self._cursors_for(key)
+        cursor = cursors.get(page)
+        
+        if cursor is None:
+            # 未记住起始游标的页（跳页）按页码请求一次
+            result = self.api_client.get_orders(page=page, limit=limit, status=status, search=search)
+        else:
+            result = self.api_client.get_orders(limit=limit, status=status, search=search,
+                                                cursor=cursor, with_total=True)
+        
+        if result.get('success') and isinstance(result.get('data'), dict):
+            pagination = result['data'].setdefault('pagination', {})
+            pagination['current_page'] = page
+            next_cursor = pagination.get('next_cursor')
+            if next_cursor:
+                with self._cursor_lock:
+                    cursors[page + 1] = next_cursor
         return result
     
+    def _cursors_for(self, key: tuple) -> Dict[int, str]:
+        """筛选条件对应的各页起始游标；本进程写过订单后重新记录"""
+        versions = self.api_client.get_tag_versions(['orders']) if hasattr(self.api_client, 'get_tag_versions') else ()
+        with self._cursor_lock:
+            entry = self._page_cursors.get(key)
+            if entry is None or entry['versions'] != versions:
+                entry = {'versions': versions, 'cursors': {1: ""}}
+                self._page_cursors[key] = entry
+            self._page_cursors.move_to_end(key)
+            while len(self._page_cursors) > self.MAX_CURSOR_FILTERS:
+                self._page_cursors.popitem(last=False)
+            return entry['cursors']
+    
+    def iter_orders(self, filters: Optional[Dict[str, Any]] = None,
+                    page_size: int = ITER_PAGE_SIZE, prefetch: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        按创建时间倒序逐个返回所有匹配的订单（游标分页，不受单页数量上限限制）
+        
+        prefetch 为 True 时，调用方处理当前页的同时在后台请求下一页，同一时刻最多一个请求在途。
+        请求失败时抛出 RuntimeError。
+        
+        Args:
+            filters: {'status': 订单状态或 'all', 'search': 客户姓名}
+            page_size: 每次请求的订单数
+            prefetch: 是否预取下一页
+        
+        Yields:
+            订单字典
+        """
+        filters = filters or {}
+        status = filters.get('status') or 'all'
+        search = filters.get('search') or ''
+        
+        def fetch(cursor: str) -> Dict[str, Any]:
+            return self.api_client.get_orders(limit=page_size, status=status, search=search, cursor=cursor)
+        
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="iter-orders") if prefetch else None
+        try:
+            pending = executor.submit(fetch, "") if executor else None
+            cursor: Optional[str] = ""
+            while cursor is not None:
+                result = pending.result() if executor else fetch(cursor)
+                if not result.get('success'):
+                    raise RuntimeError(result.get('message') or '获取订单列表失败')
+                data = result.get('data', {})
+                cursor = data.get('pagination', {}).get('next_cursor')
+                if executor and cursor is not None:
+                    pending = executor.submit(fetch, cursor)
+                yield from data.get('orders', [])
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+    
     def get_order_statistics(self) -> Dict[str, Any]:
         """
         获取订单统计信息
@@ -148,9 +231,78 @@ class OrderService:
         Returns:
             统计数据：总数、各状态数量、完成率等
         """
+        if self.replica is not None:
+            result = self.replica.dashboard_data()
+            if result.get('success'):
+                return result
         result = self.api_client.get_dashboard_data()
         return result
     
+    def search(self, query: str, limit: int = 20) -> Dict[str, Any]:
+        """
+        输入即搜：订单号前缀、电话后缀、客户姓名（含拼音首字母）
+        
+        有搜索索引时先确保副本足够新，再在索引中查询；否则退回 search_orders()。
+        
+        Args:
+            query: 搜索内容
+            limit: 最多返回的订单数
+            
+        Returns:
+            {'success': bool, 'data': 订单列表, 'message': str}
+        """
+        if self.search_index is not None and self.replica is not None:
+            sync = self.replica.ensure_fresh()
+            if sync.get('success'):
+                orders = self.search_index.search(query, limit)
+                return {'success': True, 'data': orders, 'message': f'找到 {len(orders)} 个订单'}
+        
+        result = self.search_orders(query)
+        if result.get('success'):
+            result['data'] = result['data'][:limit]
+        return result
+    
+    def search_orders(self, query: str) -> Dict[str, Any]:
+        """
+        按客户姓名搜索订单，没有结果时按订单号（包含关系，不区分大小写）搜索
+        
+        有只读副本时在本地查询，否则按姓名查询云函数、再遍历全部订单匹配订单号。
+        
+        Args:
+            query: 客户姓名或订单号片段
+            
+        Returns:
+            {'success': bool, 'data': 订单列表, 'message': str}
+        """
+        query = query.strip()
+        if self.replica is not None:
+            result = self.replica.search_orders("name", query)
+            if result.get('success') and not result['data']:
+                result = self.replica.match_order_number(query)
+            if result.get('success'):
+                return result
+        
+        result = self.api_client.search_orders_by_name(query)
+        if not result.get('success'):
+            return result
+        data = result.get('data', {})
+        # 兼容嵌套的数据结构
+        if isinstance(data, dict) and data.get('success'):
+            orders = data.get('data', [])
+        else:
+            orders = data if isinstance(data, list) else []
+        if orders:
+            return {'success': True, 'data': orders, 'message': f'找到 {len(orders)} 个订单'}
+        
+        try:
+            orders = [
+                order for order in self.iter_orders({'status': 'all'})
+                if query.lower() in order.get('order_number', '').lower()
+            ]
+        except RuntimeError as e:
+            return {'success': False, 'data': [], 'message': str(e)}
+        return {'success': True, 'data': orders, 'message': f'找到 {len(orders)} 个订单'}
+    
     def validate_order_data(self, order_data: Dict[str, Any]) -> tuple[bool, str]:
         """
         验证订单数据
@@ -0,0 +1,236 @@
+"""
+订单增量同步
+
+页面在会话中保留一份订单列表副本，刷新时只拉取水位线之后的变更（admin-orders changes）：
+- 水位线由云函数按服务器时间返回，客户端不使用本地时钟；云函数查询时从水位线向前回退几秒，
+  相邻两次增量会有少量重叠，合并时按 _id 覆盖并保留 updated_at 较新的一份，重复记录不影响结果
+- 软删除的订单和照片以 is_deleted 记录返回，合并时从副本中移除
+- 首次刷新、水位线无效或变更过多（full_resync）时全量重新加载
+
+已打开详情的订单可以用 track() 登记进度和照片，之后它们的增量也会合并到副本中；
+list_orders() 按副本中的进度批量重算这些订单的进度百分比、当前阶段和订单状态（evaluate_bulk），
+进度记录先于订单记录到达（两者落在相邻两次增量中）时列表也不会显示过时的状态。
+"""
+
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Union
+
+from .order_service import OrderService
+from .state_machine import OrderStatus, evaluate_bulk
+
+
+class ChangeFeedSync:
+    """
+    增量同步协议：水位线、增量合并和全量重新加载
+
+    子类实现 _load_snapshot()（全量加载，返回记录数，失败时抛出 RuntimeError）
+    和 _merge(data)（合并一次增量，返回 (变化的订单ID, 删除的订单ID)）。
+    """
+
+    def __init__(self, api_client, clock=time.time):
+        """
+        Args:
+            api_client: CloudBase API客户端实例
+            clock: 时钟函数（便于测试）
+        """
+        self.api_client = api_client
+        self.watermark: Optional[str] = None
+        self.synced_at: Optional[float] = None
+        self._clock = clock
+        self.stats = {'full_loads': 0, 'delta_syncs': 0, 'records': 0}
+
+    @property
+    def staleness(self) -> Optional[float]:
+        """距上次成功同步的秒数（从未同步时为 None）"""
+        return None if self.synced_at is None else max(0.0, self._clock() - self.synced_at)
+
+    def refresh(self) -> Dict[str, Any]:
+        """
+        同步到最新状态
+
+        Returns:
+            {'success': bool, 'message': str,
+             'data': {'full': 是否全量加载, 'changed': 变化的订单ID列表, 'deleted': 删除的订单ID列表}}
+        """
+        started = self._clock()
+        if self.watermark:
+            result = self.api_client.get_changes(self.watermark)
+            if not result.get('success'):
+                return result
+            data = result.get('data') or {}
+            if not data.get('full_resync'):
+                changed, deleted = self._merge(data)
+                self.watermark = data.get('watermark') or self.watermark
+                self.synced_at = started
+                self.stats['delta_syncs'] += 1
+                self._invalidate(changed | deleted)
+                return {
+                    'success': True,
+                    'message': f'同步 {len(changed)} 个订单变更',
+                    'data': {'full': False, 'changed': sorted(changed), 'deleted': sorted(deleted)}
+                }
+        return self._full_load(started)
+
+    def _full_load(self, started: float) -> Dict[str, Any]:
+        # 先取水位线再加载：加载期间的变更会在下一次增量中再次出现
+        head = self.api_client.get_changes("")
+        if not head.get('success'):
+            return head
+        watermark = (head.get('data') or {}).get('watermark')
+
+        try:
+            count = self._load_snapshot()
+        except RuntimeError as e:
+            return {'success': False, 'message': str(e), 'data': None}
+
+        self.watermark = watermark
+        self.synced_at = started
+        self.stats['full_loads'] += 1
+        self.stats['records'] += count
+        return {
+            'success': True,
+            'message': f'全量加载 {count} 条记录',
+            'data': {'full': True, 'changed': [], 'deleted': []}
+        }
+
+    def _load_snapshot(self) -> int:
+        raise NotImplementedError
+
+    def _merge(self, data: Dict[str, Any]):
+        raise NotImplementedError
+
+    def _invalidate(self, order_ids: Set[str]):
+        """变化的订单详情缓存失效（列表缓存由写操作按标签失效）"""
+        if order_ids and hasattr(self.api_client, 'invalidate_cache'):
+            self.api_client.invalidate_cache([f"order:{order_id}" for order_id in order_ids])
+
+
+class OrderSync(ChangeFeedSync):
+    """订单列表的增量同步副本"""
+
+    def __init__(self, api_client, order_service: Optional[OrderService] = None, clock=time.time):
+        """
+        Args:
+            api_client: CloudBase API客户端实例
+            order_service: 全量加载使用的订单服务（默认新建）
+        """
+        super().__init__(api_client, clock)
+        self.order_service = order_service or OrderService(api_client)
+        self.orders: Dict[str, Dict[str, Any]] = {}
+        # 已登记订单的进度和照片：订单ID -> {阶段ID/照片ID: 记录}
+        self.progress: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.photos: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # 未登记订单的进度/照片只记录版本，用于识别重叠窗口内的重复记录
+        self._seen: Dict[str, str] = {}
+
+    def _load_snapshot(self) -> int:
+        # 订单列表的响应缓存可能早于水位线，全量加载前使其失效
+        if hasattr(self.api_client, 'invalidate_cache'):
+            self.api_client.invalidate_cache(['orders'])
+        orders = list(self.order_service.iter_orders())
+
+        self.orders = {order['_id']: order for order in orders if order.get('_id')}
+        self.progress.clear()
+        self.photos.clear()
+        self._seen.clear()
+        return len(orders)
+
+    @staticmethod
+    def _is_newer(record: Dict[str, Any], current: Optional[Dict[str, Any]]) -> bool:
+        if current is None:
+            return True
+        new_ts = record.get('updated_at') or ''
+        current_ts = current.get('updated_at') or ''
+        return new_ts > current_ts or (new_ts == current_ts and record != current)
+
+    def _merge(self, data: Dict[str, Any]):
+        """合并一次增量，返回 (变化的订单ID, 删除的订单ID)"""
+        changed: Set[str] = set()
+        deleted: Set[str] = set()
+
+        for order in data.get('orders', []):
+            order_id = order.get('_id')
+            if not order_id:
+                continue
+            self.stats['records'] += 1
+            if order.get('is_deleted'):
+                if self.orders.pop(order_id, None) is not None:
+                    deleted.add(order_id)
+                self.progress.pop(order_id, None)
+                self.photos.pop(order_id, None)
+                continue
+            if self._is_newer(order, self.orders.get(order_id)):
+                self.orders[order_id] = order
+                changed.add(order_id)
+
+        for key, records, tracked in (('stage_id', data.get('progress', []), self.progress),
+                                      ('_id', data.get('photos', []), self.photos)):
+            for record in records:
+                order_id = record.get('order_id')
+                if not order_id or order_id in deleted:
+                    continue
+                self.stats['records'] += 1
+                if self._merge_child(tracked.get(order_id), record, record.get(key)):
+                    changed.add(order_id)
+
+        return changed - deleted, deleted
+
+    def _merge_child(self, children: Optional[Dict[str, Dict[str, Any]]],
+                     record: Dict[str, Any], key: Optional[str]) -> bool:
+        """合并一条进度/照片记录，返回是否有变化"""
+        if children is None:
+            version = record.get('updated_at') or ''
+            doc_id = record.get('_id') or f"{record.get('order_id')}:{key}"
+            if self._seen.get(doc_id) == version:
+                return False
+            self._seen[doc_id] = version
+            return True
+        if record.get('is_deleted'):
+            return children.pop(key, None) is not None
+        if self._is_newer(record, children.get(key)):
+            children[key] = record
+            return True
+        return False
+
+    def track(self, order_id: str, progress: List[Dict[str, Any]], photos: List[Dict[str, Any]]):
+        """
+        登记订单的进度和照片，之后的增量会合并到副本中
+
+        Args:
+            progress: 进度记录列表（含 stage_id）
+            photos: 照片记录列表（含 _id），也接受 customer-detail 按阶段分组的格式
+        """
+        flat = []
+        for photo in photos:
+            flat.extend(photo.get('photos', []) if 'photos' in photo else [photo])
+        self.progress[order_id] = {p['stage_id']: p for p in progress if p.get('stage_id')}
+        self.photos[order_id] = {p['_id']: p for p in flat if p.get('_id')}
+
+    def list_orders(self, status: Union[str, Iterable[str], None] = None) -> List[Dict[str, Any]]:
+        """
+        按创建时间倒序返回副本中的订单
+
+        Args:
+            status: 订单状态或状态集合，None 表示全部
+        """
+        orders = self._with_tracked_progress(list(self.orders.values()))
+        if status is not None:
+            statuses = {status} if isinstance(status, str) else set(status)
+            orders = [o for o in orders if o.get('order_status') in statuses]
+        return sorted(orders, key=lambda o: (o.get('created_at') or '', o.get('_id')), reverse=True)
+
+    def _with_tracked_progress(self, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """已登记进度的订单按副本中的进度重算派生字段（返回新字典，不修改副本）"""
+        indexes = [i for i, order in enumerate(orders)
+                   if self.progress.get(order['_id']) and order.get('order_status') != OrderStatus.CANCELLED.value]
+        if not indexes:
+            return orders
+        evaluation = evaluate_bulk([orders[i] for i in indexes],
+                                   [list(self.progress[orders[i]['_id']].values()) for i in indexes])
+        orders = list(orders)
+        for row, i in enumerate(indexes):
+            orders[i] = dict(orders[i],
+                             progress_percentage=int(evaluation.progress_percentage[row]),
+                             current_stage=evaluation.current_stage_name[row],
+                             order_status=evaluation.order_status[row])
+        return orders
@@ -5,6 +5,7 @@
 """
 
 from typing import Dict, List, Optional, Any
+from .order_aggregate import order_repository
 
 
 class PhotoService:
@@ -48,6 +49,11 @@ class PhotoService:
             description=description
         )
         
+        # 就地把新照片加入已加载的订单聚合
+        aggregate = order_repository(self.api_client).peek(order_id)
+        if aggregate is not None and result.get('success'):
+            aggregate.add_photos((result.get('data') or {}).get('saved_photos', []))
+        
         return result
     
     def get_photos(self, order_id: str, stage_id: Optional[str] = None) -> Dict[str, Any]:
@@ -61,14 +67,13 @@ class PhotoService:
         Returns:
             照片列表
         """
-        # 通过订单详情获取照片
-        result = self.api_client.get_order_detail(order_id, is_admin=True)
+        # 通过订单聚合获取照片（同一作用域内与订单详情共享一次请求）
+        result = order_repository(self.api_client).load(order_id)
         
         if not result.get('success'):
             return result
         
-        data = result.get('data', {})
-        photos = data.get('photos', [])
+        photos = result['data'].photos
         
         # 如果指定了stage_id，过滤照片
         if stage_id:
@@ -88,12 +93,13 @@ class PhotoService:
             'data': photos
         }
     
-    def delete_photo(self, photo_id: str) -> Dict[str, Any]:
+    def delete_photo(self, photo_id: str, order_id: Optional[str] = None) -> Dict[str, Any]:
         """
         删除照片
         
         Args:
             photo_id: 照片ID
+            order_id: 订单ID（可选，传入时就地更新已加载的订单聚合）
             
         Returns:
             删除结果
@@ -104,7 +110,13 @@ class PhotoService:
                 'message': '缺少照片ID'
             }
         
-        return self.api_client.delete_photo(photo_id)
+        result = self.api_client.delete_photo(photo_id)
+        
+        aggregate = order_repository(self.api_client).peek(order_id) if order_id else None
+        if aggregate is not None and result.get('success'):
+            aggregate.remove_photo(photo_id)
+        
+        return result
     
     def group_photos_by_stage(self, photos_data: List[Dict]) -> Dict[str, List[Dict]]:
         """
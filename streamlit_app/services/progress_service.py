@@ -4,14 +4,21 @@
 处理订单进度相关的业务逻辑
 """
 
+import time
+import uuid
 from typing import Dict, List, Optional, Any
 from datetime import datetime
-from .state_machine import OrderStateMachine, StageStatus
+from .state_machine import OrderStateMachine, OrderStatus, StageStatus, TransitionErrorCode
+from .order_aggregate import order_repository
 
 
 class ProgressService:
     """进度业务逻辑服务"""
     
+    # 批量流转：每次请求的条目数（admin-progress 单次最多 50 项）和整块请求失败时的重试次数
+    BATCH_CHUNK_SIZE = 50
+    BATCH_MAX_RETRIES = 2
+    
     def __init__(self, api_client):
         """
         初始化进度服务
@@ -32,15 +39,13 @@ class ProgressService:
         Returns:
             进度记录列表
         """
-        # 通过订单详情获取进度
-        result = self.api_client.get_order_detail(order_id, is_admin=True)
+        # 通过订单聚合获取进度（同一作用域内与订单详情共享一次请求）
+        result = order_repository(self.api_client).load(order_id)
         
         if result.get('success'):
-            data = result.get('data', {})
-            progress_timeline = data.get('progress_timeline', [])
             return {
                 'success': True,
-                'data': progress_timeline
+                'data': result['data'].progress
             }
         
         return result
@@ -49,49 +54,26 @@ class ProgressService:
         """
         开始某个阶段
         
-        校验：
+        校验（由云函数完成，一次请求）：
         1. 前一阶段必须已完成
         2. 没有其他阶段在进行中
-        3. 当前阶段必须是pending状态
+        3. 当前阶段必须是pending状态（乐观并发：期望状态不符时返回冲突）
         
         Args:
             order_id: 订单ID
             stage_id: 阶段ID
             
         Returns:
-            更新结果 + 新的订单状态和进度
+            更新结果 + 新的订单状态和进度；冲突时 error_code 为 STAGE_CONFLICT，conflict 为冲突详情
         """
-        # 先获取当前进度列表进行校验
-        progress_result = self.get_progress(order_id)
-        if not progress_result.get('success'):
-            return progress_result
-        
-        progress_list = progress_result.get('data', [])
-        
-        # 使用状态机检查是否可以开始
-        can_start, reason = self.state_machine.can_start_stage(progress_list, stage_id)
-        if not can_start:
-            return {
-                'success': False,
-                'message': reason
-            }
-        
-        # 调用API更新进度
-        result = self.api_client.update_order_progress(
-            order_id=order_id,
-            stage_id=stage_id,
-            status=StageStatus.IN_PROGRESS.value,
-            notes="开始此阶段"
-        )
-        
-        return result
+        return self._transition(order_id, stage_id, StageStatus.IN_PROGRESS, "开始此阶段")
     
     def complete_stage(self, order_id: str, stage_id: str, 
                       notes: str = "", photos: Optional[List] = None) -> Dict[str, Any]:
         """
         完成某个阶段
         
-        校验：
+        校验（由云函数完成，一次请求）：
         1. 该阶段必须是in_progress状态
         
         可选：
@@ -106,28 +88,7 @@ class ProgressService:
         Returns:
             更新结果 + 照片/视频上传结果
         """
-        # 先获取当前进度列表进行校验
-        progress_result = self.get_progress(order_id)
-        if not progress_result.get('success'):
-            return progress_result
-        
-        progress_list = progress_result.get('data', [])
-        
-        # 使用状态机检查是否可以完成
-        can_complete, reason = self.state_machine.can_complete_stage(progress_list, stage_id)
-        if not can_complete:
-            return {
-                'success': False,
-                'message': reason
-            }
-        
-        # 调用API更新进度
-        result = self.api_client.update_order_progress(
-            order_id=order_id,
-            stage_id=stage_id,
-            status=StageStatus.COMPLETED.value,
-            notes=notes
-        )
+        result = self._transition(order_id, stage_id, StageStatus.COMPLETED, notes)
         
         # 如果有照片，上传照片
         photo_result = None
@@ -135,12 +96,10 @@ class ProgressService:
             from .photo_service import PhotoService
             photo_service = PhotoService(self.api_client)
             
-            # 获取阶段名称
-            stage_name = ""
-            for p in progress_list:
-                if p.get('stage_id') == stage_id:
-                    stage_name = p.get('stage_name', '')
-                    break
+            # 获取阶段名称（仅在已加载订单聚合时可用，上传本身不依赖）
+            aggregate = order_repository(self.api_client).peek(order_id)
+            stage = aggregate.find_stage(stage_id) if aggregate is not None else None
+            stage_name = stage.get('stage_name', '') if stage else ""
             
             # 上传照片时不自动生成描述，让用户自己决定
             photo_result = photo_service.upload_photos(
@@ -157,51 +116,252 @@ class ProgressService:
         
         return result
     
+    def _transition(self, order_id: str, stage_id: str, target: StageStatus, notes: str) -> Dict[str, Any]:
+        """
+        乐观并发的阶段流转
+        
+        请求中带上期望的阶段状态（以及已加载聚合中的版本号），由云函数按相同规则校验并条件写入，
+        不再预先下载进度列表。只有本次渲染已加载订单聚合时才在本地预先校验。
+        """
+        source = StageStatus.PENDING if target == StageStatus.IN_PROGRESS else StageStatus.IN_PROGRESS
+        repository = order_repository(self.api_client)
+        aggregate = repository.peek(order_id)
+        expected_version = None
+        
+        if aggregate is not None:
+            if target == StageStatus.IN_PROGRESS:
+                allowed, reason = aggregate.snapshot.can_start(stage_id)
+            else:
+                allowed, reason = aggregate.snapshot.can_complete(stage_id)
+            if not allowed:
+                return {
+                    'success': False,
+                    'message': reason,
+                    'error_code': TransitionErrorCode.INVALID.value
+                }
+            expected_version = aggregate.find_stage(stage_id).get('version')
+        
+        # 调用API更新进度
+        result = self.api_client.update_order_progress(
+            order_id=order_id,
+            stage_id=stage_id,
+            status=target.value,
+            notes=notes,
+            expected_status=source.value,
+            expected_version=expected_version
+        )
+        
+        if self.is_conflict(result):
+            # 本地数据已过期，下次访问重新加载
+            repository.evict(order_id)
+            result['conflict'] = result.get('data') or {}
+        else:
+            self._apply_progress_result(order_id, result)
+        
+        return result
+    
+    def batch_transition(self, orders: List[Dict], stage_id: str, status: str, notes: str = "",
+                         operator: Optional[str] = None, chunk_size: Optional[int] = None,
+                         batch_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        批量开始/完成多个订单的同一阶段
+        
+        先按状态机一次性校验所有订单（订单状态；已加载订单聚合的再校验阶段规则），
+        通过的按 chunk_size 分块调用 admin-progress bulk_update，每块一次请求。
+        每项带 idempotency_key（批次ID + 订单 + 阶段 + 目标状态），整块请求失败时用相同的键重试，
+        已经生效的项由云函数返回首次结果，不会重复写入。用户重新提交同一批操作（如请求超时后再点一次）
+        时，调用方传入与第一次相同的 batch_id 即可得到同样的保证。
+        
+        Args:
+            orders: 订单列表（_id 或 order_id，可选 order_number、order_status）
+            stage_id: 阶段ID
+            status: 目标状态，in_progress 或 completed
+            notes: 备注
+            operator: 操作人
+            chunk_size: 每次请求的条目数，默认 BATCH_CHUNK_SIZE
+            batch_id: 批次ID（页面为同一次提交保存的ID，重新提交时复用）；为空时生成新的批次
+            
+        Returns:
+            {'success', 'message', 'data': {'batch_id', 'results', 'succeeded', 'failed'}}，
+            results 与 orders 一一对应：{order_id, order_number, stage_id, success, message, error_code, data, replayed}
+        """
+        try:
+            target = StageStatus(status)
+        except ValueError:
+            target = None
+        if target not in (StageStatus.IN_PROGRESS, StageStatus.COMPLETED):
+            return {'success': False, 'message': '只能批量开始或完成阶段', 'data': None}
+        
+        source = StageStatus.PENDING if target == StageStatus.IN_PROGRESS else StageStatus.IN_PROGRESS
+        batch_id = batch_id or uuid.uuid4().hex
+        repository = order_repository(self.api_client)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(orders)
+        pending: List[tuple] = []  # (结果位置, 请求项)
+        seen = set()
+        
+        # 一次性本地校验
+        for i, order in enumerate(orders):
+            order_id = order.get('_id') or order.get('order_id') or ''
+            result = {
+                'order_id': order_id,
+                'order_number': order.get('order_number', ''),
+                'stage_id': stage_id,
+                'success': False,
+                'message': '',
+                'error_code': None,
+                'data': None,
+                'replayed': False
+            }
+            results[i] = result
+            
+            if not order_id:
+                result['message'] = '缺少订单ID'
+                continue
+            if order_id in seen:
+                result['message'] = '订单重复'
+                continue
+            seen.add(order_id)
+            
+            order_status = order.get('order_status')
+            if order_status in (OrderStatus.COMPLETED.value, OrderStatus.CANCELLED.value):
+                result['message'] = f"订单{order_status}，不能更新阶段"
+                result['error_code'] = TransitionErrorCode.INVALID.value
+                continue
+            
+            expected_version = None
+            aggregate = repository.peek(order_id)
+            if aggregate is not None:
+                snapshot = aggregate.snapshot
+                if target == StageStatus.IN_PROGRESS:
+                    allowed, reason = snapshot.can_start(stage_id)
+                else:
+                    allowed, reason = snapshot.can_complete(stage_id)
+                if not allowed:
+                    result['message'] = reason
+                    result['error_code'] = TransitionErrorCode.INVALID.value
+                    continue
+                expected_version = snapshot.find(stage_id).source.get('version')
+            
+            item = {
+                'order_id': order_id,
+                'stage_id': stage_id,
+                'status': target.value,
+                'notes': notes,
+                'expected_status': source.value,
+                'idempotency_key': f"{batch_id}:{order_id}:{stage_id}:{target.value}"
+            }
+            if expected_version is not None:
+                item['expected_version'] = expected_version
+            pending.append((i, item))
+        
+        # 分块发送
+        size = max(1, chunk_size or self.BATCH_CHUNK_SIZE)
+        for start in range(0, len(pending), size):
+            chunk = pending[start:start + size]
+            chunk_results, message = self._send_bulk([item for _, item in chunk], operator)
+            for (i, item), item_result in zip(chunk, chunk_results or [None] * len(chunk)):
+                result = results[i]
+                if item_result is None:
+                    result['message'] = message
+                    continue
+                result.update({
+                    'success': bool(item_result.get('success')),
+                    'message': item_result.get('message', ''),
+                    'error_code': item_result.get('error_code'),
+                    'data': item_result.get('data'),
+                    'replayed': bool(item_result.get('replayed'))
+                })
+                if self.is_conflict(result):
+                    repository.evict(item['order_id'])
+                    result['conflict'] = result.get('data') or {}
+                else:
+                    self._apply_progress_result(item['order_id'], result)
+        
+        succeeded = sum(1 for r in results if r['success'])
+        return {
+            'success': True,
+            'message': f"成功 {succeeded} 个，失败 {len(results) - succeeded} 个",
+            'data': {
+                'batch_id': batch_id,
+                'results': results,
+                'succeeded': succeeded,
+                'failed': len(results) - succeeded
+            }
+        }
+    
+    def _send_bulk(self, items: List[Dict[str, Any]], operator: Optional[str]) -> tuple:
+        """
+        发送一块批量更新，整块失败时用相同的幂等键重试
+
+        只有云函数明确标记为不可重试（retryable 为 False，如请求参数无效）时直接返回；
+        网络错误、HTTP 错误以及云函数内部异常（HTTP 200、success 为 False）都会重试。
+        
+        Returns:
+            (逐项结果列表, None)，重试后仍失败时返回 (None, 错误信息)
+        """
+        message = '批量更新失败'
+        for attempt in range(self.BATCH_MAX_RETRIES + 1):
+            if attempt:
+                time.sleep(0.2 * (2 ** (attempt - 1)))
+            result = self.api_client.bulk_update_progress(items, operator=operator)
+            data = result.get('data') if isinstance(result, dict) else None
+            if result.get('success') and isinstance(data, dict) and len(data.get('results') or []) == len(items):
+                return data['results'], None
+            message = result.get('message') or message
+            if result.get('retryable') is False:
+                # 云函数拒绝了请求本身（参数错误等），重试无意义
+                break
+        return None, message
+    
+    @staticmethod
+    def is_conflict(result: Dict[str, Any]) -> bool:
+        """是否为并发冲突（阶段已被其他操作修改）"""
+        return result.get('error_code') == TransitionErrorCode.CONFLICT.value
+    
+    def _apply_progress_result(self, order_id: str, result: Dict[str, Any]):
+        """阶段更新成功后，用返回的进度和订单状态就地更新订单聚合"""
+        aggregate = order_repository(self.api_client).peek(order_id)
+        if aggregate is not None and result.get('success') and isinstance(result.get('data'), dict):
+            aggregate.apply_progress_update(result['data'])
+    
     def get_next_stage(self, progress_list: List[Dict]) -> Optional[Dict]:
         """
         获取下一个待处理的阶段
         
         Args:
-            progress_list: 进度记录列表
+            progress_list: 进度记录列表（或已构建的 ProgressSnapshot）
             
         Returns:
             下一个待处理的阶段，如果没有则返回None
         """
-        sorted_progress = sorted(progress_list, key=lambda x: x.get('stage_order', 0))
-        
-        for progress in sorted_progress:
-            if progress.get('status') == StageStatus.PENDING.value:
-                return progress
-        
-        return None
+        stage = self.state_machine.snapshot(progress_list).next_stage
+        return stage.source if stage is not None else None
     
     def get_current_stage(self, progress_list: List[Dict]) -> Optional[Dict]:
         """
         获取当前进行中的阶段
         
         Args:
-            progress_list: 进度记录列表
+            progress_list: 进度记录列表（或已构建的 ProgressSnapshot）
             
         Returns:
             当前进行中的阶段，如果没有则返回None
         """
-        for progress in progress_list:
-            if progress.get('status') == StageStatus.IN_PROGRESS.value:
-                return progress
-        
-        return None
+        stage = self.state_machine.snapshot(progress_list).current_stage
+        return stage.source if stage is not None else None
     
     def get_completed_stages(self, progress_list: List[Dict]) -> List[Dict]:
         """
         获取所有已完成的阶段
         
         Args:
-            progress_list: 进度记录列表
+            progress_list: 进度记录列表（或已构建的 ProgressSnapshot）
             
         Returns:
-            已完成的阶段列表
+            已完成的阶段列表（按阶段顺序）
         """
-        return [p for p in progress_list if p.get('status') == StageStatus.COMPLETED.value]
+        snapshot = self.state_machine.snapshot(progress_list)
+        return [s.source for s in snapshot.stages if s.status == StageStatus.COMPLETED.value]
     
     def format_progress_for_timeline(self, progress_list: List[Dict]) -> List[Dict]:
         """
@@ -0,0 +1,203 @@
+"""
+订单搜索索引
+
+进程内的订单搜索索引，支持输入即搜：
+- 订单号前缀（不区分大小写）
+- 电话号码后缀（常用后四位，任意长度的后缀均可）
+- 客户姓名：完全匹配、前缀匹配，安装了 pypinyin 时还支持拼音首字母前缀（如 "zs" 匹配 "张三"）
+
+每种键保存为有序的 (键, 订单ID) 列表，前缀查询用二分查找定位区间，耗时与订单总数的对数成正比；
+订单变化时按订单增删条目，不需要重建。索引通常订阅 OrderReplica 的变更，随副本同步自动更新。
+"""
+
+import bisect
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    from pypinyin import Style, lazy_pinyin
+    PINYIN_AVAILABLE = True
+except ImportError:
+    PINYIN_AVAILABLE = False
+
+
+def name_initials(name: str) -> str:
+    """姓名的拼音首字母（小写）；未安装 pypinyin 时返回空字符串"""
+    if not PINYIN_AVAILABLE or not name:
+        return ""
+    return "".join(lazy_pinyin(name, style=Style.FIRST_LETTER, errors="ignore")).lower()
+
+
+class _SortedKeys:
+    """有序的 (键, 订单ID) 列表，支持前缀查询"""
+
+    __slots__ = ("_entries",)
+
+    def __init__(self):
+        self._entries: List[Tuple[str, str]] = []
+
+    def build(self, entries: Iterable[Tuple[str, str]]):
+        self._entries = sorted(entries)
+
+    def add(self, key: str, order_id: str):
+        if key:
+            bisect.insort(self._entries, (key, order_id))
+
+    def remove(self, key: str, order_id: str):
+        if not key:
+            return
+        i = bisect.bisect_left(self._entries, (key, order_id))
+        if i < len(self._entries) and self._entries[i] == (key, order_id):
+            del self._entries[i]
+
+    def prefix(self, prefix: str, limit: int) -> List[str]:
+        """键以 prefix 开头的订单ID（按键排序，最多 limit 个）"""
+        result = []
+        i = bisect.bisect_left(self._entries, (prefix, ""))
+        while i < len(self._entries) and len(result) < limit:
+            key, order_id = self._entries[i]
+            if not key.startswith(prefix):
+                break
+            result.append(order_id)
+            i += 1
+        return result
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class OrderSearchIndex:
+    """订单号前缀、电话后缀和客户姓名的搜索索引（线程安全）"""
+
+    # 电话后缀至少需要的位数（太短的后缀匹配过多订单）
+    MIN_PHONE_SUFFIX = 3
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._orders: Dict[str, Dict[str, Any]] = {}
+        # 订单ID -> 该订单在各列表中的键，删除或更新时用来定位旧条目
+        self._keys: Dict[str, Tuple[str, str, str, str]] = {}
+        self._order_numbers = _SortedKeys()
+        self._phones = _SortedKeys()     # 键为倒序的电话号码，后缀查询转为前缀查询
+        self._names = _SortedKeys()
+        self._initials = _SortedKeys()
+
+    @staticmethod
+    def _index_keys(order: Dict[str, Any]) -> Tuple[str, str, str, str]:
+        name = (order.get('customer_name') or '').strip()
+        return (
+            (order.get('order_number') or '').upper(),
+            ''.join(c for c in (order.get('customer_phone') or '') if c.isdigit())[::-1],
+            name.lower(),
+            name_initials(name)
+        )
+
+    def _lists(self):
+        return self._order_numbers, self._phones, self._names, self._initials
+
+    def rebuild(self, orders: Iterable[Dict[str, Any]]):
+        """用全部订单重建索引"""
+        orders = {o['_id']: o for o in orders if o.get('_id') and not o.get('is_deleted')}
+        keys = {order_id: self._index_keys(order) for order_id, order in orders.items()}
+        with self._lock:
+            self._orders = orders
+            self._keys = keys
+            for position, sorted_keys in enumerate(self._lists()):
+                sorted_keys.build((k[position], order_id) for order_id, k in keys.items() if k[position])
+
+    def upsert(self, order: Dict[str, Any]):
+        """新增或更新一个订单（已删除的订单从索引移除）"""
+        order_id = order.get('_id')
+        if not order_id:
+            return
+        if order.get('is_deleted'):
+            self.remove(order_id)
+            return
+        keys = self._index_keys(order)
+        with self._lock:
+            old = self._keys.get(order_id)
+            if old != keys:
+                for position, sorted_keys in enumerate(self._lists()):
+                    if old is not None:
+                        sorted_keys.remove(old[position], order_id)
+                    sorted_keys.add(keys[position], order_id)
+                self._keys[order_id] = keys
+            self._orders[order_id] = order
+
+    def remove(self, order_id: str):
+        """从索引移除订单"""
+        with self._lock:
+            old = self._keys.pop(order_id, None)
+            self._orders.pop(order_id, None)
+            if old is not None:
+                for position, sorted_keys in enumerate(self._lists()):
+                    sorted_keys.remove(old[position], order_id)
+
+    def apply_changes(self, orders: List[Dict[str, Any]], deleted: List[str], full: bool = False):
+        """
+        订阅 OrderReplica 变更的回调
+
+        Args:
+            orders: 新增或更新的订单（full 为 True 时为全部订单）
+            deleted: 删除的订单ID
+            full: 是否为全量加载
+        """
+        if full:
+            self.rebuild(orders)
+            return
+        for order in orders:
+            self.upsert(order)
+        for order_id in deleted:
+            self.remove(order_id)
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        输入即搜：按订单号前缀、电话后缀、姓名和拼音首字母匹配
+
+        排序：订单号完全匹配 > 订单号前缀 > 电话后缀 > 姓名完全匹配 > 姓名前缀 > 拼音首字母前缀，
+        同一类中按键排序。
+
+        Args:
+            query: 搜索内容
+            limit: 最多返回的订单数
+
+        Returns:
+            订单列表
+        """
+        query = query.strip()
+        if not query or limit <= 0:
+            return []
+        digits = ''.join(c for c in query if c.isdigit())
+        name = query.lower()
+
+        with self._lock:
+            matches: List[str] = []
+            seen = set()
+
+            def collect(order_ids: Iterable[str]):
+                for order_id in order_ids:
+                    if order_id not in seen and len(matches) < limit:
+                        seen.add(order_id)
+                        matches.append(order_id)
+
+            collect(self._order_numbers.prefix(query.upper(), limit))
+            if digits == query and len(digits) >= self.MIN_PHONE_SUFFIX:
+                collect(self._phones.prefix(digits[::-1], limit))
+            # 完全匹配的姓名排在同名前缀之前
+            collect(self._names.prefix(name, limit))
+            if query.isascii() and query.isalpha():
+                collect(self._initials.prefix(name, limit))
+
+            # 订单号完全匹配排在最前
+            upper = query.upper()
+            matches.sort(key=lambda order_id: self._keys[order_id][0] != upper)
+            return [self._orders[order_id] for order_id in matches]
+
+    def get(self, order_id: str) -> Optional[Dict[str, Any]]:
+        """索引中的订单"""
+        with self._lock:
+            return self._orders.get(order_id)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._orders)
@@ -2,11 +2,20 @@
 订单状态机
 
 定义订单和阶段的状态转换规则
+
+ProgressSnapshot 对进度列表只排序、扫描一次，之后的各项查询（能否开始/完成、进度、
+当前阶段、订单状态、允许的操作）都直接从索引和预先统计的结果得出；
+OrderStateMachine 的类方法保持原有的列表入参，内部构建快照后查询。
+
+成百上千个订单需要同时计算派生字段（看板、批量更新、订单表格）时，使用 evaluate_bulk：
+把各订单的阶段状态打包成 订单×阶段 矩阵，按列向量化计算，结果与逐个订单调用类方法一致。
 """
 
-from typing import Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence
 from enum import Enum
 
+import numpy as np
+
 
 class OrderStatus(Enum):
     """订单状态枚举"""
@@ -23,6 +32,192 @@ class StageStatus(Enum):
     COMPLETED = "completed"
 
 
+class TransitionErrorCode(Enum):
+    """阶段流转失败类型（与 admin-progress 返回的 error_code 一致）"""
+    CONFLICT = "STAGE_CONFLICT"  # 阶段已被其他操作修改（状态或版本与期望不一致）
+    INVALID = "INVALID_TRANSITION"  # 不满足流转规则
+
+
+class StageRecord:
+    """快照中的一个阶段（按阶段顺序排列后的位置为 index）"""
+    __slots__ = ("index", "stage_id", "stage_name", "stage_order", "status", "source")
+
+    def __init__(self, index: int, source: Dict[str, Any]):
+        self.index = index
+        self.stage_id = source.get('stage_id')
+        self.stage_name = source.get('stage_name')
+        self.stage_order = source.get('stage_order') or 0
+        self.status = source.get('status')
+        self.source = source  # 原始进度记录
+
+
+class ProgressSnapshot:
+    """
+    进度列表的只读快照
+
+    构建时按 stage_order 排序一次，建立 stage_id -> 位置索引，统计各状态数量，
+    并记录第一个进行中、最后一个已完成、第一个待处理阶段的位置。
+    进度列表变化后需重新构建（OrderAggregate 在阶段更新后会丢弃旧快照）。
+    """
+    __slots__ = ("stages", "total", "counts", "_index", "_first_in_progress",
+                 "_last_completed", "_first_pending", "current_stage_name")
+
+    def __init__(self, progress_list: List[Dict]):
+        ordered = sorted(progress_list or [], key=lambda x: x.get('stage_order') or 0)
+        self.stages: List[StageRecord] = []
+        self.total = len(ordered)
+        self.counts: Dict[Any, int] = {}
+        self._index: Dict[Any, int] = {}
+        self._first_in_progress: Optional[int] = None
+        self._last_completed: Optional[int] = None
+        self._first_pending: Optional[int] = None
+
+        for i, progress in enumerate(ordered):
+            record = StageRecord(i, progress)
+            self.stages.append(record)
+            self._index.setdefault(record.stage_id, i)
+            self.counts[record.status] = self.counts.get(record.status, 0) + 1
+            if record.status == StageStatus.IN_PROGRESS.value:
+                if self._first_in_progress is None:
+                    self._first_in_progress = i
+            elif record.status == StageStatus.COMPLETED.value:
+                self._last_completed = i
+            elif record.status == StageStatus.PENDING.value:
+                if self._first_pending is None:
+                    self._first_pending = i
+
+        self.current_stage_name = self._resolve_current_stage_name()
+
+    @classmethod
+    def of(cls, progress_list) -> "ProgressSnapshot":
+        """已经是快照时直接返回，否则从进度列表构建"""
+        return progress_list if isinstance(progress_list, cls) else cls(progress_list)
+
+    def count(self, status: StageStatus) -> int:
+        """某状态的阶段数"""
+        return self.counts.get(status.value, 0)
+
+    def find(self, stage_id: str) -> Optional[StageRecord]:
+        """按阶段ID查找（同一ID出现多次时取阶段顺序最前的一个）"""
+        index = self._index.get(stage_id)
+        return self.stages[index] if index is not None else None
+
+    @property
+    def current_stage(self) -> Optional[StageRecord]:
+        """进行中的阶段"""
+        return self.stages[self._first_in_progress] if self._first_in_progress is not None else None
+
+    @property
+    def next_stage(self) -> Optional[StageRecord]:
+        """下一个待处理的阶段"""
+        return self.stages[self._first_pending] if self._first_pending is not None else None
+
+    @property
+    def progress_percentage(self) -> int:
+        """整体进度百分比 (0-100)"""
+        if not self.total:
+            return 0
+        return int((self.count(StageStatus.COMPLETED) / self.total) * 100)
+
+    @property
+    def has_progress(self) -> bool:
+        """是否有阶段在进行或已完成"""
+        return self._first_in_progress is not None or self._last_completed is not None
+
+    @property
+    def order_status(self) -> str:
+        """根据进度推导的订单状态"""
+        if not self.total:
+            return OrderStatus.PENDING.value
+        if self.count(StageStatus.COMPLETED) == self.total:
+            return OrderStatus.COMPLETED.value
+        if self.has_progress:
+            return OrderStatus.IN_PROGRESS.value
+        return OrderStatus.PENDING.value
+
+    def _resolve_current_stage_name(self) -> str:
+        if not self.total:
+            return "未开始"
+        # 进行中的阶段
+        if self._first_in_progress is not None:
+            return self.stages[self._first_in_progress].source.get('stage_name', '未知')
+        # 最后一个已完成的阶段：是最后一个阶段时返回"已完成"，否则返回其下一个阶段
+        if self._last_completed is not None:
+            if self._last_completed == self.total - 1:
+                return "已完成"
+            return self.stages[self._last_completed + 1].source.get('stage_name', '未知')
+        # 都没有开始，返回第一个阶段
+        return self.stages[0].source.get('stage_name', '未开始')
+
+    def can_start(self, stage_id: str) -> tuple[bool, str]:
+        """是否可以开始某个阶段，返回 (can_start, reason)"""
+        target = self.find(stage_id)
+        if target is None:
+            return False, "未找到指定阶段"
+
+        if target.status == StageStatus.IN_PROGRESS.value:
+            return False, "该阶段已经在进行中"
+        elif target.status == StageStatus.COMPLETED.value:
+            return False, "该阶段已完成，无法重新开始"
+
+        # 其他阶段在进行中
+        if self._first_in_progress is not None:
+            return False, f"请先完成进行中的阶段：{self.stages[self._first_in_progress].stage_name}"
+
+        # 前一阶段必须已完成
+        if target.index > 0:
+            previous = self.stages[target.index - 1]
+            if previous.status != StageStatus.COMPLETED.value:
+                return False, f"请先完成前一阶段：{previous.stage_name}"
+
+        return True, "可以开始"
+
+    def can_complete(self, stage_id: str) -> tuple[bool, str]:
+        """是否可以完成某个阶段，返回 (can_complete, reason)"""
+        target = self.find(stage_id)
+        if target is None:
+            return False, "未找到指定阶段"
+        if target.status != StageStatus.IN_PROGRESS.value:
+            return False, "只能完成进行中的阶段"
+        return True, "可以完成"
+
+    def allowed_actions(self, order: Dict) -> List[str]:
+        """订单允许的操作（规则见 OrderStateMachine.get_allowed_actions）"""
+        actions = []
+        order_status = order.get('order_status')
+
+        # 基本操作
+        if order_status != OrderStatus.COMPLETED.value:
+            actions.append('edit_info')  # 编辑基本信息
+
+        if order_status == OrderStatus.PENDING.value:
+            actions.append('start_stage')  # 开始阶段
+            actions.append('cancel_order')  # 取消订单
+
+        if order_status == OrderStatus.IN_PROGRESS.value:
+            if self._first_in_progress is not None:
+                actions.append('complete_stage')  # 完成当前阶段
+            if self._first_pending is not None:
+                actions.append('start_stage')  # 开始下一个阶段
+            actions.append('cancel_order')  # 取消订单
+
+        # 照片/视频管理权限：有进度即可上传/删除
+        if self.has_progress:
+            actions.append('upload_photo')
+            actions.append('delete_photo')
+
+        if order_status == OrderStatus.COMPLETED.value:
+            actions.append('view_details')  # 查看详情
+            actions.append('send_notification')  # 发送通知
+            actions.append('print_order')  # 打印订单
+
+        # 软删除（适用于所有状态）
+        if not order.get('is_deleted'):
+            actions.append('delete')
+
+        return actions
+
+
 class OrderStateMachine:
     """订单状态机"""
     
@@ -61,48 +256,22 @@ class OrderStateMachine:
         except ValueError:
             return False
     
+    @classmethod
+    def snapshot(cls, progress_list) -> ProgressSnapshot:
+        """构建进度快照（已是快照时直接返回），同一进度需要多次查询时先构建快照再传入下列方法"""
+        return ProgressSnapshot.of(progress_list)
+    
     @classmethod
     def can_start_stage(cls, progress_list: List[Dict], stage_id: str) -> tuple[bool, str]:
         """
         检查是否可以开始某个阶段
         
+        规则：目标阶段为待处理、没有其他阶段在进行中、前一阶段已完成
+        
         Returns:
             (can_start, reason) - (是否可以开始, 原因)
         """
-        # 按阶段顺序排序
-        sorted_progress = sorted(progress_list, key=lambda x: x.get('stage_order', 0))
-        
-        # 找到目标阶段
-        target_stage = None
-        target_index = -1
-        for i, progress in enumerate(sorted_progress):
-            if progress.get('stage_id') == stage_id:
-                target_stage = progress
-                target_index = i
-                break
-        
-        if not target_stage:
-            return False, "未找到指定阶段"
-        
-        # 检查当前状态
-        current_status = target_stage.get('status')
-        if current_status == StageStatus.IN_PROGRESS.value:
-            return False, "该阶段已经在进行中"
-        elif current_status == StageStatus.COMPLETED.value:
-            return False, "该阶段已完成，无法重新开始"
-        
-        # 检查是否有其他阶段在进行中
-        in_progress_stages = [p for p in sorted_progress if p.get('status') == StageStatus.IN_PROGRESS.value]
-        if in_progress_stages:
-            return False, f"请先完成进行中的阶段：{in_progress_stages[0].get('stage_name')}"
-        
-        # 检查前一阶段是否已完成
-        if target_index > 0:
-            previous_stage = sorted_progress[target_index - 1]
-            if previous_stage.get('status') != StageStatus.COMPLETED.value:
-                return False, f"请先完成前一阶段：{previous_stage.get('stage_name')}"
-        
-        return True, "可以开始"
+        return ProgressSnapshot.of(progress_list).can_start(stage_id)
     
     @classmethod
     def can_complete_stage(cls, progress_list: List[Dict], stage_id: str) -> tuple[bool, str]:
@@ -112,21 +281,7 @@ class OrderStateMachine:
         Returns:
             (can_complete, reason)
         """
-        # 找到目标阶段
-        target_stage = None
-        for progress in progress_list:
-            if progress.get('stage_id') == stage_id:
-                target_stage = progress
-                break
-        
-        if not target_stage:
-            return False, "未找到指定阶段"
-        
-        current_status = target_stage.get('status')
-        if current_status != StageStatus.IN_PROGRESS.value:
-            return False, "只能完成进行中的阶段"
-        
-        return True, "可以完成"
+        return ProgressSnapshot.of(progress_list).can_complete(stage_id)
     
     @classmethod
     def calculate_progress(cls, progress_list: List[Dict]) -> int:
@@ -136,60 +291,17 @@ class OrderStateMachine:
         Returns:
             progress_percentage (0-100)
         """
-        if not progress_list:
-            return 0
-        
-        total_stages = len(progress_list)
-        completed_stages = sum(1 for p in progress_list if p.get('status') == StageStatus.COMPLETED.value)
-        
-        return int((completed_stages / total_stages) * 100)
+        return ProgressSnapshot.of(progress_list).progress_percentage
     
     @classmethod
     def get_current_stage_name(cls, progress_list: List[Dict]) -> str:
         """获取当前阶段名称"""
-        if not progress_list:
-            return "未开始"
-        
-        sorted_progress = sorted(progress_list, key=lambda x: x.get('stage_order', 0))
-        
-        # 查找进行中的阶段
-        for progress in sorted_progress:
-            if progress.get('status') == StageStatus.IN_PROGRESS.value:
-                return progress.get('stage_name', '未知')
-        
-        # 查找最后一个已完成的阶段
-        completed_stages = [p for p in sorted_progress if p.get('status') == StageStatus.COMPLETED.value]
-        if completed_stages:
-            last_completed = completed_stages[-1]
-            # 如果是最后一个阶段，返回"已完成"
-            if last_completed == sorted_progress[-1]:
-                return "已完成"
-            # 否则返回下一个待处理的阶段
-            next_index = sorted_progress.index(last_completed) + 1
-            if next_index < len(sorted_progress):
-                return sorted_progress[next_index].get('stage_name', '未知')
-        
-        # 都没有开始，返回第一个阶段
-        return sorted_progress[0].get('stage_name', '未开始')
+        return ProgressSnapshot.of(progress_list).current_stage_name
     
     @classmethod
     def auto_update_order_status(cls, progress_list: List[Dict]) -> str:
         """根据进度自动更新订单状态"""
-        if not progress_list:
-            return OrderStatus.PENDING.value
-        
-        # 检查是否所有阶段都完成
-        all_completed = all(p.get('status') == StageStatus.COMPLETED.value for p in progress_list)
-        if all_completed:
-            return OrderStatus.COMPLETED.value
-        
-        # 检查是否有阶段在进行或已完成
-        has_progress = any(p.get('status') in [StageStatus.IN_PROGRESS.value, StageStatus.COMPLETED.value] 
-                          for p in progress_list)
-        if has_progress:
-            return OrderStatus.IN_PROGRESS.value
-        
-        return OrderStatus.PENDING.value
+        return ProgressSnapshot.of(progress_list).order_status
     
     @classmethod
     def get_allowed_actions(cls, order: Dict, progress_list: List[Dict]) -> List[str]:
@@ -199,49 +311,180 @@ class OrderStateMachine:
         Returns:
             List of action names: ['edit', 'start_stage', 'complete_stage', 'upload_photo', ...]
         """
-        actions = []
-        order_status = order.get('order_status')
-        
-        # 基本操作
-        if order_status != OrderStatus.COMPLETED.value:
-            actions.append('edit_info')  # 编辑基本信息
-        
-        if order_status == OrderStatus.PENDING.value:
-            actions.append('start_stage')  # 开始阶段
-            actions.append('cancel_order')  # 取消订单
-        
-        if order_status == OrderStatus.IN_PROGRESS.value:
-            # 查找进行中的阶段
-            in_progress_stage = next((p for p in progress_list if p.get('status') == StageStatus.IN_PROGRESS.value), None)
-            if in_progress_stage:
-                actions.append('complete_stage')  # 完成当前阶段
-            # 还有待处理的阶段也可以开始
-            if any(p.get('status') == StageStatus.PENDING.value for p in progress_list):
-                actions.append('start_stage')  # 开始下一个阶段
-            actions.append('cancel_order')  # 取消订单
-        
-        # 照片/视频管理权限：有进度即可上传/删除
-        if progress_list and any(p.get('status') in [StageStatus.IN_PROGRESS.value, StageStatus.COMPLETED.value] for p in progress_list):
-            actions.append('upload_photo')  # 上传照片/视频
-            actions.append('delete_photo')  # 删除照片/视频
-        
-        if order_status == OrderStatus.COMPLETED.value:
-            actions.append('view_details')  # 查看详情
-            actions.append('send_notification')  # 发送通知
-            actions.append('print_order')  # 打印订单
-        
-        # 软删除（适用于所有状态）
-        if not order.get('is_deleted'):
-            actions.append('delete')
-        
-        return actions
+        return ProgressSnapshot.of(progress_list).allowed_actions(order)
+
+    @classmethod
+    def evaluate_bulk(cls, orders: Sequence[Dict], progress_lists: Sequence[List[Dict]]) -> "BulkEvaluation":
+        """批量计算订单的进度、当前阶段、自动状态和允许的操作（见 evaluate_bulk）"""
+        return evaluate_bulk(orders, progress_lists)
+
+
+# 矩阵中的阶段状态编码
+_PAD = -1  # 订单阶段数不足矩阵宽度时的填充
+_PENDING = 0
+_IN_PROGRESS = 1
+_COMPLETED = 2
+_OTHER = 3  # 未知状态：只计入阶段总数
+_STATUS_CODES = {
+    StageStatus.PENDING.value: _PENDING,
+    StageStatus.IN_PROGRESS.value: _IN_PROGRESS,
+    StageStatus.COMPLETED.value: _COMPLETED
+}
+
+_ORDER_STATUS_VALUES = np.array([OrderStatus.PENDING.value, OrderStatus.IN_PROGRESS.value,
+                                 OrderStatus.COMPLETED.value], dtype=object)
+
+
+class BulkEvaluation:
+    """
+    evaluate_bulk 的结果（第 i 行对应第 i 个订单）
+
+    Attributes:
+        progress_percentage: int 数组，同 calculate_progress
+        current_stage_name: object 数组，同 get_current_stage_name
+        order_status: object 数组，同 auto_update_order_status
+        action_flags: bool 矩阵（订单 × ACTIONS），同 get_allowed_actions
+    """
+
+    # 允许操作的列顺序，与 get_allowed_actions 返回列表中的先后顺序一致
+    ACTIONS = ('edit_info', 'complete_stage', 'start_stage', 'cancel_order', 'upload_photo',
+               'delete_photo', 'view_details', 'send_notification', 'print_order', 'delete')
+
+    def __init__(self, progress_percentage: np.ndarray, current_stage_name: np.ndarray,
+                 order_status: np.ndarray, action_flags: np.ndarray):
+        self.progress_percentage = progress_percentage
+        self.current_stage_name = current_stage_name
+        self.order_status = order_status
+        self.action_flags = action_flags
+
+    def __len__(self) -> int:
+        return len(self.progress_percentage)
+
+    def allowed_actions(self, i: int) -> List[str]:
+        """第 i 个订单允许的操作"""
+        return [action for action, allowed in zip(self.ACTIONS, self.action_flags[i]) if allowed]
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """逐订单的结果字典列表"""
+        return [
+            {
+                'progress_percentage': int(self.progress_percentage[i]),
+                'current_stage': self.current_stage_name[i],
+                'order_status': self.order_status[i],
+                'allowed_actions': self.allowed_actions(i)
+            }
+            for i in range(len(self))
+        ]
+
+
+def _stage_positions(order_index: np.ndarray, stage_orders: List[Any], starts: np.ndarray) -> np.ndarray:
+    """每条进度记录按 stage_order 稳定排序后在所属订单内的位置"""
+    keys = None
+    if all(isinstance(k, (int, float)) for k in stage_orders):
+        keys = np.asarray(stage_orders, dtype=np.float64)
+    if keys is not None and not np.isnan(keys).any():
+        # 先按订单、再按 stage_order，相同时保持输入顺序（与 sorted 一致）
+        ordering = np.lexsort((np.arange(len(keys)), keys, order_index))
+    else:
+        # 非数值的 stage_order 按 Python 规则逐订单排序
+        ordering = np.empty(len(stage_orders), dtype=np.int64)
+        ends = np.append(starts[1:], len(stage_orders))
+        for start, end in zip(starts, ends):
+            ordering[start:end] = start + np.array(
+                sorted(range(end - start), key=lambda j: stage_orders[start + j]), dtype=np.int64)
+    positions = np.empty(len(ordering), dtype=np.int64)
+    positions[ordering] = np.arange(len(ordering)) - starts[order_index[ordering]]
+    return positions
+
+
+def evaluate_bulk(orders: Sequence[Dict], progress_lists: Sequence[List[Dict]]) -> BulkEvaluation:
+    """
+    向量化计算多个订单的派生字段
+
+    规则与 OrderStateMachine 的类方法完全一致（同一订单内 stage_id 唯一）：
+    进度百分比、当前阶段名称、自动订单状态和允许的操作。
+
+    Args:
+        orders: 订单列表（读取 order_status、is_deleted）
+        progress_lists: 与 orders 一一对应的进度记录列表
 
+    Returns:
+        BulkEvaluation
+    """
+    if len(orders) != len(progress_lists):
+        raise ValueError("orders 与 progress_lists 长度不一致")
 
+    n = len(orders)
+    lengths = np.fromiter((len(p or []) for p in progress_lists), dtype=np.int64, count=n)
+    width = int(lengths.max()) if n else 0
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64) if n else np.zeros(0, np.int64)
 
+    # 展平所有进度记录
+    flat = [progress for plist in progress_lists for progress in (plist or [])]
+    order_index = np.repeat(np.arange(n), lengths)
+    codes = np.fromiter((_STATUS_CODES.get(p.get('status'), _OTHER) for p in flat),
+                        dtype=np.int8, count=len(flat))
+    positions = _stage_positions(order_index, [p.get('stage_order') or 0 for p in flat], starts)
 
+    # 订单 × 阶段 矩阵（按阶段顺序）
+    status = np.full((n, width), _PAD, dtype=np.int8)
+    status[order_index, positions] = codes
+    names = np.full((n, width), None, dtype=object)
+    has_name = np.zeros((n, width), dtype=bool)
+    names[order_index, positions] = [p.get('stage_name') for p in flat]
+    has_name[order_index, positions] = [('stage_name' in p) for p in flat]
 
+    in_progress = status == _IN_PROGRESS
+    completed = status == _COMPLETED
+    completed_count = completed.sum(axis=1)
+    has_in_progress = in_progress.any(axis=1)
+    has_completed = completed.any(axis=1)
+    has_pending = (status == _PENDING).any(axis=1)
 
+    # 进度百分比：与 int((completed / total) * 100) 相同的浮点运算
+    safe_total = np.maximum(lengths, 1)
+    progress_percentage = np.where(lengths > 0, ((completed_count / safe_total) * 100).astype(np.int64), 0)
 
+    # 自动订单状态：0 待处理，1 制作中，2 已完成
+    status_code = np.where((lengths > 0) & (completed_count == lengths), 2,
+                           np.where(has_in_progress | has_completed, 1, 0))
+    order_status = _ORDER_STATUS_VALUES[status_code]
 
+    # 当前阶段名称
+    rows = np.arange(n)
+    first_in_progress = in_progress.argmax(axis=1) if width else np.zeros(n, np.int64)
+    last_completed = width - 1 - completed[:, ::-1].argmax(axis=1) if width else np.zeros(n, np.int64)
+    # 进行中 -> 该阶段；否则最后完成的下一阶段；否则第一个阶段
+    index = np.where(has_in_progress, first_in_progress, np.where(has_completed, last_completed + 1, 0))
+    index = np.minimum(index, max(width - 1, 0))
+    current_stage_name = np.full(n, "未开始", dtype=object)
+    if width:
+        picked = names[rows, index]
+        picked_has_name = has_name[rows, index]
+        default = np.where(has_in_progress | has_completed, "未知", "未开始").astype(object)
+        current_stage_name = np.where(picked_has_name, picked, default)
+        finished = ~has_in_progress & has_completed & (last_completed == lengths - 1)
+        current_stage_name[finished] = "已完成"
+        current_stage_name[lengths == 0] = "未开始"
 
+    # 允许的操作
+    statuses = [order.get('order_status') for order in orders]
+    is_pending = np.fromiter((s == OrderStatus.PENDING.value for s in statuses), dtype=bool, count=n)
+    is_making = np.fromiter((s == OrderStatus.IN_PROGRESS.value for s in statuses), dtype=bool, count=n)
+    is_done = np.fromiter((s == OrderStatus.COMPLETED.value for s in statuses), dtype=bool, count=n)
+    not_deleted = np.fromiter((not order.get('is_deleted') for order in orders), dtype=bool, count=n)
+    has_progress = has_in_progress | has_completed
+    action_flags = np.column_stack([
+        ~is_done,                                   # edit_info
+        is_making & has_in_progress,                # complete_stage
+        is_pending | (is_making & has_pending),     # start_stage
+        is_pending | is_making,                     # cancel_order
+        has_progress,                               # upload_photo
+        has_progress,                               # delete_photo
+        is_done,                                    # view_details
+        is_done,                                    # send_notification
+        is_done,                                    # print_order
+        not_deleted                                 # delete
+    ]) if n else np.zeros((0, len(BulkEvaluation.ACTIONS)), dtype=bool)
 
+    return BulkEvaluation(progress_percentage, current_stage_name, order_status, action_flags)
@@ -0,0 +1,142 @@
+"""
+CloudBase 异步客户端
+
+CloudBaseClient 的 asyncio 版本，方法与同步客户端一一对应（get_orders、get_order_detail、get_roles ...），
+可以并发发起互不依赖的云函数调用，总耗时约等于最慢的那一次调用。
+
+底层复用同步客户端及其连接池，在有界线程池中执行，因此不需要额外的异步 HTTP 依赖。
+"""
+
+import asyncio
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Optional, List, Tuple
+
+
+class AsyncCloudBaseClient:
+    """CloudBase 云函数异步客户端"""
+
+    def __init__(self, client=None, max_concurrency: int = 8, timeout: float = 15.0):
+        """
+        初始化异步客户端
+
+        Args:
+            client: 同步 CloudBaseClient 实例（默认使用全局 api_client）
+            max_concurrency: 最大并发调用数
+            timeout: 默认单次调用超时（秒）
+        """
+        if client is None:
+            from utils.cloudbase_client import api_client
+            client = api_client
+        self.client = client
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="cloudbase-async"
+        )
+        # asyncio.Semaphore 绑定到事件循环，每个循环单独创建
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._semaphores[loop] = semaphore
+        return semaphore
+
+    async def call(self, method_name: str, *args, timeout: Optional[float] = None, **kwargs) -> Dict[str, Any]:
+        """
+        异步调用同步客户端的方法
+
+        Args:
+            method_name: CloudBaseClient 方法名
+            timeout: 本次调用超时（秒），默认使用客户端超时
+
+        Returns:
+            云函数响应；超时返回 {'success': False, 'error_code': 'TIMEOUT', ...}
+        """
+        method = getattr(self.client, method_name)
+        call_timeout = self.timeout if timeout is None else timeout
+
+        async with self._get_semaphore():
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self._executor, functools.partial(method, *args, **kwargs))
+            try:
+                return await asyncio.wait_for(future, call_timeout)
+            except asyncio.TimeoutError:
+                # 线程中的请求仍会自行结束（受 HTTP 超时约束），这里只是不再等待
+                return {
+                    "success": False,
+                    "message": f"云函数调用超时（{call_timeout}秒）: {method_name}",
+                    "error_code": "TIMEOUT"
+                }
+
+    def __getattr__(self, name: str):
+        """将同步客户端的公开方法映射为同名协程方法"""
+        if name.startswith("_"):
+            raise AttributeError(name)
+        attr = getattr(self.client, name)
+        if not callable(attr):
+            return attr
+
+        async def async_method(*args, timeout: Optional[float] = None, **kwargs):
+            return await self.call(name, *args, timeout=timeout, **kwargs)
+
+        async_method.__name__ = name
+        async_method.__doc__ = attr.__doc__
+        return async_method
+
+    async def gather(self, *calls) -> List[Dict[str, Any]]:
+        """
+        并发等待多个调用，按传入顺序返回结果
+
+        单个调用抛出的异常会被转换为错误响应，不影响其他调用。
+        """
+        results = await asyncio.gather(*calls, return_exceptions=True)
+        return [
+            {"success": False, "message": f"云函数调用异常: {str(r)}"} if isinstance(r, BaseException) else r
+            for r in results
+        ]
+
+    def run_concurrently(self, calls: Dict[str, Tuple], timeout: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        同步入口：并发执行一组调用，供 Streamlit 页面等同步代码使用
+
+        Args:
+            calls: {结果名: (方法名, args元组, kwargs字典)}，args/kwargs 可省略
+            timeout: 每个调用的超时（秒）
+
+        Returns:
+            {结果名: 云函数响应}
+
+        Example:
+            results = async_api_client.run_concurrently({
+                "pending": ("get_orders", (), {"status": "待处理"}),
+                "detail": ("get_order_detail", ("order_id",), {"is_admin": True}),
+            })
+        """
+        names = list(calls.keys())
+
+        async def _run():
+            coroutines = []
+            for name in names:
+                spec = calls[name]
+                method_name = spec[0]
+                args = spec[1] if len(spec) > 1 else ()
+                kwargs = spec[2] if len(spec) > 2 else {}
+                coroutines.append(self.call(method_name, *args, timeout=timeout, **kwargs))
+            return await self.gather(*coroutines)
+
+        results = asyncio.run(_run())
+        return dict(zip(names, results))
+
+    def close(self):
+        """关闭线程池"""
+        self._executor.shutdown(wait=False)
+
+
+# 创建全局实例（共享 api_client 的连接池）
+async_api_client = AsyncCloudBaseClient()
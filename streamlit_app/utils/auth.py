@@ -4,11 +4,31 @@ from datetime import datetime, timedelta
 from utils.cloudbase_client import api_client
 from utils.helpers import translate_role
 
+# 硬编码角色权限：无法从数据库加载权限时的离线默认值
+ROLE_PERMISSIONS_FALLBACK = {
+    "admin": frozenset([
+        "dashboard.view", "orders.read", "orders.create", "orders.update", "orders.delete",
+        "progress.update", "photos.upload", "photos.manage", "users.manage", "users.create", "system.settings"
+    ]),
+    "operator": frozenset([
+        "dashboard.view", "orders.read", "orders.create", "orders.update",
+        "progress.update", "photos.upload", "photos.manage"
+    ]),
+    "viewer": frozenset([
+        "dashboard.view", "orders.read", "photos.upload"
+    ])
+}
+
+# 使用后备权限时，隔多久重新尝试从数据库加载（秒）
+FALLBACK_RETRY_SECONDS = 60
+
+
 class AuthManager:
     """身份验证管理器"""
     
-    def __init__(self):
+    def __init__(self, client=None):
         self.session_timeout = 24  # 24小时
+        self.client = client or api_client
     
     def show_login_form(self):
         """显示登录表单"""
@@ -71,7 +91,7 @@ class AuthManager:
     def login(self, username: str, password: str) -> tuple[bool, str]:
         """执行登录"""
         try:
-            result = api_client.admin_login(username, password)
+            result = self.client.admin_login(username, password)
             
             # 检查result是否为None
             if result is None:
@@ -107,6 +127,8 @@ class AuthManager:
                 st.session_state["access_token"] = actual_data.get("token", "")
                 st.session_state["login_time"] = datetime.now()
                 st.session_state["expires_in"] = 86400  # 24小时
+                # 登录时一次性解析角色权限，之后的权限检查都在内存中完成
+                self.load_permission_snapshot()
                 return True, "登录成功"
             else:
                 # 检查是否是账户被禁用的错误
@@ -139,7 +161,7 @@ class AuthManager:
         """退出登录"""
         keys_to_remove = [
             "authenticated", "user_info", "access_token", 
-            "login_time", "expires_in"
+            "login_time", "expires_in", "permission_snapshot"
         ]
         for key in keys_to_remove:
             if key in st.session_state:
@@ -153,56 +175,70 @@ class AuthManager:
         """获取当前Token"""
         return st.session_state.get("access_token", "")
     
-    def has_permission(self, permission: str) -> bool:
-        """检查用户权限"""
-        user_info = self.get_user_info()
-        user_role = user_info.get("role", "")
-        
-        # 尝试从数据库获取权限，如果失败则使用硬编码权限作为后备
+    def _resolve_role_permissions(self, role_name: str) -> tuple[frozenset, str]:
+        """
+        从数据库解析角色的权限集合
+
+        Returns:
+            (权限集合, 来源)：来源为 database 或 fallback
+        """
         try:
-            from utils.cloudbase_client import api_client
-            
-            # 获取角色权限
-            roles_result = api_client.get_roles()
+            roles_result = self.client.get_roles()
             if roles_result.get('success'):
                 roles = roles_result.get('data', {}).get('roles', [])
                 
                 # 找到当前用户的角色
                 current_role = None
                 for role in roles:
-                    if role.get('role_name') == user_role:
+                    if role.get('role_name') == role_name:
                         current_role = role
                         break
                 
                 if current_role:
                     # 获取角色的权限
-                    role_permissions_result = api_client.get_role_permissions(current_role.get('_id'))
+                    role_permissions_result = self.client.get_role_permissions(current_role.get('_id'))
                     if role_permissions_result.get('success'):
                         permissions = role_permissions_result.get('data', {}).get('permissions', [])
-                        permission_codes = [p.get('permission_code') for p in permissions]
-                        return permission in permission_codes
+                        return frozenset(p.get('permission_code') for p in permissions if p.get('permission_code')), "database"
         except Exception as e:
             print(f"从数据库获取权限失败，使用硬编码权限: {str(e)}")
         
-        # 硬编码权限作为后备方案
-        role_permissions = {
-            "admin": [
-                "dashboard.view", "orders.read", "orders.create", "orders.update", "orders.delete", 
-                "progress.update", "photos.upload", "photos.manage", "users.manage", "users.create", "system.settings"
-            ],
-            "operator": [
-                "dashboard.view", "orders.read", "orders.create", "orders.update", 
-                "progress.update", "photos.upload", "photos.manage"
-            ],
-            "viewer": [
-                "dashboard.view", "orders.read", "photos.upload"
-            ]
+        return ROLE_PERMISSIONS_FALLBACK.get(role_name, frozenset()), "fallback"
+    
+    def load_permission_snapshot(self) -> Dict[str, Any]:
+        """解析当前用户的角色权限，生成不可变快照并保存到会话"""
+        role_name = self.get_user_info().get("role", "")
+        # 先读取版本号再加载：加载期间发生的权限变更会让快照在下次检查时刷新
+        version = self.client.get_permissions_version()
+        permissions, source = self._resolve_role_permissions(role_name)
+        snapshot = {
+            "role": role_name,
+            "permissions": permissions,
+            "version": version,
+            "source": source,
+            "loaded_at": datetime.now()
         }
-        
-        if user_role in role_permissions:
-            return permission in role_permissions[user_role]
-        
-        return False
+        st.session_state["permission_snapshot"] = snapshot
+        return snapshot
+    
+    def get_permission_snapshot(self) -> Dict[str, Any]:
+        """获取权限快照；角色或权限版本变化时重新加载"""
+        snapshot = st.session_state.get("permission_snapshot")
+        if (
+            snapshot is None
+            or snapshot["role"] != self.get_user_info().get("role", "")
+            or snapshot["version"] != self.client.get_permissions_version()
+            or (
+                snapshot["source"] == "fallback"
+                and datetime.now() - snapshot["loaded_at"] > timedelta(seconds=FALLBACK_RETRY_SECONDS)
+            )
+        ):
+            snapshot = self.load_permission_snapshot()
+        return snapshot
+    
+    def has_permission(self, permission: str) -> bool:
+        """检查用户权限（基于登录时生成的权限快照，内存查找）"""
+        return permission in self.get_permission_snapshot()["permissions"]
     
     def show_user_info(self):
         """显示用户信息栏"""
@@ -0,0 +1,224 @@
+"""
+云函数调用指标
+
+记录每次云函数调用（以及 COS 上传）的耗时、请求/响应字节数、状态、重试次数和缓存命中，
+按 云函数 + action 聚合为滚动窗口内的延迟直方图：
+- 窗口被切分为若干时间槽，过期的槽整体丢弃，内存占用与调用量无关
+- 直方图使用对数分桶（每桶 ×1.5），百分位数在桶内线性插值估算
+- snapshot() 返回可直接序列化为 JSON 的汇总，供性能监控页面和外部采集使用
+"""
+
+import json
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+
+def _build_bounds() -> List[float]:
+    """直方图桶上界（毫秒）：1ms 起每桶 ×1.5，直到 60 秒"""
+    bounds = []
+    bound = 1.0
+    while bound < 60000:
+        bounds.append(round(bound, 2))
+        bound *= 1.5
+    bounds.append(60000.0)
+    return bounds
+
+
+BUCKET_BOUNDS_MS = _build_bounds()
+
+
+class _Series:
+    """单个 云函数 + action 在一个时间槽内的统计"""
+    __slots__ = ("count", "errors", "cache_hits", "retries", "total_ms", "max_ms",
+                 "request_bytes", "response_bytes", "statuses", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.cache_hits = 0
+        self.retries = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.statuses: Dict[str, int] = {}
+        # 最后一个桶收集超过 60 秒的调用
+        self.buckets = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+
+    def merge(self, other: "_Series"):
+        self.count += other.count
+        self.errors += other.errors
+        self.cache_hits += other.cache_hits
+        self.retries += other.retries
+        self.total_ms += other.total_ms
+        self.max_ms = max(self.max_ms, other.max_ms)
+        self.request_bytes += other.request_bytes
+        self.response_bytes += other.response_bytes
+        for status, n in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + n
+        for i, n in enumerate(other.buckets):
+            self.buckets[i] += n
+
+
+def _bucket_index(duration_ms: float) -> int:
+    """二分查找耗时所在的桶"""
+    low, high = 0, len(BUCKET_BOUNDS_MS)
+    while low < high:
+        mid = (low + high) // 2
+        if duration_ms <= BUCKET_BOUNDS_MS[mid]:
+            high = mid
+        else:
+            low = mid + 1
+    return low
+
+
+def estimate_percentile(buckets: List[int], pct: float, max_ms: float) -> float:
+    """根据直方图估算百分位数（毫秒），桶内按线性插值"""
+    total = sum(buckets)
+    if not total:
+        return 0.0
+    target = pct / 100 * total
+    cumulative = 0
+    for i, n in enumerate(buckets):
+        if n and cumulative + n >= target:
+            lower = BUCKET_BOUNDS_MS[i - 1] if i > 0 else 0.0
+            upper = BUCKET_BOUNDS_MS[i] if i < len(BUCKET_BOUNDS_MS) else max_ms
+            value = lower + (upper - lower) * (target - cumulative) / n
+            return round(min(value, max_ms), 1)
+        cumulative += n
+    return round(max_ms, 1)
+
+
+class CallMetrics:
+    """线程安全的滚动窗口调用指标"""
+
+    def __init__(self, window_seconds: int = 900, slot_seconds: int = 60, enabled: bool = True, clock=time.time):
+        """
+        Args:
+            window_seconds: 滚动窗口长度（秒）
+            slot_seconds: 时间槽长度（秒），窗口按槽滚动
+            enabled: 为 False 时 record() 直接返回
+            clock: 时钟函数（便于测试）
+        """
+        self.window_seconds = window_seconds
+        self.slot_seconds = max(1, slot_seconds)
+        self.enabled = enabled
+        self._clock = clock
+        self._lock = threading.Lock()
+        # 时间槽编号 -> {(云函数, action): _Series}
+        self._slots: Dict[int, Dict[Tuple[str, str], _Series]] = {}
+        self._started_at = clock()
+
+    def _prune(self, current_slot: int):
+        oldest = current_slot - self.window_seconds // self.slot_seconds
+        for slot in [s for s in self._slots if s <= oldest]:
+            del self._slots[slot]
+
+    def record(self, function_name: str, action: str, duration: float, status: Any = 200,
+               success: bool = True, request_bytes: int = 0, response_bytes: int = 0,
+               retries: int = 0, cache_hit: bool = False):
+        """
+        记录一次调用
+
+        Args:
+            duration: 耗时（秒）
+            status: HTTP 状态码，或 "cache"、"error" 等标记
+            success: 业务结果是否成功
+        """
+        if not self.enabled:
+            return
+        duration_ms = duration * 1000
+        slot = int(self._clock() // self.slot_seconds)
+        with self._lock:
+            slot_series = self._slots.get(slot)
+            if slot_series is None:
+                slot_series = self._slots[slot] = {}
+                self._prune(slot)
+            key = (function_name, action or "")
+            series = slot_series.get(key)
+            if series is None:
+                series = slot_series[key] = _Series()
+            series.count += 1
+            series.errors += 0 if success else 1
+            series.cache_hits += 1 if cache_hit else 0
+            series.retries += retries
+            series.total_ms += duration_ms
+            series.max_ms = max(series.max_ms, duration_ms)
+            series.request_bytes += request_bytes
+            series.response_bytes += response_bytes
+            status_key = str(status)
+            series.statuses[status_key] = series.statuses.get(status_key, 0) + 1
+            series.buckets[_bucket_index(duration_ms)] += 1
+
+    def reset(self):
+        """清空所有指标"""
+        with self._lock:
+            self._slots.clear()
+            self._started_at = self._clock()
+
+    def snapshot(self, function_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        汇总窗口内的指标
+
+        Returns:
+            {generated_at, window_seconds, bucket_bounds_ms, totals: {...}, calls: [{function, action, count,
+             errors, error_rate, cache_hits, cache_hit_ratio, retries, avg_ms, p50_ms, p95_ms, p99_ms, max_ms,
+             request_bytes, response_bytes, statuses, buckets}]}
+        """
+        now = self._clock()
+        merged: Dict[Tuple[str, str], _Series] = {}
+        with self._lock:
+            self._prune(int(now // self.slot_seconds))
+            for slot_series in self._slots.values():
+                for key, series in slot_series.items():
+                    if function_name and key[0] != function_name:
+                        continue
+                    target = merged.get(key)
+                    if target is None:
+                        target = merged[key] = _Series()
+                    target.merge(series)
+            started_at = self._started_at
+
+        totals = _Series()
+        calls = []
+        for (name, action), series in sorted(merged.items()):
+            totals.merge(series)
+            calls.append(self._describe(series, {"function": name, "action": action}))
+
+        window = min(self.window_seconds, max(now - started_at, 1))
+        summary = self._describe(totals, {})
+        summary["throughput"] = round(totals.count / window, 3)
+        return {
+            "generated_at": now,
+            "window_seconds": self.window_seconds,
+            "bucket_bounds_ms": BUCKET_BOUNDS_MS,
+            "totals": summary,
+            "calls": calls
+        }
+
+    @staticmethod
+    def _describe(series: _Series, base: Dict[str, Any]) -> Dict[str, Any]:
+        count = series.count
+        base.update({
+            "count": count,
+            "errors": series.errors,
+            "error_rate": round(series.errors / count, 4) if count else 0.0,
+            "cache_hits": series.cache_hits,
+            "cache_hit_ratio": round(series.cache_hits / count, 4) if count else 0.0,
+            "retries": series.retries,
+            "avg_ms": round(series.total_ms / count, 1) if count else 0.0,
+            "p50_ms": estimate_percentile(series.buckets, 50, series.max_ms),
+            "p95_ms": estimate_percentile(series.buckets, 95, series.max_ms),
+            "p99_ms": estimate_percentile(series.buckets, 99, series.max_ms),
+            "max_ms": round(series.max_ms, 1),
+            "request_bytes": series.request_bytes,
+            "response_bytes": series.response_bytes,
+            "statuses": dict(series.statuses),
+            "buckets": list(series.buckets)
+        })
+        return base
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        """导出 JSON 格式的指标快照"""
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=indent)
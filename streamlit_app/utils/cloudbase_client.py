@@ -1,10 +1,18 @@
 import streamlit as st
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Iterator, Optional, List
 import json
 import os
 import base64
+import copy
+import logging
+import threading
+import time
 from datetime import datetime
-from config import CLOUDBASE_CONFIG, API_ENDPOINTS
+from config import CLOUDBASE_CONFIG, API_ENDPOINTS, HTTP_POOL_CONFIG, CACHE_CONFIG, COS_UPLOAD_CONFIG, METRICS_CONFIG
+from utils.http_transport import PooledTransport
+from utils.response_cache import ResponseCache
+from utils.call_metrics import CallMetrics
+from utils.cos_uploader import CosUploader, is_presigned_upload
 from PIL import Image
 import io
 
@@ -17,12 +25,246 @@ try:
 except ImportError:
     CLOUDBASE_SDK_AVAILABLE = False
 
+logger = logging.getLogger(__name__)
+
+# 只读调用：云函数名 -> 只读的 action 集合（None 表示该云函数的所有调用都是只读）
+READ_CALLS = {
+    "customer-search": None,
+    "customer-detail": None,
+    "admin-dashboard": {""},
+    "admin-orders": {"list", "changes", "snapshot"},
+    "admin-progress": {"list"},
+    "admin-users": {"list", ""},
+    "role-permissions": {"list_roles", "list_permissions", "get_role_permissions"},
+    "admin-logs": {"list"}
+}
+
+
+# 只读但不缓存的调用（结果用于增量同步，必须是最新的）
+UNCACHED_READS = {("admin-orders", "changes"), ("admin-orders", "snapshot")}
+
+
+def is_read_call(function_name: str, data: Optional[Dict[str, Any]]) -> bool:
+    """判断一次云函数调用是否为只读调用"""
+    if function_name not in READ_CALLS:
+        return False
+    actions = READ_CALLS[function_name]
+    if actions is None:
+        return True
+    return (data or {}).get("action", "") in actions
+
+
+def call_action(data: Optional[Dict[str, Any]]) -> str:
+    """调用指标中的 action 名称（无 action 的云函数记为空字符串）"""
+    return str((data or {}).get("action", "")) if isinstance(data, dict) else ""
+
+
+def _order_tags(data: Optional[Dict[str, Any]]) -> List[str]:
+    """从请求数据（顶层或 data 字段）中提取订单标签"""
+    data = data or {}
+    inner = data.get("data") if isinstance(data.get("data"), dict) else {}
+    # 批量更新：每一项的订单
+    items = inner.get("items")
+    if isinstance(items, list):
+        order_ids = dict.fromkeys(item.get("order_id") for item in items if isinstance(item, dict))
+        return [f"order:{order_id}" for order_id in order_ids if order_id]
+    order_id = data.get("order_id") or inner.get("order_id")
+    return [f"order:{order_id}"] if order_id else []
+
+
+def read_cache_tags(function_name: str, data: Optional[Dict[str, Any]]) -> List[str]:
+    """只读调用的结果依赖的数据标签"""
+    if function_name == "customer-detail":
+        return _order_tags(data) + ["photos"]
+    if function_name == "admin-orders" and (data or {}).get("action") in ("changes", "snapshot"):
+        return ["orders", "photos"]
+    if function_name in ("customer-search", "admin-orders"):
+        return ["orders"]
+    if function_name == "admin-progress":
+        return _order_tags(data) + ["orders"]
+    if function_name == "admin-dashboard":
+        return ["dashboard"]
+    if function_name == "role-permissions":
+        return ["roles"]
+    if function_name == "admin-users":
+        return ["users"]
+    if function_name == "admin-logs":
+        return ["logs"]
+    return []
+
+
+def write_invalidation_tags(function_name: str, data: Optional[Dict[str, Any]]) -> List[str]:
+    """写调用完成后需要失效的数据标签（每次写操作都会记录操作日志）"""
+    action = (data or {}).get("action", "")
+    if function_name in ("admin-orders", "admin-progress"):
+        return _order_tags(data) + ["orders", "dashboard", "logs"]
+    if function_name == "photo-upload":
+        if action == "confirm_upload":
+            return _order_tags(data) + ["photos", "logs"]
+        if action == "delete":
+            return ["photos", "logs"]
+        return []
+    if function_name == "role-permissions":
+        return ["roles", "logs"]
+    if function_name == "admin-users":
+        return ["users", "logs"]
+    if function_name == "admin-dashboard":
+        return ["dashboard"]
+    return []
+
+
+def canonical_call_key(function_name: str, data: Optional[Dict[str, Any]], is_admin: bool = False) -> str:
+    """生成调用的规范化键：云函数名 + 排序后的请求数据 + 调用身份"""
+    payload = json.dumps(data or {}, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str)
+    return f"{function_name}|{'admin' if is_admin else 'public'}|{payload}"
+
+
+class _InFlightCall:
+    """正在进行中的一次调用"""
+    __slots__ = ("event", "result", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    进程内请求合并（single-flight）
+
+    同一时刻相同键的调用只真正执行一次，后到的调用等待并共享第一次调用的结果。
+    Streamlit 的多个会话运行在同一进程的不同线程中，因此可以跨会话合并。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _InFlightCall] = {}
+        self._stats = {"calls": 0, "executed": 0, "coalesced": 0}
+
+    def do(self, key: str, fn):
+        """执行调用；若相同键的调用已在进行中，则等待其结果"""
+        with self._lock:
+            self._stats["calls"] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                self._stats["coalesced"] += 1
+                is_leader = False
+            else:
+                call = _InFlightCall()
+                self._calls[key] = call
+                self._stats["executed"] += 1
+                is_leader = True
+
+        if not is_leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            # 每个等待者拿到独立副本，避免调用方修改结果时互相影响
+            return copy.deepcopy(call.result)
+
+        try:
+            result = fn()
+            call.result = copy.deepcopy(result)
+            return result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取合并统计：总调用数、实际执行数、被合并数"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls)
+        stats["coalesced_ratio"] = round(stats["coalesced"] / stats["calls"], 4) if stats["calls"] else 0.0
+        return stats
+
+
 class CloudBaseClient:
     """CloudBase 云函数客户端"""
 
-    def __init__(self):
+    # 云函数 HTTP 触发器路径
+    HTTP_PATHS = {
+        "customer-search": "/api/customer/orders/search",
+        "customer-detail": "/api/customer/orders/detail",
+        "admin-auth": "/api/admin/auth",
+        "admin-orders": "/api/admin/orders",
+        "admin-progress": "/api/admin/progress",
+        "admin-users": "/api/admin/users",
+        "role-permissions": "/api/admin/role-permissions",
+        "photo-upload": "/api/admin/photos/upload",
+        "admin-dashboard": "/api/admin/dashboard",
+        "admin-logs": "/api/admin/logs"
+    }
+
+    def __init__(self, transport: Optional[PooledTransport] = None):
         self.env_id = CLOUDBASE_CONFIG["env_id"]
         self.region = CLOUDBASE_CONFIG["region"]
+        # 共享的 keep-alive 连接池，所有云函数调用和 COS 直传复用
+        self.transport = transport or PooledTransport(
+            CLOUDBASE_CONFIG["api_base_url"],
+            self.HTTP_PATHS,
+            HTTP_POOL_CONFIG
+        )
+        # COS 预签名并发上传（复用同一连接池）
+        self.uploader = CosUploader(self.transport, multipart_api=self, **COS_UPLOAD_CONFIG)
+        # 相同的只读调用在进程内合并
+        self.single_flight = SingleFlight()
+        # 只读调用结果缓存，写操作后按标签失效
+        self.cache_enabled = CACHE_CONFIG.get("enabled", True)
+        self.cache_ttls = dict(CACHE_CONFIG.get("ttl", {}))
+        self.cache = ResponseCache(CACHE_CONFIG.get("max_entries", 512))
+        # 角色权限版本号：角色权限每次写入后递增，登录会话据此刷新权限快照
+        self._permissions_version = 0
+        self._version_lock = threading.Lock()
+        # 每次调用的耗时、字节数、状态、重试和缓存命中，按 云函数 + action 聚合
+        self.metrics = CallMetrics(
+            window_seconds=METRICS_CONFIG.get("window_seconds", 900),
+            slot_seconds=METRICS_CONFIG.get("slot_seconds", 60),
+            enabled=METRICS_CONFIG.get("enabled", True)
+        )
+
+    def get_permissions_version(self) -> int:
+        """获取当前角色权限版本号"""
+        return self._permissions_version
+
+    def bump_permissions_version(self) -> int:
+        """递增角色权限版本号，使所有会话的权限快照失效"""
+        with self._version_lock:
+            self._permissions_version += 1
+            return self._permissions_version
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """获取缓存命中统计"""
+        return self.cache.get_stats()
+
+    def invalidate_cache(self, tags: List[str]) -> int:
+        """手动按标签失效缓存（如 ["order:<id>"]、["dashboard"]）"""
+        return self.cache.invalidate_tags(tags)
+
+    def get_tag_versions(self, tags: List[str]) -> tuple:
+        """数据标签的当前版本号：本进程内对相关数据的写操作会使版本递增"""
+        return self.cache.tag_versions(tags)
+
+    def clear_cache(self):
+        """清空缓存"""
+        self.cache.clear()
+
+    def get_singleflight_stats(self) -> Dict[str, Any]:
+        """获取请求合并统计"""
+        return self.single_flight.get_stats()
+
+    def get_transport_stats(self) -> Dict[str, Any]:
+        """获取连接池复用统计"""
+        return self.transport.get_stats()
+
+    def get_call_metrics(self, function_name: Optional[str] = None) -> Dict[str, Any]:
+        """获取调用指标快照（可直接序列化为 JSON）"""
+        return self.metrics.snapshot(function_name)
     
     def _compress_image(self, file_content: bytes, filename: str, max_size_kb: int = 300, quality: int = 90) -> bytes:
         """压缩图片到指定大小"""
@@ -48,7 +290,7 @@ class CloudBaseClient:
                 compressed_size = len(buffer.getvalue())
                 
                 if compressed_size <= target_size:
-                    print(f"[成功] 图片压缩成功: {original_size/1024:.1f}KB -> {compressed_size/1024:.1f}KB (质量={q})")
+                    logger.debug("图片压缩成功: %.1fKB -> %.1fKB (质量=%d)", original_size / 1024, compressed_size / 1024, q)
                     return buffer.getvalue()
             
             # 如果还是太大，缩小尺寸
@@ -62,65 +304,89 @@ class CloudBaseClient:
                 resized_image.save(buffer, format='JPEG', quality=80, optimize=True)
                 compressed_size = len(buffer.getvalue())
                 
-                print(f"[处理] 缩小尺寸: {width}x{height}, 大小: {compressed_size/1024:.1f}KB")
+                logger.debug("缩小尺寸: %dx%d, 大小: %.1fKB", width, height, compressed_size / 1024)
                 
                 if compressed_size <= target_size or width < 200:
-                    print(f"[成功] 图片压缩成功: {original_size/1024:.1f}KB -> {compressed_size/1024:.1f}KB (尺寸={width}x{height})")
+                    logger.debug("图片压缩成功: %.1fKB -> %.1fKB (尺寸=%dx%d)", original_size / 1024, compressed_size / 1024,
+                                 width, height)
                     return buffer.getvalue()
             
         except Exception as e:
-            print(f"[错误] 图片压缩失败: {str(e)}")
+            logger.error("图片压缩失败: %s", e)
             return file_content
 
     def _call_function(self, function_name: str, data: Dict[str, Any] = None, is_admin: bool = False) -> Dict[str, Any]:
         """调用云函数"""
         try:
+            if is_read_call(function_name, data):
+                return self._call_read(function_name, data, is_admin)
             # 使用HTTP请求调用云函数（支持is_admin参数）
-            return self._call_with_http(function_name, data, is_admin)
+            result = self._call_with_http(function_name, data, is_admin)
+            # 写操作完成后失效相关缓存（失败也失效：超时的写可能已经生效）
+            tags = write_invalidation_tags(function_name, data)
+            if tags:
+                self.cache.invalidate_tags(tags)
+            if function_name == "role-permissions":
+                self.bump_permissions_version()
+            return result
         except Exception as e:
-            print(f"[错误] 云函数调用异常: {str(e)}")
+            logger.error("云函数调用异常: %s - %s", function_name, e)
             # 发生异常时返回错误信息
             return {"success": False, "message": f"云函数调用异常: {str(e)}"}
 
+    def _call_read(self, function_name: str, data: Dict[str, Any] = None, is_admin: bool = False) -> Dict[str, Any]:
+        """只读调用：先查缓存，未命中时走请求合并"""
+        key = canonical_call_key(function_name, data, is_admin)
+        tags = read_cache_tags(function_name, data)
+        ttl = self.cache_ttls.get(function_name, 0) if self.cache_enabled else 0
+        if (function_name, call_action(data)) in UNCACHED_READS:
+            ttl = 0
+
+        if ttl:
+            start = time.perf_counter()
+            cached = self.cache.get(key, function_name)
+            if cached is not None:
+                self.metrics.record(function_name, call_action(data), time.perf_counter() - start,
+                                    status="cache", cache_hit=True)
+                return cached
+
+        # 记录读取开始时的标签版本：写操作之后发起的读取不会合并到写之前的请求上，
+        # 写操作期间返回的旧结果也不会写入缓存
+        versions = self.cache.tag_versions(tags)
+
+        def load():
+            result = self._call_with_http(function_name, data, is_admin)
+            if ttl and isinstance(result, dict) and result.get("success"):
+                self.cache.set(key, result, function_name, ttl, tags, versions)
+            return result
+
+        return self.single_flight.do(f"{key}|{versions}", load)
+
     def _call_with_http(self, function_name: str, data: Dict[str, Any] = None, is_admin: bool = False) -> Dict[str, Any]:
         """使用HTTP请求调用CloudBase云函数"""
+        start = time.perf_counter()
+        action = call_action(data)
+        request_size = 0
+        response_size = 0
+        status = "error"
+        result = None
         try:
-            import requests
-            
-            # 构建CloudBase HTTP触发器URL
-            base_url = CLOUDBASE_CONFIG["api_base_url"]
-            
-            # 使用正确的HTTP触发器路径
-            http_paths = {
-                "customer-search": "/api/customer/orders/search",
-                "customer-detail": "/api/customer/orders/detail",
-                "admin-auth": "/api/admin/auth",
-                "admin-orders": "/api/admin/orders",
-                "admin-progress": "/api/admin/progress",
-                "admin-users": "/api/admin/users",
-                "role-permissions": "/api/admin/role-permissions",
-                "photo-upload": "/api/admin/photos/upload",
-                "admin-dashboard": "/api/admin/dashboard",
-                "admin-logs": "/api/admin/logs"
-            }
-            
-            http_path = http_paths.get(function_name, f"/{function_name}")
-            function_url = f"{base_url}{http_path}"
-            
             # 准备请求数据
             request_data = data or {}
             
             # 检查请求数据大小
-            import json
             request_json = json.dumps(request_data)
             request_size = len(request_json.encode('utf-8'))
-            print(f"[调用] 尝试调用云函数: {function_url}")
-            print(f"[数据] 请求数据大小: {request_size} bytes ({request_size/1024:.1f}KB)")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("调用云函数: %s action=%s 请求 %d bytes", self.transport.url_for(function_name),
+                             action, request_size)
             
             # 检查是否超过限制
             if request_size > 800 * 1024:  # 800KB限制
-                print(f"[警告] 请求数据过大: {request_size} bytes > 800KB")
-                return {"success": False, "message": "请求数据过大，请减少文件大小"}
+                logger.warning("请求数据过大: %s %d bytes > 800KB", function_name, request_size)
+                status = "too_large"
+                result = {"success": False, "message": "请求数据过大，请减少文件大小"}
+                return result
             
             # 构建请求头
             headers = {
@@ -133,32 +399,39 @@ class CloudBaseClient:
                 headers["x-administrator"] = "true"
                 headers["User-Agent"] = "life-diamond-system-admin/1.0"
             
-            # 发送HTTP请求
-            response = requests.post(
-                function_url,
-                json=request_data,
-                headers=headers,
+            # 发送HTTP请求（复用连接池中的 keep-alive 连接）
+            response = self.transport.post(
+                function_name,
+                request_data,
+                headers,
                 timeout=10
             )
-            
-            print(f"[响应] 响应状态: {response.status_code}")
+            status = response.status_code
+            response_size = len(response.content or b"")
             
             if response.status_code == 200:
                 if response.text:
-                    result = response.json()
-                    print(f"[成功] 云函数调用成功: {function_name}")
                     # 直接返回云函数的响应，保持success字段的原始值
-                    return result
+                    result = response.json()
+                    logger.debug("云函数调用成功: %s (%d bytes)", function_name, response_size)
                 else:
-                    print("[错误] 响应内容为空")
-                    return {"success": False, "message": "响应内容为空"}
+                    logger.warning("云函数响应内容为空: %s", function_name)
+                    result = {"success": False, "message": "响应内容为空"}
             else:
-                print(f"[错误] HTTP请求失败: {response.status_code} - {response.text}")
-                return {"success": False, "message": f"HTTP请求失败: {response.status_code}"}
+                logger.warning("HTTP请求失败: %s %s - %s", function_name, response.status_code, response.text[:200])
+                result = {"success": False, "message": f"HTTP请求失败: {response.status_code}"}
+            return result
                 
         except Exception as e:
-            print(f"[错误] HTTP调用异常: {str(e)}")
-            return {"success": False, "message": f"HTTP调用失败: {str(e)}"}
+            logger.error("HTTP调用异常: %s - %s", function_name, e)
+            result = {"success": False, "message": f"HTTP调用失败: {str(e)}"}
+            return result
+        finally:
+            self.metrics.record(
+                function_name, action, time.perf_counter() - start, status=status,
+                success=isinstance(result, dict) and bool(result.get("success")),
+                request_bytes=request_size, response_bytes=response_size
+            )
 
     # 客户查询接口
     def search_orders_by_name(self, customer_name: str) -> Dict[str, Any]:
@@ -195,15 +468,60 @@ class CloudBaseClient:
         """获取管理员订单列表"""
         return self._call_function("admin-orders", data)
     
-    def get_orders(self, page: int = 1, limit: int = 20, status: str = "all", search: str = "") -> Dict[str, Any]:
-        """获取订单列表（兼容接口）"""
-        return self._call_function("admin-orders", {
+    def get_orders(self, page: int = 1, limit: int = 20, status: str = "all", search: str = "",
+                   cursor: Optional[str] = None, with_total: bool = False) -> Dict[str, Any]:
+        """
+        获取订单列表（兼容接口）
+
+        传入 cursor 时使用游标分页（首页传空字符串），忽略 page：
+        返回的 pagination 包含 has_more、next_cursor，with_total 为 True 时另外返回 total_count
+        """
+        request = {
             "action": "list",
-            "page": page,
             "page_size": limit,  # 将limit映射到page_size
             "status": status,
             "search": search
-        })
+        }
+        if cursor is None:
+            request["page"] = page
+        else:
+            request["cursor"] = cursor
+            if with_total:
+                request["with_total"] = True
+        return self._call_function("admin-orders", request)
+
+    def get_changes(self, since: str = "", limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        获取水位线之后变更的订单、进度和照片（含软删除）
+
+        Args:
+            since: 上一次返回的 watermark（为空时只返回新的水位线并要求全量加载）
+            limit: 每个集合最多返回的记录数
+
+        Returns:
+            data: {watermark, full_resync, orders, progress, photos}
+        """
+        request: Dict[str, Any] = {"action": "changes", "since": since}
+        if limit:
+            request["limit"] = limit
+        return self._call_function("admin-orders", request)
+
+    def get_snapshot_page(self, collection: str, cursor: str = "", limit: Optional[int] = None) -> Dict[str, Any]:
+        """
+        按 _id 分页获取一个集合中未删除的全部记录（建立本地副本）
+
+        Args:
+            collection: orders、order_progress 或 photos
+            cursor: 上一页返回的 next_cursor（第一页为空）
+            limit: 每页记录数
+
+        Returns:
+            data: {collection, docs, next_cursor}（最后一页 next_cursor 为 None）
+        """
+        request: Dict[str, Any] = {"action": "snapshot", "collection": collection, "cursor": cursor}
+        if limit:
+            request["limit"] = limit
+        return self._call_function("admin-orders", request)
 
     def create_admin_order(self, order_data: Dict[str, Any]) -> Dict[str, Any]:
         """创建订单"""
@@ -248,8 +566,14 @@ class CloudBaseClient:
             "data": progress_data
         })
     
-    def update_order_progress(self, order_id: str, stage_id: str, status: str, notes: str = "", actual_completion: str = None) -> Dict[str, Any]:
-        """更新订单进度（兼容接口）"""
+    def update_order_progress(self, order_id: str, stage_id: str, status: str, notes: str = "", actual_completion: str = None,
+                              expected_status: Optional[str] = None, expected_version: Optional[int] = None) -> Dict[str, Any]:
+        """
+        更新订单进度（兼容接口）
+
+        expected_status / expected_version 用于乐观并发：云函数发现阶段当前状态或版本与期望不一致时
+        返回 error_code=STAGE_CONFLICT，不写入
+        """
         progress_data = {
             "order_id": order_id,
             "stage_id": stage_id,
@@ -258,12 +582,35 @@ class CloudBaseClient:
         }
         if actual_completion:
             progress_data["actual_completion"] = actual_completion
+        if expected_status is not None:
+            progress_data["expected_status"] = expected_status
+        if expected_version is not None:
+            progress_data["expected_version"] = expected_version
             
         return self._call_function("admin-progress", {
             "action": "update",
             "data": progress_data
         })
 
+    def bulk_update_progress(self, items: List[Dict[str, Any]], operator: Optional[str] = None) -> Dict[str, Any]:
+        """
+        批量更新阶段进度（一次请求，单次最多 50 项）
+
+        Args:
+            items: [{order_id, stage_id, status, notes, expected_status, expected_version, idempotency_key}]
+            operator: 操作人（记录到操作日志）
+
+        Returns:
+            data.results 与 items 一一对应；idempotency_key 已处理过的项返回首次结果（replayed 为 True）
+        """
+        bulk_data: Dict[str, Any] = {"items": items}
+        if operator:
+            bulk_data["operator"] = operator
+        return self._call_function("admin-progress", {
+            "action": "bulk_update",
+            "data": bulk_data
+        })
+
     # 管理员仪表板接口
     def get_admin_dashboard(self, data: Dict[str, Any] = None) -> Dict[str, Any]:
         """获取管理员仪表板数据"""
@@ -273,6 +620,15 @@ class CloudBaseClient:
         """获取仪表板数据（兼容接口）"""
         return self._call_function("admin-dashboard", {})
     
+    def rebuild_dashboard_stats(self) -> Dict[str, Any]:
+        """
+        全量重算仪表板计数器（云函数每天也会定时重建一次）
+        
+        Returns:
+            data.drift 为重算前计数器与实际数据的偏差列表 [{field, stored, actual}]
+        """
+        return self._call_function("admin-dashboard", {"action": "rebuild"})
+    
     def get_admin_users(self) -> Dict[str, Any]:
         """获取管理员用户列表（兼容接口）"""
         return self._call_function("admin-users", {})
@@ -310,172 +666,70 @@ class CloudBaseClient:
             })
             
             if not result.get("success"):
-                print(f"[错误] 获取上传URL失败: {result.get('message', '未知错误')}")
+                logger.error("获取上传URL失败: %s", result.get('message', '未知错误'))
                 return result
             
             # 获取上传URL和文件信息
             upload_urls = result.get("data", {}).get("upload_urls", [])
-            print(f"[成功] 获取到 {len(upload_urls)} 个上传URL")
+            logger.debug("获取到 %d 个上传URL", len(upload_urls))
             
             if len(upload_urls) != len(files):
-                print(f"[错误] 上传URL数量不匹配: {len(upload_urls)} vs {len(files)}")
+                logger.error("上传URL数量不匹配: %d vs %d", len(upload_urls), len(files))
                 return {"success": False, "message": "上传URL数量不匹配"}
             
-            # 上传文件到云存储
+            # 只支持COS预签名直传，原图上传，不压缩
+            for upload_url in upload_urls:
+                if not is_presigned_upload(upload_url):
+                    logger.error("返回的上传方式不是预签名直传: uploadMethod=%s storage_type=%s upload_url=%s...",
+                                 upload_url.get('uploadMethod', ''), upload_url.get('storage_type', ''),
+                                 str(upload_url.get('upload_url', ''))[:100])
+                    return {"success": False, "message": "上传方式错误：只支持COS预签名直传，请检查云函数配置"}
+            
+            # 并发上传文件到云存储，每个文件单独重试
+            upload_results = self.uploader.upload_files(files, upload_urls)
+            for upload_result in upload_results:
+                self.metrics.record(
+                    "cos-upload", "multipart" if upload_result.get("multipart") else "put",
+                    upload_result.get("elapsed", 0), status=upload_result.get("status_code") or "error",
+                    success=upload_result["success"], request_bytes=upload_result.get("file_size", 0),
+                    retries=max(upload_result.get("attempts", 1) - 1, 0)
+                )
+
             uploaded_files = []
-            for i, file in enumerate(files):
-                try:
-                    upload_url = upload_urls[i]
-                    file_content = file.getvalue()
-                    
-                    print(f"[上传] 开始上传文件 {i+1}/{len(files)}: {file.name}")
-                    print(f"[数据] 原始文件大小: {len(file_content)} bytes ({len(file_content)/1024:.1f}KB)")
-
-                    # 只支持COS预签名直传，不压缩，直接使用原图
-                    print("[上传] 使用COS预签名直传，原图上传，不压缩")
-                    print(f"[URL] 上传URL: {upload_url['upload_url']}")
-                    
-                    # 验证是否为预签名URL
-                    upload_method = upload_url.get("uploadMethod", "")
-                    storage_type = upload_url.get("storage_type", "")
-                    upload_url_str = str(upload_url.get("upload_url", ""))
-                    
-                    is_presigned = (
-                        upload_method == "presigned_put" 
-                        or storage_type == "cos_presigned_put"
-                        or "q-sign-algorithm=" in upload_url_str
-                    )
-                    
-                    if not is_presigned:
-                        print(f"[错误] 错误：返回的上传方式不是预签名直传")
-                        print(f"   uploadMethod: {upload_method}")
-                        print(f"   storage_type: {storage_type}")
-                        print(f"   upload_url: {upload_url_str[:100]}...")
-                        return {"success": False, "message": "上传方式错误：只支持COS预签名直传，请检查云函数配置"}
-                    
-                    # 使用COS预签名直传方案 (PUT)，原图上传
-                    print("[上传] 使用COS预签名直传方案 (PUT)，原图上传，不压缩")
-                    # 直接向 COS 预签名 URL 发起 PUT
-                    try:
-                        import requests
-                        from urllib.parse import urlparse
-                        url_info = urlparse(upload_url["upload_url"])
-                        
-                        # 详细日志：检查URL路径
-                        print(f"[解析] 解析预签名URL:")
-                        print(f"   - 完整URL: {upload_url['upload_url'][:150]}...")
-                        print(f"   - URL路径: {url_info.path}")
-                        print(f"   - URL查询参数: {url_info.query[:100]}...")
-                        
-                        # 检查预签名URL中是否包含host在签名中
-                        # 如果q-header-list包含host，需要发送Host header
-                        put_headers = {}
-                        
-                        # 依据文件类型设置 Content-Type
-                        try:
-                            content_type = getattr(file, 'type', None) or 'application/octet-stream'
-                        except Exception:
-                            content_type = 'application/octet-stream'
-                        put_headers['Content-Type'] = content_type
-                        
-                        # Content-Length 必须与实体长度一致
-                        try:
-                            put_headers['Content-Length'] = str(len(file_content))
-                        except Exception:
-                            pass
-                        
-                        # 检查是否需要发送Host header
-                        # 优先使用云函数返回的required_host值（签名时使用的host值）
-                        # 如果没有，则从URL中解析
-                        required_host = upload_url.get("required_host")
-                        
-                        if required_host:
-                            # 使用云函数明确指定的host值，确保完全匹配
-                            put_headers['host'] = required_host
-                            print(f"   - [成功] 使用云函数指定的host header: {required_host}")
-                        elif "q-header-list" in upload_url["upload_url"]:
-                            # 解析q-header-list参数
-                            import re
-                            header_list_match = re.search(r'q-header-list=([^&]+)', upload_url["upload_url"])
-                            if header_list_match:
-                                header_list = header_list_match.group(1)
-                                if 'host' in header_list.lower():
-                                    # 需要发送host header（小写）
-                                    # 使用URL中的域名，移除端口
-                                    host_value = url_info.netloc
-                                    if ':' in host_value and url_info.scheme == 'https':
-                                        host, port = host_value.rsplit(':', 1)
-                                        if port == '443':
-                                            host_value = host
-                                    
-                                    put_headers['host'] = host_value
-                                    print(f"   - [成功] q-header-list包含host，发送host header: {host_value}")
-                                    print(f"   - [警告] 注意：如果签名失败，请检查host值是否与签名时完全一致")
-                                else:
-                                    print(f"   - q-header-list不包含host，不发送host header")
-                            else:
-                                print(f"   - 无法解析q-header-list，不发送host header")
-                        else:
-                            print(f"   - URL中无q-header-list参数，不发送host header")
-                        
-                        print(f"   - Content-Type: {put_headers.get('Content-Type')}")
-                        print(f"   - Content-Length: {put_headers.get('Content-Length')}")
-                        
-                        # 使用requests直接PUT，使用原始文件字节，保持原图质量
-                        print(f"[上传] 发送PUT请求到: {url_info.scheme}://{url_info.netloc}{url_info.path}")
-                        response = requests.put(
-                            upload_url["upload_url"],
-                            # 使用原始文件字节，保持原图质量
-                            data=file_content,
-                            headers=put_headers,
-                            timeout=60
-                        )
-                        print(f"[响应] 预签名PUT响应: {response.status_code}")
-                        if response.status_code in [200, 201, 204]:
-                            upload_success = True
-                        else:
-                            try:
-                                error_text = response.text[:300] if response.text else "无响应内容"
-                                print(f"[调试] 预签名PUT响应体: {error_text}")
-                            except Exception:
-                                pass
-                            upload_success = False
-                            error_msg = f"上传失败 (HTTP {response.status_code})"
-                    except Exception as e:
-                        print(f"[错误] 预签名PUT上传失败: {str(e)}")
-                        upload_success = False
-                        error_msg = f"上传异常: {str(e)}"
-                    
-                    if upload_success:
-                        uploaded_files.append({
-                            "file_id": upload_url.get("file_id", ""),
-                            "file_name": file.name,
-                            "file_size": file.size,
-                            "file_type": file.type,
-                            "photo_url": upload_url.get("photo_url", ""),
-                            "thumbnail_url": upload_url.get("thumbnail_url", upload_url.get("photo_url", "")),
-                            "storage_type": upload_url.get("storage_type", "cos_presigned_put"),
-                            "cloud_path": upload_url.get("cloud_path", ""),
-                            "fileID": upload_url.get("fileID", ""),  # CloudBase存储的fileID
-                            "media_type": upload_url.get("media_type", "photo"),  # 'photo' 或 'video'
-                            "file_extension": upload_url.get("file_extension", "")  # 文件扩展名
-                        })
-                        print(f"[成功] 文件 {file.name} 上传成功")
-                    else:
-                        error_msg = f"上传失败"
-                        if 'response' in locals() and response:
-                            error_msg += f" (HTTP {response.status_code})"
-                        print(f"[错误] 文件 {file.name} {error_msg}")
-                        
-                except Exception as e:
-                    print(f"[错误] 上传文件 {file.name} 时出错: {str(e)}")
+            for file, upload_url, upload_result in zip(files, upload_urls, upload_results):
+                if not upload_result["success"]:
                     continue
+                # 分片续传时文件写入的是首次上传分配的路径
+                upload_url = upload_result.get("upload_url", upload_url)
+                uploaded_files.append({
+                    "file_id": upload_url.get("file_id", ""),
+                    "file_name": file.name,
+                    "file_size": file.size,
+                    "file_type": file.type,
+                    "photo_url": upload_url.get("photo_url", ""),
+                    "thumbnail_url": upload_url.get("thumbnail_url", upload_url.get("photo_url", "")),
+                    "storage_type": upload_url.get("storage_type", "cos_presigned_put"),
+                    "cloud_path": upload_url.get("cloud_path", ""),
+                    "fileID": upload_url.get("fileID", ""),  # CloudBase存储的fileID
+                    "media_type": upload_url.get("media_type", "photo"),  # 'photo' 或 'video'
+                    "file_extension": upload_url.get("file_extension", "")  # 文件扩展名
+                })
+            
+            failed_files = [
+                {"file_name": r["file_name"], "error": r["error"]}
+                for r in upload_results if not r["success"]
+            ]
             
             if not uploaded_files:
-                return {"success": False, "message": "所有文件上传失败"}
+                return {
+                    "success": False,
+                    "message": "所有文件上传失败",
+                    "upload_results": upload_results,
+                    "failed_files": failed_files
+                }
             
-            # 确认上传完成
-            return self._call_function("photo-upload", {
+            # 只确认上传成功的文件（一次调用）
+            result = self._call_function("photo-upload", {
                 "action": "confirm_upload",
                 "data": {
                     "order_id": order_id,
@@ -484,11 +738,50 @@ class CloudBaseClient:
                     "description": description
                 }
             })
+            result["upload_results"] = upload_results
+            result["failed_files"] = failed_files
+            if failed_files and result.get("success"):
+                result["message"] = f"{result.get('message', '上传完成')}（{len(failed_files)}个文件上传失败）"
+            return result
             
         except Exception as e:
-            print(f"[错误] 照片上传异常: {str(e)}")
+            logger.error("照片上传异常: %s", e)
             return {"success": False, "message": f"照片上传失败: {str(e)}"}
     
+    def init_multipart_upload(self, cloud_path: str, part_count: int, content_type: str = "application/octet-stream",
+                              upload_id: str = "") -> Dict[str, Any]:
+        """初始化分片上传（传入 upload_id 时为续传，返回已上传的分片）"""
+        return self._call_function("photo-upload", {
+            "action": "init_multipart",
+            "data": {
+                "cloud_path": cloud_path,
+                "part_count": part_count,
+                "content_type": content_type,
+                "upload_id": upload_id
+            }
+        })
+    
+    def complete_multipart_upload(self, cloud_path: str, upload_id: str, parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """合并已上传的分片"""
+        return self._call_function("photo-upload", {
+            "action": "complete_multipart",
+            "data": {
+                "cloud_path": cloud_path,
+                "upload_id": upload_id,
+                "parts": parts
+            }
+        })
+    
+    def abort_multipart_upload(self, cloud_path: str, upload_id: str) -> Dict[str, Any]:
+        """取消分片上传，释放已上传的分片"""
+        return self._call_function("photo-upload", {
+            "action": "abort_multipart",
+            "data": {
+                "cloud_path": cloud_path,
+                "upload_id": upload_id
+            }
+        })
+    
     def delete_photo(self, photo_id: str, reason: str = "", delete_from_storage: bool = True) -> Dict[str, Any]:
         """删除照片或视频"""
         if not photo_id:
@@ -612,11 +905,53 @@ class CloudBaseClient:
             "is_active": is_active
         })
     
-    def get_operation_logs(self) -> Dict[str, Any]:
-        """获取操作日志"""
-        return self._call_function("admin-logs", {
-            "action": "list"
-        })
+    def get_operation_logs(self, filters: Optional[Dict[str, Any]] = None, cursor: str = "",
+                           limit: Optional[int] = None, with_total: bool = False) -> Dict[str, Any]:
+        """
+        按时间倒序获取一页操作日志（游标分页，筛选在云函数中完成）
+
+        Args:
+            filters: {'type': 操作类型, 'since': 开始时间（含，ISO）, 'until': 结束时间（不含，ISO）,
+                      'order_number': 订单编号, 'operator': 操作人, 'customer': 客户姓名}，空值表示不限
+            cursor: 上一页返回的 next_cursor（首页为空字符串）
+            limit: 每页条数（云函数默认 100，最多 500）
+            with_total: 是否同时返回符合条件的总数
+
+        Returns:
+            data: {logs, pagination: {page_size, has_more, next_cursor[, total_count]}}
+        """
+        request: Dict[str, Any] = {"action": "list"}
+        request.update({key: value for key, value in (filters or {}).items() if value})
+        if cursor:
+            request["cursor"] = cursor
+        if limit:
+            request["limit"] = limit
+        if with_total:
+            request["with_total"] = True
+        return self._call_function("admin-logs", request)
+
+    def iter_operation_logs(self, filters: Optional[Dict[str, Any]] = None,
+                            page_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        按时间倒序逐条返回符合条件的全部操作日志，每次只请求一页
+
+        请求失败时抛出 RuntimeError。
+
+        Args:
+            filters: 与 get_operation_logs 相同
+            page_size: 每次请求的日志条数
+
+        Yields:
+            日志字典
+        """
+        cursor: Optional[str] = ""
+        while cursor is not None:
+            result = self.get_operation_logs(filters, cursor=cursor, limit=page_size)
+            if not result.get("success"):
+                raise RuntimeError(result.get("message") or "获取操作日志失败")
+            data = result.get("data") or {}
+            cursor = (data.get("pagination") or {}).get("next_cursor")
+            yield from data.get("logs", [])
 
 # 创建全局实例
 api_client = CloudBaseClient()
@@ -0,0 +1,354 @@
+"""
+COS 预签名并发上传
+
+将多个文件并发 PUT 到云函数生成的 COS 预签名地址：
+- 有界线程池，总耗时接近最大文件的上传时间，而不是所有文件耗时之和
+- 每个文件单独返回上传结果，单个文件失败不影响其他文件
+- 网络异常和 5xx/429 等可重试的响应按指数退避重试；签名错误等 4xx 不重试
+- 流式上传：请求体直接读取上传文件对象，不再复制整个文件
+- 超过阈值的文件使用 COS 分片上传：分片并发上传，内存占用不超过 分片大小 × 分片并发数；
+  部分分片失败时保留上传会话，再次上传同一文件时只补传缺失的分片；同一会话连续失败
+  max_multipart_rounds 次后取消分片上传（abort），不在存储桶中留下未完成的分片
+"""
+
+import logging
+import math
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+
+# 可以重试的 HTTP 状态码
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+def is_presigned_upload(upload_url: Dict[str, Any]) -> bool:
+    """判断云函数返回的上传地址是否为 COS 预签名直传"""
+    return (
+        upload_url.get("uploadMethod", "") == "presigned_put"
+        or upload_url.get("storage_type", "") == "cos_presigned_put"
+        or "q-sign-algorithm=" in str(upload_url.get("upload_url", ""))
+    )
+
+
+def build_put_headers(upload_url: Dict[str, Any], content_type: str, content_length: int) -> Dict[str, str]:
+    """
+    构建预签名 PUT 请求头
+
+    如果签名包含 host（q-header-list 中有 host），需要发送与签名时一致的 host 头；
+    优先使用云函数返回的 required_host。
+    """
+    headers = {
+        "Content-Type": content_type or "application/octet-stream",
+        # Content-Length 必须与实体长度一致
+        "Content-Length": str(content_length)
+    }
+
+    url = upload_url.get("upload_url", "")
+    required_host = upload_url.get("required_host")
+    if required_host:
+        headers["host"] = required_host
+    elif "q-header-list" in url:
+        header_list_match = re.search(r'q-header-list=([^&]+)', url)
+        if header_list_match and "host" in header_list_match.group(1).lower():
+            url_info = urlparse(url)
+            host_value = url_info.netloc
+            if ":" in host_value and url_info.scheme == "https":
+                host, port = host_value.rsplit(":", 1)
+                if port == "443":
+                    host_value = host
+            headers["host"] = host_value
+
+    return headers
+
+
+def get_file_size(file: Any) -> int:
+    """获取上传文件大小（优先使用 size 属性，避免读取内容）"""
+    size = getattr(file, "size", None)
+    if size is not None:
+        return int(size)
+    position = file.tell()
+    file.seek(0, 2)
+    size = file.tell()
+    file.seek(position)
+    return size
+
+
+class CosUploader:
+    """COS 预签名并发上传器"""
+
+    def __init__(self, transport, max_workers: int = 4, max_retries: int = 3,
+                 backoff_base: float = 0.5, timeout: float = 60, sleep=time.sleep,
+                 multipart_api=None, multipart_threshold: int = 16 * 1024 * 1024,
+                 part_size: int = 8 * 1024 * 1024, part_concurrency: int = 4, max_multipart_rounds: int = 3):
+        """
+        Args:
+            transport: PooledTransport 实例（复用连接池发送 PUT）
+            max_workers: 最大并发上传数
+            max_retries: 单个文件（或分片）失败后的最大重试次数
+            backoff_base: 首次重试等待时间（秒），之后每次翻倍
+            timeout: 单次 PUT 超时（秒）
+            sleep: 等待函数（便于测试）
+            multipart_api: 提供 init/complete/abort_multipart_upload 的客户端，为 None 时不使用分片上传
+            multipart_threshold: 超过该大小（字节）的文件使用分片上传
+            part_size: 分片大小（字节，COS 要求除最后一片外不小于 1MB）
+            part_concurrency: 单个文件的分片并发数
+            max_multipart_rounds: 同一分片上传会话最多尝试的次数（含续传），用完后取消上传并丢弃会话
+        """
+        self.transport = transport
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.timeout = timeout
+        self._sleep = sleep
+        self.multipart_api = multipart_api
+        self.multipart_threshold = multipart_threshold
+        self.part_size = part_size
+        self.part_concurrency = part_concurrency
+        self.max_multipart_rounds = max_multipart_rounds
+        # 未完成的分片上传会话：文件指纹 -> {upload_url, upload_id, etags, rounds}
+        self._sessions: Dict[tuple, Dict[str, Any]] = {}
+        self._sessions_lock = threading.Lock()
+
+    def _backoff(self, attempt: int) -> float:
+        """第 attempt 次失败后的等待时间：指数退避 + 随机抖动"""
+        delay = self.backoff_base * (2 ** (attempt - 1))
+        return delay + random.uniform(0, delay / 4)
+
+    def put_with_retry(self, url: str, read_body, headers: Dict[str, str]) -> Dict[str, Any]:
+        """
+        PUT 上传，失败时按指数退避重试
+
+        Args:
+            url: 预签名地址
+            read_body: 返回请求体的函数（每次重试重新读取）
+            headers: 请求头
+
+        Returns:
+            {success, status_code, attempts, error, etag}
+        """
+        status_code = None
+        error = ""
+        attempt = 0
+        while attempt <= self.max_retries:
+            attempt += 1
+            try:
+                response = self.transport.put(url, data=read_body(), headers=headers, timeout=self.timeout)
+                status_code = response.status_code
+                if status_code in (200, 201, 204):
+                    return {
+                        "success": True,
+                        "status_code": status_code,
+                        "attempts": attempt,
+                        "error": "",
+                        "etag": response.headers.get("ETag", "")
+                    }
+                error = f"上传失败 (HTTP {status_code})"
+                retryable = status_code in RETRYABLE_STATUS
+            except Exception as e:
+                error = f"上传异常: {str(e)}"
+                retryable = True
+
+            if not retryable or attempt > self.max_retries:
+                break
+            logger.warning("%s，第%d次重试", error, attempt)
+            self._sleep(self._backoff(attempt))
+
+        return {"success": False, "status_code": status_code, "attempts": attempt, "error": error, "etag": ""}
+
+    def upload_file(self, file: Any, upload_url: Dict[str, Any]) -> Dict[str, Any]:
+        """上传单个文件到预签名地址（大文件自动使用分片上传）"""
+        start = time.time()
+        file_name = getattr(file, "name", "")
+        content_type = getattr(file, "type", None) or "application/octet-stream"
+        file_size = get_file_size(file)
+
+        if self.multipart_api is not None and file_size >= self.multipart_threshold:
+            result = self.upload_multipart(file, upload_url, file_size, content_type)
+        else:
+            headers = build_put_headers(upload_url, content_type, file_size)
+
+            def read_body():
+                # 直接以文件对象作为请求体流式发送，重试时从头读取
+                file.seek(0)
+                return file
+
+            result = self.put_with_retry(upload_url["upload_url"], read_body, headers)
+            result["upload_url"] = upload_url
+
+        result.update({
+            "file_name": file_name,
+            "file_size": file_size,
+            "elapsed": round(time.time() - start, 3)
+        })
+        if result["success"]:
+            logger.info("文件 %s 上传成功（%d次尝试，%s秒）", file_name, result["attempts"], result["elapsed"])
+        else:
+            logger.error("文件 %s %s", file_name, result["error"])
+        return result
+
+    def _session_key(self, file: Any, upload_url: Dict[str, Any], file_size: int) -> tuple:
+        """分片上传会话的文件指纹：订单 + 阶段 + 文件名 + 大小"""
+        metadata = upload_url.get("metadata") or {}
+        return (metadata.get("order_id", ""), metadata.get("stage_id", ""), getattr(file, "name", ""), file_size)
+
+    def _open_session(self, session_key: tuple, upload_url: Dict[str, Any],
+                      part_count: int, content_type: str) -> Dict[str, Any]:
+        """初始化分片上传；已有未完成的会话时续传"""
+        with self._sessions_lock:
+            session = self._sessions.get(session_key)
+
+        if session is not None:
+            result = self.multipart_api.init_multipart_upload(
+                session["upload_url"]["cloud_path"], part_count, content_type, upload_id=session["upload_id"]
+            )
+            if result.get("success"):
+                data = result.get("data", {})
+                # 以服务端记录为准合并已上传的分片
+                for part in data.get("uploaded_parts", []):
+                    session["etags"][part["part_number"]] = part["etag"]
+                session["part_urls"] = {p["part_number"]: p["upload_url"] for p in data.get("part_urls", [])}
+                session["resumed"] = True
+                logger.info("继续分片上传，已完成 %d/%d 个分片", len(session["etags"]), part_count)
+                return session
+            logger.warning("无法续传分片上传，重新开始: %s", result.get("message", ""))
+            self._abort_session(session_key, session)
+
+        result = self.multipart_api.init_multipart_upload(upload_url.get("cloud_path", ""), part_count, content_type)
+        if not result.get("success"):
+            raise RuntimeError(result.get("message", "初始化分片上传失败"))
+        data = result.get("data", {})
+        session = {
+            "upload_url": upload_url,
+            "upload_id": data["upload_id"],
+            "part_urls": {p["part_number"]: p["upload_url"] for p in data.get("part_urls", [])},
+            "etags": {},
+            "resumed": False,
+            "rounds": 0
+        }
+        with self._sessions_lock:
+            self._sessions[session_key] = session
+        return session
+
+    def upload_multipart(self, file: Any, upload_url: Dict[str, Any], file_size: int, content_type: str) -> Dict[str, Any]:
+        """
+        分片上传大文件
+
+        每个分片在工作线程中按需读取，同一时刻内存中最多有 part_concurrency 个分片。
+        """
+        part_count = max(1, math.ceil(file_size / self.part_size))
+        session_key = self._session_key(file, upload_url, file_size)
+        try:
+            session = self._open_session(session_key, upload_url, part_count, content_type)
+        except Exception as e:
+            return {"success": False, "status_code": None, "attempts": 0, "error": f"分片上传初始化失败: {str(e)}",
+                    "etag": "", "multipart": True, "parts": part_count, "parts_uploaded": 0, "upload_url": upload_url}
+
+        session["rounds"] += 1
+        pending = [n for n in range(1, part_count + 1) if n not in session["etags"]]
+        read_lock = threading.Lock()
+
+        def upload_part(part_number: int) -> Dict[str, Any]:
+            with read_lock:
+                file.seek((part_number - 1) * self.part_size)
+                chunk = file.read(self.part_size)
+            result = self.put_with_retry(
+                session["part_urls"][part_number],
+                lambda: chunk,
+                {"Content-Length": str(len(chunk))}
+            )
+            if result["success"]:
+                session["etags"][part_number] = result["etag"]
+            return result
+
+        workers = max(1, min(self.part_concurrency, len(pending) or 1))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cos-part") as executor:
+            part_results = list(executor.map(upload_part, pending))
+
+        attempts = max([r["attempts"] for r in part_results], default=0)
+        result = {
+            "multipart": True,
+            "parts": part_count,
+            "parts_uploaded": len(session["etags"]),
+            "resumed": session["resumed"],
+            "attempts": attempts,
+            "upload_url": session["upload_url"]
+        }
+
+        failed = [r for r in part_results if not r["success"]]
+        if failed:
+            # 保留会话，再次上传同一文件时只补传失败的分片
+            result.update({"success": False, "status_code": failed[0]["status_code"], "etag": "",
+                           "error": f"{len(failed)}个分片上传失败，可重新上传续传: {failed[0]['error']}"})
+            return self._give_up_if_exhausted(session_key, session, result)
+
+        parts = [{"part_number": n, "etag": session["etags"][n]} for n in range(1, part_count + 1)]
+        complete = self.multipart_api.complete_multipart_upload(
+            session["upload_url"]["cloud_path"], session["upload_id"], parts
+        )
+        if not complete.get("success"):
+            result.update({"success": False, "status_code": None, "etag": "",
+                           "error": f"合并分片失败: {complete.get('message', '')}"})
+            return self._give_up_if_exhausted(session_key, session, result)
+
+        with self._sessions_lock:
+            self._sessions.pop(session_key, None)
+        result.update({"success": True, "status_code": 200, "error": "",
+                       "etag": complete.get("data", {}).get("etag", "")})
+        return result
+
+    def _give_up_if_exhausted(self, session_key: tuple, session: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        """会话的尝试次数用完时取消分片上传，结果中标记为不可续传"""
+        if session["rounds"] < self.max_multipart_rounds:
+            return result
+        self._abort_session(session_key, session)
+        result["aborted"] = True
+        result["error"] = f"分片上传{session['rounds']}次均未完成，已取消: {result['error']}"
+        return result
+
+    def _abort_session(self, session_key: tuple, session: Dict[str, Any]):
+        """丢弃会话并取消服务端的分片上传，释放已上传的分片（失败时只记录日志）"""
+        with self._sessions_lock:
+            if self._sessions.get(session_key) is session:
+                del self._sessions[session_key]
+        try:
+            result = self.multipart_api.abort_multipart_upload(session["upload_url"].get("cloud_path", ""),
+                                                               session["upload_id"])
+            if not result.get("success"):
+                logger.warning("取消分片上传失败: %s", result.get("message", ""))
+        except Exception as e:
+            logger.warning("取消分片上传异常: %s", e)
+
+    def upload_files(self, files: List[Any], upload_urls: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        并发上传多个文件
+
+        Returns:
+            与 files 顺序一致的上传结果列表，每项包含 index、file_name、success、attempts、error 等
+        """
+        if not files:
+            return []
+
+        def run(index: int) -> Dict[str, Any]:
+            try:
+                result = self.upload_file(files[index], upload_urls[index])
+            except Exception as e:
+                result = {
+                    "success": False,
+                    "status_code": None,
+                    "attempts": 0,
+                    "error": f"上传异常: {str(e)}",
+                    "file_name": getattr(files[index], "name", "")
+                }
+            result["index"] = index
+            return result
+
+        workers = max(1, min(self.max_workers, len(files)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="cos-upload") as executor:
+            return list(executor.map(run, range(len(files))))
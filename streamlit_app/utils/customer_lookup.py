@@ -0,0 +1,226 @@
+"""
+客户查询保护
+
+公开的客户查询页面每次提交都会调用 customer-search，这里在调用前加上缓存和限流：
+- 结果缓存：按规范化后的 (查询类型, 查询值) 缓存在进程共享的响应缓存中，缓存键是哈希值，
+  缓存里不出现明文电话或订单号，只有输入同一号码的访问者才会命中
+- 规范化只用于缓存键，发给 customer-search 的仍是访问者输入的原值：云函数按原值精确匹配，
+  而订单中的电话是自由文本（可能保存为 138-1234-5678 或 +86…）
+- 有结果的缓存 ttl 秒；无结果的缓存 negative_ttl 秒，按原始写法缓存（换一种写法可能查得到）
+- 缓存条目带 orders 标签，本进程的订单创建、阶段更新等写操作后随其他订单缓存一起失效
+- 令牌桶限流：每个会话和每个 IP 各一个桶，只有未命中缓存、需要调用云函数的查询消耗令牌
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from config import CUSTOMER_LOOKUP_CONFIG
+from utils.cloudbase_client import api_client
+
+# 缓存条目依赖的数据标签（订单的任何写操作都会失效 orders 标签）
+LOOKUP_TAGS = ["orders"]
+
+
+def normalize_lookup(search_type: str, search_value: str) -> str:
+    """
+    规范化查询值，同一号码的不同写法对应同一个缓存条目
+
+    - phone：只保留数字，去掉 +86 / 86 国家码
+    - order_number：去掉空白并转为大写
+    - email：转为小写
+    - 其他（姓名）：去掉首尾空白，合并中间的空白
+    """
+    value = (search_value or "").strip()
+    if search_type == "phone":
+        digits = re.sub(r"[^0-9]", "", value)
+        if len(digits) == 13 and digits.startswith("86"):
+            digits = digits[2:]
+        return digits
+    if search_type == "order_number":
+        return re.sub(r"\s+", "", value).upper()
+    if search_type == "email":
+        return value.lower()
+    return re.sub(r"\s+", " ", value)
+
+
+def lookup_cache_key(search_type: str, value: str, negative: bool = False) -> str:
+    """缓存键：查询类型和值的哈希（negative 为 True 时是无结果缓存的键）"""
+    digest = hashlib.sha256(f"{search_type}:{value}".encode("utf-8")).hexdigest()
+    return f"customer-lookup{'-miss' if negative else ''}:{digest}"
+
+
+def client_ip(forwarded_for: str, trusted_hops: int, peer_ip: Optional[str]) -> Optional[str]:
+    """
+    限流使用的客户端 IP
+
+    每层代理把它看到的对端地址追加到 X-Forwarded-For 末尾，所以只有最右边 trusted_hops 个地址是
+    受信任的代理写入的；从右数第 trusted_hops 个就是最外层代理看到的客户端地址。更靠左的地址可以由
+    客户端随意伪造，不能用作限流的键。
+
+    Args:
+        forwarded_for: X-Forwarded-For 请求头
+        trusted_hops: 受信任的代理层数（0 表示不使用该请求头）
+        peer_ip: 直接连接的对端地址（没有可信的转发地址时使用）
+    """
+    hops = [hop.strip() for hop in (forwarded_for or "").split(",") if hop.strip()]
+    if trusted_hops > 0 and len(hops) >= trusted_hops:
+        return hops[-trusted_hops]
+    return peer_ip or None
+
+
+class TokenBucketLimiter:
+    """按键（会话ID、IP）的令牌桶限流器，键的数量有上限（LRU 淘汰）"""
+
+    def __init__(self, capacity: float, refill_per_second: float, max_keys: int = 10000, clock=time.monotonic):
+        """
+        Args:
+            capacity: 桶容量（允许的突发查询次数）
+            refill_per_second: 每秒补充的令牌数
+            max_keys: 最多跟踪的键数
+            clock: 时钟函数（便于测试）
+        """
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        # 键 -> [剩余令牌, 上次更新时间]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def _bucket(self, key: str, now: float) -> List[float]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [self.capacity, now]
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_per_second)
+            bucket[1] = now
+        self._buckets.move_to_end(key)
+        return bucket
+
+    def retry_after(self, key: str) -> float:
+        """需要等待的秒数（0 表示现在可以查询），不消耗令牌"""
+        with self._lock:
+            tokens = self._bucket(key, self._clock())[0]
+        if tokens >= 1:
+            return 0.0
+        return (1 - tokens) / self.refill_per_second if self.refill_per_second > 0 else float("inf")
+
+    def consume(self, key: str):
+        """消耗一个令牌"""
+        with self._lock:
+            bucket = self._bucket(key, self._clock())
+            bucket[0] = max(0.0, bucket[0] - 1)
+
+
+class CustomerLookup:
+    """带缓存和限流的客户订单查询"""
+
+    def __init__(self, client, ttl: float = 60, negative_ttl: float = 20,
+                 session_limiter: Optional[TokenBucketLimiter] = None,
+                 ip_limiter: Optional[TokenBucketLimiter] = None):
+        """
+        Args:
+            client: CloudBaseClient（使用其响应缓存和调用指标）
+            ttl: 有结果的缓存时间（秒）
+            negative_ttl: 无结果的缓存时间（秒）
+            session_limiter: 按会话限流
+            ip_limiter: 按 IP 限流
+        """
+        self.client = client
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.session_limiter = session_limiter
+        self.ip_limiter = ip_limiter
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "negative": 0, "throttled": 0}
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _limits(self, session_id: Optional[str], ip: Optional[str]):
+        return [(limiter, key) for limiter, key in ((self.session_limiter, session_id), (self.ip_limiter, ip))
+                if limiter is not None and key]
+
+    def search(self, search_type: str, search_value: str,
+               session_id: Optional[str] = None, ip: Optional[str] = None) -> Dict[str, Any]:
+        """
+        查询订单
+
+        Args:
+            search_type: phone / order_number / email / name
+            search_value: 查询值
+            session_id: 会话ID（按会话限流）
+            ip: 客户端 IP（按 IP 限流）
+
+        Returns:
+            customer-search 的结果；命中缓存时带 cached=True，被限流时 success=False、
+            rate_limited=True、retry_after 为需要等待的秒数
+        """
+        normalized = normalize_lookup(search_type, search_value)
+        if not normalized:
+            return {"success": False, "message": "查询内容不能为空", "data": []}
+
+        start = time.perf_counter()
+        raw = search_value.strip()
+        key = lookup_cache_key(search_type, normalized)
+        negative_key = lookup_cache_key(search_type, raw, negative=True)
+        cached = self.client.cache.get(key, "customer-search")
+        if cached is None:
+            cached = self.client.cache.get(negative_key, "customer-search")
+        if cached is not None:
+            self._count("hits")
+            self.client.metrics.record("customer-search", "", time.perf_counter() - start,
+                                       status="cache", cache_hit=True)
+            return {**cached, "cached": True}
+
+        limits = self._limits(session_id, ip)
+        wait = max((limiter.retry_after(limit_key) for limiter, limit_key in limits), default=0.0)
+        if wait > 0:
+            self._count("throttled")
+            return {
+                "success": False,
+                "message": f"查询过于频繁，请 {max(1, round(wait))} 秒后再试",
+                "data": [],
+                "rate_limited": True,
+                "retry_after": round(wait, 1)
+            }
+        for limiter, limit_key in limits:
+            limiter.consume(limit_key)
+
+        self._count("misses")
+        versions = self.client.cache.tag_versions(LOOKUP_TAGS)
+        result = self.client.search_orders(search_type=search_type, search_value=raw)
+        if result.get("success"):
+            data = result.get("data")
+            orders = data.get("data", []) if isinstance(data, dict) else data
+            if orders:
+                self.client.cache.set(key, result, "customer-search", self.ttl, LOOKUP_TAGS, versions)
+            else:
+                self._count("negative")
+                self.client.cache.set(negative_key, result, "customer-search", self.negative_ttl,
+                                      LOOKUP_TAGS, versions)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存命中、无结果和限流次数"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+customer_lookup = CustomerLookup(
+    api_client,
+    ttl=CUSTOMER_LOOKUP_CONFIG["ttl"],
+    negative_ttl=CUSTOMER_LOOKUP_CONFIG["negative_ttl"],
+    session_limiter=TokenBucketLimiter(**CUSTOMER_LOOKUP_CONFIG["session_rate"]),
+    ip_limiter=TokenBucketLimiter(**CUSTOMER_LOOKUP_CONFIG["ip_rate"])
+)
@@ -0,0 +1,266 @@
+"""
+后台导出
+
+页面上的导出按钮原来在每次重新运行时都把全部数据拼成列表、转换为 DataFrame 并生成 Excel，
+即使没人点击也要付出这些代价。这里改为点击后才生成：
+- 数据来源是逐条返回的迭代器（通常是游标分页的 iter_orders / iter_operation_logs），一次只持有一页
+- xlsx 使用 openpyxl 的只写模式逐行写入，CSV 按块写入临时文件，内存占用与导出的行数无关
+- 导出在后台线程执行，页面轮询进度，完成后把临时文件交给 st.download_button
+- 导出任务有过期时间，过期或被丢弃时删除临时文件
+"""
+
+import csv
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import EXPORT_CONFIG
+
+try:
+    from openpyxl import Workbook
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 导出列：(表头, 从一行数据取值的函数)
+ExportColumn = Tuple[str, Callable[[Dict[str, Any]], Any]]
+
+MIME_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv"
+}
+
+# Excel 单元格不允许的控制字符
+_ILLEGAL_XLSX_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _xlsx_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return _ILLEGAL_XLSX_CHARS.sub("", value)
+    if isinstance(value, (int, float, bool)):
+        return value
+    return str(value)
+
+
+class _XlsxWriter:
+    """openpyxl 只写模式：行写入后即序列化到临时文件，不在内存中保留"""
+
+    def __init__(self, path: str, headers: List[str]):
+        if not OPENPYXL_AVAILABLE:
+            raise RuntimeError("缺少 openpyxl 包，请安装：pip install openpyxl，或改为导出 CSV")
+        self.path = path
+        self.workbook = Workbook(write_only=True)
+        self.sheet = self.workbook.create_sheet()
+        self.sheet.append(headers)
+
+    def write_rows(self, rows: List[List[Any]]):
+        for row in rows:
+            self.sheet.append([_xlsx_value(value) for value in row])
+
+    def close(self):
+        self.workbook.save(self.path)
+
+
+class _CsvWriter:
+    """按块写入 CSV（带 BOM，Excel 打开中文不乱码）"""
+
+    def __init__(self, path: str, headers: List[str]):
+        self.path = path
+        self.file = open(path, "w", encoding="utf-8-sig", newline="")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(headers)
+
+    def write_rows(self, rows: List[List[Any]]):
+        self.writer.writerows(["" if value is None else value for value in row] for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+_WRITERS = {"xlsx": _XlsxWriter, "csv": _CsvWriter}
+
+
+class ExportJob:
+    """一次导出任务的状态（后台线程更新，页面只读）"""
+
+    def __init__(self, file_name: str, file_format: str, total: Optional[int] = None):
+        self.id = uuid.uuid4().hex
+        self.file_name = file_name
+        self.file_format = file_format
+        self.mime = MIME_TYPES[file_format]
+        self.total = total
+        self.rows = 0
+        self.status = "running"    # running / done / failed / cancelled
+        self.error = ""
+        self.path = ""
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status != "running"
+
+    def progress(self) -> Optional[float]:
+        """完成比例（0~1）；总行数未知时返回 None"""
+        if self.status == "done":
+            return 1.0
+        if not self.total:
+            return None
+        return min(1.0, self.rows / self.total)
+
+    def cancel(self):
+        """请求停止导出（在下一个块写入前生效）"""
+        self._cancel.set()
+
+    def open(self):
+        """打开导出完成的文件（传给 st.download_button）"""
+        if self.status != "done":
+            raise RuntimeError("导出尚未完成")
+        return open(self.path, "rb")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "file_name": self.file_name,
+            "status": self.status,
+            "rows": self.rows,
+            "total": self.total,
+            "error": self.error
+        }
+
+
+class ExportManager:
+    """后台导出任务：有界线程池执行，按任务ID查询进度"""
+
+    def __init__(self, max_workers: int = 2, chunk_size: int = 500, job_ttl: float = 1800,
+                 directory: Optional[str] = None):
+        """
+        Args:
+            max_workers: 同时执行的导出数
+            chunk_size: 每次写入的行数（同时也是取消和进度更新的粒度）
+            job_ttl: 完成的任务保留多久（秒），过期后删除临时文件
+            directory: 临时文件目录（默认系统临时目录）
+        """
+        self.chunk_size = chunk_size
+        self.job_ttl = job_ttl
+        self.directory = directory
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="export")
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, ExportJob] = {}
+
+    def start(self, rows: Iterable[Dict[str, Any]], columns: Sequence[ExportColumn], file_name: str,
+              file_format: str = "xlsx", total: Optional[int] = None) -> ExportJob:
+        """
+        开始导出
+
+        Args:
+            rows: 数据行（迭代器在后台线程中消费，不要在页面线程中先展开为列表）
+            columns: 导出列
+            file_name: 下载文件名（不含扩展名）
+            file_format: xlsx 或 csv
+            total: 总行数（已知时用于显示进度百分比）
+
+        Returns:
+            导出任务
+        """
+        if file_format not in _WRITERS:
+            raise ValueError(f"不支持的导出格式: {file_format}")
+        self.cleanup()
+        job = ExportJob(f"{file_name}.{file_format}", file_format, total)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._executor.submit(self._run, job, rows, list(columns))
+        return job
+
+    def _run(self, job: ExportJob, rows: Iterable[Dict[str, Any]], columns: List[ExportColumn]):
+        fd, job.path = tempfile.mkstemp(prefix="export-", suffix=f".{job.file_format}", dir=self.directory)
+        os.close(fd)
+        try:
+            writer = _WRITERS[job.file_format](job.path, [header for header, _ in columns])
+            getters = [getter for _, getter in columns]
+            try:
+                chunk: List[List[Any]] = []
+                for row in rows:
+                    chunk.append([getter(row) for getter in getters])
+                    if len(chunk) >= self.chunk_size:
+                        if job._cancel.is_set():
+                            break
+                        writer.write_rows(chunk)
+                        job.rows += len(chunk)
+                        chunk = []
+                if job._cancel.is_set():
+                    job.status = "cancelled"
+                else:
+                    writer.write_rows(chunk)
+                    job.rows += len(chunk)
+            finally:
+                writer.close()
+                # 提前停止时关闭生成器，释放分页迭代器的预取线程
+                close = getattr(rows, "close", None)
+                if close:
+                    close()
+            if job.status == "running":
+                job.status = "done"
+        except Exception as e:
+            logger.exception("导出失败: %s", job.file_name)
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            # 未完成或执行期间被丢弃的任务不保留文件
+            if job.status != "done" or job._cancel.is_set():
+                self._remove_file(job)
+
+    def get(self, job_id: Optional[str]) -> Optional[ExportJob]:
+        """按ID查询任务（已过期或不存在时返回 None）"""
+        if not job_id:
+            return None
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def discard(self, job_id: Optional[str]):
+        """丢弃任务：停止正在执行的导出，删除临时文件"""
+        with self._lock:
+            job = self._jobs.pop(job_id, None) if job_id else None
+        if job is None:
+            return
+        job.cancel()
+        if job.finished:
+            self._remove_file(job)
+
+    def cleanup(self):
+        """删除过期的已完成任务"""
+        now = time.time()
+        with self._lock:
+            expired = [job for job in self._jobs.values()
+                       if job.finished_at is not None and now - job.finished_at > self.job_ttl]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            self._remove_file(job)
+
+    @staticmethod
+    def _remove_file(job: ExportJob):
+        if job.path:
+            try:
+                os.remove(job.path)
+            except OSError:
+                pass
+
+
+export_manager = ExportManager(
+    max_workers=EXPORT_CONFIG["max_workers"],
+    chunk_size=EXPORT_CONFIG["chunk_size"],
+    job_ttl=EXPORT_CONFIG["job_ttl"]
+)
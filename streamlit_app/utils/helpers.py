@@ -1,11 +1,14 @@
 import streamlit as st
-from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import List, Dict, Any, Optional, Callable
+import numpy as np
 import pandas as pd
 import re
 import requests
 import base64
 from config import PRODUCTION_STAGES, STATUS_MAPPING, ORDER_STATUS_MAPPING
+from utils.export_engine import export_manager
 
 def translate_role(role: str) -> str:
     """将角色英文名翻译为中文"""
@@ -16,60 +19,134 @@ def translate_role(role: str) -> str:
     }
     return role_map.get(role, role)
 
+# 页面显示的时间统一为北京时间 (UTC+8)
+BEIJING_TZ = timezone(timedelta(hours=8))
+
+DATETIME_FORMATS = {
+    "date": "%Y年%m月%d日",
+    "time": "%H:%M",
+    "datetime": "%Y年%m月%d日 %H:%M",
+}
+DEFAULT_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 批量格式化的输出布局：ISO 字符串 "YYYY-MM-DDTHH:MM:SS" 中的字符区间或固定文字
+_COLUMN_LAYOUTS = {
+    "date": [(0, 4), "年", (5, 7), "月", (8, 10), "日"],
+    "time": [(11, 16)],
+    "datetime": [(0, 4), "年", (5, 7), "月", (8, 10), "日 ", (11, 16)],
+}
+_DEFAULT_COLUMN_LAYOUT = [(0, 10), " ", (11, 19)]
+# 时间字符串结尾的时区（Z 或 +08:00 等），只在末尾 6 个字符中查找
+_TZ_SUFFIX = re.compile(r"(?:[zZ]|[+-]\d{2}(?::?\d{2})?)$")
+
+
+@lru_cache(maxsize=4096)
+def _parse_beijing_time(text: str) -> Optional[datetime]:
+    """解析 ISO 时间字符串并转换为北京时间（不带时区）；无法解析时返回 None"""
+    try:
+        parsed = datetime.fromisoformat(text.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    # 没有时区信息的时间按 UTC 处理
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(BEIJING_TZ).replace(tzinfo=None)
+
+
+def _relative_text(days: int, seconds: int) -> str:
+    if days > 0:
+        return f"{days}天前"
+    elif seconds > 3600:
+        return f"{seconds // 3600}小时前"
+    elif seconds > 60:
+        return f"{seconds // 60}分钟前"
+    return "刚刚"
+
+
 def format_datetime(dt_str: str, format_type: str = "datetime") -> str:
-    """格式化日期时间 - 自动转换UTC到北京时间(UTC+8)"""
+    """格式化日期时间 - 自动转换UTC到北京时间(UTC+8)，字符串的解析结果有缓存"""
     try:
         if not dt_str:
             return "-"
         
-        # 处理不同的时间格式
         if isinstance(dt_str, datetime):
-            # 如果已经是datetime对象，直接使用
-            utc_time = dt_str
+            # 如果datetime没有时区信息，假设是UTC
+            utc_time = dt_str if dt_str.tzinfo else dt_str.replace(tzinfo=timezone.utc)
+            beijing_time_naive = utc_time.astimezone(BEIJING_TZ).replace(tzinfo=None)
         else:
-            # 字符串格式转换为datetime
-            dt_str_clean = str(dt_str).replace('Z', '+00:00')
-            utc_time = datetime.fromisoformat(dt_str_clean)
-        
-        # 如果datetime没有时区信息，假设是UTC
-        if utc_time.tzinfo is None:
-            from datetime import timezone
-            utc_time = utc_time.replace(tzinfo=timezone.utc)
-        
-        # 转换到北京时间 (UTC+8)
-        from datetime import timedelta, timezone
-        beijing_tz = timezone(timedelta(hours=8))
-        beijing_time = utc_time.astimezone(beijing_tz)
-        
-        # 移除时区信息用于格式化
-        beijing_time_naive = beijing_time.replace(tzinfo=None)
+            beijing_time_naive = _parse_beijing_time(str(dt_str))
+            if beijing_time_naive is None:
+                return str(dt_str)
         
-        if format_type == "date":
-            return beijing_time_naive.strftime("%Y年%m月%d日")
-        elif format_type == "time":
-            return beijing_time_naive.strftime("%H:%M")
-        elif format_type == "datetime":
-            return beijing_time_naive.strftime("%Y年%m月%d日 %H:%M")
-        elif format_type == "relative":
-            now = datetime.now()
-            diff = now - beijing_time_naive
-            
-            if diff.days > 0:
-                return f"{diff.days}天前"
-            elif diff.seconds > 3600:
-                hours = diff.seconds // 3600
-                return f"{hours}小时前"
-            elif diff.seconds > 60:
-                minutes = diff.seconds // 60
-                return f"{minutes}分钟前"
-            else:
-                return "刚刚"
-        else:
-            return beijing_time_naive.strftime("%Y-%m-%d %H:%M:%S")
+        if format_type == "relative":
+            diff = datetime.now(BEIJING_TZ).replace(tzinfo=None) - beijing_time_naive
+            return _relative_text(diff.days, diff.seconds)
+        return beijing_time_naive.strftime(DATETIME_FORMATS.get(format_type, DEFAULT_DATETIME_FORMAT))
     except Exception as e:
         # 如果转换失败，返回原始字符串
         return str(dt_str) if dt_str else "-"
 
+
+def format_datetime_series(values, format_type: str = "datetime") -> pd.Series:
+    """
+    批量格式化一列时间（结果与逐个调用 format_datetime 相同）
+
+    整列一次解析并转换为北京时间，再按固定宽度的 ISO 字符串拼出显示格式，不逐个调用 strftime；
+    只有无法批量解析的值逐个交给 format_datetime 处理。空值显示为 "-"。
+
+    Args:
+        values: 时间列（Series、列表或数组；ISO 字符串、datetime 或 datetime64）
+        format_type: date / time / datetime / relative，其他值使用 "%Y-%m-%d %H:%M:%S"
+
+    Returns:
+        格式化后的字符串列（索引与输入相同）
+    """
+    series = values if isinstance(values, pd.Series) else pd.Series(list(values), dtype=object)
+    result = pd.Series("-", index=series.index, dtype=object)
+    if series.empty:
+        return result
+
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        present = series.notna().to_numpy()
+        parsed = series if series.dt.tz is not None else series.dt.tz_localize("UTC")
+    else:
+        # datetime 对象转为 ISO 文本后与字符串一起解析
+        text = series.astype(str)
+        present_mask = series.notna() & (text != "")
+        present = present_mask.to_numpy()
+        # 带时区和不带时区的值分开解析（混在一起时 pandas 会把前面的时区套用到不带时区的值上）
+        aware = pd.Series([":" in t and _TZ_SUFFIX.search(t[-6:]) is not None for t in text.tolist()],
+                          index=series.index, dtype=bool)
+        parsed = pd.Series(pd.NaT, index=series.index, dtype="datetime64[ns, UTC]")
+        for group in (present_mask & aware, present_mask & ~aware):
+            if group.any():
+                parsed[group] = pd.to_datetime(text[group], utc=True, errors="coerce", format="ISO8601")
+    parsed_ok = parsed.notna().to_numpy()
+    valid = present & parsed_ok
+
+    if valid.any():
+        local = parsed[valid].dt.tz_convert(BEIJING_TZ).dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+        if format_type == "relative":
+            now = np.datetime64(datetime.now(BEIJING_TZ).replace(tzinfo=None), "ns")
+            diff = (now - local).astype("int64")
+            days, remainder = np.divmod(diff, 86400 * 10**9)
+            seconds = remainder // 10**9
+            result[valid] = [_relative_text(d, s) for d, s in zip(days.tolist(), seconds.tolist())]
+        else:
+            iso = np.datetime_as_string(local, unit="s").astype("U19")
+            chars = iso.view("U1").reshape(len(iso), 19)
+            layout = _COLUMN_LAYOUTS.get(format_type, _DEFAULT_COLUMN_LAYOUT)
+            parts = [chars[:, piece[0]:piece[1]] if isinstance(piece, tuple)
+                     else np.full((len(iso), len(piece)), list(piece), dtype="U1")
+                     for piece in layout]
+            joined = np.ascontiguousarray(np.concatenate(parts, axis=1))
+            result[valid] = joined.view(f"U{joined.shape[1]}").ravel()
+
+    # 批量解析失败的值逐个处理（格式不规范时返回原始字符串）
+    for position in np.flatnonzero(present & ~parsed_ok):
+        result.iat[position] = format_datetime(series.iat[position], format_type)
+    return result
+
 def get_stage_info(stage_id: str) -> Dict[str, Any]:
     """获取阶段信息"""
     for stage in PRODUCTION_STAGES:
@@ -355,6 +432,69 @@ def convert_to_dataframe(data: List[Dict[str, Any]], columns_mapping: Dict[str,
     
     return df
 
+def render_export_panel(key: str, start_export: Callable[[str], Any], label: str = "📥 导出"):
+    """
+    导出按钮：点击后才在后台生成文件，生成期间显示进度，完成后提供下载
+
+    Args:
+        key: 组件和会话状态的键前缀（每个导出入口唯一）
+        start_export: 开始导出的函数，参数为文件格式（xlsx / csv），返回 ExportJob
+        label: 按钮文字
+    """
+    state_key = f"{key}_export_job"
+    job = export_manager.get(st.session_state.get(state_key))
+
+    if job is None:
+        file_format = st.selectbox("导出格式", ["xlsx", "csv"], key=f"{key}_export_format",
+                                   format_func=lambda x: "Excel" if x == "xlsx" else "CSV",
+                                   label_visibility="collapsed")
+        if st.button(label, key=f"{key}_export_start", use_container_width=True):
+            try:
+                st.session_state[state_key] = start_export(file_format).id
+            except Exception as e:
+                st.error(f"❌ 导出失败: {str(e)}")
+                return
+            st.rerun()
+    elif not job.finished:
+        _render_export_progress(key)
+    elif job.status == "done":
+        with job.open() as f:
+            st.download_button(
+                label=f"💾 下载（{job.rows} 行）",
+                data=f,
+                file_name=job.file_name,
+                mime=job.mime,
+                key=f"{key}_export_download",
+                use_container_width=True
+            )
+        if st.button("关闭", key=f"{key}_export_close", use_container_width=True):
+            export_manager.discard(job.id)
+            st.session_state.pop(state_key, None)
+            st.rerun()
+    else:
+        if job.status == "failed":
+            st.error(f"❌ 导出失败: {job.error}")
+        if st.button("重新导出", key=f"{key}_export_reset", use_container_width=True):
+            export_manager.discard(job.id)
+            st.session_state.pop(state_key, None)
+            st.rerun()
+
+@st.fragment(run_every=1)
+def _render_export_progress(key: str):
+    """导出进度（每秒刷新一次，只重新运行这一部分）"""
+    state_key = f"{key}_export_job"
+    job = export_manager.get(st.session_state.get(state_key))
+    if job is None or job.finished:
+        # 导出结束，整页重新运行以显示下载按钮
+        st.rerun()
+        return
+    text = f"正在导出… {job.rows} / {job.total} 行" if job.total else f"正在导出… {job.rows} 行"
+    st.progress(job.progress() or 0.0, text=text)
+    if st.button("取消导出", key=f"{key}_export_cancel", use_container_width=True):
+        export_manager.discard(job.id)
+        st.session_state.pop(state_key, None)
+        st.rerun()
+
 def apply_custom_css():
     """应用自定义CSS样式"""
     st.markdown("""
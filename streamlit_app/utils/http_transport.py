@@ -0,0 +1,142 @@
+"""
+HTTP 连接池传输层
+
+为 CloudBase 云函数调用提供共享的 keep-alive 连接池，避免每次调用都重新进行 TCP+TLS 握手。
+每个云函数路径挂载独立的连接池，池大小可按路径配置。
+"""
+
+import threading
+from typing import Dict, Any, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class PooledTransport:
+    """线程安全的连接池 HTTP 传输"""
+
+    def __init__(self, base_url: str, http_paths: Dict[str, str], pool_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化连接池
+
+        Args:
+            base_url: 云函数 HTTP 触发器根地址
+            http_paths: 云函数名 -> HTTP 路径 映射
+            pool_config: 连接池配置（default_pool_size、pool_sizes、pool_connections、keep_alive）
+        """
+        self.base_url = base_url.rstrip("/")
+        self.http_paths = dict(http_paths)
+        self.config = pool_config or {}
+
+        self._lock = threading.Lock()
+        self._request_counts: Dict[str, int] = {}
+        self._error_counts: Dict[str, int] = {}
+        self._adapters: Dict[str, HTTPAdapter] = {}
+
+        self.session = self._build_session()
+
+    def _new_adapter(self, pool_size: int) -> HTTPAdapter:
+        """创建连接池适配器（不在适配器层重试，重试由调用方控制）"""
+        return HTTPAdapter(
+            pool_connections=self.config.get("pool_connections", 4),
+            pool_maxsize=pool_size,
+            max_retries=0,
+            pool_block=False
+        )
+
+    def _build_session(self) -> requests.Session:
+        """构建 Session，并为每个云函数路径挂载独立连接池"""
+        session = requests.Session()
+        default_size = self.config.get("default_pool_size", 10)
+        pool_sizes = self.config.get("pool_sizes", {})
+
+        # 默认适配器：用于 COS 预签名上传等非云函数地址
+        default_adapter = self._new_adapter(default_size)
+        session.mount("https://", default_adapter)
+        session.mount("http://", default_adapter)
+        self._adapters["default"] = default_adapter
+
+        # requests 按最长前缀匹配适配器，因此每个路径都会命中自己的连接池
+        for function_name, path in self.http_paths.items():
+            adapter = self._new_adapter(pool_sizes.get(function_name, default_size))
+            session.mount(f"{self.base_url}{path}", adapter)
+            self._adapters[function_name] = adapter
+
+        if not self.config.get("keep_alive", True):
+            session.headers["Connection"] = "close"
+
+        return session
+
+    def url_for(self, function_name: str) -> str:
+        """获取云函数的完整调用地址"""
+        return f"{self.base_url}{self.http_paths.get(function_name, f'/{function_name}')}"
+
+    def _record(self, name: str, failed: bool = False):
+        with self._lock:
+            self._request_counts[name] = self._request_counts.get(name, 0) + 1
+            if failed:
+                self._error_counts[name] = self._error_counts.get(name, 0) + 1
+
+    def post(self, function_name: str, json_data: Dict[str, Any], headers: Dict[str, str], timeout: float = 10) -> requests.Response:
+        """向云函数发送 POST 请求（复用该路径的连接池）"""
+        try:
+            response = self.session.post(
+                self.url_for(function_name),
+                json=json_data,
+                headers=headers,
+                timeout=timeout
+            )
+        except Exception:
+            self._record(function_name, failed=True)
+            raise
+        self._record(function_name)
+        return response
+
+    def put(self, url: str, data: Any, headers: Dict[str, str], timeout: float = 60) -> requests.Response:
+        """发送 PUT 请求（用于 COS 预签名直传）"""
+        try:
+            response = self.session.put(url, data=data, headers=headers, timeout=timeout)
+        except Exception:
+            self._record("default", failed=True)
+            raise
+        self._record("default")
+        return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取连接复用统计
+
+        Returns:
+            {name: {requests, errors, connections_opened, connections_reused, reuse_rate, pool_size}}
+        """
+        stats = {}
+        with self._lock:
+            request_counts = dict(self._request_counts)
+            error_counts = dict(self._error_counts)
+
+        for name, adapter in self._adapters.items():
+            opened = 0
+            pool_requests = 0
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is None:
+                    continue
+                opened += getattr(pool, "num_connections", 0)
+                pool_requests += getattr(pool, "num_requests", 0)
+
+            reused = max(pool_requests - opened, 0)
+            stats[name] = {
+                "requests": request_counts.get(name, 0),
+                "errors": error_counts.get(name, 0),
+                "connections_opened": opened,
+                "connections_reused": reused,
+                "reuse_rate": round(reused / pool_requests, 4) if pool_requests else 0.0,
+                "pool_size": adapter._pool_maxsize
+            }
+
+        return stats
+
+    def close(self):
+        """关闭所有连接"""
+        self.session.close()
@@ -0,0 +1,22 @@
+"""
+进程内共享的订单只读副本和搜索索引
+
+各页面的订单列表、搜索和仪表板统计从同一个副本读取，搜索索引订阅副本的变更；
+关闭副本时（CLOUDBASE_REPLICA=false）两者都为 None。
+"""
+
+from config import REPLICA_CONFIG
+from services.order_replica import OrderReplica
+from services.search_index import OrderSearchIndex
+from utils.cloudbase_client import api_client
+
+order_replica = OrderReplica(
+    api_client,
+    path=REPLICA_CONFIG["path"],
+    max_staleness=REPLICA_CONFIG["max_staleness"]
+) if REPLICA_CONFIG["enabled"] else None
+
+order_search_index = None
+if order_replica is not None:
+    order_search_index = OrderSearchIndex()
+    order_replica.subscribe(order_search_index.apply_changes)
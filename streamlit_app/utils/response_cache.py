@@ -0,0 +1,159 @@
+"""
+云函数响应缓存
+
+进程级的只读调用缓存（Streamlit 所有会话共享），特性：
+- 按云函数设置 TTL，过期自动失效
+- LRU 容量上限，超出时淘汰最久未使用的条目
+- 基于标签的失效：每个条目带若干标签（如 order:<id>、orders、dashboard、roles），
+  写操作完成后按标签批量失效
+- 每个标签维护一个版本号，失效时递增；读取开始时记录版本，写回时版本已变化则丢弃结果，
+  避免写操作期间发出的旧读请求把过期数据写回缓存
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple
+
+
+class _CacheEntry:
+    """缓存条目"""
+    __slots__ = ("value", "expires_at", "tags", "function_name")
+
+    def __init__(self, value: Any, expires_at: float, tags: Tuple[str, ...], function_name: str):
+        self.value = value
+        self.expires_at = expires_at
+        self.tags = tags
+        self.function_name = function_name
+
+
+class ResponseCache:
+    """线程安全的 TTL + LRU + 标签失效缓存"""
+
+    def __init__(self, max_entries: int = 512, clock=time.monotonic):
+        """
+        Args:
+            max_entries: 最大缓存条目数
+            clock: 时钟函数（便于测试）
+        """
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, _CacheEntry]" = OrderedDict()
+        self._tag_versions: Dict[str, int] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _function_stats(self, function_name: str) -> Dict[str, int]:
+        stats = self._stats.get(function_name)
+        if stats is None:
+            stats = {"hits": 0, "misses": 0}
+            self._stats[function_name] = stats
+        return stats
+
+    def tag_versions(self, tags: List[str]) -> Tuple[int, ...]:
+        """获取一组标签的当前版本号（读取开始前调用）"""
+        with self._lock:
+            return tuple(self._tag_versions.get(tag, 0) for tag in tags)
+
+    def get(self, key: str, function_name: str) -> Optional[Any]:
+        """读取缓存，未命中或已过期返回 None；命中时返回独立副本"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= self._clock():
+                del self._entries[key]
+                entry = None
+
+            stats = self._function_stats(function_name)
+            if entry is None:
+                stats["misses"] += 1
+                return None
+
+            stats["hits"] += 1
+            self._entries.move_to_end(key)
+            value = entry.value
+        return copy.deepcopy(value)
+
+    def set(self, key: str, value: Any, function_name: str, ttl: float,
+            tags: List[str], versions: Optional[Tuple[int, ...]] = None) -> bool:
+        """
+        写入缓存
+
+        Args:
+            versions: 读取开始时的标签版本；若期间有标签被失效，则不写入
+
+        Returns:
+            是否写入成功
+        """
+        if ttl <= 0:
+            return False
+        stored = copy.deepcopy(value)
+        with self._lock:
+            if versions is not None:
+                current = tuple(self._tag_versions.get(tag, 0) for tag in tags)
+                if current != versions:
+                    return False
+
+            self._entries[key] = _CacheEntry(stored, self._clock() + ttl, tuple(tags), function_name)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+        return True
+
+    def invalidate_tags(self, tags: List[str]) -> int:
+        """按标签失效缓存，返回删除的条目数"""
+        if not tags:
+            return 0
+        tag_set = set(tags)
+        with self._lock:
+            for tag in tag_set:
+                self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+            stale_keys = [key for key, entry in self._entries.items() if tag_set.intersection(entry.tags)]
+            for key in stale_keys:
+                del self._entries[key]
+            self._invalidations += len(stale_keys)
+        return len(stale_keys)
+
+    def clear(self):
+        """清空缓存（统计保留）"""
+        with self._lock:
+            for entry in self._entries.values():
+                for tag in entry.tags:
+                    self._tag_versions[tag] = self._tag_versions.get(tag, 0) + 1
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+
+        Returns:
+            {hits, misses, hit_ratio, size, evictions, invalidations, functions: {云函数名: {hits, misses, hit_ratio}}}
+        """
+        with self._lock:
+            per_function = {name: dict(stats) for name, stats in self._stats.items()}
+            size = len(self._entries)
+            evictions = self._evictions
+            invalidations = self._invalidations
+
+        total_hits = 0
+        total_misses = 0
+        for stats in per_function.values():
+            lookups = stats["hits"] + stats["misses"]
+            stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+            total_hits += stats["hits"]
+            total_misses += stats["misses"]
+
+        total = total_hits + total_misses
+        return {
+            "hits": total_hits,
+            "misses": total_misses,
+            "hit_ratio": round(total_hits / total, 4) if total else 0.0,
+            "size": size,
+            "max_entries": self.max_entries,
+            "evictions": evictions,
+            "invalidations": invalidations,
+            "functions": per_function
+        }
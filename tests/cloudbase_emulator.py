@@ -0,0 +1,1368 @@
+"""
+CloudBase 本地模拟服务
+
+在本地实现 CloudBaseClient.HTTP_PATHS 中的 10 个云函数 HTTP 路径，以及 COS 预签名上传目标，
+用于离线开发、集成测试和压测，不依赖真实的 CloudBase 环境。
+
+- 数据保存在内存中（进程退出即丢失），启动时可生成指定数量的模拟订单
+- 可配置注入延迟（固定 + 随机抖动）和错误率，模拟云函数冷启动和网络故障
+- 响应结构与 cloudbase_functions/ 下的云函数保持一致
+
+使用方法：
+    python tests/cloudbase_emulator.py --port 8787 --seed-orders 500 --latency-ms 80 --error-rate 0.01
+    API_BASE_URL=http://127.0.0.1:8787 streamlit run streamlit_app/main.py
+
+默认账户：admin/admin123、operator/operator123、viewer/viewer123
+"""
+
+import sys
+import os
+import base64
+import json
+import random
+import threading
+import time
+import uuid
+import hashlib
+import argparse
+import heapq
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from typing import Dict, Any, List, Optional, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'streamlit_app'))
+
+from utils.cloudbase_client import CloudBaseClient
+
+
+# 与云函数中的阶段数据保持一致
+STAGES = [
+    {"stage_id": "STAGE001", "stage_name": "进入实验室", "stage_order": 1},
+    {"stage_id": "STAGE002", "stage_name": "碳化提纯", "stage_order": 2},
+    {"stage_id": "STAGE003", "stage_name": "石墨化", "stage_order": 3},
+    {"stage_id": "STAGE004", "stage_name": "高温高压培育生长", "stage_order": 4},
+    {"stage_id": "STAGE005", "stage_name": "钻胚提取", "stage_order": 5},
+    {"stage_id": "STAGE006", "stage_name": "切割", "stage_order": 6},
+    {"stage_id": "STAGE007", "stage_name": "认证溯源", "stage_order": 7},
+    {"stage_id": "STAGE008", "stage_name": "镶嵌钻石", "stage_order": 8}
+]
+STAGE_NAMES = {s["stage_id"]: s["stage_name"] for s in STAGES}
+
+DEFAULT_PERMISSIONS = [
+    ("dashboard.view", "查看仪表板", "dashboard"),
+    ("orders.read", "查看订单", "orders"),
+    ("orders.create", "创建订单", "orders"),
+    ("orders.update", "更新订单", "orders"),
+    ("orders.delete", "删除订单", "orders"),
+    ("progress.update", "更新进度", "progress"),
+    ("photos.upload", "上传照片", "photos"),
+    ("photos.manage", "管理照片", "photos"),
+    ("users.manage", "管理用户", "users"),
+    ("users.create", "创建用户", "users"),
+    ("system.settings", "系统设置", "system")
+]
+
+DEFAULT_ROLES = {
+    "admin": ("系统管理员", [code for code, _, _ in DEFAULT_PERMISSIONS]),
+    "operator": ("操作员", ["dashboard.view", "orders.read", "orders.create", "orders.update",
+                         "progress.update", "photos.upload", "photos.manage"]),
+    "viewer": ("查看者", ["dashboard.view", "orders.read", "photos.upload"])
+}
+
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何林罗高"
+GIVEN_NAMES = ["伟", "芳", "娜", "敏", "静", "丽", "强", "磊", "洋", "艳", "勇", "军", "杰", "娟", "涛", "明", "超", "秀英", "华", "建国"]
+DIAMOND_TYPES = ["圆形", "公主方", "椭圆形", "心形", "祖母绿"]
+DIAMOND_SIZES = ["0.3克拉", "0.5克拉", "1克拉", "1.5克拉", "2克拉"]
+
+
+def now_iso(moment: Optional[datetime] = None) -> str:
+    """与 JS new Date().toISOString() 相同格式的 UTC 时间"""
+    moment = moment or datetime.now(timezone.utc)
+    return moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"
+
+
+# admin-progress 单次批量更新最多处理的条目数
+BULK_MAX_ITEMS = 50
+
+# 云数据库 get() 单次最多返回的记录数（模拟服务的查询同样截断）
+DB_MAX_GET = 1000
+# admin-orders 增量变更：水位线回退时间和每个集合最多返回的记录数（多取一条不能超过 DB_MAX_GET）
+CHANGE_FEED_OVERLAP_MS = 5000
+CHANGE_FEED_MAX_RECORDS = DB_MAX_GET - 1
+# 与 admin-orders 相同：全量快照每页最多返回的记录数
+SNAPSHOT_PAGE_SIZE = 500
+SNAPSHOT_COLLECTIONS = ("orders", "order_progress", "photos")
+# 与 admin-dashboard 相同：仪表板计数器文档和最近动态的条数
+DASHBOARD_STATS_ID = "global"
+ORDER_STATUSES = ("待处理", "制作中", "已完成")
+STAGE_STATUSES = ("completed", "in_progress", "pending")
+RECENT_ACTIVITY_LIMIT = 50
+# 与 admin-logs 相同：每页默认和最多返回的日志条数
+LOG_PAGE_SIZE = 100
+LOG_MAX_PAGE_SIZE = 500
+
+
+class DocumentStore:
+    """线程安全的内存文档库（集合 -> _id -> 文档）"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.collections: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        # order_id -> 进度/照片 _id 列表，避免按订单查询时全表扫描
+        self._by_order: Dict[str, Dict[str, List[str]]] = {"order_progress": {}, "photos": {}}
+
+    def collection(self, name: str) -> Dict[str, Dict[str, Any]]:
+        return self.collections.setdefault(name, {})
+
+    def add(self, name: str, doc: Dict[str, Any]) -> str:
+        with self.lock:
+            doc_id = doc.get("_id") or uuid.uuid4().hex
+            doc["_id"] = doc_id
+            self.collection(name)[doc_id] = doc
+            if name in self._by_order and doc.get("order_id"):
+                self._by_order[name].setdefault(doc["order_id"], []).append(doc_id)
+            return doc_id
+
+    def get(self, name: str, doc_id: str) -> Optional[Dict[str, Any]]:
+        return self.collection(name).get(doc_id)
+
+    def by_order(self, name: str, order_id: str) -> List[Dict[str, Any]]:
+        with self.lock:
+            docs = self.collection(name)
+            return [docs[i] for i in self._by_order[name].get(order_id, []) if i in docs]
+
+    def find(self, name: str, predicate=None) -> List[Dict[str, Any]]:
+        with self.lock:
+            docs = list(self.collection(name).values())
+        return [d for d in docs if predicate is None or predicate(d)]
+
+    def remove(self, name: str, doc_id: str):
+        with self.lock:
+            self.collection(name).pop(doc_id, None)
+
+
+class CloudBaseEmulator:
+    """云函数业务逻辑的 Python 实现"""
+
+    def __init__(self, base_url: str = "", seed_orders: int = 0, rng_seed: int = 42):
+        self.base_url = base_url
+        self.store = DocumentStore()
+        # 模拟 COS：对象键 -> 内容；分片上传：upload_id -> {part_number: 内容}
+        self.objects: Dict[str, bytes] = {}
+        self.multipart: Dict[str, Dict[int, bytes]] = {}
+        self._seed_defaults()
+        if seed_orders:
+            self.seed_orders(seed_orders, rng_seed)
+
+    # ------------------------------------------------------------------
+    # 初始数据
+    # ------------------------------------------------------------------
+
+    def _seed_defaults(self):
+        created = now_iso()
+        for username, real_name, role in [("admin", "系统管理员", "admin"),
+                                          ("operator", "操作员", "operator"),
+                                          ("viewer", "查看者", "viewer")]:
+            self.store.add("admins", {
+                "username": username, "password": f"{username}123", "real_name": real_name,
+                "role": role, "email": "", "is_active": True, "created_at": created,
+                "updated_at": created, "last_login": None
+            })
+
+        permission_ids = {}
+        for code, name, category in DEFAULT_PERMISSIONS:
+            doc_id = f"perm_{code.replace('.', '_')}"
+            permission_ids[code] = doc_id
+            self.store.add("permissions", {
+                "_id": doc_id, "id": doc_id, "permission_code": code, "permission_name": name,
+                "category": category, "description": name, "is_active": True, "created_at": created
+            })
+
+        for role_name, (display_name, codes) in DEFAULT_ROLES.items():
+            role_id = f"role_{role_name}"
+            self.store.add("roles", {
+                "_id": role_id, "role_name": role_name, "display_name": display_name,
+                "description": display_name, "is_active": True, "created_at": created,
+                "updated_at": created, "created_by": "system"
+            })
+            for code in codes:
+                self.store.add("role_permissions", {
+                    "role_id": role_id, "permission_id": permission_ids[code],
+                    "granted_at": created, "granted_by": "system"
+                })
+
+    def seed_orders(self, count: int, rng_seed: int = 42):
+        """生成模拟订单（含随机推进的制作进度）"""
+        rng = random.Random(rng_seed)
+        start = datetime.now(timezone.utc) - timedelta(days=90)
+        for i in range(count):
+            created_at = start + timedelta(minutes=int(90 * 24 * 60 * i / max(count, 1)))
+            phone = f"1{rng.randint(3, 9)}{rng.randint(0, 999999999):09d}"
+            order = self._new_order({
+                "customer_name": rng.choice(SURNAMES) + rng.choice(GIVEN_NAMES),
+                "customer_phone": phone,
+                "customer_email": f"user{i}@example.com",
+                "diamond_type": rng.choice(DIAMOND_TYPES),
+                "diamond_size": rng.choice(DIAMOND_SIZES)
+            }, created_at)
+
+            completed = rng.randint(0, len(STAGES))
+            in_progress = completed < len(STAGES) and rng.random() < 0.6
+            moment = created_at
+            for progress in sorted(self.store.by_order("order_progress", order["_id"]), key=lambda p: p["stage_order"]):
+                if progress["stage_order"] <= completed:
+                    moment += timedelta(hours=rng.randint(6, 72))
+                    progress.update({"status": "completed", "started_at": now_iso(moment - timedelta(hours=4)),
+                                     "completed_at": now_iso(moment)})
+                elif in_progress and progress["stage_order"] == completed + 1:
+                    progress.update({"status": "in_progress", "started_at": now_iso(moment)})
+            self._recalculate_order(order["_id"])
+        # 生成的进度没有经过写操作，计数器在第一次查询仪表板时重建
+        self.store.remove("dashboard_stats", DASHBOARD_STATS_ID)
+
+    def _new_order(self, data: Dict[str, Any], created_at: Optional[datetime] = None) -> Dict[str, Any]:
+        created = now_iso(created_at)
+        phone = data.get("customer_phone", "")
+        last4 = phone[-4:] if len(phone) >= 4 else "0000"
+        order = {
+            "order_number": f"LD{last4}{uuid.uuid4().hex[:6].upper()}",
+            "customer_name": data.get("customer_name", ""),
+            "customer_phone": phone,
+            "customer_email": data.get("customer_email", ""),
+            "diamond_type": data.get("diamond_type", ""),
+            "diamond_size": data.get("diamond_size", ""),
+            "special_requirements": data.get("special_requirements", ""),
+            "order_status": "待处理",
+            "current_stage": "进入实验室",
+            "progress_percentage": 0,
+            "notes": "",
+            "created_at": created,
+            "updated_at": created
+        }
+        order_id = self.store.add("orders", order)
+        for stage in STAGES:
+            self.store.add("order_progress", {
+                "order_id": order_id, "stage_id": stage["stage_id"], "stage_name": stage["stage_name"],
+                "status": "pending", "stage_order": stage["stage_order"], "notes": "", "version": 0,
+                "created_at": created, "updated_at": created
+            })
+        delta = Counter()
+        self._add_order_stats(delta, order, [], 1)
+        for progress in self.store.by_order("order_progress", order_id):
+            self._add_stage_stats(delta, progress, 1)
+        self._update_dashboard_stats(delta)
+        return order
+
+    def _recalculate_order(self, order_id: str) -> Dict[str, Any]:
+        """与 admin-progress 相同的整体进度、当前阶段和订单状态计算"""
+        progress = sorted(self.store.by_order("order_progress", order_id), key=lambda p: p["stage_order"])
+        total = len(progress)
+        completed = len([p for p in progress if p["status"] == "completed"])
+        in_progress = [p for p in progress if p["status"] == "in_progress"]
+        percentage = int(completed / total * 100 + 0.5) if total else 0
+
+        current_stage = "未开始"
+        if in_progress:
+            current_stage = in_progress[0]["stage_name"]
+        elif completed == total:
+            current_stage = "已完成"
+        elif completed > 0:
+            next_stage = next((p for p in progress if p["status"] == "pending"), None)
+            if next_stage:
+                current_stage = next_stage["stage_name"]
+
+        order_status = "待处理"
+        if completed == total:
+            order_status = "已完成"
+        elif completed > 0 or in_progress:
+            order_status = "制作中"
+
+        order = self.store.get("orders", order_id)
+        order.update({
+            "progress_percentage": percentage,
+            "current_stage": current_stage,
+            "order_status": order_status,
+            "updated_at": now_iso()
+        })
+        return order
+
+    # ------------------------------------------------------------------
+    # 仪表板计数器（与 admin-orders、admin-progress、admin-dashboard 相同）
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _add_order_stats(delta: Counter, order: Dict[str, Any], progress: List[Dict[str, Any]], sign: int):
+        """订单本身的计数（订单数、状态、完成日期和耗时），sign 为 1 计入、-1 扣除"""
+        status = order.get("order_status") or "待处理"
+        delta["total_orders"] += sign
+        if status in ORDER_STATUSES:
+            delta[f"status.{status}"] += sign
+        if status != "已完成":
+            return
+        finished = max((p["completed_at"] for p in progress
+                        if p.get("status") == "completed" and p.get("completed_at")), default=None)
+        if not finished:
+            return
+        delta[f"completed_by_day.{finished[:10]}"] += sign
+        days = 0
+        if order.get("created_at"):
+            created = datetime.fromisoformat(order["created_at"].replace("Z", "+00:00"))
+            elapsed = datetime.fromisoformat(finished.replace("Z", "+00:00")) - created
+            days = -(-elapsed.total_seconds() // 86400)
+        if days > 0:
+            delta["completion_days_total"] += sign * int(days)
+            delta["completion_days_count"] += sign
+
+    @staticmethod
+    def _add_stage_stats(delta: Counter, progress: Dict[str, Any], sign: int):
+        """一条进度记录的阶段计数"""
+        stage_name = progress.get("stage_name") or "未知阶段"
+        status = progress.get("status") or "pending"
+        delta[f"stages.{stage_name}.total"] += sign
+        if status in STAGE_STATUSES:
+            delta[f"stages.{stage_name}.{status}"] += sign
+
+    def _order_stats_delta(self, order_before, progress_before, order_after, progress_after) -> Counter:
+        delta = Counter()
+        self._add_order_stats(delta, order_before, progress_before, -1)
+        self._add_order_stats(delta, order_after, progress_after, 1)
+        for progress in progress_before:
+            self._add_stage_stats(delta, progress, -1)
+        for progress in progress_after:
+            self._add_stage_stats(delta, progress, 1)
+        return delta
+
+    def _update_dashboard_stats(self, delta: Counter):
+        """按增量更新计数器；与数据库 update 相同，计数器文档不存在时不做任何事"""
+        with self.store.lock:
+            stats = self.store.get("dashboard_stats", DASHBOARD_STATS_ID)
+            if stats is None:
+                return
+            changed = False
+            for path, amount in delta.items():
+                if not amount:
+                    continue
+                *parents, leaf = path.split(".")
+                node = stats
+                for key in parents:
+                    node = node.setdefault(key, {})
+                node[leaf] = node.get(leaf, 0) + amount
+                changed = True
+            if changed:
+                stats["updated_at"] = now_iso()
+
+    @staticmethod
+    def _expand_stats(delta: Counter) -> Dict[str, Any]:
+        stats: Dict[str, Any] = {
+            "total_orders": 0, "status": {status: 0 for status in ORDER_STATUSES}, "stages": {},
+            "completed_by_day": {}, "completion_days_total": 0, "completion_days_count": 0
+        }
+        for path, amount in delta.items():
+            if not amount:
+                continue
+            *parents, leaf = path.split(".")
+            node = stats
+            for key in parents:
+                node = node.setdefault(key, {})
+            node[leaf] = amount
+        return stats
+
+    @classmethod
+    def _flatten_stats(cls, node: Optional[Dict[str, Any]], prefix: str = "") -> Dict[str, Any]:
+        result = {}
+        for key, value in (node or {}).items():
+            if not prefix and key in ("_id", "updated_at", "rebuilt_at"):
+                continue
+            path = f"{prefix}.{key}" if prefix else key
+            if isinstance(value, dict):
+                result.update(cls._flatten_stats(value, path))
+            else:
+                result[path] = value
+        return result
+
+    def _rebuild_dashboard_stats(self) -> Dict[str, Any]:
+        """全量重算计数器，覆盖保存并返回与原计数器的偏差"""
+        with self.store.lock:
+            previous = self._flatten_stats(self.store.get("dashboard_stats", DASHBOARD_STATS_ID))
+            orders = self.store.find("orders", lambda o: not o.get("is_deleted"))
+            all_progress = self.store.find("order_progress")
+            delta = Counter()
+            progress_by_order: Dict[str, List[Dict[str, Any]]] = {}
+            for progress in all_progress:
+                self._add_stage_stats(delta, progress, 1)
+                progress_by_order.setdefault(progress["order_id"], []).append(progress)
+            for order in orders:
+                self._add_order_stats(delta, order, progress_by_order.get(order["_id"], []), 1)
+
+            stats = self._expand_stats(delta)
+            stats["rebuilt_at"] = stats["updated_at"] = now_iso()
+            actual = self._flatten_stats(stats)
+            drift = [{"field": path, "stored": previous.get(path) or 0, "actual": actual.get(path) or 0}
+                     for path in sorted(set(previous) | set(actual))
+                     if (previous.get(path) or 0) != (actual.get(path) or 0)]
+            self.store.add("dashboard_stats", {"_id": DASHBOARD_STATS_ID, **stats})
+        return {"stats": json.loads(json.dumps(stats)), "drift": drift, "bootstrapped": not previous,
+                "scanned": {"orders": len(orders), "progress": len(all_progress)}}
+
+    def _log(self, log_type: str, description: str, operator: str = "admin", order: Optional[Dict] = None,
+             metadata: Optional[Dict] = None):
+        timestamp = now_iso()
+        self.store.add("operation_logs", {
+            "type": log_type, "operator": operator, "description": description,
+            "order_number": (order or {}).get("order_number", ""), "order_id": (order or {}).get("_id", ""),
+            "ip_address": "", "metadata": metadata or {}, "timestamp": timestamp, "created_at": timestamp
+        })
+
+    @staticmethod
+    def _order_cursor(order: Dict[str, Any]) -> str:
+        """与 admin-orders 相同的游标编码：Base64([created_at, _id])"""
+        return base64.b64encode(json.dumps([order.get("created_at", ""), order["_id"]],
+                                           separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+    def _active_order(self, order_id: str) -> Optional[Dict[str, Any]]:
+        order = self.store.get("orders", order_id)
+        if order is None or order.get("is_deleted"):
+            return None
+        return order
+
+    # ------------------------------------------------------------------
+    # 云函数
+    # ------------------------------------------------------------------
+
+    def customer_search(self, body: Dict[str, Any], headers: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        search_type = body.get("search_type") or "phone"
+        search_value = (body.get("search_value") or body.get("customer_name") or "").strip()
+        if not search_value:
+            return 200, {"success": False, "message": "查询内容不能为空", "data": []}
+
+        field = {"order_number": "order_number", "phone": "customer_phone",
+                 "email": "customer_email"}.get(search_type, "customer_name")
+        orders = self.store.find("orders", lambda o: not o.get("is_deleted") and o.get(field) == search_value)
+        type_name = {"name": "姓名", "phone": "电话", "email": "邮箱", "order_number": "订单号"}.get(search_type, "信息")
+        return 200, {"success": True, "data": orders, "message": f"根据{type_name}查询成功，找到 {len(orders)} 个订单"}
+
+    def _photo_url(self, cloud_path: str) -> str:
+        return f"{self.base_url}/cos/{cloud_path}"
+
+    def customer_detail(self, body: Dict[str, Any], headers: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        order_id = body.get("order_id", "")
+        if not order_id:
+            return 200, {"success": False, "message": "订单ID不能为空", "data": None}
+        order = self._active_order(order_id)
+        if order is None:
+            return 200, {"success": False, "message": "订单不存在或已删除"}
+
+        photos_by_stage: Dict[str, List[Dict[str, Any]]] = {}
+        photos = [p for p in self.store.by_order("photos", order_id) if not p.get("is_deleted")]
+        for photo in sorted(photos, key=lambda p: (p["stage_id"], p.get("sort_order", 0))):
+            stage_name = STAGE_NAMES.get(photo["stage_id"]) or photo.get("stage_name") or "未知阶段"
+            url = self._photo_url(photo["cloud_path"]) if photo.get("cloud_path") else photo.get("photo_url", "")
+            photos_by_stage.setdefault(stage_name, []).append({
+                "photo_url": url, "thumbnail_url": url, "description": photo.get("description"),
+                "upload_time": photo.get("upload_time"), "media_type": photo.get("media_type", "photo"),
+                "file_type": photo.get("file_type", "image/jpeg"), "file_name": photo.get("file_name", ""),
+                "_id": photo["_id"]
+            })
+
+        is_admin = headers.get("x-administrator") == "true" or "admin" in headers.get("user-agent", "")
+        progress = self.store.by_order("order_progress", order_id)
+        if is_admin:
+            rank = {"completed": 3, "in_progress": 2, "pending": 1}
+        else:
+            rank = {"completed": 2, "in_progress": 1}
+            progress = [p for p in progress if p["status"] in rank]
+        progress = sorted(sorted(progress, key=lambda p: p["stage_order"]), key=lambda p: -rank[p["status"]])
+
+        return 200, {
+            "success": True,
+            "data": {
+                "order_info": {
+                    "order_id": order["_id"],
+                    **{k: order.get(k) for k in ("order_number", "customer_name", "customer_phone", "diamond_type",
+                                                 "diamond_size", "special_requirements", "order_status",
+                                                 "progress_percentage", "created_at")}
+                },
+                "progress_timeline": [
+                    {**{k: p.get(k) for k in ("stage_id", "stage_name", "status", "started_at", "completed_at",
+                                              "notes", "stage_order")}, "version": p.get("version", 0)}
+                    for p in progress
+                ],
+                "photos": [{"stage_name": name, "photos": items} for name, items in photos_by_stage.items()]
+            },
+            "message": "查询成功"
+        }
+
+    def admin_auth(self, body: Dict[str, Any], headers: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        username = body.get("username", "")
+        password = body.get("password", "")
+        if not username or not password:
+            return 200, {"success": False, "message": "用户名和密码不能为空", "data": None}
+        users = self.store.find("admins", lambda u: u["username"] == username)
+        if not users:
+            return 200, {"success": False, "message": "用户名或密码错误", "data": None}
+        user = users[0]
+        if not user.get("is_active"):
+            return 200, {"success": False, "message": "账户已被禁用，请联系管理员", "data": None,
+                         "error_code": "ACCOUNT_DISABLED"}
+        if user["password"] != password:
+            return 200, {"success": False, "message": "用户名或密码错误", "data": None}
+
+        user["last_login"] = now_iso()
+        self._log("用户登录", f"管理员登录：{user['real_name']} ({username})", operator=username)
+        return 200, {
+            "success": True,
+            "data": {
+                "token": f"admin_token_{int(time.time() * 1000)}",
+                "user": {"user_id": user["_id"], "username": username, "real_name": user["real_name"],
+                         "role": user["role"]},
+                "expires_in": 86400
+            },
+            "message": "登录成功"
+        }
+
+    def admin_orders(self, body: Dict[str, Any], headers: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        action = body.get("action") or "create"
+        data = body.get("data") or body
+
+        if action == "list":
+            page = int(data.get("page") or 1)
+            limit = int(data.get("limit") or data.get("page_size") or 20)
+            status = data.get("status") or "all"
+            search = data.get("search") or ""
+            orders = self.store.find("orders", lambda o: (
+                not o.get("is_deleted")
+                and (status == "all" or o.get("order_status") == status)
+                and (not search or o.get("customer_name") == search)
+            ))
+            orders.sort(key=lambda o: (o.get("created_at", ""), o["_id"]), reverse=True)
+            total = len(orders)
+
+            if data.get("cursor") is not None:
+                # 游标分页：(created_at, _id) 倒序，取游标之后的订单
+                if data["cursor"]:
+                    try:
+                        created_at, order_id = json.loads(base64.b64decode(data["cursor"]).decode("utf-8"))
+                    except (ValueError, TypeError):
+                        return 200, {"success": False, "message": "无效的分页游标", "data": None}
+                    orders = [o for o in orders if (o.get("created_at", ""), o["_id"]) < (created_at, order_id)]
+                has_more = len(orders) > limit
+                page_orders = orders[:limit]
+                pagination = {"page_size": limit, "has_more": has_more,
+                              "next_cursor": self._order_cursor(page_orders[-1]) if has_more else None}
+                if data.get("with_total"):
+                    pagination.update({"total_count": total, "total_pages": -(-total // limit) if limit else 0})
+                return 200, {"success": True, "data": {"orders": page_orders, "pagination": pagination},
+                             "message": "获取订单列表成功"}
+
+            offset = (page - 1) * limit
+            page_orders = orders[offset:offset + limit]
+            has_more = offset + len(page_orders) < total
+            return 200, {
+                "success": True,
+                "data": {
+                    "orders": page_orders,
+                    "pagination": {"current_page": page, "page_size": limit, "total_count": total,
+                                   "total_pages": -(-total // limit) if limit else 0, "has_more": has_more,
+                                   "next_cursor": self._order_cursor(page_orders[-1]) if has_more and page_orders else None}
+                },
+                "message": "获取订单列表成功"
+            }
+
+        if action == "create":
+            order = self._new_order(data)
+            self._log("订单创建", f"创建订单：{order['order_number']} - {order['customer_name']}",
+                      data.get("operator", "admin"), order)
+            return 200, {"success": True, "data": {"order_id": order["_id"], **order},
+                         "message": "订单创建成功，已自动初始化8个制作阶段"}
+
+        if action == "update":
+            order_id = data.get("order_id", "")
+            if not order_id:
+                return 200, {"success": False, "message": "订单ID不能为空", "data": None}
+            update = {"updated_at": now_iso()}
+            for key in ("customer_name", "customer_phone", "customer_email", "diamond_type", "diamond_size",
+                        "order_status"):
+                if data.get(key):
+                    update[key] = data[key]
+            for key in ("special_requirements", "notes"):
+                if key in data:
+                    update[key] = data[key]
+            with self.store.lock:
+                order = self.store.get("orders", order_id)
+                if order is not None:
+                    before = dict(order)
+                    order.update(update)
+                    if not before.get("is_deleted") and before.get("order_status") != order.get("order_status"):
+                        progress = self.store.by_order("order_progress", order_id)
+                        self._update_dashboard_stats(self._order_stats_delta(before, progress, order, progress))
+            if order is not None:
+                self._log("订单更新", f"更新订单：客户 {order['customer_name']}", data.get("operator", "admin"), order)
+            return 200, {"success": True, "data": update, "message": "订单更新成功"}
+
+        if action == "delete":
+            order_id = data.get("order_id", "")
+            if not order_id:
+                return 200, {"success": False, "message": "订单ID不能为空", "data": None}
+            with self.store.lock:
+                order = self.store.get("orders", order_id)
+                if order is not None and not order.get("is_deleted"):
+                    # 阶段计数与 admin-dashboard 原来的口径一样包含已删除订单的进度，不扣除
+                    delta = Counter()
+                    self._add_order_stats(delta, order, self.store.by_order("order_progress", order_id), -1)
+                    self._update_dashboard_stats(delta)
+                if order is not None:
+                    order.update({"is_deleted": True, "deleted_at": now_iso(), "updated_at": now_iso()})
+            if order is not None:
+                self._log("订单删除", f"删除订单：客户 {order['customer_name']}", data.get("operator", "admin"), order)
+            return 200, {"success": True, "data": {"order_id": order_id}, "message": "订单删除成功"}
+
+        if action == "changes":
+            return 200, {"success": True, "data": self._list_changes(data), "message": "获取变更成功"}
+
+        if action == "snapshot":
+            page = self._snapshot_page(data)
+            if page is None:
+                return 200, {"success": False, "message": f"不支持的集合: {data.get('collection')}", "data": None}
+            return 200, {"success": True, "data": page, "message": "获取快照成功"}
+
+        return 200, {"success": False, "message": f"不支持的操作类型: {action}", "data": None}
+
+    def _list_changes(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """与 admin-orders changes 相同：水位线之前 CHANGE_FEED_OVERLAP_MS 之后更新的订单、进度和照片"""
+        watermark = now_iso()
+        since = data.get("since") or ""
+        limit = max(1, min(int(data.get("limit") or CHANGE_FEED_MAX_RECORDS), CHANGE_FEED_MAX_RECORDS))
+        full_resync = {"watermark": watermark, "full_resync": True, "orders": [], "progress": [], "photos": []}
+        try:
+            since_time = datetime.strptime(since, "%Y-%m-%dT%H:%M:%S.%fZ").replace(tzinfo=timezone.utc)
+        except ValueError:
+            return full_resync
+
+        start = now_iso(since_time - timedelta(milliseconds=CHANGE_FEED_OVERLAP_MS))
+        changes = {}
+        for key, name in (("orders", "orders"), ("progress", "order_progress"), ("photos", "photos")):
+            docs = sorted((dict(d) for d in self.store.find(name, lambda d: d.get("updated_at", "") >= start)),
+                          key=lambda d: d["updated_at"])
+            # 与云函数相同：.limit(limit + 1).get()，服务端最多返回 DB_MAX_GET 条
+            docs = self._db_get(docs, limit + 1)
+            if len(docs) > limit:
+                return full_resync
+            changes[key] = docs
+        return {"watermark": watermark, "since": since, "full_resync": False, **changes}
+
+    @staticmethod
+    def _db_get(docs: List[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """模拟云数据库 .limit(limit).get()：limit 超过 DB_MAX_GET 时服务端仍只返回 DB_MAX_GET 条"""
+        return docs[:min(limit, DB_MAX_GET)]
+
+    def _snapshot_page(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """与 admin-orders snapshot 相同：按 _id 分页返回一个集合中未删除的记录"""
+        collection = data.get("collection")
+        if collection not in SNAPSHOT_COLLECTIONS:
+            return None
+        limit = min(int(data.get("limit") or SNAPSHOT_PAGE_SIZE), SNAPSHOT_PAGE_SIZE)
+        cursor = data.get("cursor") or ""
+        docs = sorted((dict(d) for d in self.store.find(collection, lambda d: not d.get("is_deleted") and d["_id"] > cursor)),
+                      key=lambda d: d["_id"])
+        page = docs[:limit]
+        return {"collection": collection, "docs": page,
+                "next_cursor": page[-1]["_id"] if len(docs) > limit else None}
+
+    def admin_progress(self, body: Dict[str, Any], headers: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        action = body.get("action", "")
+        data = body.get("data") or {}
+
+        if action == "list":
+            order_id = data.get("order_id", "")
+            if not order_id:
+                return 200, {"success": False, "message": "缺少订单ID", "data": None}
+            if self._active_order(order_id) is None:
+                return 200, {"success": False, "message": "订单不存在或已删除", "data": None}
+            progress = sorted(self.store.by_order("order_progress", order_id), key=lambda p: p["stage_order"])
+            return 200, {"success": True, "message": "获取进度列表成功", "data": progress}
+
+        if action == "update":
+            return self._update_progress(data)
+
+        if action == "bulk_update":
+            return 200, self._bulk_update_progress(data)
+
+        return 200, {"success": False, "message": "不支持的操作类型", "data": None}
+
+    def _bulk_update_progress(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """与 admin-progress bulk_update 相同：逐项按单个更新的规则处理，idempotency_key 重复时返回首次生效的结果"""
+        items = data.get("items") or []
+        if not items:
+            return {"success": False, "message": "缺少批量更新项", "error_code": "INVALID_BULK_REQUEST",
+                    "retryable": False, "data": None}
+        if len(items) > BULK_MAX_ITEMS:
+            return {"success": False, "message": f"单次批量更新最多 {BULK_MAX_ITEMS} 项",
+                    "error_code": "INVALID_BULK_REQUEST", "retryable": False, "data": None}
+
+        results = []
+        with self.store.lock:
+            for item in items:
+                key = item.get("idempotency_key")
+                record = self.store.get("progress_idempotency", key) if key else None
+                if record is not None:
+                    results.append({**record["result"], "replayed": True})
+                    continue
+                _, payload = self._update_progress({**item, "operator": data.get("operator", "admin")})
+                result = {"order_id": item.get("order_id", ""), "stage_id": item.get("stage_id", ""),
+                          "idempotency_key": key, **payload}
+                if key and result.get("success"):
+                    self.store.add("progress_idempotency", {"_id": key, "result": result, "created_at": now_iso()})
+                results.append(result)
+
+        succeeded = sum(1 for r in results if r.get("success"))
+        return {
+            "success": True,
+            "message": f"批量更新完成：成功 {succeeded} 项，失败 {len(items) - succeeded} 项",
+            "data": {"results": results, "succeeded": succeeded, "failed": len(items) - succeeded}
+        }
+
+    def _update_progress(self, data: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        order_id = data.get("order_id", "")
+        stage_id = data.get("stage_id", "")
+        status = data.get("status", "")
+        notes = data.get("notes", "")
+        if not order_id or not stage_id:
+            return 200, {"success": False, "message": "缺少订单ID或阶段ID", "data": None}
+
+        with self.store.lock:
+            order = self._active_order(order_id)
+            if order is None:
+                return 200, {"success": False, "message": "订单不存在或已删除", "data": None}
+            all_progress = self.store.by_order("order_progress", order_id)
+            current = next((p for p in all_progress if p["stage_id"] == stage_id), None)
+            if current is None:
+                return 200, {"success": False, "message": "未找到指定的阶段记录", "data": None}
+
+            current_version = current.get("version", 0)
+            expected_status = data.get("expected_status")
+            expected_version = data.get("expected_version")
+            if ((expected_status is not None and expected_status != current["status"])
+                    or (expected_version is not None and int(expected_version) != current_version)):
+                return 200, {
+                    "success": False,
+                    "message": f"阶段「{current['stage_name']}」已被其他操作修改，请刷新后重试",
+                    "error_code": "STAGE_CONFLICT",
+                    "data": {"stage_id": stage_id, "expected_status": expected_status,
+                             "expected_version": expected_version, "current_status": current["status"],
+                             "current_version": current_version}
+                }
+
+            error = None
+            if status == "in_progress":
+                other = next((p for p in all_progress if p["status"] == "in_progress" and p["stage_id"] != stage_id), None)
+                if other:
+                    error = f"无法开始新阶段，请先完成当前进行中的阶段：{other['stage_name']}"
+                if not error:
+                    previous = next((p for p in all_progress if p["stage_order"] == current["stage_order"] - 1), None)
+                    if previous and previous["status"] != "completed":
+                        error = f"无法开始此阶段，请先完成前一个阶段：{previous['stage_name']}"
+                if not error and current["status"] == "completed":
+                    error = "此阶段已完成，无法重新开始"
+            if status == "completed" and current["status"] != "in_progress":
+                error = "只能完成正在进行中的阶段"
+            if error:
+                return 200, {"success": False, "message": error, "error_code": "INVALID_TRANSITION",
+                             "data": {"stage_id": stage_id, "current_status": current["status"],
+                                      "current_version": current_version}}
+
+            order_before = dict(order)
+            progress_before = [dict(p) for p in all_progress]
+            current.update({"status": status, "notes": notes, "version": current_version + 1, "updated_at": now_iso()})
+            if status == "in_progress":
+                current["started_at"] = now_iso()
+            if status == "completed":
+                current["completed_at"] = now_iso()
+            order = self._recalculate_order(order_id)
+            self._update_dashboard_stats(self._order_stats_delta(order_before, progress_before, order, all_progress))
+
+        log_type = "阶段开始" if status == "in_progress" else "阶段完成"
+        self._log(log_type, f"{log_type}：客户 {order['customer_name']} - {current['stage_name']}",
+                  data.get("operator", "admin"), order)
+        return 200, {
+            "success": True,
+            "message": "进度更新成功",
+            "data": {
+                "order_id": order_id, "stage_id": stage_id, "status": status, "notes": notes,
+                "version": current["version"], "started_at": current.get("started_at"),
+                "completed_at": current.get("completed_at"),
+                "progress_percentage": order["progress_percentage"], "current_stage": order["current_stage"],
+                "order_status": order["order_status"]
+            }
+        }
+
+    def admin_dashboard(self, body: Dict[str, Any], headers: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        """与 admin-dashboard 相同：读取计数器文档和最近动态，rebuild 全量重算计数器"""
+        if body.get("action") == "rebuild":
+            rebuilt = self._rebuild_dashboard_stats()
+            return 200, {"success": True, "data": rebuilt,
+                         "message": f"仪表板计数器已重建，校正 {len(rebuilt['drift'])} 项偏差"}
+
+        with self.store.lock:
+            stats = self.store.get("dashboard_stats", DASHBOARD_STATS_ID)
+            stats = json.loads(json.dumps(stats)) if stats is not None else None
+        if stats is None:
+            stats = self._rebuild_dashboard_stats()["stats"]
+
+        # 最近动态：最新创建的订单和最近完成的阶段各取前 RECENT_ACTIVITY_LIMIT 条（已删除订单的阶段多取一倍）
+        recent_orders = heapq.nlargest(RECENT_ACTIVITY_LIMIT,
+                                       self.store.find("orders", lambda o: not o.get("is_deleted")),
+                                       key=lambda o: o.get("created_at") or "")
+        completed = heapq.nlargest(RECENT_ACTIVITY_LIMIT * 2,
+                                   self.store.find("order_progress", lambda p: p.get("status") == "completed"
+                                                   and p.get("completed_at")),
+                                   key=lambda p: p["completed_at"])
+        activities = [{"type": "订单创建", "message": f"{o['customer_name']} - {o['order_number']}",
+                       "timestamp": o.get("created_at"), "order_id": o["_id"]} for o in recent_orders]
+        for progress in completed:
+            order = self._active_order(progress["order_id"])
+            if order is not None:
+                activities.append({"type": "阶段完成",
+                                   "message": f"{order['customer_name']} - {progress.get('stage_name') or progress['stage_id']}",
+                                   "timestamp": progress["completed_at"], "order_id": progress["order_id"]})
+        activities.sort(key=lambda a: a.get("timestamp") or "", reverse=True)
+
+        now = datetime.now(timezone.utc)
+        thirty_days_ago = now_iso(now - timedelta(days=30))
+        recent_count = len(self.store.find("orders", lambda o: not o.get("is_deleted")
+                                           and o.get("created_at", "") >= thirty_days_ago))
+
+        status_stats = {status: (stats.get("status") or {}).get(status, 0) for status in ORDER_STATUSES}
+        stage_stats = {name: {"completed": counts.get("completed", 0), "in_progress": counts.get("in_progress", 0),
+                              "pending": counts.get("pending", 0), "total": counts["total"]}
+                       for name, counts in (stats.get("stages") or {}).items() if counts.get("total")}
+        completed_by_day = stats.get("completed_by_day") or {}
+        dates = [(now - timedelta(days=i)).strftime("%Y-%m-%d") for i in range(29, -1, -1)]
+        today, month = dates[-1], dates[-1][:7]
+        count = stats.get("completion_days_count") or 0
+        avg_days = int(round(stats.get("completion_days_total", 0) / count)) if count > 0 else 0
+        total = stats.get("total_orders") or 0
+        return 200, {
+            "success": True,
+            "data": {
+                "overview": {
+                    "total_orders": total,
+                    "completed_orders": status_stats["已完成"],
+                    "in_progress_orders": status_stats["制作中"],
+                    "pending_orders": status_stats["待处理"],
+                    "today_completed": completed_by_day.get(today, 0),
+                    "this_month_completed": sum(n for day, n in completed_by_day.items() if day[:7] == month),
+                    "completion_rate": round(status_stats["已完成"] / total * 100) if total else 0,
+                    "recent_orders": recent_count,
+                    "avg_completion_time": avg_days,
+                    "on_time_rate": 0
+                },
+                "order_status_stats": status_stats,
+                "stage_stats": stage_stats,
+                "recent_activities": activities[:RECENT_ACTIVITY_LIMIT],
+                "completion_trend": {"dates": [d[5:] for d in dates],
+                                     "completions": [completed_by_day.get(d, 0) for d in dates]},
+                "performance_metrics": {"avg_completion_days": avg_days, "on_time_rate": 0},
+                "stats_updated_at": stats.get("updated_at"),
+                "stats_rebuilt_at": stats.get("rebuilt_at")
+            },
+            "message": "获取仪表板数据成功"
+        }
+
+    def admin_users(self, body: Dict[str, Any], headers: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        action = body.get("action") or "create"
+        data = body.get("data") or body
+
+        if action == "list":
+            users = sorted(self.store.find("admins"), key=lambda u: u.get("created_at", ""), reverse=True)
+            users = [{"user_id": u["_id"], **{k: u.get(k) for k in ("username", "real_name", "role", "email",
+                                                                     "last_login", "created_at", "is_active")}}
+                     for u in users]
+            return 200, {"success": True, "data": {"users": users, "total_count": len(users)},
+                         "message": "获取用户列表成功"}
+
+        if action == "create":
+            username = data.get("username", "")
+            if self.store.find("admins", lambda u: u["username"] == username):
+                return 200, {"success": False, "message": "用户名已存在", "data": None}
+            created = now_iso()
+            user = {"username": username, "password": data.get("password", ""), "real_name": data.get("real_name", ""),
+                    "role": data.get("role", "operator"), "email": data.get("email", ""),
+                    "is_active": data.get("is_active", True), "created_at": created, "updated_at": created,
+                    "last_login": None}
+            user_id = self.store.add("admins", user)
+            self._log("用户创建", f"创建用户：{username} - {user['real_name']}", data.get("operator", "admin"))
+            return 200, {"success": True, "data": {"user_id": user_id, "username": username,
+                                                   "real_name": user["real_name"], "role": user["role"]},
+                         "message": "用户创建成功"}
+
+        if action == "update":
+            user_id = data.get("user_id", "")
+            if not user_id:
+                return 200, {"success": False, "message": "用户ID不能为空", "data": None}
+            update = {"updated_at": now_iso()}
+            for key in ("real_name", "email", "role", "is_active"):
+                if key in data:
+                    update[key] = data[key]
+            if data.get("password"):
+                update["password"] = data["password"]
+            user = self.store.get("admins", user_id)
+            if user is not None:
+                user.update(update)
+                self._log("用户更新", f"更新用户：{user['real_name']} ({user['username']})", data.get("operator", "admin"))
+            update.pop("password", None)
+            return 200, {"success": True, "data": {"user_id": user_id, **update}, "message": "用户更新成功"}
+
+        if action == "delete":
+            user_id = data.get("user_id", "")
+            if not user_id:
+                return 200, {"success": False, "message": "用户ID不能为空", "data": None}
+            user = self.store.get("admins", user_id)
+            if user is None:
+                return 200, {"success": False, "message": "用户不存在", "data": None}
+            if user["role"] == "admin" and len(self.store.find("admins", lambda u: u["role"] == "admin")) <= 1:
+                return 200, {"success": False, "message": "不能删除最后一个系统管理员", "data": None}
+            self._log("用户删除", f"删除用户：{user['username']} - {user['real_name']}", data.get("operator", "admin"))
+            self.store.remove("admins", user_id)
+            return 200, {"success": True, "data": {"user_id": user_id}, "message": "用户删除成功"}
+
+        return 200, {"success": False, "message": f"不支持的操作类型: {action}", "data": None}
+
+    def role_permissions(self, body: Dict[str, Any], headers: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        action = body.get("action") or "list"
+        data = body.get("data") or body
+
+        if action == "list":
+            return 200, {"success": True, "message": "获取角色列表成功", "data": {"roles": self.store.find("roles")}}
+
+        if action == "list_roles":
+            roles = sorted(self.store.find("roles", lambda r: r.get("is_active")),
+                           key=lambda r: r.get("created_at", ""), reverse=True)
+            return 200, {"success": True, "data": {"roles": roles, "total_count": len(roles)},
+                         "message": "获取角色列表成功"}
+
+        if action == "list_permissions":
+            permissions = sorted(self.store.find("permissions"),
+                                 key=lambda p: (p.get("category", ""), p.get("permission_name", "")))
+            return 200, {"success": True, "data": {"permissions": permissions, "total_count": len(permissions)},
+                         "message": "获取权限列表成功"}
+
+        if action == "get_role_permissions":
+            role_id = data.get("role_id", "")
+            if not role_id:
+                return 200, {"success": False, "message": "角色ID不能为空", "data": None}
+            ids = {rp["permission_id"] for rp in self.store.find("role_permissions", lambda rp: rp["role_id"] == role_id)}
+            permissions = self.store.find("permissions", lambda p: p["_id"] in ids and p.get("is_active"))
+            return 200, {"success": True, "data": {"role_id": role_id, "permissions": permissions,
+                                                   "permission_count": len(permissions)},
+                         "message": "获取角色权限成功"}
+
+        if action == "update_role_permissions":
+            role_id = data.get("role_id", "")
+            if not role_id:
+                return 200, {"success": False, "message": "角色ID不能为空", "data": None}
+            permission_ids = data.get("permission_ids") or []
+            with self.store.lock:
+                for rp in self.store.find("role_permissions", lambda rp: rp["role_id"] == role_id):
+                    self.store.remove("role_permissions", rp["_id"])
+                for permission_id in permission_ids:
+                    self.store.add("role_permissions", {"role_id": role_id, "permission_id": permission_id,
+                                                        "granted_at": now_iso(),
+                                                        "granted_by": data.get("granted_by", "system")})
+            self._log("权限管理", f"更新角色权限：{role_id}", data.get("operator", "admin"))
+            return 200, {"success": True, "data": {"role_id": role_id, "permission_count": len(permission_ids)},
+                         "message": "角色权限更新成功"}
+
+        if action == "create_role":
+            role_name = data.get("role_name", "")
+            if self.store.find("roles", lambda r: r["role_name"] == role_name):
+                return 200, {"success": False, "message": "角色名称已存在", "data": None}
+            created = now_iso()
+            role_id = self.store.add("roles", {
+                "role_name": role_name, "display_name": data.get("display_name", ""),
+                "description": data.get("description", ""), "is_active": True, "created_at": created,
+                "updated_at": created, "created_by": data.get("created_by", "system")
+            })
+            self._log("角色创建", f"创建角色：{data.get('display_name', '')} ({role_name})", data.get("operator", "admin"))
+            return 200, {"success": True, "data": {"role_id": role_id, "role_name": role_name,
+                                                   "display_name": data.get("display_name", "")},
+                         "message": "角色创建成功"}
+
+        if action == "update_permission":
+            permission = self.store.get("permissions", data.get("permission_id", ""))
+            if permission is None:
+                return 200, {"success": False, "message": "权限不存在", "data": None}
+            permission.update({"is_active": data.get("is_active"), "updated_at": now_iso()})
+            self._log("权限管理", f"{'启用' if data.get('is_active') else '禁用'}权限：{permission['permission_name']}",
+                      data.get("operator", "admin"))
+            return 200, {"success": True, "message": f"权限已{'启用' if data.get('is_active') else '禁用'}",
+                         "data": {"permission_id": permission["_id"], "is_active": data.get("is_active")}}
+
+        if action == "init_default_data":
+            return 200, {"success": True, "message": "默认数据已存在", "data": None}
+
+        return 200, {"success": False, "message": f"不支持的操作类型: {action}", "data": None}
+
+    def admin_logs(self, body: Dict[str, Any], headers: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        """与 admin-logs 相同：按筛选条件和 (timestamp, _id) 游标倒序分页"""
+        if (body.get("action") or "list") != "list":
+            return 400, {"success": False, "message": "不支持的操作"}
+        limit = min(int(body.get("limit") or LOG_PAGE_SIZE), LOG_MAX_PAGE_SIZE)
+        cursor = None
+        if body.get("cursor"):
+            try:
+                cursor = tuple(json.loads(base64.b64decode(body["cursor"]).decode("utf-8")))
+            except (ValueError, TypeError):
+                return 200, {"success": False, "message": "无效的分页游标", "data": None}
+
+        def contains(value, needle):
+            return needle.lower() in str(value or "").lower()
+
+        def matches(log):
+            timestamp = log.get("timestamp", "")
+            return ((not body.get("type") or log.get("type") == body["type"])
+                    and (not body.get("since") or timestamp >= body["since"])
+                    and (not body.get("until") or timestamp < body["until"])
+                    and (not body.get("order_number") or contains(log.get("order_number"), body["order_number"]))
+                    and (not body.get("operator") or contains(log.get("operator"), body["operator"]))
+                    and (not body.get("customer") or contains(log.get("description"), body["customer"])
+                         or contains((log.get("metadata") or {}).get("customer_name"), body["customer"])))
+
+        logs = sorted(self.store.find("operation_logs", matches),
+                      key=lambda l: (l.get("timestamp", ""), l["_id"]), reverse=True)
+        total = len(logs)
+        if cursor is not None:
+            logs = [l for l in logs if (l.get("timestamp", ""), l["_id"]) < cursor]
+        page = logs[:limit]
+        has_more = len(logs) > limit
+        pagination = {"page_size": limit, "has_more": has_more, "next_cursor": base64.b64encode(json.dumps(
+            [page[-1].get("timestamp", ""), page[-1]["_id"]], separators=(",", ":")).encode("utf-8")).decode("ascii")
+            if has_more else None}
+        if body.get("with_total"):
+            pagination["total_count"] = total
+        return 200, {"success": True, "data": {"logs": page, "pagination": pagination}, "message": "获取操作日志成功"}
+
+    def photo_upload(self, body: Dict[str, Any], headers: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        action = body.get("action")
+        data = body.get("data") or {}
+
+        if action == "test":
+            return 200, {"success": True, "message": "无依赖云函数运行正常！", "timestamp": now_iso()}
+
+        if action == "get_upload_url":
+            order_id = data.get("order_id")
+            stage_id = data.get("stage_id")
+            if not order_id or not stage_id:
+                return 400, {"success": False, "message": "缺少必要参数: order_id 或 stage_id"}
+            file_types = data.get("file_types") or []
+            order_hash = hashlib.md5(order_id.encode("utf-8")).hexdigest()[:16]
+            stage_num = stage_id.replace("STAGE", "").lstrip("0") or "0"
+            upload_urls = []
+            for i in range(int(data.get("file_count", 1))):
+                mime = (file_types[i] if i < len(file_types) else "image/jpeg").lower()
+                is_video = mime.startswith("video/")
+                ext = "mp4" if is_video else ("png" if "png" in mime else "jpg")
+                folder = "videos" if is_video else "photos"
+                prefix = "video" if is_video else "photo"
+                timestamp = int(time.time() * 1000)
+                key = f"{folder}/{order_hash}/{stage_num}/{timestamp}_{i}.{ext}"
+                upload_urls.append({
+                    "file_id": f"{prefix}_{order_id}_{stage_id}_{timestamp}_{i}.{ext}",
+                    "upload_url": f"{self._photo_url(key)}?q-sign-algorithm=sha1&q-ak=emulator&q-header-list=&q-signature=fake",
+                    "cloud_path": key,
+                    "storage_type": "cos_presigned_put",
+                    "uploadMethod": "presigned_put",
+                    "photo_url": self._photo_url(key),
+                    "thumbnail_url": self._photo_url(key),
+                    "media_type": "video" if is_video else "photo",
+                    "file_extension": ext,
+                    "metadata": {"order_id": order_id, "stage_id": stage_id, "media_type": "video" if is_video else "photo"}
+                })
+            return 200, {"success": True, "data": {"upload_urls": upload_urls},
+                         "message": f"成功生成 {len(upload_urls)} 个上传URL"}
+
+        if action == "init_multipart":
+            cloud_path = data.get("cloud_path", "")
+            part_count = int(data.get("part_count") or 0)
+            if not cloud_path.startswith(("photos/", "videos/")) or not 1 <= part_count <= 10000:
+                return 400, {"success": False, "message": "缺少必要参数或参数无效: cloud_path 或 part_count"}
+            upload_id = data.get("upload_id") or ""
+            uploaded_parts = []
+            if upload_id:
+                if upload_id not in self.multipart:
+                    return 200, {"success": False, "message": "初始化分片上传失败: NoSuchUpload",
+                                 "error_code": "UPLOAD_NOT_FOUND"}
+                uploaded_parts = [{"part_number": n, "etag": f'"{hashlib.md5(content).hexdigest()}"', "size": len(content)}
+                                  for n, content in sorted(self.multipart[upload_id].items())]
+            else:
+                upload_id = uuid.uuid4().hex
+                self.multipart[upload_id] = {}
+            part_urls = [{"part_number": n,
+                          "upload_url": f"{self._photo_url(cloud_path)}?partNumber={n}&uploadId={upload_id}&q-signature=fake"}
+                         for n in range(1, part_count + 1)]
+            return 200, {"success": True, "data": {"upload_id": upload_id, "cloud_path": cloud_path,
+                                                   "part_urls": part_urls, "uploaded_parts": uploaded_parts},
+                         "message": f"分片上传已就绪，共{part_count}个分片"}
+
+        if action == "complete_multipart":
+            upload_id = data.get("upload_id", "")
+            parts = self.multipart.get(upload_id)
+            numbers = sorted(int(p["part_number"]) for p in data.get("parts") or [])
+            if parts is None or not numbers or any(n not in parts for n in numbers):
+                return 200, {"success": False, "message": "完成分片上传失败: InvalidPart"}
+            self.objects[data["cloud_path"]] = b"".join(parts[n] for n in numbers)
+            del self.multipart[upload_id]
+            return 200, {"success": True, "data": {"cloud_path": data["cloud_path"], "etag": "",
+                                                   "photo_url": self._photo_url(data["cloud_path"])},
+                         "message": "分片上传完成"}
+
+        if action == "abort_multipart":
+            self.multipart.pop(data.get("upload_id", ""), None)
+            return 200, {"success": True, "message": "分片上传已取消"}
+
+        if action == "confirm_upload":
+            order_id = data.get("order_id")
+            stage_id = data.get("stage_id")
+            files = data.get("uploaded_files")
+            if not order_id or not stage_id or not isinstance(files, list):
+                return 400, {"success": False, "message": "缺少必要参数: order_id, stage_id 或 uploaded_files"}
+            order = self.store.get("orders", order_id)
+            existing = len([p for p in self.store.by_order("photos", order_id)
+                            if p["stage_id"] == stage_id and not p.get("is_deleted")])
+            saved = []
+            for i, file in enumerate(files):
+                media_type = file.get("media_type") or ("video" if str(file.get("file_type", "")).startswith("video/") else "photo")
+                record = {
+                    "order_id": order_id, "stage_id": stage_id, "stage_name": STAGE_NAMES.get(stage_id, stage_id),
+                    "file_id": file.get("file_id", ""), "photo_url": self._photo_url(file.get("cloud_path", "")),
+                    "thumbnail_url": self._photo_url(file.get("cloud_path", "")),
+                    "storage_type": file.get("storage_type", "cos_presigned_put"),
+                    "file_name": file.get("file_name") or "未命名", "file_size": file.get("file_size", 0),
+                    "file_type": file.get("file_type") or ("video/mp4" if media_type == "video" else "image/jpeg"),
+                    "media_type": media_type, "upload_time": now_iso(), "created_at": now_iso(), "updated_at": now_iso(),
+                    "description": data.get("description", ""), "sort_order": existing + i, "is_deleted": False,
+                    "cloud_path": file.get("cloud_path", "")
+                }
+                record["_id"] = self.store.add("photos", record)
+                saved.append(dict(record))
+            if saved:
+                self._log("媒体上传", f"上传媒体：客户 {(order or {}).get('customer_name', '未知客户')} - "
+                                      f"{STAGE_NAMES.get(stage_id, stage_id)} (照片{len(saved)}张)",
+                          data.get("operator", "admin"), order)
+            return 200, {"success": True, "data": {"saved_photos": saved, "total_saved": len(saved),
+                                                   "total_uploaded": len(files)},
+                         "message": f"成功保存 {len(saved)} 张照片"}
+
+        if action == "delete":
+            photo = self.store.get("photos", data.get("photo_id", ""))
+            if not data.get("photo_id"):
+                return 400, {"success": False, "message": "缺少必要参数: photo_id"}
+            if photo is None or photo.get("is_deleted"):
+                return 200, {"success": False, "message": "媒体不存在或已删除"}
+            photo.update({"is_deleted": True, "deleted_at": now_iso(), "updated_at": now_iso(),
+                          "delete_reason": data.get("reason", "")})
+            cos_deleted = False
+            if data.get("delete_from_storage", True):
+                cos_deleted = self.objects.pop(photo.get("cloud_path", ""), None) is not None
+            self._log("媒体删除", f"删除媒体：{photo.get('stage_name')} - {photo.get('file_name')}",
+                      data.get("operator", "admin"), self.store.get("orders", photo["order_id"]))
+            return 200, {"success": True, "data": {"photo_id": photo["_id"], "cos_deleted": cos_deleted,
+                                                   "cos_error": None},
+                         "message": "媒体已删除"}
+
+        return 400, {"success": False, "message": f"不支持的操作: {action}"}
+
+    # ------------------------------------------------------------------
+    # 模拟 COS
+    # ------------------------------------------------------------------
+
+    def cos_put(self, key: str, query: Dict[str, List[str]], content: bytes) -> Tuple[int, Dict[str, str]]:
+        etag = f'"{hashlib.md5(content).hexdigest()}"'
+        if "uploadId" in query:
+            parts = self.multipart.get(query["uploadId"][0])
+            if parts is None:
+                return 404, {}
+            parts[int(query["partNumber"][0])] = content
+        else:
+            self.objects[key] = content
+        return 200, {"ETag": etag}
+
+    def cos_get(self, key: str) -> Optional[bytes]:
+        return self.objects.get(key)
+
+    def dispatch(self, function_name: str, body: Dict[str, Any], headers: Dict[str, str]) -> Tuple[int, Dict[str, Any]]:
+        handler = getattr(self, function_name.replace("-", "_"))
+        return handler(body, headers)
+
+
+class EmulatorHandler(BaseHTTPRequestHandler):
+    """HTTP 入口：云函数路径 -> 模拟实现，/cos/ 路径 -> 模拟 COS"""
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, payload: bytes, content_type: str = "application/json; charset=utf-8",
+              extra_headers: Optional[Dict[str, str]] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        for key, value in (extra_headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", 0))
+        return self.rfile.read(length) if length else b""
+
+    def _inject(self, function_name: str) -> bool:
+        """注入延迟和错误；返回 True 表示本次请求模拟失败"""
+        server = self.server
+        latency = server.function_latency_ms.get(function_name, server.latency_ms)
+        if latency or server.jitter_ms:
+            time.sleep((latency + random.uniform(0, server.jitter_ms)) / 1000)
+        if server.error_rate and random.random() < server.error_rate:
+            server.record(function_name, failed=True)
+            self._send(502, "模拟云函数故障".encode("utf-8"), "text/plain; charset=utf-8")
+            return True
+        return False
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        body = self._read_body()
+        function_name = self.server.path_functions.get(path)
+        if function_name is None:
+            if path == "/__emulator/reset_stats":
+                self.server.reset_stats()
+                self._send(200, b'{"success": true}')
+                return
+            self._send(404, b'{"success": false, "message": "not found"}')
+            return
+
+        if self._inject(function_name):
+            return
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            request = {}
+        headers = {k.lower(): v for k, v in self.headers.items()}
+        status, payload = self.server.emulator.dispatch(function_name, request, headers)
+        self.server.record(function_name)
+        self._send(status, json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8"))
+
+    def do_PUT(self):
+        parsed = urlparse(self.path)
+        content = self._read_body()
+        if not parsed.path.startswith("/cos/"):
+            self._send(404, b"")
+            return
+        if self._inject("cos"):
+            return
+        status, headers = self.server.emulator.cos_put(parsed.path[len("/cos/"):], parse_qs(parsed.query), content)
+        self.server.record("cos")
+        self._send(status, b"", extra_headers=headers)
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        if parsed.path == "/__emulator/stats":
+            self._send(200, json.dumps(self.server.get_stats()).encode("utf-8"))
+            return
+        if parsed.path.startswith("/cos/"):
+            content = self.server.emulator.cos_get(parsed.path[len("/cos/"):])
+            if content is None:
+                self._send(404, b"")
+            else:
+                content_type = "video/mp4" if parsed.path.endswith(".mp4") else "image/jpeg"
+                self._send(200, content, content_type)
+            return
+        self._send(404, b"")
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class EmulatorServer(ThreadingHTTPServer):
+    """带注入配置和调用统计的模拟服务"""
+    daemon_threads = True
+
+    def __init__(self, address, emulator: CloudBaseEmulator, latency_ms: float = 0, jitter_ms: float = 0,
+                 error_rate: float = 0, function_latency_ms: Optional[Dict[str, float]] = None, verbose: bool = False):
+        super().__init__(address, EmulatorHandler)
+        self.emulator = emulator
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.function_latency_ms = function_latency_ms or {}
+        self.verbose = verbose
+        self.path_functions = {path: name for name, path in CloudBaseClient.HTTP_PATHS.items()}
+        self._stats_lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def record(self, function_name: str, failed: bool = False):
+        with self._stats_lock:
+            stats = self._stats.setdefault(function_name, {"calls": 0, "errors": 0})
+            stats["calls"] += 1
+            stats["errors"] += int(failed)
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        with self._stats_lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self._stats.clear()
+
+
+def start_emulator(host: str = "127.0.0.1", port: int = 0, seed_orders: int = 0, **options) -> Tuple[EmulatorServer, str]:
+    """
+    在后台线程启动模拟服务
+
+    Args:
+        port: 端口（0 表示随机端口）
+        seed_orders: 初始生成的订单数
+        options: latency_ms、jitter_ms、error_rate、function_latency_ms、verbose
+
+    Returns:
+        (server, base_url)，用 server.shutdown() 停止
+    """
+    emulator = CloudBaseEmulator(seed_orders=seed_orders)
+    server = EmulatorServer((host, port), emulator, **options)
+    base_url = f"http://{host}:{server.server_address[1]}"
+    emulator.base_url = base_url
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CloudBase 本地模拟服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--seed-orders", type=int, default=200, help="初始生成的订单数")
+    parser.add_argument("--latency-ms", type=float, default=0, help="每次调用的固定延迟（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="随机附加延迟上限（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0, help="随机返回 502 的概率（0-1）")
+    parser.add_argument("--function-latency", action="append", default=[], metavar="NAME=MS",
+                        help="单个云函数的固定延迟，如 admin-dashboard=300，可重复")
+    parser.add_argument("--verbose", action="store_true", help="打印每个请求")
+    args = parser.parse_args()
+
+    function_latency = {}
+    for item in args.function_latency:
+        name, _, value = item.partition("=")
+        function_latency[name] = float(value)
+
+    emulator = CloudBaseEmulator(seed_orders=args.seed_orders)
+    server = EmulatorServer((args.host, args.port), emulator, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+                            error_rate=args.error_rate, function_latency_ms=function_latency, verbose=args.verbose)
+    emulator.base_url = f"http://{args.host}:{server.server_address[1]}"
+    print(f"🚀 CloudBase 模拟服务已启动: {emulator.base_url}（{args.seed_orders} 个订单）")
+    print(f"   API_BASE_URL={emulator.base_url} streamlit run streamlit_app/main.py")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n已停止")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,389 @@
+"""
+负载生成器
+
+模拟多个并发的客户和管理员会话，通过服务层和 CloudBaseClient 运行脚本化的业务流程，
+用于回答“一个容器能支撑多少并发操作员”这类问题。
+
+业务流程（按权重随机选择）：
+- customer：客户按手机号查询订单 → 查看订单详情
+- progress：管理员订单列表 → 订单详情 → 开始/完成阶段
+- upload：管理员上传阶段照片
+- dashboard：刷新仪表板
+
+报告每个操作的 p50/p95/p99 延迟、吞吐量、错误率和每个用户操作触发的后端调用次数。
+
+使用方法：
+    # 对本地模拟服务压测（自动启动）
+    python tests/load_generator.py --emulator --users 20 --duration 60 --latency-ms 80
+    # 对真实环境压测
+    python tests/load_generator.py --base-url https://xxx.service.tcloudbase.com --users 5 --duration 30
+"""
+
+import sys
+import os
+import io
+import json
+import math
+import random
+import argparse
+import threading
+import time
+import contextlib
+from typing import Dict, Any, List, Optional, Callable
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'streamlit_app'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from config import CLOUDBASE_CONFIG, HTTP_POOL_CONFIG
+from utils.cloudbase_client import CloudBaseClient
+from utils.http_transport import PooledTransport
+from services import OrderService, ProgressService, PhotoService
+
+
+DEFAULT_MIX = {"customer": 4, "progress": 3, "upload": 1, "dashboard": 2}
+
+
+class CountingTransport(PooledTransport):
+    """统计当前线程发出的后端请求数（云函数调用和 COS 上传）"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._local = threading.local()
+
+    def reset_call_count(self):
+        self._local.calls = 0
+
+    def get_call_count(self) -> int:
+        return getattr(self._local, "calls", 0)
+
+    def _count(self):
+        self._local.calls = self.get_call_count() + 1
+
+    def post(self, function_name, json_data, headers, timeout=10):
+        self._count()
+        return super().post(function_name, json_data, headers, timeout=timeout)
+
+    def put(self, url, data, headers, timeout=60):
+        self._count()
+        return super().put(url, data, headers, timeout=timeout)
+
+
+class UploadFile(io.BytesIO):
+    """模拟 Streamlit UploadedFile"""
+
+    def __init__(self, content: bytes, name: str, file_type: str = "image/jpeg"):
+        super().__init__(content)
+        self.name = name
+        self.type = file_type
+        self.size = len(content)
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    """最近秩百分位数（输入需已排序）"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct * len(sorted_values) / 100))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class LoadRecorder:
+    """线程安全的操作结果记录"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Dict[str, List[float]] = {}
+        self._errors: Dict[str, int] = {}
+        self._backend_calls: Dict[str, int] = {}
+        self._error_messages: Dict[str, Dict[str, int]] = {}
+
+    def record(self, operation: str, elapsed: float, success: bool, backend_calls: int, message: str = ""):
+        with self._lock:
+            self._samples.setdefault(operation, []).append(elapsed)
+            self._backend_calls[operation] = self._backend_calls.get(operation, 0) + backend_calls
+            if not success:
+                self._errors[operation] = self._errors.get(operation, 0) + 1
+                messages = self._error_messages.setdefault(operation, {})
+                messages[message] = messages.get(message, 0) + 1
+
+    def report(self, duration: float) -> Dict[str, Any]:
+        """
+        汇总统计
+
+        Returns:
+            {duration, total_operations, throughput, error_rate, operations: {操作: {count, errors, error_rate,
+             throughput, p50_ms, p95_ms, p99_ms, max_ms, backend_calls_per_op, top_errors}}}
+        """
+        with self._lock:
+            samples = {op: sorted(values) for op, values in self._samples.items()}
+            errors = dict(self._errors)
+            backend_calls = dict(self._backend_calls)
+            error_messages = {op: dict(m) for op, m in self._error_messages.items()}
+
+        operations = {}
+        total = total_errors = 0
+        for operation, values in sorted(samples.items()):
+            count = len(values)
+            failed = errors.get(operation, 0)
+            total += count
+            total_errors += failed
+            top_errors = sorted(error_messages.get(operation, {}).items(), key=lambda item: -item[1])[:3]
+            operations[operation] = {
+                "count": count,
+                "errors": failed,
+                "error_rate": round(failed / count, 4),
+                "throughput": round(count / duration, 2),
+                "p50_ms": round(percentile(values, 50) * 1000, 1),
+                "p95_ms": round(percentile(values, 95) * 1000, 1),
+                "p99_ms": round(percentile(values, 99) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1),
+                "backend_calls_per_op": round(backend_calls.get(operation, 0) / count, 2),
+                "top_errors": [{"message": message, "count": n} for message, n in top_errors]
+            }
+
+        return {
+            "duration": round(duration, 2),
+            "total_operations": total,
+            "throughput": round(total / duration, 2) if duration else 0.0,
+            "error_rate": round(total_errors / total, 4) if total else 0.0,
+            "operations": operations
+        }
+
+
+class VirtualUser:
+    """一个模拟会话：循环执行随机选择的业务流程"""
+
+    def __init__(self, user_id: int, client: CloudBaseClient, recorder: LoadRecorder, orders: List[Dict[str, Any]],
+                 mix: Dict[str, int], think_time: tuple, photo_size: int, rng: random.Random):
+        self.user_id = user_id
+        self.client = client
+        self.recorder = recorder
+        self.orders = orders
+        self.think_time = think_time
+        self.photo_size = photo_size
+        self.rng = rng
+        self.order_service = OrderService(client)
+        self.progress_service = ProgressService(client)
+        self.photo_service = PhotoService(client)
+        self.workflows = {
+            "customer": self.customer_workflow,
+            "progress": self.progress_workflow,
+            "upload": self.upload_workflow,
+            "dashboard": self.dashboard_workflow
+        }
+        self.mix = [(name, weight) for name, weight in mix.items() if weight > 0 and name in self.workflows]
+
+    def timed(self, operation: str, action: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """执行一个用户操作并记录延迟、结果和后端调用次数"""
+        transport = self.client.transport
+        transport.reset_call_count()
+        start = time.perf_counter()
+        try:
+            result = action() or {}
+        except Exception as e:
+            result = {"success": False, "message": f"异常: {type(e).__name__}"}
+        elapsed = time.perf_counter() - start
+        success = bool(result.get("success"))
+        self.recorder.record(operation, elapsed, success, transport.get_call_count(),
+                             "" if success else str(result.get("message", ""))[:80])
+        return result
+
+    def think(self):
+        low, high = self.think_time
+        if high > 0:
+            time.sleep(self.rng.uniform(low, high))
+
+    def customer_workflow(self):
+        order = self.rng.choice(self.orders)
+        found = self.timed("search_orders",
+                           lambda: self.client.search_orders(search_type="phone", search_value=order["customer_phone"]))
+        matches = found.get("data") or []
+        if matches:
+            self.think()
+            self.timed("customer_detail", lambda: self.client.get_order_detail(matches[0]["_id"]))
+
+    def progress_workflow(self):
+        listed = self.timed("order_list", lambda: self.order_service.list_orders(
+            page=self.rng.randint(1, max(1, len(self.orders) // 20)), limit=20))
+        orders = (listed.get("data") or {}).get("orders") or []
+        candidates = [o for o in orders if o.get("order_status") != "已完成"] or orders
+        if not candidates:
+            return
+        order_id = self.rng.choice(candidates)["_id"]
+        self.think()
+        detail = self.timed("order_detail", lambda: self.order_service.get_order(order_id))
+        if not detail.get("success"):
+            return
+
+        progress = detail["data"].get("progress") or []
+        current = self.progress_service.get_current_stage(progress)
+        self.think()
+        if current:
+            self.timed("complete_stage", lambda: self.progress_service.complete_stage(
+                order_id, current["stage_id"], notes="压测完成"))
+            return
+        next_stage = self.progress_service.get_next_stage(progress)
+        if next_stage:
+            self.timed("start_stage", lambda: self.progress_service.start_stage(order_id, next_stage["stage_id"]))
+
+    def upload_workflow(self):
+        order = self.rng.choice(self.orders)
+        stage_id = f"STAGE00{self.rng.randint(1, 8)}"
+        files = [UploadFile(os.urandom(self.photo_size), f"load_{self.user_id}_{i}.jpg")
+                 for i in range(self.rng.randint(1, 3))]
+        self.timed("upload_photos", lambda: self.photo_service.upload_photos(order["_id"], stage_id, "", files))
+
+    def dashboard_workflow(self):
+        self.timed("dashboard", self.order_service.get_order_statistics)
+
+    def run(self, deadline: float):
+        names = [name for name, _ in self.mix]
+        weights = [weight for _, weight in self.mix]
+        while time.time() < deadline:
+            self.workflows[self.rng.choices(names, weights)[0]]()
+            self.think()
+
+
+def load_order_pool(client: CloudBaseClient, max_orders: int = 500) -> List[Dict[str, Any]]:
+    """压测前读取一批订单，作为客户查询和照片上传的目标"""
+    orders = []
+    page = 1
+    while len(orders) < max_orders:
+        result = client.get_orders(page=page, limit=100)
+        batch = (result.get("data") or {}).get("orders") or []
+        orders.extend(batch)
+        pagination = (result.get("data") or {}).get("pagination") or {}
+        if not batch or page >= pagination.get("total_pages", page):
+            break
+        page += 1
+    return orders[:max_orders]
+
+
+def run_load(base_url: str, users: int = 10, duration: float = 30, think_time: tuple = (0.5, 2.0),
+             mix: Optional[Dict[str, int]] = None, photo_size: int = 64 * 1024, seed: int = 1,
+             quiet: bool = True) -> Dict[str, Any]:
+    """
+    运行一次压测
+
+    所有虚拟用户共享一个 CloudBaseClient（与同一容器内的 Streamlit 会话一致），
+    因此报告反映的是单个容器的承载能力。
+
+    Args:
+        base_url: 云函数 HTTP 访问地址
+        users: 并发虚拟用户数
+        duration: 持续时间（秒）
+        think_time: 操作之间的思考时间范围（秒）
+        mix: 业务流程权重，默认 DEFAULT_MIX
+        photo_size: 每张模拟照片的字节数
+        quiet: 是否屏蔽客户端的逐次调用日志
+
+    Returns:
+        LoadRecorder.report() 的结果，附加 users、base_url、cache 和 transport 统计
+    """
+    pool_config = dict(HTTP_POOL_CONFIG)
+    pool_config["pool_maxsize"] = max(pool_config.get("pool_maxsize", 10), users)
+    client = CloudBaseClient(CountingTransport(base_url, CloudBaseClient.HTTP_PATHS, pool_config))
+    recorder = LoadRecorder()
+
+    output = open(os.devnull, "w") if quiet else sys.stdout
+    try:
+        with contextlib.redirect_stdout(output):
+            orders = load_order_pool(client)
+            if not orders:
+                raise RuntimeError("没有可用于压测的订单")
+
+            deadline = time.time() + duration
+            threads = []
+            start = time.perf_counter()
+            for i in range(users):
+                user = VirtualUser(i, client, recorder, orders, mix or DEFAULT_MIX, think_time, photo_size,
+                                   random.Random(seed + i))
+                thread = threading.Thread(target=user.run, args=(deadline,), name=f"load-user-{i}", daemon=True)
+                thread.start()
+                threads.append(thread)
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+    finally:
+        if quiet:
+            output.close()
+
+    report = recorder.report(elapsed)
+    report.update({
+        "users": users,
+        "base_url": base_url,
+        "cache": client.get_cache_stats(),
+        "transport": client.get_transport_stats()
+    })
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    """打印压测报告"""
+    print("\n" + "="*96)
+    print(f"📊 压测报告：{report['users']} 个并发用户，{report['duration']} 秒，目标 {report['base_url']}")
+    print("="*96)
+    print(f"{'操作':<18}{'次数':>8}{'吞吐/秒':>10}{'错误率':>9}{'p50(ms)':>10}{'p95(ms)':>10}"
+          f"{'p99(ms)':>10}{'max(ms)':>10}{'后端调用/次':>12}")
+    for operation, stats in report["operations"].items():
+        print(f"{operation:<18}{stats['count']:>8}{stats['throughput']:>10}{stats['error_rate']:>9.2%}"
+              f"{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['max_ms']:>10}"
+              f"{stats['backend_calls_per_op']:>12}")
+    print("-"*96)
+    print(f"总计：{report['total_operations']} 次操作，{report['throughput']} 次/秒，错误率 {report['error_rate']:.2%}，"
+          f"缓存命中率 {report['cache']['hit_ratio']:.2%}")
+
+    for operation, stats in report["operations"].items():
+        for error in stats["top_errors"]:
+            print(f"  [错误] {operation}: {error['message']} ×{error['count']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生命钻石订单系统负载生成器")
+    parser.add_argument("--base-url", default=CLOUDBASE_CONFIG["api_base_url"], help="云函数 HTTP 访问地址")
+    parser.add_argument("--emulator", action="store_true", help="启动本地模拟服务并对其压测")
+    parser.add_argument("--seed-orders", type=int, default=500, help="模拟服务的初始订单数")
+    parser.add_argument("--latency-ms", type=float, default=50, help="模拟服务的固定延迟（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=30, help="模拟服务的随机附加延迟（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0, help="模拟服务的错误率")
+    parser.add_argument("--users", type=int, default=10, help="并发虚拟用户数")
+    parser.add_argument("--duration", type=float, default=30, help="持续时间（秒）")
+    parser.add_argument("--think-min", type=float, default=0.5, help="最短思考时间（秒）")
+    parser.add_argument("--think-max", type=float, default=2.0, help="最长思考时间（秒）")
+    parser.add_argument("--mix", default="", help="业务流程权重，如 customer=4,progress=3,upload=1,dashboard=2")
+    parser.add_argument("--photo-kb", type=int, default=64, help="每张模拟照片大小（KB）")
+    parser.add_argument("--json", default="", help="将报告写入 JSON 文件")
+    parser.add_argument("--verbose", action="store_true", help="显示客户端调用日志")
+    args = parser.parse_args()
+
+    mix = dict(DEFAULT_MIX)
+    for item in filter(None, args.mix.split(",")):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = int(weight)
+
+    server = None
+    base_url = args.base_url
+    if args.emulator:
+        from cloudbase_emulator import start_emulator
+        server, base_url = start_emulator(seed_orders=args.seed_orders, latency_ms=args.latency_ms,
+                                          jitter_ms=args.jitter_ms, error_rate=args.error_rate)
+        print(f"🚀 已启动本地模拟服务: {base_url}")
+
+    try:
+        report = run_load(base_url, users=args.users, duration=args.duration,
+                          think_time=(args.think_min, args.think_max), mix=mix,
+                          photo_size=args.photo_kb * 1024, quiet=not args.verbose)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    print_report(report)
+    if server is not None:
+        print(f"\n模拟服务收到的调用：{json.dumps(server.get_stats(), ensure_ascii=False)}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n报告已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
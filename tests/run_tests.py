@@ -12,6 +12,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'streamlit_app'
 
 from test_state_machine import run_all_tests as test_state_machine
 from test_services import run_all_tests as test_services
+from test_cloudbase_client import run_all_tests as test_cloudbase_client
+from test_auth import run_all_tests as test_auth
+from test_emulator import run_all_tests as test_emulator
 
 
 def main():
@@ -30,6 +33,18 @@ def main():
     print("\n📍 第2部分：服务层测试")
     results.append(('服务层', test_services()))
     
+    # 测试3: 客户端基础设施
+    print("\n📍 第3部分：客户端基础设施测试")
+    results.append(('客户端', test_cloudbase_client()))
+    
+    # 测试4: 权限
+    print("\n📍 第4部分：权限快照测试")
+    results.append(('权限', test_auth()))
+    
+    # 测试5: 本地模拟服务
+    print("\n📍 第5部分：本地模拟服务测试")
+    results.append(('模拟服务', test_emulator()))
+    
     # 总结
     print("\n" + "="*70)
     print("📊 测试结果总结")
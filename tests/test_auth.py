@@ -0,0 +1,109 @@
+"""
+权限快照测试
+
+使用模拟客户端验证权限在登录时解析一次、之后的检查都在内存中完成
+"""
+
+import sys
+import os
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'streamlit_app'))
+
+import streamlit as st
+from utils.auth import AuthManager, ROLE_PERMISSIONS_FALLBACK
+
+
+class MockRoleClient:
+    """模拟角色权限接口，记录调用次数"""
+
+    def __init__(self, online: bool = True):
+        self.online = online
+        self.calls = 0
+        self.version = 0
+        self.permissions = ["dashboard.view", "orders.read"]
+
+    def admin_login(self, username, password):
+        return {'success': True, 'data': {'user': {'username': username, 'role': 'operator'}, 'token': 't'}}
+
+    def get_permissions_version(self):
+        return self.version
+
+    def get_roles(self):
+        self.calls += 1
+        if not self.online:
+            raise ConnectionError("offline")
+        return {'success': True, 'data': {'roles': [{'_id': 'role_operator', 'role_name': 'operator'}]}}
+
+    def get_role_permissions(self, role_id):
+        self.calls += 1
+        return {'success': True, 'data': {'permissions': [{'permission_code': p} for p in self.permissions]}}
+
+
+def test_permission_snapshot():
+    """测试权限快照"""
+    print("\n=== 测试权限快照 ===")
+
+    client = MockRoleClient()
+    auth = AuthManager(client)
+
+    # 测试1: 登录时解析一次权限，之后的检查不再请求
+    success, _ = auth.login("operator", "operator123")
+    assert success, "登录应该成功"
+    assert client.calls == 2, "登录时应该加载一次角色权限"
+    for _ in range(50):
+        assert auth.has_permission("orders.read"), "应该有查看订单权限"
+        assert not auth.has_permission("orders.delete"), "不应该有删除订单权限"
+    assert client.calls == 2, f"权限检查不应该发起请求，实际调用：{client.calls}"
+    assert isinstance(auth.get_permission_snapshot()["permissions"], frozenset), "权限快照应该是不可变集合"
+    print("✅ 测试1通过: 权限检查为内存查找")
+
+    # 测试2: 权限版本变化后刷新快照
+    client.permissions = ["dashboard.view", "orders.read", "orders.delete"]
+    client.version += 1
+    assert auth.has_permission("orders.delete"), "版本变化后应该加载新权限"
+    assert client.calls == 4, "版本变化后应该只重新加载一次"
+    auth.has_permission("orders.delete")
+    assert client.calls == 4, "刷新后再次检查不应该请求"
+    print("✅ 测试2通过: 版本号变化刷新快照")
+
+    auth.logout()
+    assert "permission_snapshot" not in st.session_state, "退出登录应该清除权限快照"
+
+    # 测试3: 离线时使用硬编码后备权限
+    offline_auth = AuthManager(MockRoleClient(online=False))
+    offline_auth.login("operator", "operator123")
+    snapshot = offline_auth.get_permission_snapshot()
+    assert snapshot["source"] == "fallback", "离线时应该使用后备权限"
+    assert snapshot["permissions"] == ROLE_PERMISSIONS_FALLBACK["operator"], "后备权限应该与硬编码表一致"
+    assert offline_auth.has_permission("progress.update"), "后备权限应该生效"
+    offline_auth.logout()
+    print("✅ 测试3通过: 离线使用后备权限")
+
+
+def run_all_tests():
+    """运行所有测试"""
+    print("\n" + "="*60)
+    print("🧪 开始测试权限快照")
+    print("="*60)
+
+    try:
+        test_permission_snapshot()
+
+        print("\n" + "="*60)
+        print("🎉 所有测试通过！权限快照正常！")
+        print("="*60)
+        return True
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ 测试异常: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    exit(0 if success else 1)
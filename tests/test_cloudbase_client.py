@@ -0,0 +1,663 @@
+"""
+CloudBase 客户端测试
+
+使用本地 HTTP 服务测试连接池等客户端基础设施，不依赖真实 CloudBase 环境
+"""
+
+import sys
+import os
+import io
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'streamlit_app'))
+
+from utils.http_transport import PooledTransport
+from utils.cloudbase_client import CloudBaseClient
+from utils.async_cloudbase_client import AsyncCloudBaseClient
+from utils.response_cache import ResponseCache
+from utils.call_metrics import CallMetrics
+from utils.customer_lookup import TokenBucketLimiter, normalize_lookup, lookup_cache_key, client_ip
+from utils.export_engine import ExportManager
+from utils.helpers import format_datetime, format_datetime_series
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """回显请求体的 keep-alive 处理器"""
+    protocol_version = "HTTP/1.1"
+    delay = 0
+    request_count = 0
+    # COS 上传模拟状态
+    lock = threading.Lock()
+    put_delay = 0
+    put_attempts = {}
+    uploaded = {}
+    reject_paths = set()
+
+    def do_POST(self):
+        EchoHandler.request_count += 1
+        time.sleep(EchoHandler.delay)
+        length = int(self.headers.get('Content-Length', 0))
+        body = json.loads(self.rfile.read(length) or b'{}')
+        payload = json.dumps({'success': True, 'data': {'path': self.path, 'echo': body}}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_PUT(self):
+        """模拟 COS 预签名上传：/cos/slow 慢速，/cos/flaky 首次 503，/cos/forbidden 签名错误"""
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length)
+        with EchoHandler.lock:
+            EchoHandler.put_attempts[self.path] = EchoHandler.put_attempts.get(self.path, 0) + 1
+            attempts = EchoHandler.put_attempts[self.path]
+            if self.path.startswith('/cos/flaky') and attempts == 1:
+                status = 503
+            elif self.path.startswith('/cos/forbidden') or self.path in EchoHandler.reject_paths:
+                status = 403
+            else:
+                status = 200
+                EchoHandler.uploaded[self.path] = body
+        time.sleep(EchoHandler.put_delay)
+        self.send_response(status)
+        self.send_header('ETag', f'"{len(body)}"')
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeUploadedFile(io.BytesIO):
+    """模拟 Streamlit UploadedFile"""
+
+    def __init__(self, name: str, content: bytes, file_type: str = 'image/jpeg'):
+        super().__init__(content)
+        self.name = name
+        self.type = file_type
+        self.size = len(content)
+
+
+def start_local_server():
+    """启动本地测试服务，返回 (server, base_url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), EchoHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def test_pooled_transport_reuses_connections():
+    """测试连接池复用 keep-alive 连接"""
+    print("\n=== 测试连接池复用 ===")
+
+    server, base_url = start_local_server()
+    try:
+        transport = PooledTransport(base_url, CloudBaseClient.HTTP_PATHS, {
+            "default_pool_size": 2,
+            "pool_sizes": {"admin-orders": 4}
+        })
+        client = CloudBaseClient(transport=transport)
+
+        for page in range(1, 6):
+            result = client.get_orders(page=page, limit=10)
+            assert result['success'] == True, "请求应该成功"
+        assert result['data']['path'] == "/api/admin/orders", "应该命中正确的HTTP路径"
+
+        stats = client.get_transport_stats()
+        orders_stats = stats['admin-orders']
+        assert orders_stats['requests'] == 5, f"应该记录5次请求，实际：{orders_stats['requests']}"
+        assert orders_stats['connections_opened'] == 1, "顺序请求应该只建立1个连接"
+        assert orders_stats['connections_reused'] == 4, "后续请求应该复用连接"
+        assert orders_stats['pool_size'] == 4, "应该使用按路径配置的池大小"
+        assert stats['admin-dashboard']['pool_size'] == 2, "未配置的路径使用默认池大小"
+        print(f"✅ 测试1通过: 连接复用率 {orders_stats['reuse_rate']}")
+        transport.close()
+    finally:
+        server.shutdown()
+
+
+def test_single_flight_coalesces_reads():
+    """测试相同只读调用的请求合并"""
+    print("\n=== 测试请求合并 ===")
+
+    server, base_url = start_local_server()
+    EchoHandler.delay = 0.3
+    EchoHandler.request_count = 0
+    try:
+        client = CloudBaseClient(transport=PooledTransport(base_url, CloudBaseClient.HTTP_PATHS))
+
+        # 测试1: 10个会话同时请求仪表板，只有1次真正到达后端
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(client.get_dashboard_data()))
+            for _ in range(10)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(results) == 10 and all(r['success'] for r in results), "所有调用都应该成功"
+        assert EchoHandler.request_count == 1, f"后端应该只收到1次请求，实际：{EchoHandler.request_count}"
+        stats = client.get_singleflight_stats()
+        assert stats['coalesced'] == 9, f"应该合并9次调用，实际：{stats['coalesced']}"
+        print(f"✅ 测试1通过: 10次调用合并为1次请求 (合并率 {stats['coalesced_ratio']})")
+
+        # 测试2: 结果相互独立，修改一个不影响其他
+        results[0]['data']['echo']['mutated'] = True
+        assert 'mutated' not in results[1]['data']['echo'], "合并后的结果应该是独立副本"
+        print("✅ 测试2通过: 合并结果互不影响")
+
+        # 测试3: 写操作不合并
+        EchoHandler.request_count = 0
+        threads = [
+            threading.Thread(target=lambda: client.update_admin_order("order_1", {"notes": "x"}))
+            for _ in range(3)
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert EchoHandler.request_count == 3, "写操作不应该被合并"
+        print("✅ 测试3通过: 写操作不合并")
+    finally:
+        EchoHandler.delay = 0
+        server.shutdown()
+
+
+def test_response_cache():
+    """测试只读调用缓存与写后失效"""
+    print("\n=== 测试响应缓存 ===")
+
+    server, base_url = start_local_server()
+    EchoHandler.request_count = 0
+    try:
+        client = CloudBaseClient(transport=PooledTransport(base_url, CloudBaseClient.HTTP_PATHS))
+
+        # 测试1: 重复读取命中缓存
+        client.get_order_detail("order_1", is_admin=True)
+        client.get_order_detail("order_1", is_admin=True)
+        client.get_order_detail("order_2", is_admin=True)
+        assert EchoHandler.request_count == 2, f"重复读取应该命中缓存，实际请求：{EchoHandler.request_count}"
+        stats = client.get_cache_stats()
+        assert stats['hits'] == 1 and stats['misses'] == 2, "命中统计不正确"
+        assert stats['functions']['customer-detail']['hit_ratio'] == round(1 / 3, 4), "命中率不正确"
+        print(f"✅ 测试1通过: 命中率 {stats['hit_ratio']}")
+
+        # 测试2: 写操作后只失效相关订单
+        client.update_order_progress("order_1", "stage_1", "completed")
+        client.get_order_detail("order_1", is_admin=True)
+        client.get_order_detail("order_2", is_admin=True)
+        assert EchoHandler.request_count == 4, "写操作后应该重新读取该订单，其他订单仍命中缓存"
+        print("✅ 测试2通过: 写后读一致，按订单失效")
+
+        # 测试3: 未配置 TTL 的读取不缓存
+        EchoHandler.request_count = 0
+        client.get_operation_logs()
+        client.get_operation_logs()
+        assert EchoHandler.request_count == 2, "未配置TTL的云函数不应该缓存"
+        print("✅ 测试3通过: 未配置TTL不缓存")
+
+        # 测试4: 角色权限更新后角色列表失效
+        EchoHandler.request_count = 0
+        client.get_roles()
+        client.get_roles()
+        client.update_role_permissions("admin", ["orders.view"])
+        client.get_roles()
+        assert EchoHandler.request_count == 3, "角色更新后应该重新加载角色列表"
+        assert client.get_permissions_version() == 1, "角色权限更新后应该递增权限版本号"
+        print("✅ 测试4通过: 角色缓存随写操作失效")
+    finally:
+        server.shutdown()
+
+    # 测试5: TTL 过期、LRU 淘汰和旧读取不回写
+    now = [0.0]
+    cache = ResponseCache(max_entries=2, clock=lambda: now[0])
+    cache.set("a", {"v": 1}, "admin-orders", 10, ["orders"])
+    now[0] = 11
+    assert cache.get("a", "admin-orders") is None, "过期条目不应该命中"
+    cache.set("a", {"v": 1}, "admin-orders", 10, ["orders"])
+    cache.set("b", {"v": 2}, "admin-orders", 10, ["orders"])
+    cache.get("a", "admin-orders")
+    cache.set("c", {"v": 3}, "admin-orders", 10, ["orders"])
+    assert cache.get("b", "admin-orders") is None, "最久未使用的条目应该被淘汰"
+    assert cache.get("a", "admin-orders") == {"v": 1}, "最近使用的条目应该保留"
+
+    versions = cache.tag_versions(["orders"])
+    cache.invalidate_tags(["orders"])
+    assert not cache.set("d", {"v": 4}, "admin-orders", 10, ["orders"], versions), "失效前发起的读取不应该写回缓存"
+    print("✅ 测试5通过: TTL、LRU 和标签版本正常")
+
+
+def test_call_metrics():
+    """测试调用耗时直方图和客户端埋点"""
+    print("\n=== 测试调用指标 ===")
+
+    # 测试1: 百分位估算和滚动窗口
+    now = [0.0]
+    metrics = CallMetrics(window_seconds=120, slot_seconds=60, clock=lambda: now[0])
+    for i in range(100):
+        metrics.record("admin-orders", "list", (i + 1) / 1000, request_bytes=10, response_bytes=100)
+    metrics.record("admin-orders", "list", 0.5, status=500, success=False)
+    snapshot = metrics.snapshot()
+    call = snapshot["calls"][0]
+    assert call["count"] == 101 and call["errors"] == 1, "调用次数和错误数不正确"
+    assert 40 <= call["p50_ms"] <= 60, f"P50 估算偏差过大：{call['p50_ms']}"
+    assert 85 <= call["p95_ms"] <= 130, f"P95 估算偏差应该在一个分桶内：{call['p95_ms']}"
+    assert call["p99_ms"] <= call["max_ms"] == 500.0, "P99 不应超过最大值"
+    assert call["statuses"] == {"200": 100, "500": 1}, "状态码统计不正确"
+    assert json.loads(metrics.to_json())["totals"]["count"] == 101, "JSON 导出应该包含汇总"
+
+    now[0] = 200
+    metrics.record("admin-dashboard", "", 0.01)
+    names = [c["function"] for c in metrics.snapshot()["calls"]]
+    assert names == ["admin-dashboard"], f"窗口外的指标应该过期，实际：{names}"
+    print("✅ 测试1通过: 百分位估算和滚动窗口")
+
+    # 测试2: 客户端记录字节数和缓存命中
+    server, base_url = start_local_server()
+    try:
+        client = CloudBaseClient(transport=PooledTransport(base_url, CloudBaseClient.HTTP_PATHS))
+        client.get_order_detail("order_1", is_admin=True)
+        client.get_order_detail("order_1", is_admin=True)
+        client.update_order_progress("order_1", "stage_1", "completed")
+        calls = {(c["function"], c["action"]): c for c in client.get_call_metrics()["calls"]}
+        detail = calls[("customer-detail", "")]
+        assert detail["count"] == 2 and detail["cache_hits"] == 1, "应该记录一次请求和一次缓存命中"
+        assert detail["request_bytes"] > 0 and detail["response_bytes"] > 0, "应该记录请求和响应字节数"
+        assert calls[("admin-progress", "update")]["statuses"] == {"200": 1}, "写操作应该按 action 记录"
+    finally:
+        server.shutdown()
+    print("✅ 测试2通过: 客户端埋点")
+
+
+class UploadTestClient(CloudBaseClient):
+    """上传测试客户端：云函数调用在本地模拟，PUT 发送到本地服务"""
+
+    def __init__(self, base_url: str, paths):
+        super().__init__(transport=PooledTransport(base_url, CloudBaseClient.HTTP_PATHS))
+        self.uploader.backoff_base = 0.01
+        self.base_url = base_url
+        self.paths = paths
+        self.confirmed_files = None
+        self.multipart_calls = []
+
+    def _call_function(self, function_name, data=None, is_admin=False):
+        if data['action'] == 'get_upload_url':
+            return {'success': True, 'data': {'upload_urls': [
+                {'upload_url': f"{self.base_url}{path}", 'uploadMethod': 'presigned_put', 'file_id': path,
+                 'cloud_path': f"videos{path}", 'metadata': {'order_id': 'order_1', 'stage_id': 'stage_1'}}
+                for path in self.paths
+            ]}}
+        if data['action'] == 'init_multipart':
+            self.multipart_calls.append(data)
+            part_urls = [
+                {'part_number': n, 'upload_url': f"{self.base_url}/cos/mp?partNumber={n}&uploadId=u1"}
+                for n in range(1, data['data']['part_count'] + 1)
+            ]
+            return {'success': True, 'data': {'upload_id': 'u1', 'part_urls': part_urls, 'uploaded_parts': []}}
+        if data['action'] in ('complete_multipart', 'abort_multipart'):
+            self.multipart_calls.append(data)
+            return {'success': True, 'data': {'etag': 'done'}}
+        self.confirmed_files = data['data']['uploaded_files']
+        return {'success': True, 'message': '上传成功'}
+
+
+def test_concurrent_photo_upload():
+    """测试照片并发上传、重试和部分失败"""
+    print("\n=== 测试并发上传 ===")
+
+    server, base_url = start_local_server()
+    EchoHandler.put_delay = 0.3
+    EchoHandler.put_attempts.clear()
+    try:
+        # 测试1: 多个文件并发上传，总耗时接近单个文件
+        paths = [f"/cos/slow_{i}" for i in range(4)]
+        client = UploadTestClient(base_url, paths)
+        files = [FakeUploadedFile(f"photo_{i}.jpg", b"x" * 1024) for i in range(4)]
+        start = time.time()
+        result = client.upload_photos("order_1", "stage_1", files)
+        elapsed = time.time() - start
+        assert result['success'], "上传应该成功"
+        assert len(client.confirmed_files) == 4, "应该确认全部4个文件"
+        assert elapsed < 0.9, f"并发上传总耗时应该接近单个文件，实际：{elapsed:.2f}秒"
+        print(f"✅ 测试1通过: 4个文件并发上传 ({elapsed:.2f}秒)")
+
+        # 测试2: 可重试错误自动重试，签名错误不重试且不确认
+        EchoHandler.put_delay = 0
+        paths = ["/cos/flaky_1", "/cos/forbidden_1", "/cos/ok_1"]
+        client = UploadTestClient(base_url, paths)
+        files = [FakeUploadedFile(f"photo_{i}.jpg", b"y" * 10) for i in range(3)]
+        result = client.upload_photos("order_1", "stage_1", files)
+        by_name = {r['file_name']: r for r in result['upload_results']}
+        assert by_name['photo_0.jpg']['success'] and by_name['photo_0.jpg']['attempts'] == 2, "503 应该重试后成功"
+        assert not by_name['photo_1.jpg']['success'], "403 应该失败"
+        assert EchoHandler.put_attempts['/cos/forbidden_1'] == 1, "签名错误不应该重试"
+        confirmed = [f['file_id'] for f in client.confirmed_files]
+        assert confirmed == ["/cos/flaky_1", "/cos/ok_1"], f"只应该确认上传成功的文件，实际：{confirmed}"
+        assert result['failed_files'][0]['file_name'] == 'photo_1.jpg', "应该返回失败文件"
+        print("✅ 测试2通过: 失败重试，只确认成功的文件")
+    finally:
+        EchoHandler.put_delay = 0
+        server.shutdown()
+
+
+class StreamOnlyFile(FakeUploadedFile):
+    """禁止整体读取的上传文件，用于验证流式上传"""
+
+    def getvalue(self):
+        raise AssertionError("不应该整体读取文件内容")
+
+
+def test_multipart_upload_resume():
+    """测试大文件分片上传和断点续传"""
+    print("\n=== 测试分片上传 ===")
+
+    server, base_url = start_local_server()
+    EchoHandler.put_attempts.clear()
+    EchoHandler.uploaded.clear()
+    try:
+        content = bytes(range(256)) * 4
+        client = UploadTestClient(base_url, ["/cos/video_1"])
+        client.uploader.multipart_threshold = 1000
+        client.uploader.part_size = 256
+        client.uploader.part_concurrency = 2
+
+        # 测试1: 一个分片失败，上传失败但保留会话
+        EchoHandler.reject_paths = {"/cos/mp?partNumber=3&uploadId=u1"}
+        result = client.upload_photos("order_1", "stage_1", [StreamOnlyFile("video.mp4", content, "video/mp4")])
+        assert not result['success'], "分片失败时上传应该失败"
+        assert result['upload_results'][0]['parts_uploaded'] == 3, "应该记录已上传的3个分片"
+        print("✅ 测试1通过: 分片失败后保留上传会话")
+
+        # 测试2: 再次上传只补传失败的分片
+        EchoHandler.reject_paths = set()
+        client.paths = ["/cos/video_2"]
+        result = client.upload_photos("order_1", "stage_1", [StreamOnlyFile("video.mp4", content, "video/mp4")])
+        assert result['success'], "续传应该成功"
+        assert EchoHandler.put_attempts["/cos/mp?partNumber=1&uploadId=u1"] == 1, "已上传的分片不应该重传"
+        assert EchoHandler.put_attempts["/cos/mp?partNumber=3&uploadId=u1"] == 2, "失败的分片应该补传"
+        assert result['upload_results'][0]['resumed'], "应该标记为续传"
+        assert client.multipart_calls[-2]['data']['upload_id'] == 'u1', "续传应该带上原 upload_id"
+        assert client.confirmed_files[0]['file_id'] == "/cos/video_1", "应该确认首次分配的存储路径"
+        print("✅ 测试2通过: 断点续传只补传缺失分片")
+
+        # 测试3: 每个分片请求体不超过分片大小，合并后内容完整
+        parts = [EchoHandler.uploaded[f"/cos/mp?partNumber={n}&uploadId=u1"] for n in range(1, 5)]
+        assert max(len(p) for p in parts) <= 256, "分片请求体不应该超过分片大小"
+        assert b"".join(parts) == content, "分片内容应该与原文件一致"
+        complete_parts = client.multipart_calls[-1]['data']['parts']
+        assert [p['part_number'] for p in complete_parts] == [1, 2, 3, 4], "合并时应该包含全部分片"
+        print("✅ 测试3通过: 分片大小受限，内容完整")
+
+        # 测试4: 小文件流式单次上传，不整体读取内容
+        client.paths = ["/cos/small_1"]
+        result = client.upload_photos("order_1", "stage_1", [StreamOnlyFile("p.jpg", b"z" * 100)])
+        assert result['success'], "小文件应该单次上传成功"
+        assert EchoHandler.uploaded["/cos/small_1"] == b"z" * 100, "流式上传内容应该完整"
+        print("✅ 测试4通过: 小文件流式上传")
+
+        # 测试5: 同一会话的尝试次数用完后取消分片上传
+        client.uploader.max_multipart_rounds = 2
+        EchoHandler.reject_paths = {"/cos/mp?partNumber=2&uploadId=u1"}
+        client.paths = ["/cos/video_3"]
+        for _ in range(2):
+            result = client.upload_photos("order_1", "stage_1", [StreamOnlyFile("broken.mp4", content, "video/mp4")])
+            assert not result['success'], "分片持续失败时上传应该失败"
+        assert result['upload_results'][0].get('aborted'), "尝试次数用完后应该标记为已取消"
+        assert client.multipart_calls[-1]['action'] == 'abort_multipart', "应该取消分片上传"
+        assert client.multipart_calls[-1]['data']['upload_id'] == 'u1', "应该取消原会话"
+        assert not client.uploader._sessions, "取消后不应该保留会话"
+        print("✅ 测试5通过: 分片上传多次失败后取消")
+    finally:
+        EchoHandler.reject_paths = set()
+        server.shutdown()
+
+
+class SlowClient:
+    """模拟耗时的同步客户端"""
+
+    def get_orders(self, page: int = 1, limit: int = 20, status: str = "all", search: str = ""):
+        time.sleep(0.2)
+        return {'success': True, 'data': {'status': status}}
+
+    def get_roles(self):
+        time.sleep(1.0)
+        return {'success': True, 'data': {'roles': []}}
+
+
+def test_async_client_fan_out():
+    """测试异步客户端并发调用和超时"""
+    print("\n=== 测试异步并发调用 ===")
+
+    async_client = AsyncCloudBaseClient(SlowClient(), max_concurrency=4, timeout=5)
+
+    # 测试1: 三个调用并发执行，总耗时接近单次调用
+    start = time.time()
+    results = async_client.run_concurrently({
+        status: ("get_orders", (), {"status": status})
+        for status in ["待处理", "制作中", "已完成"]
+    })
+    elapsed = time.time() - start
+    assert elapsed < 0.5, f"并发调用应该接近单次耗时，实际：{elapsed:.2f}秒"
+    assert results["制作中"]['data']['status'] == "制作中", "结果应该按名称对应"
+    print(f"✅ 测试1通过: 3个调用并发完成 ({elapsed:.2f}秒)")
+
+    # 测试2: 单次调用超时返回错误响应
+    results = async_client.run_concurrently({"roles": ("get_roles",)}, timeout=0.1)
+    assert results["roles"]['success'] == False, "超时调用应该返回失败"
+    assert results["roles"]['error_code'] == "TIMEOUT", "应该标记为超时"
+    print("✅ 测试2通过: 超时调用返回错误响应")
+
+    # 测试3: 并发上限生效
+    bounded_client = AsyncCloudBaseClient(SlowClient(), max_concurrency=1, timeout=5)
+    start = time.time()
+    bounded_client.run_concurrently({
+        str(i): ("get_orders",) for i in range(3)
+    })
+    elapsed = time.time() - start
+    assert elapsed >= 0.6, f"并发上限为1时应该串行执行，实际：{elapsed:.2f}秒"
+    print(f"✅ 测试3通过: 并发上限生效 ({elapsed:.2f}秒)")
+
+    async_client.close()
+    bounded_client.close()
+
+
+def test_customer_lookup_limiter():
+    """测试客户查询的令牌桶限流和查询值规范化"""
+    print("\n=== 测试客户查询限流 ===")
+
+    now = [0.0]
+    limiter = TokenBucketLimiter(capacity=3, refill_per_second=0.5, max_keys=2, clock=lambda: now[0])
+    for _ in range(3):
+        assert limiter.retry_after("s1") == 0, "桶内有令牌时可以查询"
+        limiter.consume("s1")
+    assert limiter.retry_after("s1") == 2.0, f"令牌用完后应该等待 2 秒，实际：{limiter.retry_after('s1')}"
+    assert limiter.retry_after("s2") == 0, "不同的键互不影响"
+    now[0] += 2
+    assert limiter.retry_after("s1") == 0, "等待后恢复一个令牌"
+    limiter.retry_after("s3")
+    assert len(limiter._buckets) == 2 and "s2" not in limiter._buckets, "超过键数上限时淘汰最久未用的键"
+    print("✅ 测试1通过: 令牌桶按键限流并按时间恢复")
+
+    assert normalize_lookup("phone", "+86 138-0000-1234") == normalize_lookup("phone", "13800001234"), \
+        "电话号码的不同写法应该规范化为相同的值"
+    assert normalize_lookup("order_number", " ld1234 abc ") == "LD1234ABC", "订单号应该去空白并转大写"
+    key = lookup_cache_key("phone", "13800001234")
+    assert "13800001234" not in key and key == lookup_cache_key("phone", "13800001234"), "缓存键不应该包含明文"
+    print("✅ 测试2通过: 查询值规范化，缓存键不含明文")
+
+    assert client_ip("6.6.6.6, 1.2.3.4", 1, "10.0.0.1") == "1.2.3.4", "应该取代理追加的最右边地址"
+    assert client_ip("6.6.6.6, 1.2.3.4, 10.0.0.2", 2, "10.0.0.1") == "1.2.3.4", "两层代理时取从右数第二个地址"
+    assert client_ip("1.2.3.4", 2, "10.0.0.1") == "10.0.0.1", "地址数少于代理层数时使用对端地址"
+    assert client_ip("6.6.6.6, 1.2.3.4", 0, "10.0.0.1") == "10.0.0.1", "没有受信任代理时忽略转发头"
+    assert client_ip("", 1, None) is None, "没有地址时返回 None"
+    print("✅ 测试3通过: 限流 IP 不使用客户端伪造的转发地址")
+
+def test_export_engine():
+    """测试后台流式导出"""
+    print("\n=== 测试后台导出 ===")
+
+    import csv
+    import tempfile
+    import tracemalloc
+    from openpyxl import load_workbook
+
+    directory = tempfile.mkdtemp()
+    manager = ExportManager(max_workers=2, chunk_size=500, directory=directory)
+    columns = [
+        ("订单编号", lambda row: row["order_number"]),
+        ("操作描述", lambda row: row["description"]),
+        ("进度(%)", lambda row: row["progress"]),
+    ]
+
+    def rows(count, fail_at=None):
+        for i in range(count):
+            if i == fail_at:
+                raise RuntimeError("获取操作日志失败")
+            yield {"order_number": f"LD{i:06d}", "description": f"阶段完成\x01第{i}条", "progress": i % 101}
+
+    def wait(job, timeout=30):
+        deadline = time.time() + timeout
+        while not job.finished and time.time() < deadline:
+            time.sleep(0.02)
+        assert job.finished, "导出应该在超时前结束"
+
+    # 测试1: 10 万行 CSV，内存峰值与行数无关
+    tracemalloc.start()
+    job = manager.start(rows(100000), columns, "订单", "csv", total=100000)
+    assert job.status == "running" and job.progress() == 0, "开始导出后立即返回，导出在后台执行"
+    wait(job)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    assert job.status == "done" and job.rows == 100000, f"应该导出 100000 行，实际：{job.status} {job.rows} {job.error}"
+    assert peak < 5 * 1024 * 1024, f"导出内存峰值应该很小，实际：{peak / 1e6:.1f}MB"
+    with job.open() as f:
+        reader = csv.reader(io.TextIOWrapper(f, encoding="utf-8-sig"))
+        assert next(reader) == ["订单编号", "操作描述", "进度(%)"], "第一行应该是表头"
+        lines = sum(1 for _ in reader)
+    assert lines == 100000, f"CSV 应该有 100000 行数据，实际：{lines}"
+    print(f"✅ 测试1通过: 10 万行 CSV 流式导出，内存峰值 {peak / 1e6:.2f}MB")
+
+    # 测试2: xlsx 只写模式，去除 Excel 不允许的控制字符
+    job = manager.start(rows(2000), columns, "操作日志", "xlsx")
+    wait(job)
+    assert job.status == "done" and job.file_name == "操作日志.xlsx", f"xlsx 导出应该成功：{job.error}"
+    assert job.progress() == 1.0, "完成后进度为 1"
+    sheet = load_workbook(job.path, read_only=True).active
+    values = list(sheet.iter_rows(values_only=True))
+    assert len(values) == 2001 and values[1] == ("LD000000", "阶段完成第0条", 0), f"xlsx 内容不正确：{values[:2]}"
+    print("✅ 测试2通过: xlsx 逐行写入并可以正常读取")
+
+    # 测试3: 数据源出错时任务失败并删除临时文件
+    job = manager.start(rows(3000, fail_at=1200), columns, "订单", "csv")
+    wait(job)
+    assert job.status == "failed" and "获取操作日志失败" in job.error, f"数据源出错时应该失败：{job.status}"
+    assert not os.path.exists(job.path), "失败的导出不应该留下临时文件"
+    print("✅ 测试3通过: 数据源出错时报告错误")
+
+    # 测试4: 丢弃正在执行的任务，停止读取数据并删除文件
+    consumed = [0]
+
+    def slow_rows():
+        for row in rows(100000):
+            consumed[0] += 1
+            if consumed[0] % 500 == 0:
+                time.sleep(0.01)
+            yield row
+
+    job = manager.start(slow_rows(), columns, "订单", "csv")
+    time.sleep(0.05)
+    manager.discard(job.id)
+    wait(job)
+    assert job.status == "cancelled" and consumed[0] < 100000, f"丢弃后应该停止导出：{job.status} {consumed[0]}"
+    assert manager.get(job.id) is None and not os.path.exists(job.path), "丢弃的任务不应该保留"
+    print(f"✅ 测试4通过: 取消导出（已读取 {consumed[0]} 行）")
+
+    # 测试5: 过期任务的文件被清理
+    manager.job_ttl = 0
+    done = manager.get(manager.start(rows(10), columns, "订单", "csv").id)
+    wait(done)
+    time.sleep(0.01)
+    manager.cleanup()
+    assert manager.get(done.id) is None and not os.listdir(directory), "过期任务和文件应该被清理"
+    print("✅ 测试5通过: 过期导出文件被清理")
+
+def test_format_datetime_series():
+    """测试批量时间格式化"""
+    print("\n=== 测试批量时间格式化 ===")
+
+    import pandas as pd
+    from datetime import datetime, timedelta, timezone
+
+    now = datetime.now(timezone.utc)
+    values = [
+        "2024-01-01T16:30:00.000Z",
+        "2024-01-01T16:30:00",                      # 不带时区按 UTC
+        "2024-01-01T11:30:00-05:00",                # 跟在带时区的值后面，也不能套用前面的时区
+        "2024-01-01T16:30:00",
+        datetime(2024, 1, 1, 16, 30, tzinfo=timezone.utc),
+        "2024-01-01",
+        "", None, float("nan"),
+        "bad", "2024-02-30T00:00:00Z",
+        (now - timedelta(hours=3, minutes=5)).isoformat(),
+    ]
+    for format_type in ["date", "time", "datetime", "relative", "full"]:
+        batch = format_datetime_series(values, format_type).tolist()
+        single = [format_datetime(v, format_type) if isinstance(v, (str, datetime)) else "-" for v in values]
+        assert batch == single, f"{format_type} 批量结果应该与逐个格式化一致：{batch} != {single}"
+    batch = format_datetime_series(values, "datetime").tolist()
+    assert batch[:5] == ["2024年01月02日 00:30"] * 5, f"时间应该转换为北京时间：{batch[:5]}"
+    assert batch[6:11] == ["-", "-", "-", "bad", "2024-02-30T00:00:00Z"], f"空值显示 -，无法解析的值原样返回：{batch[6:11]}"
+    assert format_datetime_series(values, "relative").iat[-1] == "3小时前", "相对时间应该按小时显示"
+    print("✅ 测试1通过: 批量格式化与逐个格式化结果一致")
+
+    column = pd.Series(pd.date_range("2024-03-01", periods=100000, freq="37s"))
+    formatted = format_datetime_series(column, "full")
+    assert formatted.iat[0] == "2024-03-01 08:00:00" and formatted.iat[-1] == format_datetime(column.iat[-1].to_pydatetime(), "full"), \
+        f"datetime64 列应该直接转换：{formatted.iat[0]} {formatted.iat[-1]}"
+    start = time.perf_counter()
+    text = format_datetime_series(column.dt.strftime("%Y-%m-%dT%H:%M:%S.000Z"), "datetime")
+    elapsed = time.perf_counter() - start
+    assert text.iat[1] == "2024年03月01日 08:00" and len(text) == 100000, f"字符串列结果不正确：{text.iat[1]}"
+    print(f"✅ 测试2通过: 10 万行时间列批量格式化 {elapsed * 1000:.0f}ms")
+
+def run_all_tests():
+    """运行所有测试"""
+    print("\n" + "="*60)
+    print("🧪 开始测试CloudBase客户端")
+    print("="*60)
+
+    try:
+        test_pooled_transport_reuses_connections()
+        test_async_client_fan_out()
+        test_single_flight_coalesces_reads()
+        test_response_cache()
+        test_call_metrics()
+        test_customer_lookup_limiter()
+        test_export_engine()
+        test_format_datetime_series()
+        test_concurrent_photo_upload()
+        test_multipart_upload_resume()
+
+        print("\n" + "="*60)
+        print("🎉 所有测试通过！客户端基础设施正常！")
+        print("="*60)
+        return True
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ 测试异常: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    exit(0 if success else 1)
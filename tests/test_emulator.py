@@ -0,0 +1,801 @@
+"""
+本地模拟服务测试
+
+将 CloudBaseClient 指向 cloudbase_emulator，完整运行服务层流程：
+创建订单 → 查询 → 开始/完成阶段 → 上传照片 → 仪表板，以及延迟和错误注入
+"""
+
+import sys
+import os
+import io
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'streamlit_app'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from config import HTTP_POOL_CONFIG
+from utils.cloudbase_client import CloudBaseClient
+from utils.http_transport import PooledTransport
+from services import OrderService, ProgressService, PhotoService, OrderSync, OrderReplica, OrderSearchIndex, order_scope
+from utils.customer_lookup import CustomerLookup, TokenBucketLimiter
+from cloudbase_emulator import start_emulator, now_iso
+from load_generator import run_load
+
+
+class EmulatorFile(io.BytesIO):
+    """模拟 Streamlit UploadedFile"""
+
+    def __init__(self, content: bytes, name: str, file_type: str = "image/jpeg"):
+        super().__init__(content)
+        self.name = name
+        self.type = file_type
+        self.size = len(content)
+
+
+def make_client(base_url: str) -> CloudBaseClient:
+    """创建指向模拟服务的客户端"""
+    return CloudBaseClient(PooledTransport(base_url, CloudBaseClient.HTTP_PATHS, HTTP_POOL_CONFIG))
+
+
+def test_services_against_emulator():
+    """测试服务层在模拟服务上的完整流程"""
+    print("\n=== 测试模拟服务 ===")
+
+    server, base_url = start_emulator(seed_orders=20)
+    try:
+        client = make_client(base_url)
+        order_service = OrderService(client)
+        progress_service = ProgressService(client)
+        photo_service = PhotoService(client)
+
+        # 测试1: 登录和订单创建、查询
+        login = client.admin_login("admin", "admin123")
+        assert login["success"], "默认管理员应该可以登录"
+        assert not client.admin_login("admin", "wrong")["success"], "错误密码应该登录失败"
+
+        created = order_service.create_order({
+            "customer_name": "测试客户", "customer_phone": "13800001234",
+            "diamond_type": "圆形", "diamond_size": "1克拉"
+        })
+        assert created["success"], f"创建订单应该成功: {created.get('message')}"
+        order_id = created["data"]["order_id"]
+        assert created["data"]["order_number"].startswith("LD1234"), "订单号应该包含手机号后四位"
+
+        listed = order_service.list_orders(page=1, limit=10)
+        assert listed["data"]["pagination"]["total_count"] == 21, "订单总数应该包含初始数据"
+        found = client.search_orders(search_type="phone", search_value="13800001234")
+        assert len(found["data"]) == 1, "应该可以按手机号查到新订单"
+        print("✅ 测试1通过: 登录、创建和查询订单")
+
+        # 测试2: 阶段流转
+        detail = order_service.get_order(order_id)
+        assert len(detail["data"]["progress"]) == 8, "新订单应该有8个阶段"
+        assert progress_service.start_stage(order_id, "STAGE001")["success"], "应该可以开始第一个阶段"
+        blocked = client.update_order_progress(order_id, "STAGE003", "in_progress")
+        assert not blocked["success"], "有进行中的阶段时不能开始其他阶段"
+
+        photo = EmulatorFile(b"\xff\xd8" + os.urandom(2048), "stage1.jpg")
+        completed = progress_service.complete_stage(order_id, "STAGE001", notes="完成", photos=[photo])
+        assert completed["success"], f"应该可以完成阶段: {completed.get('message')}"
+        assert completed["data"]["progress_percentage"] == 13, "完成1/8阶段后进度应该是13%"
+        assert completed["photo_upload"]["success"], "照片应该上传到模拟 COS"
+        print("✅ 测试2通过: 开始和完成阶段")
+
+        # 测试3: 照片可以读取
+        photos = photo_service.get_photos(order_id)
+        urls = [p["photo_url"] for group in photos["data"] for p in group["photos"]]
+        assert len(urls) == 1, "订单应该有1张照片"
+        response = client.transport.session.get(urls[0], timeout=5)
+        assert response.content == photo.getvalue(), "模拟 COS 应该返回上传的内容"
+        print("✅ 测试3通过: 照片上传和读取")
+
+        # 测试4: 仪表板和日志
+        dashboard = order_service.get_order_statistics()
+        assert dashboard["data"]["overview"]["total_orders"] == 21, "仪表板订单数应该正确"
+        logs = client._call_function("admin-logs", {"action": "list"})
+        log_types = {log["type"] for log in logs["data"]["logs"]}
+        assert {"订单创建", "阶段开始", "阶段完成", "媒体上传"} <= log_types, "操作应该写入日志"
+        print("✅ 测试4通过: 仪表板和操作日志")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # 测试5: 延迟和错误注入
+    server, base_url = start_emulator(latency_ms=50, error_rate=1.0)
+    try:
+        client = make_client(base_url)
+        start = time.time()
+        result = client.admin_login("admin", "admin123")
+        assert time.time() - start >= 0.05, "应该注入延迟"
+        assert not result["success"], "错误率为1时调用应该失败"
+        stats = server.get_stats()
+        assert stats["admin-auth"]["errors"] == 1, "应该记录注入的错误"
+        print("✅ 测试5通过: 延迟和错误注入")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def detail_calls(client: CloudBaseClient) -> int:
+    """客户端发出的订单详情调用次数（含缓存命中）"""
+    return sum(c["count"] for c in client.get_call_metrics("customer-detail")["calls"])
+
+
+def test_order_scope():
+    """测试订单聚合作用域内只加载一次订单详情"""
+    print("\n=== 测试订单聚合 ===")
+
+    server, base_url = start_emulator(seed_orders=1)
+    try:
+        client = make_client(base_url)
+        order_service = OrderService(client)
+        progress_service = ProgressService(client)
+        photo_service = PhotoService(client)
+        order_id = order_service.create_order({"customer_name": "聚合", "customer_phone": "13900000000"})["data"]["order_id"]
+
+        # 测试1: 不在作用域内时每个服务各自请求，阶段流转不再预读进度
+        order_service.get_order(order_id)
+        progress_service.start_stage(order_id, "STAGE001")
+        assert detail_calls(client) == 1, "阶段流转不应该预先请求订单详情"
+
+        # 测试2: 作用域内详情 + 完成阶段 + 照片 只请求一次
+        with order_scope(client) as repository:
+            before = detail_calls(client)
+            detail = order_service.get_order(order_id)
+            photo = EmulatorFile(b"\xff\xd8" + os.urandom(512), "scope.jpg")
+            result = progress_service.complete_stage(order_id, "STAGE001", notes="完成", photos=[photo])
+            assert result["success"], f"完成阶段应该成功: {result.get('message')}"
+            photos = photo_service.get_photos(order_id)["data"]
+            assert detail_calls(client) - before == 1, f"作用域内应该只请求一次详情，实际：{detail_calls(client) - before}"
+            assert repository.loads == 1, "仓库应该只加载一次"
+
+            # 写操作后就地更新
+            stage = next(p for p in detail["data"]["progress"] if p["stage_id"] == "STAGE001")
+            assert stage["status"] == "completed" and stage["completed_at"], "阶段状态应该就地更新"
+            assert detail["data"]["order"]["progress_percentage"] == 13, "订单进度应该就地更新"
+            assert "start_stage" in repository.peek(order_id).allowed_actions, "允许的操作应该随进度更新"
+            assert sum(len(g["photos"]) for g in photos) == 1, "新照片应该加入聚合"
+
+        # 测试3: 离开作用域后重新加载，与服务端一致
+        fresh = order_service.get_order(order_id)["data"]
+        assert fresh["order"]["progress_percentage"] == 13, "服务端进度应该与就地更新一致"
+        assert sum(len(g["photos"]) for g in fresh["photos"]) == 1, "服务端照片应该与就地更新一致"
+        print("✅ 测试6通过: 订单聚合作用域内只加载一次详情，写后就地更新")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_stage_transition_conflict():
+    """测试乐观并发的阶段流转"""
+    print("\n=== 测试阶段流转并发冲突 ===")
+
+    server, base_url = start_emulator()
+    try:
+        client = make_client(base_url)
+        operator_a = ProgressService(client)
+        operator_b = ProgressService(make_client(base_url))
+        order_id = OrderService(client).create_order({"customer_name": "并发", "customer_phone": "13700000000"})["data"]["order_id"]
+        progress_calls = lambda: server.get_stats().get("admin-progress", {}).get("calls", 0)
+
+        # 测试1: 一次请求完成流转，返回新版本号
+        result = operator_a.start_stage(order_id, "STAGE001")
+        assert result["success"] and result["data"]["version"] == 1, "开始阶段应该成功并递增版本"
+        assert progress_calls() == 1 and "customer-detail" not in server.get_stats(), "流转应该只有一次请求"
+
+        # 测试2: 另一个操作员重复开始同一阶段，返回冲突
+        conflict = operator_b.start_stage(order_id, "STAGE001")
+        assert operator_b.is_conflict(conflict), f"重复开始应该返回冲突：{conflict}"
+        assert conflict["conflict"]["current_status"] == "in_progress", "冲突详情应该包含当前状态"
+
+        # 测试3: 基于旧聚合的版本号完成阶段，返回冲突
+        with order_scope(client):
+            OrderService(client).get_order(order_id)
+            assert operator_a.complete_stage(order_id, "STAGE001")["success"], "基于最新版本应该可以完成"
+        with order_scope(operator_b.api_client) as repository:
+            OrderService(operator_b.api_client).get_order(order_id)
+            repository.peek(order_id).find_stage("STAGE002")["version"] = 5
+            stale = operator_b.start_stage(order_id, "STAGE002")
+            assert operator_b.is_conflict(stale), "版本号不一致应该返回冲突"
+            assert repository.peek(order_id) is None, "冲突后应该丢弃本地聚合"
+
+        # 测试4: 本地聚合可以判断时不发请求
+        with order_scope(client):
+            OrderService(client).get_order(order_id)
+            before = progress_calls()
+            invalid = operator_a.start_stage(order_id, "STAGE005")
+            assert invalid["error_code"] == "INVALID_TRANSITION", "不满足规则应该返回校验失败"
+            assert progress_calls() == before, "本地可以判断时不应该发请求"
+        print("✅ 测试7通过: 阶段流转一次请求，并发修改返回冲突")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_order_pagination():
+    """测试游标分页和订单遍历"""
+    print("\n=== 测试游标分页 ===")
+
+    server, base_url = start_emulator(seed_orders=230)
+    try:
+        client = make_client(base_url)
+        order_service = OrderService(client)
+        # 连续创建的订单可能 created_at 相同，由 _id 区分先后
+        for i in range(20):
+            order_service.create_order({"customer_name": f"分页{i}", "customer_phone": f"1350000{i:04d}"})
+        list_calls = lambda: server.get_stats().get("admin-orders", {}).get("calls", 0)
+
+        # 测试1: 遍历全部订单，不受单页数量限制，请求数 = 页数
+        server.reset_stats()
+        orders = list(order_service.iter_orders(page_size=40))
+        ids = [o["_id"] for o in orders]
+        assert len(ids) == 250 and len(set(ids)) == 250, f"应该不重不漏地返回 250 个订单，实际：{len(ids)}/{len(set(ids))}"
+        keys = [(o["created_at"], o["_id"]) for o in orders]
+        assert keys == sorted(keys, reverse=True), "应该按 (created_at, _id) 倒序"
+        assert list_calls() == 7, f"250 个订单每页 40 个应该请求 7 次，实际：{list_calls()}"
+        assert [o["_id"] for o in order_service.iter_orders(page_size=64, prefetch=False)] == ids, "不预取时结果应该一致"
+
+        # 测试2: 状态筛选
+        making = [o["_id"] for o in order_service.iter_orders({"status": "制作中"}, page_size=25)]
+        assert making == [o["_id"] for o in orders if o["order_status"] == "制作中"], "状态筛选结果应该一致"
+
+        # 测试3: 页码分页建立在游标上，结果与按页码查询一致
+        for page in (1, 2, 3, 7):
+            listed = order_service.list_orders(page=page, limit=20)
+            expected = client.get_orders(page=page, limit=20)["data"]["orders"]
+            assert [o["_id"] for o in listed["data"]["orders"]] == [o["_id"] for o in expected], f"第{page}页结果应该一致"
+            assert listed["data"]["pagination"]["current_page"] == page, "应该返回当前页码"
+            assert listed["data"]["pagination"]["total_count"] == 250, "应该返回订单总数"
+        assert order_service._page_cursors[("all", "", 20)]["cursors"].get(4), "顺序翻页后应该记住下一页游标"
+
+        # 测试4: 无效游标
+        invalid = client.get_orders(cursor="not-a-cursor")
+        assert not invalid["success"], "无效游标应该返回失败"
+        print("✅ 测试8通过: 游标分页遍历全部订单，页码分页结果一致")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class LossyClient(CloudBaseClient):
+    """第一次批量更新的响应“丢失”：云函数已经写入，客户端收到网络错误（或 failure 指定的响应）"""
+
+    def __init__(self, *args, failure=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.lost = 0
+        self.failure = failure or {"success": False, "message": "HTTP调用失败: Read timed out"}
+
+    def bulk_update_progress(self, items, operator=None):
+        result = super().bulk_update_progress(items, operator)
+        if not self.lost:
+            self.lost += 1
+            return dict(self.failure)
+        return result
+
+
+def test_batch_transition():
+    """测试批量阶段流转"""
+    print("\n=== 测试批量阶段流转 ===")
+
+    server, base_url = start_emulator()
+    try:
+        client = make_client(base_url)
+        order_service = OrderService(client)
+        progress_service = ProgressService(client)
+        orders = [order_service.create_order({"customer_name": f"批量{i}", "customer_phone": f"1360000{i:04d}"})["data"]
+                  for i in range(120)]
+        orders = [{"_id": o["order_id"], "order_number": o.get("order_number", ""), "order_status": "待处理"} for o in orders]
+        progress_calls = lambda: server.get_stats().get("admin-progress", {}).get("calls", 0)
+
+        # 测试1: 120 个订单按 50 一块发送，3 次请求
+        server.reset_stats()
+        result = progress_service.batch_transition(orders, "STAGE001", "in_progress", operator="admin")
+        assert result["success"] and result["data"]["succeeded"] == 120, f"应该全部成功：{result['message']}"
+        assert progress_calls() == 3, f"应该分 3 块发送，实际：{progress_calls()}"
+        first = result["data"]["results"][0]
+        assert first["order_id"] == orders[0]["_id"] and first["data"]["version"] == 1, "结果应该与订单一一对应"
+        assert order_service.get_order(orders[0]["_id"])["data"]["order"]["order_status"] == "制作中", "订单状态应该更新"
+
+        # 测试2: 本地校验不通过的不发送，服务端拒绝的逐项返回
+        batch = [dict(orders[0], order_status="已完成"), orders[1], orders[1], {"order_number": "X"}]
+        server.reset_stats()
+        result = progress_service.batch_transition(batch, "STAGE001", "in_progress")
+        results = result["data"]["results"]
+        assert results[0]["error_code"] == "INVALID_TRANSITION", "已完成订单应该在本地拒绝"
+        assert progress_service.is_conflict(results[1]), "重复开始应该返回冲突"
+        assert results[2]["message"] == "订单重复" and results[3]["message"] == "缺少订单ID", "重复和缺少ID应该在本地拒绝"
+        assert progress_calls() == 1 and result["data"]["failed"] == 4, "只有通过本地校验的订单发送请求"
+        assert not progress_service.batch_transition(orders, "STAGE001", "pending")["success"], "不能批量退回待处理"
+
+        # 测试3: 响应丢失后用相同的幂等键重试，不重复写入
+        lossy = LossyClient(PooledTransport(base_url, CloudBaseClient.HTTP_PATHS, HTTP_POOL_CONFIG))
+        server.reset_stats()
+        result = ProgressService(lossy).batch_transition(orders[:10], "STAGE001", "completed")
+        assert lossy.lost == 1 and progress_calls() == 2, "整块失败应该重试一次"
+        assert result["data"]["succeeded"] == 10, f"重试应该返回首次处理的结果：{result['data']['results'][0]}"
+        assert all(r["replayed"] and r["data"]["version"] == 2 for r in result["data"]["results"]), \
+            "重试的结果应该来自幂等记录，版本只递增一次"
+
+        # 测试4: 云函数内部异常（HTTP 200、data 为 null）同样重试；请求本身无效时不重试
+        internal_error = {"success": False, "message": "服务器内部错误: connect ETIMEDOUT", "data": None}
+        flaky = LossyClient(PooledTransport(base_url, CloudBaseClient.HTTP_PATHS, HTTP_POOL_CONFIG),
+                            failure=internal_error)
+        server.reset_stats()
+        result = ProgressService(flaky).batch_transition(orders[20:25], "STAGE001", "completed")
+        assert progress_calls() == 2 and result["data"]["succeeded"] == 5, "云函数内部异常应该重试"
+        server.reset_stats()
+        results, message = progress_service._send_bulk([], None)
+        assert results is None and progress_calls() == 1, f"不可重试的拒绝不应该重试：{message}"
+
+        # 测试5: 页面用同一批次ID重新提交时返回首次结果，新的批次按当前状态处理
+        first = progress_service.batch_transition(orders[10:20], "STAGE001", "completed", batch_id="resubmit")
+        again = progress_service.batch_transition(orders[10:20], "STAGE001", "completed", batch_id="resubmit")
+        assert first["data"]["succeeded"] == 10 and again["data"]["succeeded"] == 10, "重新提交应该返回首次的成功结果"
+        assert all(r["replayed"] and r["data"]["version"] == 2 for r in again["data"]["results"]), \
+            "重新提交不应该重复写入"
+        fresh = progress_service.batch_transition(orders[10:20], "STAGE001", "completed", batch_id="another")
+        assert fresh["data"]["failed"] == 10, "新的批次应该按当前状态校验"
+        print("✅ 测试9通过: 批量流转分块发送、逐项返回结果，重试和重新提交幂等")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_order_sync():
+    """测试订单增量同步"""
+    print("\n=== 测试订单增量同步 ===")
+
+    server, base_url = start_emulator(seed_orders=150)
+    try:
+        client = make_client(base_url)
+        order_service = OrderService(client)
+        progress_service = ProgressService(client)
+        photo_service = PhotoService(client)
+        sync = OrderSync(client)
+
+        # 测试1: 首次刷新全量加载
+        first = sync.refresh()
+        assert first["success"] and first["data"]["full"], "首次刷新应该全量加载"
+        assert len(sync.orders) == 150 and sync.watermark, "应该加载全部订单并记录水位线"
+
+        # 测试2: 更新、新建、删除只同步变化的记录
+        target, removed = sync.list_orders("待处理")[:2]
+        created = order_service.create_order({"customer_name": "增量", "customer_phone": "13700001111"})["data"]["order_id"]
+        assert progress_service.start_stage(target["_id"], "STAGE001")["success"], "应该可以开始阶段"
+        assert order_service.delete_order(removed["_id"])["success"], "应该可以删除订单"
+        sync.track(created, order_service.get_order(created)["data"]["progress"], [])
+        photo = EmulatorFile(b"\xff\xd8" + os.urandom(512), "sync.jpg")
+        uploaded = photo_service.upload_photos(created, "STAGE001", "进入实验室", [photo])
+        assert uploaded["success"], f"照片应该上传成功: {uploaded.get('message')}"
+
+        server.reset_stats()
+        delta = sync.refresh()
+        assert delta["success"] and not delta["data"]["full"], "之后应该增量同步"
+        assert server.get_stats()["admin-orders"]["calls"] == 1, "增量同步只需要一次请求"
+        assert set(delta["data"]["changed"]) == {target["_id"], created}, f"变化的订单不正确：{delta['data']}"
+        assert delta["data"]["deleted"] == [removed["_id"]] and removed["_id"] not in sync.orders, "删除的订单应该移除"
+        assert sync.orders[target["_id"]]["order_status"] == "制作中", "订单状态应该更新"
+        assert len(sync.orders) == 150 and sync.list_orders()[0]["_id"] == created, "新订单应该排在最前"
+        assert len(sync.photos[created]) == 1, "已登记订单的照片应该合并"
+
+        # 测试3: 重叠窗口内的重复记录合并结果不变
+        repeat = sync.refresh()
+        assert repeat["success"] and not repeat["data"]["changed"] and not repeat["data"]["deleted"], \
+            f"重复的变更不应该再报告变化：{repeat['data']}"
+        photo_id = next(iter(sync.photos[created]))
+        assert photo_service.delete_photo(photo_id, created)["success"], "应该可以删除照片"
+        assert sync.refresh()["data"]["changed"] == [created] and not sync.photos[created], "删除的照片应该移除"
+
+        # 已登记订单的进度先于订单记录到达时，列表按副本中的进度重算派生字段
+        stage = dict(min(sync.progress[created].values(), key=lambda p: p.get("stage_order", 0)),
+                     status="in_progress", updated_at="9999-12-31T00:00:00.000Z")
+        sync._merge({"progress": [stage]})
+        listed = next(o for o in sync.list_orders("制作中") if o["_id"] == created)
+        assert listed["current_stage"] == stage["stage_name"], f"当前阶段应该按进度重算：{listed}"
+        assert sync.orders[created]["order_status"] == "待处理", "副本中的订单记录不应该被修改"
+
+        # 测试4: 水位线无效时全量重新加载
+        assert client.get_changes("not-a-time")["data"]["full_resync"], "无效水位线应该要求全量同步"
+        sync.watermark = "not-a-time"
+        assert sync.refresh()["data"]["full"] and len(sync.orders) == 150, "应该全量重新加载"
+        assert sync.stats["full_loads"] == 2, "应该全量加载两次"
+        print("✅ 测试10通过: 订单副本增量同步，重复和删除正确合并")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_change_feed_cap():
+    """测试增量变更不超过云数据库单次查询上限"""
+    print("\n=== 测试增量变更上限 ===")
+
+    from cloudbase_emulator import CHANGE_FEED_MAX_RECORDS, DB_MAX_GET
+
+    server, base_url = start_emulator()
+    try:
+        client = make_client(base_url)
+        since = now_iso(datetime.now(timezone.utc) - timedelta(seconds=1))
+        store = server.emulator.store
+        assert CHANGE_FEED_MAX_RECORDS + 1 <= DB_MAX_GET, "多取的一条不能超过单次查询上限"
+
+        for i in range(CHANGE_FEED_MAX_RECORDS):
+            store.add("photos", {"order_id": "cap", "file_name": f"{i}.jpg", "updated_at": now_iso()})
+        data = client.get_changes(since, limit=5000)["data"]
+        assert not data["full_resync"] and len(data["photos"]) == CHANGE_FEED_MAX_RECORDS, \
+            f"上限以内应该返回全部变更：{data['full_resync']} {len(data['photos'])}"
+
+        # 达到 DB_MAX_GET 条时不能返回被截断的增量，必须要求全量同步
+        store.add("photos", {"order_id": "cap", "file_name": "last.jpg", "updated_at": now_iso()})
+        data = client.get_changes(since)["data"]
+        assert data["full_resync"] and not data["photos"], "变更超过上限时应该要求全量同步"
+        print(f"✅ 测试17通过: 增量变更最多 {CHANGE_FEED_MAX_RECORDS} 条，超过时要求全量同步")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_order_replica():
+    """测试订单只读副本"""
+    print("\n=== 测试订单只读副本 ===")
+
+    server, base_url = start_emulator(seed_orders=300)
+    try:
+        client = make_client(base_url)
+        clock = FakeClock()
+        replica = OrderReplica(client, max_staleness=30, clock=clock)
+        order_service = OrderService(client, replica=replica)
+        other = make_client(base_url)
+
+        # 测试1: 首次查询全量加载，列表、搜索和仪表板与云函数一致
+        listed = order_service.list_orders(page=2, limit=25, status="制作中")
+        expected = other.get_orders(page=2, limit=25, status="制作中")["data"]
+        assert [o["_id"] for o in listed["data"]["orders"]] == [o["_id"] for o in expected["orders"]], "订单列表应该一致"
+        assert listed["data"]["pagination"]["total_count"] == expected["pagination"]["total_count"], "订单总数应该一致"
+        assert listed["replica"]["staleness_seconds"] == 0, "结果应该带副本的数据年龄"
+        phone = expected["orders"][0]["customer_phone"]
+        assert replica.search_orders("phone", phone)["data"] == other.search_orders("phone", phone)["data"], \
+            "按电话查询结果应该一致"
+        dashboard = order_service.get_order_statistics()["data"]
+        remote = other.get_dashboard_data()["data"]
+        for key in ("overview", "order_status_stats", "stage_stats", "completion_trend", "performance_metrics"):
+            assert dashboard[key] == remote[key], f"仪表板 {key} 应该一致"
+        assert [a["timestamp"] for a in dashboard["recent_activities"]] == \
+            [a["timestamp"] for a in remote["recent_activities"][:OrderReplica.RECENT_ACTIVITY_LIMIT]], "最近动态应该一致"
+        assert replica.stats["full_loads"] == 1, "应该只全量加载一次"
+
+        # 测试2: 副本新鲜时查询不请求云函数
+        server.reset_stats()
+        start = time.perf_counter()
+        for page in range(1, 101):
+            order_service.list_orders(page=page % 12 + 1, limit=25)
+        elapsed_ms = (time.perf_counter() - start) * 1000 / 100
+        assert not server.get_stats(), f"副本新鲜时不应该请求云函数：{server.get_stats()}"
+        assert elapsed_ms < 5, f"本地查询应该在毫秒级，实际：{elapsed_ms:.2f}ms"
+        number = expected["orders"][3]["order_number"]
+        found = order_service.search_orders(number[-6:].lower())["data"]
+        assert number in [o["order_number"] for o in found], "应该可以按订单号片段搜索"
+
+        # 测试3: 本进程写入后下一次查询立即同步
+        pending = replica.list_orders(status="待处理", limit=1)["data"]["orders"][0]
+        assert ProgressService(client).start_stage(pending["_id"], "STAGE001")["success"], "应该可以开始阶段"
+        making = order_service.list_orders(status="制作中", limit=500)["data"]["orders"]
+        assert pending["_id"] in [o["_id"] for o in making], "本进程的写入应该立即可见"
+        assert replica.stats["delta_syncs"] == 1, "应该增量同步一次"
+
+        # 测试4: 其他进程的写入在 max_staleness 内可见
+        created = other.create_admin_order({"customer_name": "副本", "customer_phone": "13900002222"})["data"]["order_id"]
+        clock.now += 10
+        stale = order_service.list_orders(limit=1)
+        assert stale["data"]["orders"][0]["_id"] != created and stale["replica"]["staleness_seconds"] == 10, \
+            "数据年龄未超过上限时读取副本"
+        clock.now += 25
+        fresh = order_service.list_orders(limit=1)
+        assert fresh["data"]["orders"][0]["_id"] == created, "超过上限后应该同步到最新"
+        assert fresh["data"]["pagination"]["total_count"] == 301, "订单总数应该包含新订单"
+
+        # 测试5: 没有 updated_at 的旧记录可以被新版本覆盖
+        legacy = {"_id": "legacy-photo", "order_id": created, "stage_id": "STAGE001", "description": "旧照片"}
+        replica._merge({"photos": [legacy]})
+        replica._merge({"photos": [{**legacy, "description": "已更新", "updated_at": now_iso()}]})
+        stored = replica._query("SELECT updated_at, doc FROM photos WHERE _id = ?", ("legacy-photo",))
+        assert stored[0][0] and "已更新" in stored[0][1], f"旧记录应该被新版本覆盖：{stored}"
+        print("✅ 测试11通过: 只读副本与云函数结果一致，本地查询不请求云函数，数据年龄有上限")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_order_search():
+    """测试订单搜索索引随副本更新"""
+    print("\n=== 测试订单搜索 ===")
+
+    server, base_url = start_emulator(seed_orders=200)
+    try:
+        client = make_client(base_url)
+        replica = OrderReplica(client)
+        index = OrderSearchIndex()
+        replica.subscribe(index.apply_changes)
+        order_service = OrderService(client, replica=replica, search_index=index)
+
+        # 测试1: 首次搜索时副本全量加载，索引随之建立
+        first = order_service.list_orders(limit=1)["data"]["orders"][0]
+        found = order_service.search(first["order_number"].lower(), limit=1)
+        assert found["data"][0]["_id"] == first["_id"] and len(index) == 200, "应该按订单号找到订单"
+        by_phone = order_service.search(first["customer_phone"][-4:], limit=200)["data"]
+        assert first["_id"] in [o["_id"] for o in by_phone], "应该按电话后四位找到订单"
+
+        # 测试2: 新建、修改和删除订单后索引增量更新
+        created = order_service.create_order({"customer_name": "欧阳索引", "customer_phone": "13611118888"})["data"]
+        assert order_service.search("8888")["data"][0]["_id"] == created["order_id"], "新订单应该可以按电话搜索"
+        assert order_service.update_order(created["order_id"], {"customer_name": "司马索引"})["success"], "应该可以修改订单"
+        assert [o["customer_name"] for o in order_service.search("司马")["data"]] == ["司马索引"], "修改后的姓名应该可以搜索"
+        assert not order_service.search("欧阳")["data"], "旧姓名应该从索引移除"
+        assert order_service.delete_order(first["_id"])["success"], "应该可以删除订单"
+        assert not order_service.search(first["order_number"])["data"], "删除的订单应该从索引移除"
+        assert replica.stats["full_loads"] == 1, "索引只随增量更新，不重新全量加载"
+
+        # 测试3: 没有索引时退回云函数搜索
+        fallback = OrderService(client).search("司马索引")
+        assert fallback["success"] and fallback["data"][0]["_id"] == created["order_id"], "应该退回按姓名搜索"
+        print("✅ 测试12通过: 搜索索引随副本增量更新")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_customer_lookup():
+    """测试客户查询缓存和限流"""
+    print("\n=== 测试客户查询缓存和限流 ===")
+
+    server, base_url = start_emulator(seed_orders=30)
+    try:
+        client = make_client(base_url)
+        now = [0.0]
+        lookup = CustomerLookup(client, ttl=60, negative_ttl=20,
+                                session_limiter=TokenBucketLimiter(3, 0.1, clock=lambda: now[0]),
+                                ip_limiter=TokenBucketLimiter(5, 0.5, clock=lambda: now[0]))
+        order = client.get_orders(limit=1, status="待处理")["data"]["orders"][0]
+        search_calls = lambda: server.get_stats().get("customer-search", {}).get("calls", 0)
+
+        # 测试1: 同一号码的不同写法只查询一次
+        server.reset_stats()
+        phone = order["customer_phone"]
+        first = lookup.search("phone", phone, session_id="s1", ip="1.1.1.1")
+        again = lookup.search("phone", f"+86 {phone[:3]}-{phone[3:]}", session_id="s2", ip="2.2.2.2")
+        assert first["success"] and order["_id"] in [o["_id"] for o in first["data"]], "应该查到订单"
+        assert again.get("cached") and again["data"] == first["data"], "规范化后相同的查询应该命中缓存"
+        assert search_calls() == 1, f"相同号码只应该调用一次云函数，实际：{search_calls()}"
+
+        # 测试2: 无结果同样缓存
+        assert not lookup.search("phone", "13000000000", session_id="s1")["data"], "不存在的号码应该没有结果"
+        assert lookup.search("phone", "13000000000", session_id="s1").get("cached"), "无结果也应该缓存"
+        assert lookup.get_stats()["negative"] == 1, "应该记录一次无结果查询"
+
+        # 测试2b: 云函数收到原始写法，按其他写法缓存的无结果不影响按保存格式查询
+        free_text = client.create_admin_order({"customer_name": "自由格式", "customer_phone": "138-1234-5678"})
+        assert free_text["success"], "应该可以创建订单"
+        assert not lookup.search("phone", "13812345678", session_id="s4")["data"], "与保存格式不同时云函数查不到"
+        exact = lookup.search("phone", "138-1234-5678", session_id="s4")
+        assert not exact.get("cached") and [o["customer_phone"] for o in exact["data"]] == ["138-1234-5678"], \
+            "按保存的写法应该查到订单"
+
+        # 测试3: 阶段更新后缓存失效
+        assert ProgressService(client).start_stage(order["_id"], "STAGE001")["success"], "应该可以开始阶段"
+        refreshed = lookup.search("phone", phone, session_id="s3")
+        assert not refreshed.get("cached") and search_calls() == 5, "写操作之后应该重新查询"
+
+        # 测试4: 未命中缓存的查询按会话和 IP 限流，命中缓存的不受限
+        results = [lookup.search("order_number", f"LD0000{i:06d}", session_id="scraper", ip="9.9.9.9") for i in range(5)]
+        assert all(r["success"] for r in results[:3]) and results[3].get("rate_limited"), "会话超过额度后应该被限流"
+        assert results[3]["retry_after"] == 10.0, f"应该提示等待时间：{results[3]['retry_after']}"
+        assert lookup.search("phone", phone, session_id="scraper", ip="9.9.9.9").get("cached"), "命中缓存的查询不受限流"
+        others = [lookup.search("order_number", f"LD1111{i:06d}", session_id=f"rotate{i}", ip="9.9.9.9") for i in range(4)]
+        assert all(r["success"] for r in others[:2]) and others[2].get("rate_limited"), "更换会话时按 IP 限流"
+        now[0] += 10
+        assert lookup.search("order_number", "LD0000999999", session_id="scraper", ip="8.8.8.8")["success"], \
+            "等待后应该恢复"
+        assert lookup.get_stats()["throttled"] == 4, f"应该记录限流次数：{lookup.get_stats()}"
+        print("✅ 测试13通过: 客户查询按规范化号码缓存（含无结果），写后失效，未命中缓存时限流")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_dashboard_counters():
+    """测试仪表板计数器的增量维护和重建"""
+    print("\n=== 测试仪表板计数器 ===")
+
+    server, base_url = start_emulator(seed_orders=200)
+    try:
+        client = make_client(base_url)
+        order_service = OrderService(client)
+        progress_service = ProgressService(client)
+        keys = ("overview", "order_status_stats", "stage_stats", "completion_trend", "performance_metrics")
+
+        # 测试1: 首次查询时全量重建计数器，之后的查询只读计数器
+        first = client.get_dashboard_data()["data"]
+        rebuilt_at = first["stats_rebuilt_at"]
+        assert rebuilt_at and first["overview"]["total_orders"] == 200, "首次查询应该重建计数器"
+        assert len(first["recent_activities"]) == 50, "最近动态只返回前 50 条"
+
+        # 测试2: 创建、阶段流转、批量流转、修改状态和删除后，增量计数与全量重算一致
+        created = [order_service.create_order({"customer_name": f"计数{i}", "customer_phone": f"1370000{i:04d}"})
+                   ["data"]["order_id"] for i in range(3)]
+        for stage in range(1, 9):
+            stage_id = f"STAGE{stage:03d}"
+            assert progress_service.start_stage(created[0], stage_id)["success"], "应该可以开始阶段"
+            assert progress_service.complete_stage(created[0], stage_id)["success"], "应该可以完成阶段"
+        pending = [{"_id": o["_id"], "order_number": o["order_number"], "order_status": "待处理"}
+                   for o in client.get_orders(limit=5, status="待处理")["data"]["orders"]]
+        assert progress_service.batch_transition(pending, "STAGE001", "in_progress")["data"]["succeeded"] == 5, \
+            "批量流转应该全部成功"
+        finished = [o for o in client.get_orders(limit=3, status="已完成")["data"]["orders"] if o["_id"] != created[0]]
+        assert order_service.update_order(finished[1]["_id"], {"order_status": "制作中"})["success"], "应该可以修改订单状态"
+        assert order_service.delete_order(finished[0]["_id"])["success"], "应该可以删除已完成订单"
+        assert order_service.delete_order(created[2])["success"], "应该可以删除待处理订单"
+
+        dashboard = client.get_dashboard_data()["data"]
+        assert dashboard["stats_rebuilt_at"] == rebuilt_at, "写操作后的查询不应该重建计数器"
+        assert dashboard["overview"]["total_orders"] == 200 + 3 - 2, "订单数应该增量更新"
+        assert dashboard["overview"]["today_completed"] >= 1 and dashboard["completion_trend"]["completions"][-1] >= 1, \
+            "今天完成的订单应该计入今日完成和趋势"
+        assert dashboard["recent_activities"][0]["type"] == "阶段完成", "最近动态应该包含刚完成的阶段"
+        rebuild = client.rebuild_dashboard_stats()
+        assert rebuild["success"] and rebuild["data"]["drift"] == [], f"增量计数不应该有偏差：{rebuild['data']['drift']}"
+        rebuilt = client.get_dashboard_data()["data"]
+        for key in keys:
+            assert rebuilt[key] == dashboard[key], f"重建前后仪表板 {key} 应该一致"
+
+        # 测试3: 重建校正注入的偏差
+        stats = server.emulator.store.get("dashboard_stats", "global")
+        stats["status"]["已完成"] += 3
+        stats["stages"]["切割"]["pending"] -= 1
+        assert client.get_dashboard_data()["data"]["order_status_stats"] == rebuilt["order_status_stats"], \
+            "计数器没有写操作时仪表板应该命中缓存"
+        drift = client.rebuild_dashboard_stats()["data"]["drift"]
+        assert {d["field"] for d in drift} == {"status.已完成", "stages.切割.pending"}, f"应该报告偏差字段：{drift}"
+        assert next(d for d in drift if d["field"] == "status.已完成")["stored"] == \
+            rebuilt["order_status_stats"]["已完成"] + 3, "偏差应该包含重建前的计数"
+        repaired = client.get_dashboard_data()["data"]
+        for key in keys:
+            assert repaired[key] == rebuilt[key], f"重建后仪表板 {key} 应该恢复"
+        print("✅ 测试14通过: 仪表板计数器随写操作增量更新，查询不扫描全表，重建校正偏差")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_operation_log_paging():
+    """测试操作日志的服务端筛选和游标分页"""
+    print("\n=== 测试操作日志分页 ===")
+
+    server, base_url = start_emulator()
+    try:
+        client = make_client(base_url)
+        store = server.emulator.store
+        start = datetime.now(timezone.utc) - timedelta(days=10)
+        for i in range(1500):
+            moment = start + timedelta(minutes=9 * i)
+            store.add("operation_logs", {
+                "type": ["订单创建", "阶段开始", "阶段完成"][i % 3], "operator": ["admin", "operator"][i % 2],
+                "description": f"操作：客户 {['王伟', '李芳', '张敏'][i % 5 % 3]}", "order_number": f"LD{i % 40:04d}X",
+                "metadata": {}, "timestamp": now_iso(moment - timedelta(milliseconds=i % 2)), "created_at": now_iso(moment)
+            })
+        all_logs = store.find("operation_logs")
+        log_calls = lambda: server.get_stats().get("admin-logs", {}).get("calls", 0)
+
+        # 测试1: 单次请求只返回一页
+        server.reset_stats()
+        page = client.get_operation_logs(with_total=True)["data"]
+        assert len(page["logs"]) == 100 and page["pagination"]["has_more"], "默认每页 100 条"
+        assert page["pagination"]["total_count"] == len(all_logs), "应该返回符合条件的总数"
+        assert not client.get_operation_logs(cursor="not-a-cursor")["success"], "无效游标应该返回错误"
+
+        # 测试2: 流式遍历超过 1000 条的全部日志，按时间倒序且不重复
+        server.reset_stats()
+        streamed = list(client.iter_operation_logs(page_size=500))
+        assert len(streamed) == len(all_logs) == len({log["_id"] for log in streamed}), "应该遍历全部日志且不重复"
+        keys = [(log["timestamp"], log["_id"]) for log in streamed]
+        assert keys == sorted(keys, reverse=True), "应该按时间倒序"
+        assert log_calls() == 3, f"1500 条日志按 500 一页应该请求 3 次，实际：{log_calls()}"
+
+        # 测试3: 筛选在云函数中完成，结果与逐条筛选一致
+        since = now_iso(start + timedelta(days=3))
+        until = now_iso(start + timedelta(days=6))
+        filters = {"type": "阶段完成", "since": since, "until": until, "order_number": "ld001",
+                   "operator": "OPER", "customer": "李芳"}
+        expected = sorted((log for log in all_logs
+                           if log["type"] == "阶段完成" and since <= log["timestamp"] < until
+                           and "ld001" in log["order_number"].lower() and "oper" in log["operator"]
+                           and "李芳" in log["description"]),
+                          key=lambda log: (log["timestamp"], log["_id"]), reverse=True)
+        filtered = list(client.iter_operation_logs(filters, page_size=7))
+        assert expected and [log["_id"] for log in filtered] == [log["_id"] for log in expected], \
+            "筛选结果应该与逐条筛选一致"
+        total = client.get_operation_logs(filters, with_total=True)["data"]["pagination"]["total_count"]
+        assert total == len(expected), "筛选后的总数应该正确"
+
+        # 测试4: 今日操作数只请求一条日志，由云函数计数
+        day_start = now_iso(datetime.now(timezone.utc) - timedelta(hours=20))
+        today = client.get_operation_logs({"since": day_start}, limit=1, with_total=True)["data"]
+        assert len(today["logs"]) == 1, "计数请求只应该返回一条日志"
+        assert today["pagination"]["total_count"] == sum(log["timestamp"] >= day_start for log in all_logs), \
+            "计数应该覆盖全部日志而不是已加载的一页"
+        print("✅ 测试15通过: 操作日志在云函数中筛选，游标分页遍历超过 1000 条的日志")
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_load_generator():
+    """测试负载生成器"""
+    print("\n=== 测试负载生成器 ===")
+
+    server, base_url = start_emulator(seed_orders=50, latency_ms=5)
+    try:
+        report = run_load(base_url, users=4, duration=1.5, think_time=(0, 0.02), photo_size=1024)
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    operations = report["operations"]
+    assert {"search_orders", "order_list", "order_detail", "dashboard"} <= set(operations), \
+        f"应该覆盖主要业务流程，实际：{list(operations)}"
+    for name, stats in operations.items():
+        assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"] <= stats["max_ms"], f"{name} 百分位应该单调"
+        assert stats["count"] > 0 and stats["throughput"] > 0, f"{name} 应该有吞吐量"
+    assert operations["search_orders"]["backend_calls_per_op"] <= 1, "客户查询最多一次后端调用"
+    assert report["error_rate"] < 0.2, f"错误率不应过高：{report['error_rate']}"
+    print("✅ 测试16通过: 负载生成器报告百分位、吞吐量和后端调用次数")
+
+
+def run_all_tests():
+    """运行所有测试"""
+    print("\n" + "="*60)
+    print("🧪 开始测试本地模拟服务")
+    print("="*60)
+
+    try:
+        test_services_against_emulator()
+        test_order_scope()
+        test_stage_transition_conflict()
+        test_order_pagination()
+        test_batch_transition()
+        test_order_sync()
+        test_change_feed_cap()
+        test_order_replica()
+        test_order_search()
+        test_customer_lookup()
+        test_dashboard_counters()
+        test_operation_log_paging()
+        test_load_generator()
+
+        print("\n" + "="*60)
+        print("🎉 所有测试通过！模拟服务正常！")
+        print("="*60)
+        return True
+
+    except AssertionError as e:
+        print(f"\n❌ 测试失败: {str(e)}")
+        return False
+    except Exception as e:
+        print(f"\n❌ 测试异常: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+if __name__ == "__main__":
+    success = run_all_tests()
+    exit(0 if success else 1)
@@ -53,7 +53,8 @@ class MockAPIClient:
         }
     
     def update_order_progress(self, order_id: str, stage_id: str, 
-                            status: str, notes: str = "") -> Dict[str, Any]:
+                            status: str, notes: str = "",
+                            expected_status: str = None, expected_version: int = None) -> Dict[str, Any]:
         """模拟更新进度"""
         return {
             'success': True,
@@ -248,6 +249,169 @@ def test_photo_service():
     print("✅ 测试6通过: 有效文件验证成功")
 
 
+def test_search_index():
+    """测试订单搜索索引"""
+    print("\n=== 测试订单搜索索引 ===")
+    
+    import random
+    import time
+    from services.search_index import OrderSearchIndex, PINYIN_AVAILABLE
+    
+    rng = random.Random(7)
+    surnames = "王李张刘陈杨赵黄周吴"
+    orders = [
+        {
+            '_id': f'order_{i:06d}',
+            'order_number': f'LD{i % 10000:04d}{i:06X}',
+            'customer_name': rng.choice(surnames) + rng.choice("伟芳娜敏静丽强磊军洋"),
+            'customer_phone': f'13{rng.randrange(10**9):09d}'
+        }
+        for i in range(100000)
+    ]
+    index = OrderSearchIndex()
+    index.rebuild(orders)
+    
+    # 测试1: 订单号前缀（不区分大小写），完全匹配排在最前
+    target = orders[12345]
+    results = index.search(target['order_number'].lower(), limit=5)
+    assert results and results[0]['_id'] == target['_id'], "订单号完全匹配应该排在最前"
+    prefix = target['order_number'][:6]
+    expected = sorted(o['order_number'] for o in orders if o['order_number'].startswith(prefix))[:20]
+    assert [o['order_number'] for o in index.search(prefix)] == expected, "订单号前缀应该按订单号排序返回"
+    print("✅ 测试1通过: 订单号前缀搜索")
+    
+    # 测试2: 电话后四位 / 任意后缀
+    last4 = target['customer_phone'][-4:]
+    matched = {o['_id'] for o in index.search(last4, limit=1000)}
+    expected = {o['_id'] for o in orders if o['customer_phone'].endswith(last4)} | \
+        {o['_id'] for o in orders if o['order_number'].startswith(last4)}
+    assert target['_id'] in matched and matched == expected, "电话后四位应该匹配全部订单"
+    assert index.search(target['customer_phone'][-8:])[0]['_id'] == target['_id'], "更长的后缀应该定位到订单"
+    print("✅ 测试2通过: 电话后缀搜索")
+    
+    # 测试3: 姓名完全匹配排在前缀匹配之前
+    index.upsert({'_id': 'named', 'order_number': 'LDX', 'customer_name': '王', 'customer_phone': ''})
+    results = index.search('王', limit=3)
+    assert results[0]['_id'] == 'named' and all(o['customer_name'].startswith('王') for o in results), \
+        "姓名完全匹配应该排在前缀匹配之前"
+    if PINYIN_AVAILABLE:
+        assert all(o['customer_name'][0] == '王' for o in index.search('w', limit=50)), "拼音首字母应该匹配姓名"
+    print("✅ 测试3通过: 客户姓名搜索")
+    
+    # 测试4: 增量更新
+    index.upsert(dict(target, customer_phone='13900009999', order_number='LDNEW000001'))
+    assert index.search('LDNEW')[0]['_id'] == target['_id'], "更新后的订单号应该可以搜索"
+    assert target['_id'] not in {o['_id'] for o in index.search(last4, limit=1000)}, "旧电话号码应该移除"
+    index.remove(target['_id'])
+    assert not index.search('LDNEW') and len(index) == 100000, "删除的订单应该从索引移除"
+    print("✅ 测试4通过: 增量更新索引")
+    
+    # 测试5: 10 万订单的输入即搜耗时
+    queries = [o['order_number'][:rng.randint(3, 8)] for o in rng.sample(orders, 100)]
+    queries += [o['customer_phone'][-4:] for o in rng.sample(orders, 100)]
+    queries += [rng.choice(surnames) for _ in range(100)]
+    start = time.perf_counter()
+    for query in queries:
+        index.search(query)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    assert elapsed_ms < 5, f"10 万订单的查询应该在 5ms 以内，实际：{elapsed_ms:.3f}ms"
+    print(f"✅ 测试5通过: 平均查询耗时 {elapsed_ms:.3f}ms")
+
+
+def test_log_store():
+    """测试操作日志列式存储"""
+    print("\n=== 测试操作日志列式存储 ===")
+    
+    import random
+    import time
+    from datetime import datetime, timedelta, timezone
+    from services.log_store import OperationLogStore
+    
+    rng = random.Random(11)
+    beijing = timezone(timedelta(hours=8))
+    now = datetime.now(timezone.utc)
+    types = ["订单创建", "订单更新", "阶段开始", "阶段完成", "照片上传", "用户登录"]
+    operators = ["admin", "operator", "viewer", "张经理"]
+    names = ["王伟", "李芳", "张敏", "刘强"]
+    logs = []
+    for i in range(100000):
+        moment = now - timedelta(seconds=rng.randrange(60 * 24 * 3600))
+        name = rng.choice(names)
+        logs.append({
+            'type': rng.choice(types),
+            'operator': rng.choice(operators),
+            'description': f"操作：客户 {name}",
+            'order_number': f"LD{rng.randrange(10000):04d}ABC{i % 977:03d}",
+            'metadata': {'customer_name': name},
+            'timestamp': moment.strftime("%Y-%m-%dT%H:%M:%S.") + f"{moment.microsecond // 1000:03d}Z"
+        })
+    logs.append({'type': '订单创建', 'operator': 'admin', 'description': '', 'order_number': '', 'timestamp': 'bad'})
+    store = OperationLogStore(logs)
+    
+    def local_date(log):
+        try:
+            return datetime.fromisoformat(log['timestamp'].replace('Z', '+00:00')).astimezone(beijing).date()
+        except ValueError:
+            return None
+    
+    def expected(log_type=None, start=None, end=None, number='', customer='', operator=''):
+        result = []
+        for log in logs:
+            day = local_date(log)
+            if log_type and log['type'] != log_type:
+                continue
+            if (start or end) and (day is None or (start and day < start) or (end and day > end)):
+                continue
+            if number and number.lower() not in log['order_number'].lower():
+                continue
+            if customer and customer.lower() not in (log['description'] + str(log.get('metadata', {}))).lower():
+                continue
+            if operator and operator.lower() not in log['operator'].lower():
+                continue
+            result.append(log)
+        return sorted(result, key=lambda log: log['timestamp'], reverse=True)
+    
+    # 测试1: 各种条件组合与逐条筛选的结果一致，按时间倒序
+    today = store.today()
+    cases = [
+        dict(log_type="阶段完成"),
+        dict(start=today - timedelta(days=7)),
+        dict(start=today, end=today),
+        dict(start=today - timedelta(days=20), end=today - timedelta(days=10), log_type="订单更新"),
+        dict(number="abc01"),
+        dict(customer="李芳", operator="OPER"),
+        dict(log_type="照片上传", start=today - timedelta(days=30), number="LD1", customer="王", operator="张")
+    ]
+    for case in cases:
+        positions = store.filter(log_type=case.get('log_type'), start_date=case.get('start'),
+                                 end_date=case.get('end'), order_number=case.get('number', ''),
+                                 customer=case.get('customer', ''), operator=case.get('operator', ''))
+        rows = store.rows(positions)
+        want = expected(**case)
+        assert len(rows) == len(want) and [r['timestamp'] for r in rows] == [w['timestamp'] for w in want], \
+            f"筛选结果应该与逐条筛选一致：{case}"
+    assert len(store.filter()) == len(logs), "没有条件时应该返回全部日志"
+    assert not len(store.filter(log_type="不存在的类型")), "不存在的类型应该没有结果"
+    print("✅ 测试1通过: 筛选结果与逐条筛选一致")
+    
+    # 测试2: 今日操作数
+    today_logs = [log for log in logs if local_date(log) == today]
+    assert store.count_on(today) == len(today_logs), "今日操作数应该正确"
+    positions = store.filter(log_type="阶段开始")
+    assert store.count_on(today, positions) == len([log for log in today_logs if log['type'] == "阶段开始"]), \
+        "筛选结果中的今日操作数应该正确"
+    print("✅ 测试2通过: 按北京时间统计今日操作")
+    
+    # 测试3: 10 万条日志的筛选耗时
+    start = time.perf_counter()
+    for _ in range(20):
+        store.filter(log_type="阶段完成", start_date=today - timedelta(days=30), operator="admin")
+        store.filter(order_number="ABC12")
+    elapsed_ms = (time.perf_counter() - start) * 1000 / 40
+    assert elapsed_ms < 20, f"10 万条日志的筛选应该在毫秒级，实际：{elapsed_ms:.2f}ms"
+    print(f"✅ 测试3通过: 平均筛选耗时 {elapsed_ms:.3f}ms")
+
+
 def run_all_tests():
     """运行所有测试"""
     print("\n" + "="*60)
@@ -257,6 +421,8 @@ def run_all_tests():
     try:
         test_order_service()
         test_progress_service()
+        test_search_index()
+        test_log_store()
         test_photo_service()
         
         print("\n" + "="*60)
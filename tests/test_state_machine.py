@@ -4,10 +4,11 @@
 测试订单和阶段的状态转换逻辑
 """
 
+import random
 import sys
 sys.path.insert(0, '../streamlit_app')
 
-from services.state_machine import OrderStateMachine, OrderStatus, StageStatus
+from services.state_machine import OrderStateMachine, OrderStatus, StageStatus, ProgressSnapshot, evaluate_bulk
 
 
 def test_order_state_transitions():
@@ -222,6 +223,142 @@ def test_get_allowed_actions():
     print(f"✅ 测试3通过: 已完成状态允许的操作: {actions}")
 
 
+def test_progress_snapshot():
+    """测试进度快照"""
+    print("\n=== 测试进度快照 ===")
+    
+    # 输入顺序与阶段顺序不同
+    progress_list = [
+        {'stage_id': 'S3', 'stage_name': '石墨化', 'stage_order': 3, 'status': 'pending'},
+        {'stage_id': 'S1', 'stage_name': '进入实验室', 'stage_order': 1, 'status': 'completed'},
+        {'stage_id': 'S2', 'stage_name': '碳化提纯', 'stage_order': 2, 'status': 'in_progress'}
+    ]
+    snapshot = ProgressSnapshot(progress_list)
+    
+    # 测试1: 排序、索引和状态统计
+    assert [s.stage_id for s in snapshot.stages] == ['S1', 'S2', 'S3'], "快照应按阶段顺序排列"
+    assert snapshot.find('S3').index == 2, "阶段索引不正确"
+    assert snapshot.find('S9') is None, "不存在的阶段应返回None"
+    assert snapshot.count(StageStatus.COMPLETED) == 1, "已完成阶段数不正确"
+    assert snapshot.find('S2').source is progress_list[2], "快照记录应引用原始进度"
+    print("✅ 测试1通过: 排序、索引和状态统计正确")
+    
+    # 测试2: 当前阶段和下一阶段
+    assert snapshot.current_stage.stage_id == 'S2', "当前阶段应为S2"
+    assert snapshot.next_stage.stage_id == 'S3', "下一阶段应为S3"
+    assert snapshot.current_stage_name == '碳化提纯', "当前阶段名称不正确"
+    assert snapshot.progress_percentage == 33, "进度应为33%"
+    assert snapshot.order_status == '制作中', "订单状态应为制作中"
+    print("✅ 测试2通过: 当前阶段和下一阶段正确")
+    
+    # 测试3: 与类方法结果一致（类方法也接受快照）
+    for stage_id in ['S1', 'S2', 'S3', 'S9']:
+        assert snapshot.can_start(stage_id) == OrderStateMachine.can_start_stage(progress_list, stage_id), \
+            f"{stage_id} 能否开始的结果不一致"
+        assert snapshot.can_complete(stage_id) == OrderStateMachine.can_complete_stage(snapshot, stage_id), \
+            f"{stage_id} 能否完成的结果不一致"
+    assert snapshot.can_start('S3') == (False, "请先完成进行中的阶段：碳化提纯"), "S3不应能开始"
+    order = {'order_status': '制作中', 'is_deleted': False}
+    assert snapshot.allowed_actions(order) == OrderStateMachine.get_allowed_actions(order, progress_list), \
+        "允许的操作不一致"
+    assert OrderStateMachine.snapshot(snapshot) is snapshot, "已是快照时应直接返回"
+    print("✅ 测试3通过: 快照与类方法结果一致")
+    
+    # 测试4: 最后一个已完成阶段之后的阶段为当前阶段
+    progress_list[2]['status'] = 'completed'
+    snapshot = ProgressSnapshot(progress_list)
+    assert snapshot.current_stage is None, "没有进行中的阶段"
+    assert snapshot.current_stage_name == '石墨化', "当前阶段应为石墨化"
+    assert snapshot.can_start('S3') == (True, "可以开始"), "S3应能开始"
+    assert ProgressSnapshot([]).current_stage_name == '未开始', "空进度应为未开始"
+    print("✅ 测试4通过: 无进行中阶段时的当前阶段正确")
+    
+    # 测试5: stage_order 为 None 时按 0 排序，不抛出异常
+    progress_list = [
+        {'stage_id': 'S1', 'stage_name': '进入实验室', 'stage_order': None, 'status': 'completed'},
+        {'stage_id': 'S2', 'stage_name': '碳化提纯', 'stage_order': 2, 'status': 'pending'}
+    ]
+    snapshot = ProgressSnapshot(progress_list)
+    assert [s.stage_id for s in snapshot.stages] == ['S1', 'S2'], "None 应排在最前"
+    assert OrderStateMachine.calculate_progress(progress_list) == 50, "进度应为50%"
+    assert OrderStateMachine.auto_update_order_status(progress_list) == '制作中', "订单状态应为制作中"
+    assert snapshot.current_stage_name == OrderStateMachine.get_current_stage_name(progress_list) == '碳化提纯', \
+        "当前阶段应为碳化提纯"
+    print("✅ 测试5通过: 缺失的阶段顺序按0处理")
+
+
+def random_progress_list(rng, string_orders=False):
+    """随机生成一个订单的进度（阶段顺序可重复、可缺失或为 None，状态可能未知）"""
+    count = rng.choice([0, 1, 2, 3, 5, 8, 8, 8, 12])
+    progress_list = []
+    for i in range(count):
+        progress = {'stage_id': f'STAGE{i:03d}'}
+        if string_orders:
+            progress['stage_order'] = str(rng.randint(1, 12))
+        else:
+            roll = rng.random()
+            if roll < 0.85:
+                progress['stage_order'] = rng.choice([rng.randint(0, 10), rng.randint(0, 10) + 0.5])
+            elif roll < 0.9:
+                progress['stage_order'] = None
+        if rng.random() < 0.9:
+            progress['stage_name'] = f'阶段{i}'
+        status = rng.choices(['pending', 'in_progress', 'completed', 'unknown', None],
+                             weights=[40, 10, 45, 3, 2])[0]
+        if status is not None:
+            progress['status'] = status
+        progress_list.append(progress)
+    return progress_list
+
+
+def test_evaluate_bulk_matches_scalar():
+    """测试批量计算与逐个订单的状态机规则一致（随机生成的订单）"""
+    print("\n=== 测试批量计算 ===")
+    rng = random.Random(20241017)
+    order_statuses = ['待处理', '制作中', '已完成', '已取消', None]
+    
+    def check(orders, progress_lists):
+        result = evaluate_bulk(orders, progress_lists)
+        assert len(result) == len(orders), "结果行数应与订单数一致"
+        for i, (order, progress_list) in enumerate(zip(orders, progress_lists)):
+            expected = {
+                'progress_percentage': OrderStateMachine.calculate_progress(progress_list),
+                'current_stage': OrderStateMachine.get_current_stage_name(progress_list),
+                'order_status': OrderStateMachine.auto_update_order_status(progress_list),
+                'allowed_actions': OrderStateMachine.get_allowed_actions(order, progress_list)
+            }
+            actual = result.to_records()[i] if len(orders) < 50 else {
+                'progress_percentage': int(result.progress_percentage[i]),
+                'current_stage': result.current_stage_name[i],
+                'order_status': result.order_status[i],
+                'allowed_actions': result.allowed_actions(i)
+            }
+            assert actual == expected, f"第{i}个订单结果不一致：{actual} != {expected}，进度：{progress_list}"
+    
+    # 测试1: 随机批次
+    for _ in range(200):
+        size = rng.randint(0, 30)
+        orders = [{'order_status': rng.choice(order_statuses), 'is_deleted': rng.random() < 0.2} for _ in range(size)]
+        progress_lists = [random_progress_list(rng) for _ in range(size)]
+        check(orders, progress_lists)
+    print("✅ 测试1通过: 200个随机批次与逐个计算结果一致")
+    
+    # 测试2: 字符串形式的阶段顺序（按字符串排序）
+    for _ in range(20):
+        size = rng.randint(1, 10)
+        orders = [{'order_status': rng.choice(order_statuses)} for _ in range(size)]
+        progress_lists = [random_progress_list(rng, string_orders=True) for _ in range(size)]
+        check(orders, progress_lists)
+    print("✅ 测试2通过: 字符串阶段顺序结果一致")
+    
+    # 测试3: 大批量（一千个订单）
+    orders = [{'order_status': rng.choice(order_statuses)} for _ in range(1000)]
+    progress_lists = [random_progress_list(rng) for _ in range(1000)]
+    check(orders, progress_lists)
+    assert OrderStateMachine.evaluate_bulk(orders, progress_lists).action_flags.shape == (1000, 10), "操作矩阵形状不正确"
+    print("✅ 测试3通过: 1000个订单结果一致")
+
+
 def run_all_tests():
     """运行所有测试"""
     print("\n" + "="*60)
@@ -235,6 +372,8 @@ def run_all_tests():
         test_calculate_progress()
         test_auto_update_order_status()
         test_get_current_stage_name()
+        test_progress_snapshot()
+        test_evaluate_bulk_matches_scalar()
         test_get_allowed_actions()
         
         print("\n" + "="*60)